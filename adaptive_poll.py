@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+زمان‌بندی تطبیقی خواندن منبع قیمت بر اساس نوسان قیمت تتر
+
+به جای خواندن ثابت ساعتی، فاصله خواندن منبع (ChannelSource در
+auto_fetcher.py --watch و BotApiSource در ربات با POLL_ADAPTIVE=1) پس از هر
+خواندن دوباره تعیین می‌شود:
+
+- اگر تغییر قیمت تتر بین tickهای متوالی رسیده از خواندن قبلی حداقل
+  POLL_VOLATILITY_PCT درصد باشد، فاصله به POLL_MIN_SECONDS برمی‌گردد
+- در غیر این صورت (بازار آرام یا خطای خواندن) فاصله POLL_BACKOFF_FACTOR برابر
+  می‌شود تا حداکثر POLL_MAX_SECONDS
+- بیش از POLL_HOURLY_BUDGET خواندن در هر ساعت لغزان انجام نمی‌شود (سقف
+  درخواست‌های API)؛ خواندن بعدی تا آزاد شدن سهمیه عقب می‌افتد
+- خواندن فقط بین POLL_FIRST_HOUR و POLL_LAST_HOUR روزهای باز بازار انجام
+  می‌شود و هر روز با POLL_MIN_SECONDS شروع می‌شود
+
+هر تصمیم لاگ و در summary() (نمایش در /status) شمرده می‌شود. ارسال یا عدم ارسال
+پیام همچنان با سیاست انتشار (publish_policy.py) است.
+"""
+
+import os
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from config import config
+from prefetch import SLOT_FIRST_HOUR, SLOT_LAST_HOUR
+
+logger = logging.getLogger(__name__)
+
+# فعال‌سازی حلقه خواندن تطبیقی در ربات (auto_fetcher با --watch)
+POLL_ADAPTIVE = os.getenv('POLL_ADAPTIVE', '0').strip().lower() not in ('0', 'false', 'no', 'off', '')
+POLL_MIN_SECONDS = float(os.getenv('POLL_MIN_SECONDS', '60'))
+POLL_MAX_SECONDS = float(os.getenv('POLL_MAX_SECONDS', '1800'))
+# حداقل تغییر قیمت تتر بین دو tick متوالی برای بازار پرنوسان (درصد)
+POLL_VOLATILITY_PCT = float(os.getenv('POLL_VOLATILITY_PCT', '0.2'))
+POLL_BACKOFF_FACTOR = float(os.getenv('POLL_BACKOFF_FACTOR', '2'))
+# حداکثر خواندن منبع در هر ساعت (0 = بدون سقف)
+POLL_HOURLY_BUDGET = int(os.getenv('POLL_HOURLY_BUDGET', '30'))
+POLL_FIRST_HOUR = int(os.getenv('POLL_FIRST_HOUR', str(SLOT_FIRST_HOUR)))
+POLL_LAST_HOUR = int(os.getenv('POLL_LAST_HOUR', str(SLOT_LAST_HOUR)))
+
+VOLATILE = 'volatile'
+FLAT = 'flat'
+ERROR = 'error'
+
+REASON_LABELS = {
+    VOLATILE: 'بازار پرنوسان',
+    FLAT: 'بازار آرام',
+    ERROR: 'خطای خواندن منبع',
+}
+
+
+@dataclass
+class PollDecision:
+    """تصمیم پس از یک خواندن"""
+    reason: str
+    # فاصله تطبیقی (قبل از اعمال سهمیه و ساعات کاری)
+    interval: float
+    # زمان خواندن بعدی
+    next_at: datetime
+    # بیشترین تغییر قیمت بین tickهای جدید (درصد)؛ None یعنی tick جدیدی نیامده
+    change_pct: Optional[float] = None
+    # خواندن بعدی به خاطر سهمیه ساعتی عقب افتاده است
+    throttled: bool = False
+
+    @property
+    def label(self) -> str:
+        return REASON_LABELS.get(self.reason, self.reason)
+
+
+class AdaptivePoller:
+    """
+    تعیین زمان خواندن بعدی منبع
+
+    decide() پس از هر خواندن با tickهای موتور آمار (state.stats.ticks()) فراخوانی
+    می‌شود؛ run() حلقه خواندن و انتظار است. پارامترهای داده نشده از POLL_* خوانده
+    می‌شوند.
+    """
+
+    def __init__(
+        self,
+        min_seconds: float = POLL_MIN_SECONDS,
+        max_seconds: float = POLL_MAX_SECONDS,
+        threshold_pct: float = POLL_VOLATILITY_PCT,
+        backoff: float = POLL_BACKOFF_FACTOR,
+        hourly_budget: int = POLL_HOURLY_BUDGET,
+        first_hour: int = POLL_FIRST_HOUR,
+        last_hour: int = POLL_LAST_HOUR,
+        tz=None,
+        clock: Optional[Callable[[], datetime]] = None,
+        skip_day: Optional[Callable] = None,
+    ):
+        if not 0 < min_seconds <= max_seconds:
+            raise ValueError("باید 0 < POLL_MIN_SECONDS <= POLL_MAX_SECONDS باشد")
+        if backoff <= 1:
+            raise ValueError("POLL_BACKOFF_FACTOR باید بزرگ‌تر از 1 باشد")
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.threshold_pct = threshold_pct
+        self.backoff = backoff
+        self.hourly_budget = hourly_budget
+        self.first_hour = first_hour
+        self.last_hour = last_hour
+        self.tz = tz or config.current.tz
+        self._clock = clock or (lambda: datetime.now(self.tz))
+        # تابعی که برای روزهای تعطیل True برمی‌گرداند
+        self._skip_day = skip_day
+        self.interval = min_seconds
+        # زمان آخرین tick دیده شده در تصمیم قبلی
+        self._seen_until: Optional[float] = None
+        # زمان خواندن‌های ساعت اخیر (یونیکس)
+        self._polls: deque = deque()
+        # آمار تصمیم‌ها
+        self.polls = 0
+        self.decisions = {VOLATILE: 0, FLAT: 0, ERROR: 0}
+        self.throttled = 0
+        self.last: Optional[PollDecision] = None
+
+    def _window(self, day) -> tuple:
+        start = self.tz.localize(datetime.combine(day, time(self.first_hour)))
+        end = self.tz.localize(datetime.combine(day, time(self.last_hour)))
+        return start, end
+
+    def next_open(self, moment: datetime) -> datetime:
+        """اولین زمان مجاز خواندن از moment به بعد (خود moment در ساعات کاری)"""
+        day = moment.date()
+        for _ in range(15):
+            if not (self._skip_day and self._skip_day(day)):
+                start, end = self._window(day)
+                if moment <= end:
+                    return max(moment, start)
+            day += timedelta(days=1)
+        raise RuntimeError("هیچ روز کاری در دو هفته آینده یافت نشد")
+
+    def window_end(self, moment: datetime) -> datetime:
+        """پایان ساعات کاری روز moment"""
+        return self._window(moment.date())[1]
+
+    def changes(self, ticks: Iterable) -> Optional[List[float]]:
+        """
+        درصد تغییر قیمت تتر بین tickهای متوالی که از تصمیم قبلی رسیده‌اند
+
+        tickهای (زمان، قیمت تتر، ...) موتور آمار؛ اولین tick جدید با tick قبل از خود
+        مقایسه می‌شود. None یعنی tick جدیدی نیامده است.
+        """
+        prices = [(tick[0], tick[1]) for tick in ticks]
+        since = self._seen_until
+        if since is None:
+            # اولین تصمیم: tickهای بازه حداکثر فاصله خواندن
+            since = self._clock().timestamp() - self.max_seconds
+        fresh = [i for i, (ts, _) in enumerate(prices) if ts > since]
+        if prices:
+            self._seen_until = max(since, max(ts for ts, _ in prices))
+        if not fresh:
+            return None
+        series = [price for _, price in prices[max(fresh[0] - 1, 0):]]
+        return [abs(b - a) / a * 100 for a, b in zip(series, series[1:]) if a]
+
+    def _prune(self, now: float):
+        while self._polls and self._polls[0] <= now - 3600:
+            self._polls.popleft()
+
+    def decide(self, ticks: Iterable = (), failed: bool = False) -> PollDecision:
+        """ثبت خواندن انجام شده و تعیین زمان خواندن بعدی"""
+        now = self._clock()
+        stamp = now.timestamp()
+        self.polls += 1
+        self._polls.append(stamp)
+        self._prune(stamp)
+
+        changes = None if failed else self.changes(ticks)
+        change = max(changes) if changes else None
+        if failed:
+            reason = ERROR
+        elif change is not None and change >= self.threshold_pct:
+            reason = VOLATILE
+        else:
+            reason = FLAT
+        if reason == VOLATILE:
+            self.interval = self.min_seconds
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_seconds)
+        self.decisions[reason] += 1
+
+        next_stamp = stamp + self.interval
+        throttled = False
+        if self.hourly_budget and len(self._polls) >= self.hourly_budget:
+            # خواندن بعدی وقتی مجاز است که قدیمی‌ترین خواندن ساعت اخیر از سهمیه خارج شود
+            freed = self._polls[-self.hourly_budget] + 3600
+            if freed > next_stamp:
+                next_stamp, throttled = freed, True
+                self.throttled += 1
+
+        next_at = now + timedelta(seconds=next_stamp - stamp)
+        opened = self.next_open(next_at)
+        if opened != next_at:
+            # روز کاری بعدی دوباره با کوتاه‌ترین فاصله شروع می‌شود
+            self.interval = self.min_seconds
+        decision = PollDecision(reason, self.interval, opened, change, throttled)
+        self.last = decision
+        logger.info(
+            "⏱️ خواندن بعدی منبع %s (%s، تغییر %s%s)",
+            f"{opened:%H:%M:%S}", decision.label,
+            '-' if change is None else f"{change:.2f}%", '، سقف ساعتی' if throttled else '',
+        )
+        return decision
+
+    async def run(
+        self,
+        poll: Callable[[], Awaitable[bool]],
+        ticks: Callable[[], Iterable],
+        until: Optional[datetime] = None,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+    ):
+        """
+        حلقه خواندن: poll (True یعنی خواندن موفق) و انتظار تا زمان تصمیم گرفته شده
+
+        until: پایان حلقه (auto_fetcher)؛ None یعنی تا لغو task (ربات)
+        """
+        next_at = self.next_open(self._clock())
+        while until is None or next_at <= until:
+            delay = (next_at - self._clock()).total_seconds()
+            if delay > 0:
+                await sleep(delay)
+            try:
+                ok = await poll()
+            except Exception as e:
+                logger.error("خطا در خواندن منبع: %s", e)
+                ok = False
+            next_at = self.decide(ticks(), failed=not ok).next_at
+
+    def summary(self) -> dict:
+        self._prune(self._clock().timestamp())
+        last = self.last
+        return {
+            'interval': self.interval,
+            'reason': last.reason if last else None,
+            'change_pct': last.change_pct if last else None,
+            'next_at': last.next_at if last else None,
+            'polls': self.polls,
+            'polls_last_hour': len(self._polls),
+            'hourly_budget': self.hourly_budget,
+            'throttled': self.throttled,
+            'decisions': dict(self.decisions),
+        }
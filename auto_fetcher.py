@@ -8,151 +8,338 @@
 import os
 import asyncio
 import logging
+import argparse
+from datetime import datetime
+from functools import partial
 
-import pytz
 from dotenv import load_dotenv
-from telethon import TelegramClient  # type: ignore
-from telegram import Bot
 
 # بارگذاری متغیرهای محیطی
 load_dotenv()
 
+from logging_utils import setup_logging, correlation_scope
+from config import config
+from profiling import profiled
+from telethon_session import shared_client
+from http_pool import pool
+from sinks import SinkDispatcher, build_sinks
+from jalali_calendar import get_calendar, skip_closed_day
+from yuan_rates import refresh_yuan_rate
+from pipeline import FAILED, Outcome, Pipeline, Source, SourceError, SourceMessage, Tenant
+from dedupe import content_hash
+from prefetch import SlotResult, plan_slot, record_lateness, run_slot
+from adaptive_poll import AdaptivePoller
+
 # تنظیمات لاگ
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-# تنظیمات Telethon (برای خواندن کانال عمومی)
-API_ID = int(os.getenv('TELEGRAM_API_ID', '0'))
-API_HASH = os.getenv('TELEGRAM_API_HASH', '')
-PHONE = os.getenv('TELEGRAM_PHONE', '')
+# تعداد پیام در هر درخواست و سقف پیام‌های پردازش شده در یک اجرا
+FETCH_BATCH_SIZE = int(os.getenv('FETCH_BATCH_SIZE', '50'))
+FETCH_MAX_MESSAGES = int(os.getenv('FETCH_MAX_MESSAGES', '500'))
+# تعداد پیام‌های اخیر (تا آخرین شناسه پردازش شده) که برای ویرایش بررسی می‌شوند
+FETCH_EDIT_WINDOW = int(os.getenv('FETCH_EDIT_WINDOW', '10'))
 
-# تنظیمات Bot (برای ارسال پیام)
-BOT_TOKEN = os.getenv('BOT_TOKEN', '')
-TARGET_GROUP_ID = os.getenv('TARGET_GROUP_ID', '')
-SOURCE_CHANNEL = os.getenv('SOURCE_CHANNEL', 'tetherprice_toman')
-TIMEZONE = pytz.timezone(os.getenv('TIMEZONE', 'Asia/Tehran'))
+# حداکثر انتظار برای ارسال به همه مقصدها قبل از پایان اجرا (ثانیه)
+SINK_FLUSH_SECONDS = float(os.getenv('SINK_FLUSH_SECONDS', '60'))
 
 # Import از bot.py
 try:
-    from bot import bot_instance
+    from bot import bot_instance, publish_policy, publish_outbox
 except ImportError:
     logger.error("نمی‌توان bot.py را import کرد")
     bot_instance = None
+    publish_policy = None
+    publish_outbox = None
+
+
+async def fetch_new_messages(client, channel_username: str, min_id: int = 0) -> list:
+    """
+    دریافت پیام‌های جدیدتر از min_id به ترتیب زمانی (قدیمی‌ترین اول)
+    
+    پیام‌ها در دسته‌های FETCH_BATCH_SIZE تایی خوانده می‌شوند. اگر هنوز
+    شناسه‌ای ذخیره نشده باشد (اجرای اول)، فقط آخرین پیام برگردانده می‌شود.
+    """
+    if not min_id:
+        latest = await client.get_messages(channel_username, limit=1)
+        return list(latest or [])
+    
+    collected = []
+    cursor = min_id
+    while len(collected) < FETCH_MAX_MESSAGES:
+        batch = await client.get_messages(
+            channel_username,
+            limit=FETCH_BATCH_SIZE,
+            min_id=cursor,
+            reverse=True
+        )
+        if not batch:
+            break
+        collected.extend(batch)
+        cursor = batch[-1].id
+        if len(batch) < FETCH_BATCH_SIZE:
+            break
+    return collected
 
 
-async def read_channel_with_telethon(channel_username: str) -> str | None:
+async def fetch_edited_messages(client, channel_username: str, max_id: int) -> list:
     """
-    خواندن آخرین پیام از کانال عمومی با استفاده از Telethon
+    پیام‌های ویرایش شده در FETCH_EDIT_WINDOW پیام آخر تا شناسه max_id
+
+    کانال‌های قیمت معمولاً همان پست را ویرایش می‌کنند؛ این پیام‌ها شناسه جدیدی
+    ندارند و با min_id دیده نمی‌شوند. تکراری بودن آن‌ها با dedupe.SeenCache
+    بررسی می‌شود.
+    """
+    if not max_id or FETCH_EDIT_WINDOW <= 0:
+        return []
+    recent = await client.get_messages(channel_username, limit=FETCH_EDIT_WINDOW, max_id=max_id + 1)
+    return [m for m in reversed(recent or []) if getattr(m, 'edit_date', None)]
+
+
+async def fetch_updates(client, channel_username: str, min_id: int = 0) -> list:
+    """پیام‌های ویرایش شده تا min_id و پیام‌های جدیدتر از آن"""
+    edited = await fetch_edited_messages(client, channel_username, min_id)
+    return edited + await fetch_new_messages(client, channel_username, min_id)
+
+
+async def read_new_messages(channel_username: str, min_id: int = 0) -> list | None:
+    """
+    خواندن همه پیام‌های جدید (و ویرایش شده) کانال از آخرین شناسه پردازش شده
+    
+    از اتصال مشترک Telethon (telethon_session.shared_client) استفاده می‌شود که
+    منبع نرخ یوآن هم در همان tick از آن می‌خواند. در صورت خطا None برمی‌گرداند
     """
-    client = None
     try:
-        # ایجاد کلاینت Telethon
-        client = TelegramClient('user_session', API_ID, API_HASH)
-        await client.start(phone=PHONE)
-        
-        logger.info(f"وارد شدن با حساب کاربری و خواندن از @{channel_username}...")
-        
-        # دریافت کانال
-        channel = await client.get_entity(channel_username)
-        
-        # دریافت آخرین پیام
-        messages = await client.get_messages(channel, limit=1)
+        client = await shared_client.get()
         
-        if messages and len(messages) > 0 and hasattr(messages[0], 'text') and messages[0].text:
-            text = messages[0].text
-            logger.info(f"پیام دریافت شد از @{channel_username}")
-            if client:
-                await client.disconnect()
-            return text
-        
-        if client:
-            await client.disconnect()
-        logger.warning("پیامی یافت نشد")
-        return None
+        logger.info("خواندن پیام‌های جدید @%s (بعد از شناسه %d)...", channel_username, min_id)
+        messages = await fetch_updates(client, channel_username, min_id)
+        logger.info("%d پیام جدید یا ویرایش شده از @%s دریافت شد", len(messages), channel_username)
+        return messages
         
     except Exception as e:
-        logger.error(f"خطا در خواندن کانال با Telethon: {e}")
-        if client:
-            try:
-                await client.disconnect()
-            except:
-                pass
+        logger.error("خطا در خواندن کانال با Telethon: %s", e)
         return None
 
 
-async def main():
+class ChannelSource(Source):
+    """
+    پیام‌های جدید کانال عمومی (Telethon) از آخرین شناسه پردازش شده
+
+    شناسه آخرین پیام پس از پردازش در state.cursors ذخیره می‌شود. پیام‌های
+    ویرایش شده اخیر هم خوانده و با state.seen فقط یک بار پردازش می‌شوند.
+    """
+
+    def __init__(self, channel_username: str, state, force: bool = False, client=None):
+        self.name = channel_username
+        self.state = state
+        self.force = force
+        # کلاینت متصل دیگر؛ None یعنی اتصال مشترک فرآیند (shared_client)
+        self.client = client
+        self.cursor = state.cursors.get(channel_username, 0)
+        self.seen = state.seen
+
+    @property
+    def empty_text(self) -> str:
+        return f"✅ پیام جدیدی از آخرین اجرا (شناسه {self.cursor}) منتشر نشده است"
+
+    async def read(self) -> list:
+        if self.client is not None:
+            messages = await fetch_updates(self.client, self.name, self.cursor)
+        else:
+            messages = await read_new_messages(self.name, self.cursor)
+        if messages is None:
+            raise SourceError("❌ نتوانستیم از کانال بخوانیم")
+        result = []
+        for m in messages:
+            edited = getattr(m, 'edit_date', None)
+            moment = edited or m.date
+            result.append(SourceMessage(
+                m.text, moment.timestamp() if moment else None, m.id,
+                edited=bool(edited) and m.id <= self.cursor,
+            ))
+        # ترتیب زمانی انتشار یا ویرایش (آخرین قیمت، آخرین پیام است)
+        return sorted(result, key=lambda m: (m.at or 0, m.id))
+
+    def commit(self, tick):
+        last_id = max(m.id for m in tick.messages)
+        self.state.cursors[self.name] = max(self.cursor, last_id)
+
+    def tick_key(self, tick) -> str:
+        # tick همان شناسه آخرین پیام منبع است (و hash متن برای ویرایش)
+        last = tick.messages[-1]
+        key = f"{self.name}:{last.id}"
+        if last.edited:
+            key += f":{content_hash(last.text)[:8]}"
+        if self.force:
+            key += f":{tick.now:%H%M%S}"
+        return key
+
+
+def _tenant(dispatcher: SinkDispatcher) -> Tenant:
+    return Tenant(
+        'auto_fetcher', bot_instance, publish_policy,
+        dispatcher=lambda: dispatcher,
+        refresh_rate=partial(refresh_yuan_rate, bot_instance),
+    )
+
+
+async def publish_new_rate(dispatcher: SinkDispatcher, force: bool = False) -> Outcome:
+    """
+    خواندن پیام‌های جدید، محاسبه نرخ و ثبت پیام در outbox (از طریق خط لوله)
+    """
+    source = ChannelSource(config.current.source_channel, bot_instance, force)
+    async with Pipeline() as pipeline:
+        return await pipeline.run(source, _tenant(dispatcher), force=force)
+
+
+async def prefetch_new_rate(dispatcher: SinkDispatcher, slot, force: bool = False, bot=None) -> SlotResult:
+    """
+    آماده‌سازی پیام قبل از slot با اتصال گرم Telethon و ارسال سر slot (prefetch.py)
+    """
+    channel = config.current.source_channel
+
+    async def warm():
+        # ورود به حساب و اتصال HTTPS ربات قبل از slot، نه بعد از آن
+        await shared_client.get()
+        if bot is not None:
+            try:
+                await bot.initialize()
+            except Exception as e:
+                logger.warning("آماده‌سازی اتصال ربات ناموفق بود: %s", e)
+
+    async with Pipeline() as pipeline:
+        return await run_slot(
+            pipeline,
+            lambda: ChannelSource(channel, bot_instance, force),
+            _tenant(dispatcher), slot, force=force, warm=warm,
+        )
+
+
+async def watch_new_rates(dispatcher: SinkDispatcher, poller: AdaptivePoller) -> Outcome | None:
+    """
+    خواندن کانال با فاصله تطبیقی (adaptive_poll.py) تا پایان ساعات کاری امروز
+
+    اتصال مشترک Telethon برای همه خواندن‌ها باز می‌ماند. آخرین نتیجه منتشر شده
+    (یا آخرین نتیجه، اگر چیزی منتشر نشد) برگردانده می‌شود.
+    """
+    channel = config.current.source_channel
+    tenant = _tenant(dispatcher)
+    outcome = published = None
+
+    async def poll() -> bool:
+        nonlocal outcome, published
+        with correlation_scope():
+            outcome = await pipeline.run(ChannelSource(channel, bot_instance), tenant)
+        logger.info("نتیجه خواندن تطبیقی: %s", outcome.detail or outcome.status)
+        if outcome.published:
+            published = outcome
+        return outcome.status != FAILED
+
+    async with Pipeline() as pipeline:
+        until = poller.window_end(datetime.now(config.current.tz))
+        await poller.run(poll, bot_instance.stats.ticks, until=until)
+    logger.info("🔄 خواندن تطبیقی: %s", poller.summary())
+    return published or outcome
+
+
+async def main(force: bool = False, prefetch: bool = False, watch: bool = False):
     """
     تابع اصلی: خواندن از کانال و ارسال به گروه
+    
+    همه پیام‌های جدید از آخرین اجرا (بر اساس شناسه پیام) به ترتیب پردازش می‌شوند
+    و در پایان حداکثر یک پیام منتشر می‌شود. پیام‌های ارسال نشده اجرای قبلی
+    (رکوردهای در انتظار outbox) هم در همین اجرا دوباره ارسال می‌شوند.
+    
+    force: ارسال بدون توجه به سیاست انتشار
+    prefetch: آماده‌سازی پیام قبل از slot ساعتی و ارسال سر ساعت (prefetch.py)
+    watch: خواندن با فاصله تطبیقی تا پایان ساعات کاری امروز (adaptive_poll.py)
     """
-    try:
-        # بررسی تنظیمات
-        if not all([API_ID, API_HASH, PHONE, BOT_TOKEN, TARGET_GROUP_ID]):
-            logger.error("❌ تنظیمات ناقص است! لطفاً .env را کامل کنید")
-            return
-        
-        # بررسی نرخ یوآن
-        if not bot_instance or not bot_instance.yuan_rate:
-            logger.error("❌ نرخ یوآن تنظیم نشده است!")
-            return
+    settings = config.current
+    with correlation_scope():
+        try:
+            # بررسی تنظیمات
+            if not all([
+                settings.telegram_api_id, settings.telegram_api_hash, settings.telegram_phone,
+                settings.bot_token, settings.target_group_id,
+            ]):
+                logger.error("❌ تنظیمات ناقص است! لطفاً .env را کامل کنید")
+                return
         
-        logger.info("🔄 شروع فرآیند خودکار...")
+            # روزهای تعطیل بازار (جمعه و تعطیلات رسمی) اجرا نمی‌شود
+            today = datetime.now(settings.tz).date()
+            if not force and skip_closed_day(today):
+                logger.info("⏸️ امروز تعطیل است (%s)", get_calendar().closed_reason(today))
+                return
         
-        # خواندن از کانال عمومی با Telethon
-        text = await read_channel_with_telethon(SOURCE_CHANNEL)
+            if not bot_instance:
+                return
         
-        if not text:
-            logger.error("❌ نتوانستیم از کانال بخوانیم")
-            return
+            logger.info("🔄 شروع فرآیند خودکار...")
         
-        # استخراج قیمت تتر
-        tether_price = bot_instance.extract_tether_price(text)
-        if not tether_price:
-            logger.error("❌ قیمت تتر در پیام یافت نشد")
-            return
+            slot = plan_slot(datetime.now(settings.tz)) if prefetch else None
+            if prefetch and slot is None:
+                logger.info("زمان فعلی به هیچ slot ساعتی نزدیک نیست؛ اجرای عادی")
         
-        logger.info(f"✅ قیمت تتر: {tether_price:,} ریال")
-        
-        # محاسبه نرخ مبنا
-        base_rate = bot_instance.calculate_base_rate(tether_price)
-        if not base_rate:
-            logger.error("❌ خطا در محاسبه نرخ")
-            return
-        
-        # بررسی شرط کاهش نرخ
-        if bot_instance.last_calculated_rate and base_rate < bot_instance.last_calculated_rate:
-            logger.warning(
-                f"⚠️ نرخ جدید ({base_rate:,.0f}) کمتر از نرخ قبلی "
-                f"({bot_instance.last_calculated_rate:,.0f}) است. "
-                f"از نرخ قبلی استفاده می‌شود."
+            # ارسال به همه مقصدها؛ یک مقصد کند بقیه را معطل نمی‌کند
+            # اتصال‌های Bot API از pool مشترک (در پایان اجرا بسته می‌شوند)
+            bot = pool.create_bot(settings.bot_token)
+            dispatcher = SinkDispatcher(
+                build_sinks(bot, settings.target_group_id, settings),
+                outbox=publish_outbox,
             )
-            base_rate = bot_instance.last_calculated_rate
-        else:
-            bot_instance.last_calculated_rate = base_rate
-            bot_instance.save_data()
-        
-        logger.info(f"✅ نرخ مبنا: {base_rate:,.0f} تومان")
-        
-        # ایجاد پیام نهایی
-        message = bot_instance.format_message(base_rate)
+            await dispatcher.start()
+            if publish_outbox.depth:
+                logger.info("📬 %d پیام ارسال نشده از اجرای قبلی", publish_outbox.depth)
+            try:
+                if watch:
+                    outcome = await watch_new_rates(dispatcher, AdaptivePoller(skip_day=skip_closed_day))
+                    if outcome is None:
+                        logger.info("⏸️ ساعات خواندن امروز تمام شده است")
+                        return
+                elif slot is not None:
+                    result = await prefetch_new_rate(dispatcher, slot, force, bot)
+                    outcome = result.outcome
+                else:
+                    outcome = await publish_new_rate(dispatcher, force)
+                if not await dispatcher.flush(SINK_FLUSH_SECONDS):
+                    logger.warning("⚠️ ارسال به برخی مقصدها تا پایان مهلت انجام نشد")
+                elif slot is not None and outcome.published:
+                    # تأخیر تحویل به همه مقصدها نسبت به slot
+                    delivered = (datetime.now(settings.tz) - slot).total_seconds()
+                    record_lateness(bot_instance, slot, result.queued_lateness, delivered)
+                    bot_instance.save_data()
+                    logger.info("⏱️ تأخیر تحویل slot %s: %.2f ثانیه", f"{slot:%H:%M}", delivered)
+            finally:
+                await dispatcher.close()
+                await pool.close()
+                await shared_client.close()
         
-        # ارسال به گروه
-        if BOT_TOKEN and TARGET_GROUP_ID:
-            bot = Bot(BOT_TOKEN)
-            await bot.send_message(chat_id=TARGET_GROUP_ID, text=message)
+            if publish_outbox.depth:
+                logger.error("❌ %d پیام ارسال نشد و در اجرای بعدی دوباره ارسال می‌شود", publish_outbox.depth)
+                return
         
-        logger.info("✅ پیام با موفقیت ارسال شد!")
-        print("\n" + "="*50)
-        print("✅ عملیات موفق بود!")
-        print("="*50)
-        print(message)
-        print("="*50)
+            if outcome.published:
+                logger.info("✅ پیام به %s ارسال شد!", ', '.join(dispatcher.names))
+                print("\n" + "="*50)
+                print("✅ عملیات موفق بود!")
+                print("="*50)
+                print(outcome.message)
+                print("="*50)
         
-    except Exception as e:
-        logger.error(f"❌ خطا در فرآیند: {e}", exc_info=True)
+        except Exception as e:
+            logger.error("❌ خطا در فرآیند: %s", e, exc_info=True)
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="خواندن کانال منبع و ارسال نرخ به گروه")
+    parser.add_argument('--force', action='store_true', help="ارسال حتی اگر نرخ تغییری نکرده باشد")
+    parser.add_argument('--prefetch', action='store_true',
+                        help="آماده‌سازی پیام قبل از slot ساعتی و ارسال دقیقاً سر ساعت")
+    parser.add_argument('--profile', action='store_true',
+                        help="پروفایل این اجرا (مثل PROFILE=1؛ خروجی در PROFILE_DIR)")
+    parser.add_argument('--watch', action='store_true',
+                        help="خواندن با فاصله تطبیقی بر اساس نوسان قیمت تا پایان ساعات کاری (POLL_*)")
+    args = parser.parse_args()
+    run = profiled('auto_fetcher', enabled=args.profile or None)(main)
+    asyncio.run(run(force=args.force, prefetch=args.prefetch, watch=args.watch))
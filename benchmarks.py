@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+بنچمارک‌های عملکرد ربات
+
+اجرا:
+    python benchmarks.py            # همه بنچمارک‌ها
+    python benchmarks.py logging    # فقط یک بنچمارک
+"""
+
+import os
+import sys
+import time
+import logging
+
+SAMPLE_TEXT = """💵 قیمت لحظه‌ای تتر
+
+🟢 خرید تتر : 1084970 ریال
+🔴 فروش تتر : 1084980 ریال
+
+@tetherprice_toman"""
+
+
+def _per_op_us(func, iterations: int) -> float:
+    """میانگین زمان هر تکرار به میکروثانیه"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_logging(iterations: int = 20000):
+    """سربار لاگ در هر tick (استخراج قیمت + محاسبه نرخ مبنا)"""
+    from logging_utils import setup_logging
+    from bot import TetherBot
+
+    bot = TetherBot(data_file=None)
+    bot.yuan_rate = 7.12
+
+    def tick():
+        price = bot.extract_tether_price(SAMPLE_TEXT)
+        bot.calculate_base_rate(price)
+
+    devnull = open(os.devnull, 'w', encoding='utf-8')
+    scenarios = [
+        ('text / sync', dict(log_format='text', use_queue=False)),
+        ('text / queue', dict(log_format='text', use_queue=True)),
+        ('json / queue', dict(log_format='json', use_queue=True)),
+        ('json / queue / sample=100', dict(log_format='json', use_queue=True, sample_every=100)),
+        ('level=WARNING', dict(level='WARNING', use_queue=True)),
+    ]
+
+    logging.disable(logging.CRITICAL)
+    baseline = _per_op_us(tick, iterations)
+    logging.disable(logging.NOTSET)
+
+    print(f"\n📊 سربار لاگ در هر tick ({iterations:,} تکرار)")
+    print(f"   بدون لاگ: {baseline:8.2f} µs/tick")
+    try:
+        for name, options in scenarios:
+            options.setdefault('level', 'INFO')
+            options.setdefault('sample_every', 1)
+            setup_logging(stream=devnull, force=True, **options)
+            elapsed = _per_op_us(tick, iterations)
+            print(f"   {name:<28} {elapsed:8.2f} µs/tick  (سربار: {elapsed - baseline:+.2f} µs)")
+    finally:
+        setup_logging(force=True)
+        devnull.close()
+
+
+def synthetic_recording(posts: int = 20000, interval_minutes: int = 6, seed: int = 1):
+    """ساخت پیام‌های مصنوعی کانال برای بازپخش"""
+    import random
+    from datetime import datetime, timedelta
+    from replay import RecordedPost
+    from config import config
+
+    rng = random.Random(seed)
+    moment = config.current.tz.localize(datetime(2025, 9, 1, 9, 0))
+    price = 1_080_000
+    recording = [RecordedPost(date=moment, yuan_rate=7.12)]
+    for _ in range(posts):
+        moment += timedelta(minutes=interval_minutes)
+        price += rng.randint(-3000, 3000)
+        recording.append(RecordedPost(date=moment, text=f"🔴 فروش تتر : {price} ریال"))
+    return recording
+
+
+def bench_replay(posts: int = 20000):
+    """خط مبنای عملکرد کل مسیر محاسبه با بازپخش پیام‌های مصنوعی"""
+    import asyncio
+    from replay import ReplayEngine
+
+    logging.disable(logging.WARNING)
+    try:
+        for mode in ('schedule', 'posts'):
+            engine = ReplayEngine(synthetic_recording(posts), mode=mode)
+            report = asyncio.run(engine.run())
+            print(f"\n📊 بازپخش ({mode}, {posts:,} پیام)")
+            print(report.summary())
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def _fake_sqlite_session(path: str):
+    """ساخت یک فایل session آزمایشی (بدون اتصال به تلگرام)"""
+    from telethon.crypto import AuthKey
+    from telethon.sessions import SQLiteSession
+
+    session = SQLiteSession(path)
+    session.set_dc(4, '149.154.167.91', 443)
+    session.auth_key = AuthKey(data=os.urandom(256))
+    session.save()
+    session.close()
+
+
+def bench_session(iterations: int = 200):
+    """
+    زمان آماده شدن کلاینت Telethon تا اولین درخواست (بدون شبکه)
+
+    روش قدیم: decode کردن base64 به فایل و باز کردن session از نوع SQLite
+    روش جدید: StringSession در حافظه
+    """
+    import base64
+    import shutil
+    import tempfile
+    from telethon import TelegramClient
+    from telethon.sessions import StringSession
+    from telethon_session import string_from_sqlite_bytes
+
+    workdir = tempfile.mkdtemp()
+    try:
+        source = os.path.join(workdir, 'source')
+        _fake_sqlite_session(source)
+        with open(f'{source}.session', 'rb') as f:
+            encoded = base64.b64encode(f.read()).decode()
+        session_string = string_from_sqlite_bytes(base64.b64decode(encoded))
+        target = os.path.join(workdir, 'user_session')
+
+        def legacy():
+            with open(f'{target}.session', 'wb') as f:
+                f.write(base64.b64decode(encoded))
+            client = TelegramClient(target, 1, 'hash')
+            client.session.close()
+
+        def in_memory():
+            TelegramClient(StringSession(session_string), 1, 'hash')
+
+        def converted():
+            string_from_sqlite_bytes(base64.b64decode(encoded))
+            TelegramClient(StringSession(session_string), 1, 'hash')
+
+        print(f"\n📊 آماده‌سازی کلاینت Telethon ({iterations} تکرار)")
+        for name, func in (
+            ('فایل SQLite (base64 → دیسک)', legacy),
+            ('StringSession در حافظه', in_memory),
+            ('TELETHON_SESSION → حافظه', converted),
+        ):
+            print(f"   {name:<30} {_per_op_us(func, iterations):10.1f} µs")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class FakeBotApi:
+    """
+    جایگزین Bot تلگرام برای بنچمارک sharding
+
+    هزینه CPU هر ارسال (ساخت و سریال‌سازی درخواست) شبیه‌سازی می‌شود؛ تأخیر شبکه نه.
+    """
+
+    def __init__(self, cost_rounds: int = 300):
+        self.cost_rounds = cost_rounds
+
+    async def send_message(self, chat_id, text, **kwargs):
+        import json
+        import asyncio
+        import hashlib
+        payload = json.dumps({'chat_id': chat_id, 'text': text}, ensure_ascii=False).encode()
+        for _ in range(self.cost_rounds):
+            payload = hashlib.sha256(payload).digest()
+        await asyncio.sleep(0)
+
+
+def bench_sharding(chats: int = 4000, ticks: int = 3):
+    """
+    توان ارسال به تعداد زیاد گروه با 1 تا N فرآیند worker و سهم جابه‌جا شده
+    با اضافه شدن یک worker
+    """
+    from sharding import HashRing, ShardCoordinator
+
+    chat_ids = [-1000000000000 - i for i in range(chats)]
+    text = SAMPLE_TEXT * 3
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, cores})
+
+    print(f"\n📊 ارسال به {chats:,} گروه با sharding ({ticks} tick، {cores} هسته)")
+    baseline = None
+    for workers in counts:
+        coordinator = ShardCoordinator(chat_ids, workers, FakeBotApi)
+        coordinator.start()
+        try:
+            coordinator.broadcast('warmup', text)
+            coordinator.wait('warmup', timeout=120)
+            start = time.perf_counter()
+            for i in range(ticks):
+                coordinator.broadcast(f'tick-{i}', text)
+                result = coordinator.wait(f'tick-{i}', timeout=120)
+                assert result and result['sent'] == chats
+            rate = chats * ticks / (time.perf_counter() - start)
+        finally:
+            coordinator.stop()
+        baseline = baseline or rate
+        print(f"   {workers} worker: {rate:10,.0f} پیام/ثانیه  (x{rate / baseline:.2f})")
+
+    for workers in (4, 8):
+        before = HashRing([f'worker-{i}' for i in range(workers)])
+        after = HashRing([f'worker-{i}' for i in range(workers + 1)])
+        moved = sum(before.owner(c) != after.owner(c) for c in chat_ids)
+        print(f"   {workers} → {workers + 1} worker: {moved / chats:.1%} گروه‌ها جابه‌جا شدند"
+              f" (ایده‌آل: {1 / (workers + 1):.1%})")
+
+
+def bench_http(sends: int = 200):
+    """
+    زمان هر ارسال Bot API: Bot تازه برای هر ارسال (روش قبلی auto_fetcher و
+    reminder) در برابر Bot ساخته شده با pool مشترک (http_pool.py)
+
+    سرور محلی بدون TLS است؛ در api.telegram.org دست‌دهی TLS هر اتصال جدید هم اضافه می‌شود.
+    """
+    import asyncio
+    from telegram import Bot
+    from diagnostics import BotApiStandIn
+    from http_pool import HttpPool
+
+    async def run(api):
+        start = time.perf_counter()
+        for _ in range(sends):
+            await Bot('1:bench', base_url=api.base_url).send_message(-1001, SAMPLE_TEXT)
+        before = (time.perf_counter() - start) / sends * 1e3
+
+        pool = HttpPool()
+        bot = pool.create_bot('1:bench', base_url=api.base_url)
+        start = time.perf_counter()
+        for _ in range(sends):
+            await bot.send_message(-1001, SAMPLE_TEXT)
+        after = (time.perf_counter() - start) / sends * 1e3
+        await pool.close()
+        return before, after, pool.stats.summary()
+
+    logging.disable(logging.CRITICAL)
+    try:
+        with BotApiStandIn() as api:
+            before, after, stats = asyncio.run(run(api))
+    finally:
+        logging.disable(logging.NOTSET)
+    print(f"\n📊 زمان هر ارسال Bot API ({sends:,} ارسال به سرور محلی)")
+    print(f"   Bot تازه برای هر ارسال: {before:8.2f} ms/ارسال")
+    print(f"   pool مشترک:            {after:8.2f} ms/ارسال  (x{before / after:.1f})")
+    print(f"   {stats['requests']} درخواست، {stats['connections']} اتصال جدید"
+          f" ({stats['reuse_ratio']:.0%} بازاستفاده)")
+
+
+BENCHMARKS = {
+    'logging': bench_logging,
+    'replay': bench_replay,
+    'session': bench_session,
+    'sharding': bench_sharding,
+    'http': bench_http,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ بنچمارک ناشناخته: {name} (موجود: {', '.join(BENCHMARKS)})")
+            continue
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
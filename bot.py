@@ -10,75 +10,262 @@ import os
 import re
 import json
 import math
+import time
+import signal
+import asyncio
 import logging
-from datetime import datetime
+from datetime import date, datetime
+from functools import partial
 from typing import Optional
 
 # تنظیم timezone برای سازگاری با Python 3.13
 os.environ.setdefault('TZ', 'UTC')
 
-import pytz
-import jdatetime  # type: ignore
 from dotenv import load_dotenv
-from telegram import Update
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
 from telegram.ext import (
     Application,
     CommandHandler,
     ContextTypes,
+    InlineQueryHandler,
 )
 
 # بارگذاری متغیرهای محیطی
 load_dotenv()
 
-# تنظیمات لاگ
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+from logging_utils import setup_logging, correlation_scope, fmt
+from config import config, Settings
+from profiling import profiled
+from reply_cache import ReplyCache
+from publish_policy import PublishPolicy
+from rolling_stats import StatsEngine
+from dedupe import SeenCache
+from sinks import SinkDispatcher, build_sinks, SINK_TIMEOUT_SECONDS, SINK_SETTINGS
+from outbox import Outbox
+from jalali_calendar import get_calendar, skip_closed_day
+from quotes import QuoteBook, parse_amounts
+from currencies import SEPARATE, CurrencyPair, price_pairs
+from reminder import ReminderLoop
+from yuan_rates import SOURCE_LABELS, close_service as close_yuan_service, refresh_yuan_rate
+from rate_api import RateApi, RATE_API_PORT
+from http_pool import pool as http_pool
+from leader import LEADER_LEASE_FILE, LeaderElector, LeaseStore
+from prefetch import lateness_summary
+from adaptive_poll import POLL_ADAPTIVE, AdaptivePoller
+from pipeline import (
+    FAILED, NO_SINKS, PUBLISHED, Outcome, Pipeline, Source, SourceError, SourceMessage, Tenant,
 )
+
+# تنظیمات لاگ
+setup_logging()
 logger = logging.getLogger(__name__)
 
-# تنظیمات
-BOT_TOKEN = os.getenv('BOT_TOKEN')
-TARGET_GROUP_ID = os.getenv('TARGET_GROUP_ID')
-SOURCE_CHANNEL = os.getenv('SOURCE_CHANNEL', 'tetherprice_toman')
-PRIVATE_CHANNEL_ID = os.getenv('PRIVATE_CHANNEL_ID')  # کانال میانی برای خواندن
-TIMEZONE = pytz.timezone(os.getenv('TIMEZONE', 'Asia/Tehran'))
+# تنظیمات (توکن، گروه مقصد، کانال‌ها و منطقه زمانی در config.current)
 DATA_FILE = 'data.json'
 
+# سطوح قیمت: (عنوان، سقف مقدار یوآن، افزایش نسبت به نرخ مبنا)
+PRICE_TIERS = (
+    ('1️⃣ خرید تا 5 هزار یوآن', 5000, 80),
+    ('2️⃣ خرید تا 10 هزار یوآن', 10000, 70),
+    ('3️⃣ خرید بالای 10 هزار یوآن', None, 60),
+)
+
+# جفت اصلی (نرخ آن yuan_rate است)؛ جفت‌های دیگر در config.current.currencies
+CNY = CurrencyPair('CNY', 'یوآن', PRICE_TIERS)
+
 
 class TetherBot:
     """کلاس اصلی ربات محاسبه نرخ یوآن"""
     
-    def __init__(self):
-        self.yuan_rate: Optional[float] = None
-        self.last_calculated_rate: Optional[float] = None
+    def __init__(self, data_file: Optional[str] = DATA_FILE):
+        # data_file=None یعنی بدون ذخیره‌سازی روی دیسک (برای تست و بنچمارک)
+        self.data_file = data_file
+        # نسخه follower (leader.py) فقط data.json را می‌خواند
+        self.read_only = False
+        # نسخه وضعیت: با هر تغییر نرخ یا تنظیمات مقصد افزایش می‌یابد
+        self.state_version = 0
+        self._yuan_rate: Optional[float] = None
+        self._last_calculated_rate: Optional[float] = None
+        # تاریخ (به وقت محلی) آخرین تنظیم نرخ یوآن
+        self.yuan_rate_date: Optional[str] = None
+        # منبع نرخ یوآن (manual = /setrate، یا نام منبع خودکار در yuan_rates)
+        self.yuan_rate_source: str = 'manual'
+        # وضعیت یادآوری روز جاری (مشترک بین ربات و reminder.py)
+        self.reminder: dict = {}
+        # آخرین پیام منتشر شده (برای سیاست انتشار)
+        self.publish_state: dict = {}
+        # شناسه آخرین پیام پردازش شده هر کانال منبع
+        self.cursors: dict = {}
+        # زوج‌های (شناسه، hash محتوا) پردازش شده هر منبع
+        self.seen = SeenCache()
+        # آمار لحظه‌ای قیمت‌ها (پنجره‌های ۱ و ۲۴ ساعته)
+        self.stats = StatsEngine()
+        # رکوردهای ارسال پیام (outbox پایدار)
+        self.outbox: list = []
+        # تأخیر ارسال پیام‌های ساعتی نسبت به زمان slot (prefetch.py)
+        self.slot_lateness: list = []
+        # نرخ و آخرین نرخ مبنای جفت‌ارزهای اضافه (کد ارز ← مقدار)
+        self.currency_rates: dict = {}
+        self.currency_last_rates: dict = {}
         self.load_data()
     
+    @property
+    def yuan_rate(self) -> Optional[float]:
+        return self._yuan_rate
+    
+    @yuan_rate.setter
+    def yuan_rate(self, value: Optional[float]):
+        if value != self._yuan_rate:
+            self._yuan_rate = value
+            self.state_version += 1
+    
+    @property
+    def last_calculated_rate(self) -> Optional[float]:
+        return self._last_calculated_rate
+    
+    @last_calculated_rate.setter
+    def last_calculated_rate(self, value: Optional[float]):
+        if value != self._last_calculated_rate:
+            self._last_calculated_rate = value
+            self.state_version += 1
+    
+    def bump_version(self):
+        """اعلام تغییر وضعیت خارج از نرخ‌ها (مثلاً تنظیمات گروه مقصد)"""
+        self.state_version += 1
+    
+    def set_yuan_rate(self, rate: float, now: Optional[datetime] = None, source: str = 'manual'):
+        """تنظیم نرخ یوآن و ثبت تاریخ روز و منبع آن"""
+        now = now or datetime.now(config.current.tz)
+        if source != self.yuan_rate_source:
+            self.bump_version()
+        self.yuan_rate = rate
+        self.yuan_rate_date = now.date().isoformat()
+        self.yuan_rate_source = source
+    
+    @property
+    def pairs(self) -> tuple:
+        """جفت‌ارزهای اضافه بر یوآن"""
+        return config.current.currencies
+    
+    def set_currency_rate(self, code: str, rate: float):
+        """تنظیم نرخ یک جفت‌ارز اضافه (CNY همان set_yuan_rate است)"""
+        if self.currency_rates.get(code) != rate:
+            self.currency_rates[code] = rate
+            self.bump_version()
+    
+    def has_fresh_yuan_rate(self, day: date) -> bool:
+        """آیا نرخ یوآن برای این روز تنظیم شده است؟"""
+        return bool(self.yuan_rate) and self.yuan_rate_date == day.isoformat()
+    
     def load_data(self):
         """بارگذاری داده‌های ذخیره شده"""
         try:
-            if os.path.exists(DATA_FILE):
-                with open(DATA_FILE, 'r', encoding='utf-8') as f:
+            if self.data_file and os.path.exists(self.data_file):
+                with open(self.data_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     self.yuan_rate = data.get('yuan_rate')
                     self.last_calculated_rate = data.get('last_calculated_rate')
-                    logger.info(f"داده‌ها بارگذاری شد - نرخ یوآن: {self.yuan_rate}")
+                    self.yuan_rate_date = data.get('yuan_rate_date')
+                    self.yuan_rate_source = data.get('yuan_rate_source') or 'manual'
+                    self.reminder = data.get('reminder') or {}
+                    self.publish_state.update(data.get('publish_state') or {})
+                    self.cursors = data.get('cursors') or {}
+                    self.stats.restore(data.get('ticks'))
+                    self.seen.restore(data.get('seen'))
+                    self.outbox = data.get('outbox') or []
+                    self.slot_lateness = data.get('slot_lateness') or []
+                    self.currency_rates = data.get('currency_rates') or {}
+                    self.currency_last_rates = data.get('currency_last_rates') or {}
+                    logger.info("داده‌ها بارگذاری شد - نرخ یوآن: %s", self.yuan_rate)
         except Exception as e:
-            logger.error(f"خطا در بارگذاری داده‌ها: {e}")
+            logger.error("خطا در بارگذاری داده‌ها: %s", e)
+    
+    def reload_data(self):
+        """
+        بارگذاری دوباره data.json در نمونه در حال اجرا (نسخه follower یا رهبر جدید)
+        
+        لیست outbox و دیکشنری publish_state در جای خود به‌روز می‌شوند چون
+        Outbox و PublishPolicy به همان اشیا ارجاع دارند.
+        """
+        outbox = self.outbox
+        self.stats = StatsEngine()
+        self.seen = SeenCache()
+        self.load_data()
+        outbox[:] = self.outbox
+        self.outbox = outbox
+        self.bump_version()
+    
+    def reload_reminder(self):
+        """
+        ادغام وضعیت یادآوری data.json با وضعیت حافظه
+        
+        اگر فرآیند دیگری (ربات یا اجرای مستقیم reminder.py) امروز یادآوری
+        بیشتری ثبت کرده باشد، همان وضعیت استفاده می‌شود.
+        """
+        if not self.data_file or not os.path.exists(self.data_file):
+            return
+        try:
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                stored = json.load(f).get('reminder') or {}
+        except Exception as e:
+            logger.warning("خواندن وضعیت یادآوری از data.json ممکن نشد: %s", e)
+            return
+        if (stored.get('date') or '', stored.get('count', 0)) > (
+            self.reminder.get('date') or '', self.reminder.get('count', 0)
+        ):
+            self.reminder = stored
     
     def save_data(self):
         """ذخیره داده‌ها"""
+        if not self.data_file or self.read_only:
+            return
         try:
             data = {
                 'yuan_rate': self.yuan_rate,
                 'last_calculated_rate': self.last_calculated_rate,
-                'last_update': datetime.now(TIMEZONE).isoformat()
+                'yuan_rate_date': self.yuan_rate_date,
+                'yuan_rate_source': self.yuan_rate_source,
+                'reminder': self.reminder,
+                'publish_state': self.publish_state,
+                'cursors': self.cursors,
+                'ticks': self.stats.export(),
+                'seen': self.seen.export(),
+                'outbox': self.outbox,
+                'slot_lateness': self.slot_lateness,
+                'currency_rates': self.currency_rates,
+                'currency_last_rates': self.currency_last_rates,
+                'last_update': datetime.now(config.current.tz).isoformat()
             }
-            with open(DATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self._write_data(data)
             logger.info("داده‌ها ذخیره شد")
         except Exception as e:
-            logger.error(f"خطا در ذخیره داده‌ها: {e}")
+            logger.error("خطا در ذخیره داده‌ها: %s", e)
+    
+    def _write_data(self, data: dict):
+        """نوشتن در فایل موقت و جایگزینی اتمی تا فایل نیمه‌کاره باقی نماند"""
+        tmp_file = f"{self.data_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.data_file)
+    
+    def save_reminder(self):
+        """
+        ذخیره فقط وضعیت یادآوری در data.json (اجرای مستقیم reminder.py)
+        
+        بقیه کلیدهای فایل دست نمی‌خورند تا نسخه قدیمی حافظه این فرآیند
+        تغییرات ربات در حال اجرا (نرخ، outbox، ...) را بازنویسی نکند.
+        """
+        if not self.data_file or self.read_only:
+            return
+        try:
+            data = {}
+            if os.path.exists(self.data_file):
+                with open(self.data_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            data['reminder'] = self.reminder
+            self._write_data(data)
+        except Exception as e:
+            logger.error("خطا در ذخیره وضعیت یادآوری: %s", e)
     
     def extract_tether_price(self, text: str) -> Optional[int]:
         """
@@ -97,15 +284,36 @@ class TetherBot:
             if match:
                 price_str = match.group(1).replace(',', '')
                 price = int(price_str)
-                logger.info(f"قیمت تتر استخراج شد: {price:,} ریال")
+                logger.info("قیمت تتر استخراج شد: %s ریال", fmt(price, ','))
                 return price
             
             logger.warning("قیمت فروش تتر در متن یافت نشد")
             return None
         except Exception as e:
-            logger.error(f"خطا در استخراج قیمت تتر: {e}")
+            logger.error("خطا در استخراج قیمت تتر: %s", e)
             return None
     
+    def accept_price(self, tether_price: int, at: Optional[float] = None) -> bool:
+        """
+        بررسی قیمت استخراج شده قبل از محاسبه: قیمت‌های پرت رد می‌شوند، مگر
+        چند قیمت پرت همخوان پشت سر هم سطح جدید قیمت را تأیید کنند
+        """
+        now = at if at is not None else time.time()
+        outlier = self.stats.is_outlier(tether_price, now=now)
+        if self.stats.accept(tether_price, now=now):
+            if outlier:
+                logger.warning("سطح جدید قیمت تتر (%s ریال) تأیید و پذیرفته شد", fmt(tether_price, ','))
+            return True
+        logger.warning(
+            "قیمت تتر (%s ریال) با میانه اخیر اختلاف غیرعادی دارد و رد شد",
+            fmt(tether_price, ',')
+        )
+        return False
+    
+    def record_tick(self, tether_price: int, base_rate: Optional[float], at: Optional[float] = None):
+        """ثبت tick در موتور آمار (at: زمان یونیکس، پیش‌فرض اکنون)"""
+        self.stats.record(at if at is not None else time.time(), tether_price, base_rate)
+    
     def calculate_base_rate(self, tether_price_rial: int) -> Optional[float]:
         """
         محاسبه نرخ مبنا
@@ -130,58 +338,175 @@ class TetherBot:
             rounded_rate = math.ceil(base_rate / 10) * 10
             
             logger.info(
-                f"محاسبه: {tether_price_toman:,.0f} تومان ÷ {self.yuan_rate} = "
-                f"{base_rate:,.2f} → رند شده: {rounded_rate:,.0f}"
+                "محاسبه: %s تومان ÷ %s = %s → رند شده: %s",
+                fmt(tether_price_toman, ',.0f'), self.yuan_rate,
+                fmt(base_rate, ',.2f'), fmt(rounded_rate, ',.0f')
             )
             
             return float(rounded_rate)
         except Exception as e:
-            logger.error(f"خطا در محاسبه نرخ مبنا: {e}")
+            logger.error("خطا در محاسبه نرخ مبنا: %s", e)
             return None
     
-    def format_message(self, base_rate: float) -> str:
+    def apply_ratchet(self, base_rate: float, save: bool = True) -> float:
+        """
+        شرط کاهش نرخ: اگر نرخ جدید کمتر از نرخ قبلی بود، از نرخ قبلی استفاده شود
+        در غیر این صورت نرخ جدید ذخیره می‌شود
+        
+        save=False: ذخیره روی دیسک به عهده فراخواننده است
+        """
+        if self.last_calculated_rate and base_rate < self.last_calculated_rate:
+            logger.warning(
+                "نرخ جدید (%s) کمتر از نرخ قبلی (%s) است. "
+                "از نرخ قبلی استفاده می‌شود.",
+                fmt(base_rate, ',.0f'),
+                fmt(self.last_calculated_rate, ',.0f')
+            )
+            return self.last_calculated_rate
+        
+        self.last_calculated_rate = base_rate
+        if save:
+            self.save_data()
+        return base_rate
+    
+    def price_all(self, tether_price_rial: int) -> dict:
+        """
+        قیمت‌گذاری یک قیمت تتر برای یوآن و همه جفت‌ارزهای اضافه در یک محاسبه
+        
+        خروجی: کد ارز ← نرخ مبنای رند شده (جفت‌های بدون نرخ حذف می‌شوند)
+        """
+        rates = dict(self.currency_rates, CNY=self.yuan_rate)
+        priced = price_pairs(tether_price_rial, (CNY,) + self.pairs, rates)
+        if 'CNY' not in priced:
+            logger.error("نرخ یوآن تنظیم نشده است!")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "محاسبه %s ریال: %s", fmt(tether_price_rial, ','),
+                ', '.join(f"{code}={rate:,.0f}" for code, rate in priced.items()),
+            )
+        return priced
+    
+    def apply_pair_ratchets(self, rates: dict) -> dict:
+        """شرط کاهش نرخ برای هر جفت‌ارز اضافه (مانند apply_ratchet بدون ذخیره)"""
+        applied = {}
+        for code, base_rate in rates.items():
+            last = self.currency_last_rates.get(code)
+            if last and base_rate < last:
+                applied[code] = last
+                continue
+            if base_rate != last:
+                self.currency_last_rates[code] = base_rate
+                self.bump_version()
+            applied[code] = base_rate
+        return applied
+    
+    def tier_prices(self, base_rate: float, rates: Optional[dict] = None) -> tuple:
+        """
+        قیمت هر سطح (به همان دقتی که در پیام نمایش داده می‌شود)
+        
+        rates: نرخ مبنای جفت‌ارزهای اضافه؛ سطوح آن‌ها پشت سر سطوح یوآن می‌آیند
+        """
+        prices = CNY.tier_prices(base_rate)
+        for pair in self.pairs:
+            if rates and pair.code in rates:
+                prices += pair.tier_prices(rates[pair.code])
+        return prices
+    
+    def render_messages(self, base_rate: float, rates: dict, now: Optional[datetime] = None) -> list:
+        """
+        پیام‌های یک tick: [(کد ارز، متن)]
+        
+        CURRENCY_MESSAGES=combined یک پیام با همه ارزها، separate یک پیام برای هر ارز
+        """
+        if config.current.currency_messages != SEPARATE:
+            return [(CNY.code, self.format_message(base_rate, now, rates))]
+        messages = [(CNY.code, self.format_message(base_rate, now))]
+        for pair in self.pairs:
+            if pair.code in rates:
+                messages.append((pair.code, self.format_message(rates[pair.code], now, pair=pair)))
+        return messages
+    
+    def format_message(
+        self, base_rate: float, now: Optional[datetime] = None,
+        rates: Optional[dict] = None, pair: CurrencyPair = CNY,
+    ) -> str:
         """
         ایجاد متن پیام نهایی با تاریخ شمسی و میلادی
+        
+        now: زمان پیام (پیش‌فرض: زمان فعلی)
+        rates: نرخ مبنای جفت‌ارزهای اضافه برای پیام ترکیبی
+        pair: جفت‌ارز پیام (پیش‌فرض یوآن)
         """
         # زمان فعلی
-        now = datetime.now(TIMEZONE)
+        now = now or datetime.now(config.current.tz)
         current_time = now.strftime('%H:%M')
         
-        # تاریخ شمسی
-        j_date = jdatetime.datetime.now()
-        persian_date = j_date.strftime('%Y/%m/%d')
-        persian_day_name = j_date.strftime('%A')  # نام روز به فارسی
+        # تاریخ شمسی و نام روز از جدول تقویم
+        calendar = get_calendar()
+        today = now.date()
+        persian_date = calendar.jalali_str(today)
+        persian_day_name = calendar.weekday_name(today)
         
         # تاریخ میلادی
         gregorian_date = now.strftime('%Y/%m/%d')
-        gregorian_day_name = now.strftime('%A')  # نام روز
         
-        # ترجمه نام روزهای میلادی به فارسی
-        day_translation = {
-            'Saturday': 'شنبه',
-            'Sunday': 'یکشنبه',
-            'Monday': 'دوشنبه',
-            'Tuesday': 'سه‌شنبه',
-            'Wednesday': 'چهارشنبه',
-            'Thursday': 'پنج‌شنبه',
-            'Friday': 'جمعه'
-        }
-        gregorian_day_name_fa = day_translation.get(gregorian_day_name, gregorian_day_name)
+        tiers = pair.tier_lines(base_rate)
+        for extra in self.pairs:
+            if rates and extra.code in rates:
+                tiers += f"\n\n💱 نرخ {extra.name}\n{extra.tier_lines(rates[extra.code])}"
         
-        return f"""⏳ به‌روزرسانی نرخ یوآن
+        return f"""⏳ به‌روزرسانی نرخ {pair.name}
 📅 تاریخ شمسی: {persian_date} ({persian_day_name})
-📆 تاریخ میلادی: {gregorian_date} ({gregorian_day_name_fa})
+📆 تاریخ میلادی: {gregorian_date} ({persian_day_name})
 🕐 ساعت: {current_time}
 
-1️⃣ خرید تا 5 هزار یوآن : {base_rate + 80:,.0f}
-2️⃣ خرید تا 10 هزار یوآن : {base_rate + 70:,.0f}
-3️⃣ خرید بالای 10 هزار یوآن : {base_rate + 60:,.0f}"""
+{tiers}"""
 
 
 # ایجاد نمونه از ربات
 bot_instance = TetherBot()
 
+# کش پاسخ دستورات فقط‌خواندنی
+reply_cache = ReplyCache()
+
+# سیاست انتشار (جلوگیری از ارسال پیام تکراری)
+publish_policy = PublishPolicy(bot_instance.publish_state, skip_day=skip_closed_day)
+
+# جدول قیمت /quote (برای هر نسخه نرخ یک بار ساخته می‌شود)
+quote_book = QuoteBook(PRICE_TIERS)
+
+# صف پایدار پیام‌های منتشر شده
+publish_outbox = Outbox(bot_instance.outbox, bot_instance.save_data)
+
+# حلقه یادآوری (در main ساخته می‌شود)
+reminder_loop: Optional[ReminderLoop] = None
+reminder_task: Optional[asyncio.Task] = None
+background_tasks: list = []
+
+# خواندن تطبیقی منبع (با POLL_ADAPTIVE=1 در نسخه رهبر)
+source_poller: Optional[AdaptivePoller] = None
+source_poll_task: Optional[asyncio.Task] = None
+
+# مقصدهای خروجی پیام نرخ (در post_init ساخته می‌شود)
+sink_dispatcher: Optional[SinkDispatcher] = None
+
+# API محلی فقط‌خواندنی نرخ (با RATE_API_PORT در post_init راه‌اندازی می‌شود)
+rate_api: Optional[RateApi] = None
+
+# انتخاب رهبر بین نسخه‌های ربات (با LEADER_LEASE_FILE در run_standby ساخته می‌شود)
+elector: Optional[LeaderElector] = None
+
+# خط لوله محاسبه و انتشار نرخ (workerها در post_init شروع می‌شوند)
+pricing_pipeline = Pipeline()
+bot_tenant = Tenant(
+    'bot', bot_instance, publish_policy,
+    # نسخه‌ای که lease آن منقضی شده منتشر نمی‌کند (حتی قبل از heartbeat بعدی)
+    dispatcher=lambda: sink_dispatcher if _leading() else None,
+    refresh_rate=partial(refresh_yuan_rate, bot_instance),
+)
+
 
+@profiled()
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """دستور /start"""
     await update.message.reply_text(
@@ -190,234 +515,648 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "دستورات موجود:\n"
         "/start - شروع و راهنما\n"
         "/setrate <نرخ> - تنظیم نرخ یوآن (مثال: /setrate 7.12)\n"
+        "/setrate <ارز> <نرخ> - تنظیم نرخ ارزهای دیگر (مثال: /setrate AED 3.67)\n"
         "/getrate - نمایش نرخ فعلی یوآن\n"
         "/update - به‌روزرسانی دستی نرخ\n"
-        "/status - نمایش وضعیت ربات"
+        "/status - نمایش وضعیت ربات\n"
+        "/stats - آمار نوسان قیمت (۱ و ۲۴ ساعت)\n"
+        "/quote <مقدار> - قیمت کل برای مقدار یوآن (مثال: /quote 7500 12000)"
     )
 
 
+@profiled()
 async def set_rate(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """تنظیم نرخ یوآن - دستور /setrate"""
+    """تنظیم نرخ یوآن یا جفت‌ارزهای اضافه - دستور /setrate [ارز] <نرخ>"""
     try:
-        if not context.args or len(context.args) != 1:
+        if not context.args or len(context.args) not in (1, 2):
             await update.message.reply_text(
                 "❌ فرمت نادرست!\n"
-                "مثال: /setrate 7.12"
+                "مثال: /setrate 7.12 یا /setrate AED 3.67"
             )
             return
         
-        rate = float(context.args[0])
+        rate = float(context.args[-1])
         
         if rate <= 0:
             await update.message.reply_text("❌ نرخ باید عددی مثبت باشد!")
             return
         
-        bot_instance.yuan_rate = rate
+        code = context.args[0].upper() if len(context.args) == 2 else CNY.code
+        if code != CNY.code:
+            pair = next((p for p in bot_instance.pairs if p.code == code), None)
+            if not pair:
+                known = ', '.join(p.code for p in (CNY,) + bot_instance.pairs)
+                await update.message.reply_text(f"❌ ارز ناشناخته: {code}\nارزهای تعریف شده: {known}")
+                return
+            bot_instance.set_currency_rate(code, rate)
+            bot_instance.save_data()
+            await update.message.reply_text(f"✅ نرخ {pair.name} ({code}) به {rate} تنظیم شد.")
+            logger.info("نرخ %s توسط کاربر به %s تنظیم شد", code, rate)
+            return
+        
+        bot_instance.set_yuan_rate(rate)
         bot_instance.save_data()
         
+        # توقف یادآوری‌های امروز
+        if reminder_loop:
+            reminder_loop.notify_rate_set()
+        
         await update.message.reply_text(
             f"✅ نرخ یوآن به {rate} تنظیم شد.\n"
-            f"🕐 زمان: {datetime.now(TIMEZONE).strftime('%Y/%m/%d - %H:%M')}"
+            f"🕐 زمان: {datetime.now(config.current.tz).strftime('%Y/%m/%d - %H:%M')}"
         )
         
-        logger.info(f"نرخ یوآن توسط کاربر به {rate} تنظیم شد")
+        logger.info("نرخ یوآن توسط کاربر به %s تنظیم شد", rate)
         
     except ValueError:
         await update.message.reply_text("❌ لطفاً یک عدد معتبر وارد کنید!")
     except Exception as e:
-        logger.error(f"خطا در تنظیم نرخ: {e}")
+        logger.error("خطا در تنظیم نرخ: %s", e)
         await update.message.reply_text(f"❌ خطا در تنظیم نرخ: {str(e)}")
 
 
-async def get_rate(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """نمایش نرخ فعلی یوآن - دستور /getrate"""
-    if bot_instance.yuan_rate:
-        await update.message.reply_text(
-            f"💱 نرخ فعلی یوآن: {bot_instance.yuan_rate}\n"
-            f"📊 آخرین نرخ محاسبه شده: "
-            f"{bot_instance.last_calculated_rate:,.0f} تومان"
-            if bot_instance.last_calculated_rate else ""
-        )
-    else:
-        await update.message.reply_text(
+def render_get_rate() -> str:
+    """ساخت متن پاسخ /getrate"""
+    if not bot_instance.yuan_rate:
+        return (
             "❌ نرخ یوآن هنوز تنظیم نشده است.\n"
             "لطفاً با دستور /setrate نرخ را تنظیم کنید."
         )
+    text = f"💱 نرخ فعلی یوآن: {bot_instance.yuan_rate}"
+    source = SOURCE_LABELS.get(bot_instance.yuan_rate_source, bot_instance.yuan_rate_source)
+    text += f"\n📡 منبع: {source} ({bot_instance.yuan_rate_date or '-'})"
+    if bot_instance.last_calculated_rate:
+        text += (
+            f"\n📊 آخرین نرخ محاسبه شده: "
+            f"{bot_instance.last_calculated_rate:,.0f} تومان"
+        )
+    return text + _format_pairs()
 
 
-async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """نمایش وضعیت ربات - دستور /status"""
-    status_msg = f"""📊 وضعیت ربات:
+def _format_pairs() -> str:
+    """نرخ و آخرین نرخ مبنای جفت‌ارزهای اضافه (هر کدام یک خط)"""
+    lines = []
+    for pair in bot_instance.pairs:
+        rate = bot_instance.currency_rates.get(pair.code)
+        last = bot_instance.currency_last_rates.get(pair.code)
+        line = f"\n💱 نرخ {pair.name} ({pair.code}): {rate if rate else '❌ تنظیم نشده'}"
+        if last:
+            line += f" → {last:,.0f} تومان"
+        lines.append(line)
+    return ''.join(lines)
+
+
+def _format_outbox() -> str:
+    """عمق outbox و تأخیر ارسال برای /status"""
+    depth = publish_outbox.depth
+    if depth:
+        text = f"{depth} پیام در انتظار (قدیمی‌ترین: {publish_outbox.oldest_pending_age():.0f} ثانیه)"
+    else:
+        text = "خالی"
+    lag = publish_outbox.last_delivery_lag()
+    if lag is not None:
+        text += f" | تأخیر آخرین ارسال: {lag:.1f} ثانیه"
+    return text
+
+
+def _format_lateness() -> str:
+    """خلاصه تأخیر تحویل پیام‌های ساعتی نسبت به سر ساعت (حالت prefetch)"""
+    summary = lateness_summary(bot_instance.slot_lateness)
+    if not summary:
+        return "ثبت نشده"
+    return (
+        f"آخرین {summary['last']:.1f} ثانیه | میانگین {summary['mean']:.1f} | "
+        f"بیشینه {summary['max']:.1f} ({summary['count']} ارسال)"
+    )
+
+
+def _format_source_poll() -> str:
+    if source_poller is None:
+        return ''
+    summary = source_poller.summary()
+    line = f"\n🔄 خواندن تطبیقی منبع: هر {summary['interval'] / 60:g} دقیقه"
+    if source_poller.last:
+        last = source_poller.last
+        change = '' if last.change_pct is None else f"، تغییر {last.change_pct:.2f}%"
+        line += f" ({last.label}{change})، بعدی {last.next_at:%H:%M}"
+    budget = f"/{summary['hourly_budget']}" if summary['hourly_budget'] else ''
+    return line + f"، {summary['polls_last_hour']}{budget} خواندن در ساعت اخیر"
+
+
+def _format_leader() -> str:
+    if elector is None:
+        return ''
+    summary = elector.summary()
+    role = f"رهبر (term {summary['term']})" if summary['leader'] else 'follower'
+    return f"\n👥 نقش: {role} - {summary['holder']}، {summary['elections']} بار رهبر شده"
+
+
+def _format_http_pool() -> str:
+    summary = http_pool.stats.summary()
+    if not summary['requests']:
+        return '-'
+    return (
+        f"{summary['requests']} درخواست، {summary['connections']} اتصال جدید "
+        f"({summary['reuse_ratio']:.0%} بازاستفاده)"
+    )
+
+
+def render_status() -> str:
+    """ساخت بخش کش شونده پاسخ /status (فقط وابسته به state_version)"""
+    settings = config.current
+    return f"""📊 وضعیت ربات:
 
 💱 نرخ یوآن: {bot_instance.yuan_rate if bot_instance.yuan_rate else '❌ تنظیم نشده'}
-📈 آخرین نرخ محاسبه شده: {f"{bot_instance.last_calculated_rate:,.0f} تومان" if bot_instance.last_calculated_rate else '❌ محاسبه نشده'}
-📢 کانال منبع: @{SOURCE_CHANNEL}
-🎯 گروه مقصد: {TARGET_GROUP_ID if TARGET_GROUP_ID else '❌ تنظیم نشده'}
-🕐 زمان فعلی: {datetime.now(TIMEZONE).strftime('%Y/%m/%d - %H:%M:%S')}
+📈 آخرین نرخ محاسبه شده: {f"{bot_instance.last_calculated_rate:,.0f} تومان" if bot_instance.last_calculated_rate else '❌ محاسبه نشده'}{_format_pairs()}
+📢 کانال منبع: @{settings.source_channel}
+🎯 گروه مقصد: {settings.target_group_id if settings.target_group_id else '❌ تنظیم نشده'}
+📤 مقصدهای خروجی: {', '.join(sink_dispatcher.names) if sink_dispatcher else '❌ هیچ'}
 """
-    await update.message.reply_text(status_msg)
 
 
+def status_live_version() -> tuple:
+    """
+    نسخه بخش پویای /status
+
+    صف ارسال، تأخیر پیام‌ها، اتصال‌های HTTP، خواندن تطبیقی و نقش رهبر بدون
+    تغییر state_version عوض می‌شوند؛ شمارنده‌های آن‌ها کلید کش این بخش است.
+    """
+    lateness = bot_instance.slot_lateness
+    return (
+        bot_instance.state_version,
+        publish_outbox.generation,
+        lateness[-1]['slot'] if lateness else None,
+        http_pool.stats.requests,
+        source_poller.polls if source_poller else None,
+        (elector.is_leader, elector.elections, elector.demotions) if elector else None,
+    )
+
+
+def render_status_live() -> str:
+    """ساخت بخش پویای پاسخ /status (دقت زمان: دقیقه)"""
+    settings = config.current
+    return f"""📬 صف ارسال: {_format_outbox()}
+⏱️ تأخیر پیام‌های ساعتی: {_format_lateness()}
+🔌 اتصال‌های HTTP: {_format_http_pool()}{_format_source_poll()}{_format_leader()}
+🕐 زمان فعلی: {datetime.now(settings.tz).strftime('%Y/%m/%d - %H:%M')}
+"""
+
+
+@profiled()
+async def get_rate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نمایش نرخ فعلی یوآن - دستور /getrate"""
+    text = reply_cache.get('getrate', bot_instance.state_version, render_get_rate)
+    await update.message.reply_text(text)
+
+
+@profiled()
+async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نمایش وضعیت ربات - دستور /status"""
+    text = reply_cache.get('status', bot_instance.state_version, render_status)
+    live = reply_cache.get('status_live', status_live_version(), render_status_live, per_minute=True)
+    await update.message.reply_text(text + live)
+
+
+def _format_window(stats: Optional[dict], unit: str) -> str:
+    if not stats:
+        return "   داده‌ای موجود نیست"
+    return (
+        f"   میانگین: {stats['mean']:,.0f} | میانه: {stats['median']:,.0f}\n"
+        f"   کمینه: {stats['min']:,.0f} | بیشینه: {stats['max']:,.0f}\n"
+        f"   انحراف معیار: {stats['stdev']:,.1f} {unit} | تغییر: {stats['change_pct']:+.2f}%\n"
+        f"   تعداد نمونه: {stats['count']}"
+    )
+
+
+def render_stats() -> str:
+    """ساخت متن پاسخ /stats از موتور آمار"""
+    now = time.time()
+    engine = bot_instance.stats
+    sections = []
+    for series, title, unit in (
+        ('tether', '💵 قیمت تتر', 'ریال'),
+        ('base_rate', '📈 نرخ مبنا', 'تومان'),
+    ):
+        sections.append(f"{title} ({unit}):")
+        for window, label in (('1h', '⏱ ۱ ساعت اخیر'), ('24h', '📅 ۲۴ ساعت اخیر')):
+            sections.append(f" {label}:")
+            sections.append(_format_window(engine.snapshot(series, window, now=now), unit))
+        sections.append("")
+    return "📊 آمار نوسان قیمت\n\n" + "\n".join(sections).rstrip()
+
+
+@profiled()
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نمایش آمار نوسان - دستور /stats"""
+    text = reply_cache.get('stats', bot_instance.stats.version, render_stats, per_minute=True)
+    await update.message.reply_text(text)
+
+
+def current_quote_table():
+    """جدول قیمت آخرین نرخ محاسبه شده (None اگر نرخی موجود نباشد)"""
+    return quote_book.table(bot_instance.state_version, bot_instance.last_calculated_rate)
+
+
+@profiled()
+async def quote(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """قیمت کل برای یک یا چند مقدار یوآن - دستور /quote"""
+    amounts = parse_amounts(' '.join(context.args or ()))
+    if not amounts:
+        await update.message.reply_text(
+            "❌ مقدار یوآن را وارد کنید!\n"
+            "مثال: /quote 7500\n"
+            "چند مقدار: /quote 3000 7500 12000"
+        )
+        return
+    table = current_quote_table()
+    if not table:
+        await update.message.reply_text("❌ نرخ هنوز محاسبه نشده است!")
+        return
+    await update.message.reply_text(table.render(amounts))
+
+
+@profiled()
+async def inline_quote(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """پاسخ inline (مثال: @bot 7500)"""
+    query = update.inline_query
+    amounts = parse_amounts(query.query)
+    table = current_quote_table()
+    if not amounts or not table:
+        await query.answer([], cache_time=5)
+        return
+    
+    results = [
+        InlineQueryResultArticle(
+            id=f"{bot_instance.state_version}-{amount}",
+            title=f"{amount:,} یوآن",
+            description=table.line(amount).splitlines()[0],
+            input_message_content=InputTextMessageContent(table.line(amount)),
+        )
+        for amount in amounts
+    ]
+    if len(amounts) > 1:
+        results.insert(0, InlineQueryResultArticle(
+            id=f"{bot_instance.state_version}-all-{'-'.join(map(str, amounts))}"[:64],
+            title=f"همه ({len(amounts)} مقدار)",
+            input_message_content=InputTextMessageContent(table.render(amounts)),
+        ))
+    await query.answer(results, cache_time=30)
+
+
+@profiled()
 async def update_rate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """به‌روزرسانی دستی نرخ - دستور /update"""
     await update.message.reply_text("🔄 در حال به‌روزرسانی نرخ...")
     
     try:
-        result = await fetch_and_calculate(context.application)
+        # به‌روزرسانی دستی همیشه ارسال می‌شود
+        result = await fetch_and_calculate(context.application, force=True)
         await update.message.reply_text(result)
     except Exception as e:
-        logger.error(f"خطا در به‌روزرسانی دستی: {e}")
+        logger.error("خطا در به‌روزرسانی دستی: %s", e)
         await update.message.reply_text(f"❌ خطا در به‌روزرسانی: {str(e)}")
 
 
-async def fetch_and_calculate(application: Application) -> str:
+class BotApiSource(Source):
+    """
+    آخرین پیام کانال میانی (PRIVATE_CHANNEL_ID) یا کانال عمومی از طریق Bot API
+
+    خواندن مستقیم کانال عمومی معمولاً ممکن نیست؛ راه‌حل در ADVANCED.md.
+    پست ویرایش شده (edited_channel_post) هم آخرین پیام حساب می‌شود؛ با seen
+    همان پست با همان متن فقط یک بار پردازش می‌شود.
+    """
+
+    def __init__(self, bot, settings: Settings, seen: Optional[SeenCache] = None):
+        self.bot = bot
+        self.settings = settings
+        self.name = settings.private_channel_id or settings.source_channel
+        self.seen = seen
+
+    async def read(self) -> list:
+        if self.settings.private_channel_id:
+            return [await self._read_private()]
+        return [await self._read_public()]
+
+    @staticmethod
+    def _message(update) -> Optional[SourceMessage]:
+        """پیام منبع از پست یا پست ویرایش شده کانال"""
+        post = update.channel_post or update.edited_channel_post
+        if not post:
+            return None
+        moment = post.edit_date or post.date
+        return SourceMessage(
+            post.text, moment.timestamp() if moment else None, post.message_id,
+            edited=post.edit_date is not None,
+        )
+
+    async def _read_private(self) -> SourceMessage:
+        channel_id = self.settings.private_channel_id
+        logger.info("در حال دریافت پیام از کانال میانی %s...", channel_id)
+        try:
+            await self.bot.get_chat(channel_id)
+            updates = await self.bot.get_updates(limit=100)
+        except Exception as e:
+            raise SourceError(
+                f"❌ خطا در دریافت از کانال میانی.\n"
+                f"مطمئن شوید:\n"
+                f"1. ربات عضو کانال است\n"
+                f"2. PRIVATE_CHANNEL_ID صحیح است\n"
+                f"3. پیامی در کانال موجود است\n\n"
+                f"خطا: {str(e)}"
+            ) from e
+
+        for upd in reversed(updates):
+            post = upd.channel_post or upd.edited_channel_post
+            if post and str(post.chat.id) == str(channel_id) and post.text:
+                logger.info("پیام از کانال میانی دریافت شد")
+                return self._message(upd)
+        raise SourceError(f"❌ پیامی در کانال میانی {channel_id} یافت نشد.")
+
+    async def _read_public(self) -> SourceMessage:
+        source_channel = self.settings.source_channel
+        channel_username = f"@{source_channel}"
+        logger.info("در حال دریافت پیام از کانال عمومی %s...", channel_username)
+        try:
+            await self.bot.get_chat(channel_username)
+            updates = await self.bot.get_updates(limit=100)
+        except Exception as e:
+            raise SourceError(
+                f"⚠️ نمی‌توان مستقیماً از کانال عمومی خواند.\n\n"
+                f"💡 راه حل:\n"
+                f"1. یک کانال خصوصی بسازید\n"
+                f"2. ربات را به آن اضافه و ادمین کنید\n"
+                f"3. پیام‌ها را به آنجا forward کنید\n"
+                f"4. PRIVATE_CHANNEL_ID را در .env تنظیم کنید\n\n"
+                f"📖 جزئیات بیشتر: ADVANCED.md\n\n"
+                f"خطا: {str(e)}"
+            ) from e
+
+        for upd in reversed(updates):
+            post = upd.channel_post or upd.edited_channel_post
+            if post and post.chat.username and post.chat.username.lower() == source_channel.lower():
+                if post.text:
+                    return self._message(upd)
+                break
+        raise SourceError(
+            f"❌ پیامی از کانال {channel_username} یافت نشد.\n\n"
+            f"💡 راه حل: یک کانال میانی بسازید و PRIVATE_CHANNEL_ID را تنظیم کنید.\n"
+            f"📖 راهنما: ADVANCED.md"
+        )
+
+
+def describe_outcome(outcome: Outcome) -> str:
+    """متن پاسخ /update و لاگ به‌روزرسانی برنامه‌ریزی شده"""
+    if outcome.status == PUBLISHED:
+        return f"✅ پیام برای ارسال به {len(outcome.destinations)} مقصد در صف قرار گرفت!\n\n{outcome.message}"
+    if outcome.status == NO_SINKS:
+        return f"{outcome.detail}:\n\n{outcome.message}"
+    return outcome.detail
+
+
+async def read_source(application: Application, force: bool = False) -> Outcome:
+    """یک خواندن منبع از طریق خط لوله"""
+    with correlation_scope():
+        source = BotApiSource(application.bot, config.current, seen=bot_instance.seen)
+        return await pricing_pipeline.run(source, bot_tenant, force=force)
+
+
+@profiled()
+async def fetch_and_calculate(application: Application, force: bool = False) -> str:
     """
-    دریافت قیمت از کانال، محاسبه و ارسال پیام
+    دریافت قیمت از کانال، محاسبه و ارسال پیام (از طریق خط لوله)
     این تابع توسط scheduler هر ساعت فراخوانی می‌شود
+    
+    force: ارسال بدون توجه به سیاست انتشار
     """
-    try:
-        # بررسی تنظیم نرخ یوآن
-        if not bot_instance.yuan_rate:
-            error_msg = "❌ نرخ یوآن تنظیم نشده است! لطفاً با دستور /setrate نرخ را تنظیم کنید."
-            logger.error(error_msg)
-            return error_msg
-        
-        text = None
-        
-        # اگر کانال میانی تنظیم شده، از آن استفاده کن
-        if PRIVATE_CHANNEL_ID:
-            logger.info(f"در حال دریافت پیام از کانال میانی {PRIVATE_CHANNEL_ID}...")
-            try:
-                # دریافت آخرین پیام از کانال میانی
-                chat = await application.bot.get_chat(PRIVATE_CHANNEL_ID)
-                
-                # دریافت updates و پیدا کردن آخرین پیام
-                updates = await application.bot.get_updates(limit=100)
-                
-                for upd in reversed(updates):
-                    if (upd.channel_post and 
-                        str(upd.channel_post.chat.id) == str(PRIVATE_CHANNEL_ID)):
-                        text = upd.channel_post.text
-                        logger.info("پیام از کانال میانی دریافت شد")
-                        break
-                
-                if not text:
-                    error_msg = f"❌ پیامی در کانال میانی {PRIVATE_CHANNEL_ID} یافت نشد."
-                    logger.error(error_msg)
-                    return error_msg
-                    
-            except Exception as e:
-                logger.error(f"خطا در دریافت از کانال میانی: {e}")
-                error_msg = (
-                    f"❌ خطا در دریافت از کانال میانی.\n"
-                    f"مطمئن شوید:\n"
-                    f"1. ربات عضو کانال است\n"
-                    f"2. PRIVATE_CHANNEL_ID صحیح است\n"
-                    f"3. پیامی در کانال موجود است\n\n"
-                    f"خطا: {str(e)}"
-                )
-                return error_msg
-        
-        else:
-            # تلاش برای خواندن مستقیم از کانال عمومی (ممکن است کار نکند)
-            channel_username = f"@{SOURCE_CHANNEL}"
-            logger.info(f"در حال دریافت پیام از کانال عمومی {channel_username}...")
-            
-            try:
-                chat = await application.bot.get_chat(channel_username)
-                updates = await application.bot.get_updates(limit=100)
-                
-                channel_message = None
-                for upd in reversed(updates):
-                    if (upd.channel_post and 
-                        upd.channel_post.chat.username and 
-                        upd.channel_post.chat.username.lower() == SOURCE_CHANNEL.lower()):
-                        channel_message = upd.channel_post
-                        break
-                
-                if not channel_message or not channel_message.text:
-                    error_msg = (
-                        f"❌ پیامی از کانال {channel_username} یافت نشد.\n\n"
-                        f"💡 راه حل: یک کانال میانی بسازید و PRIVATE_CHANNEL_ID را تنظیم کنید.\n"
-                        f"📖 راهنما: ADVANCED.md"
-                    )
-                    logger.error(error_msg)
-                    return error_msg
-                
-                text = channel_message.text
-                
-            except Exception as e:
-                logger.error(f"خطا در دریافت پیام از کانال عمومی: {e}")
-                error_msg = (
-                    f"⚠️ نمی‌توان مستقیماً از کانال عمومی خواند.\n\n"
-                    f"💡 راه حل:\n"
-                    f"1. یک کانال خصوصی بسازید\n"
-                    f"2. ربات را به آن اضافه و ادمین کنید\n"
-                    f"3. پیام‌ها را به آنجا forward کنید\n"
-                    f"4. PRIVATE_CHANNEL_ID را در .env تنظیم کنید\n\n"
-                    f"📖 جزئیات بیشتر: ADVANCED.md\n\n"
-                    f"خطا: {str(e)}"
-                )
-                return error_msg
-        
-        # استخراج قیمت تتر
-        tether_price = bot_instance.extract_tether_price(text)
-        if not tether_price:
-            error_msg = "❌ قیمت تتر در پیام کانال یافت نشد!"
-            logger.error(error_msg)
-            return error_msg
-        
-        # محاسبه نرخ مبنا
-        base_rate = bot_instance.calculate_base_rate(tether_price)
-        if not base_rate:
-            error_msg = "❌ خطا در محاسبه نرخ مبنا!"
-            logger.error(error_msg)
-            return error_msg
-        
-        # بررسی شرط: اگر نرخ جدید کمتر از نرخ قبلی بود، از نرخ قبلی استفاده شود
-        if bot_instance.last_calculated_rate and base_rate < bot_instance.last_calculated_rate:
-            logger.warning(
-                f"نرخ جدید ({base_rate:,.0f}) کمتر از نرخ قبلی "
-                f"({bot_instance.last_calculated_rate:,.0f}) است. "
-                f"از نرخ قبلی استفاده می‌شود."
-            )
-            base_rate = bot_instance.last_calculated_rate
-        else:
-            # ذخیره نرخ جدید
-            bot_instance.last_calculated_rate = base_rate
-            bot_instance.save_data()
-        
-        # ایجاد پیام نهایی
-        message = bot_instance.format_message(base_rate)
-        
-        # ارسال به گروه مقصد
-        if TARGET_GROUP_ID:
-            await application.bot.send_message(
-                chat_id=TARGET_GROUP_ID,
-                text=message
-            )
-            logger.info(f"پیام با موفقیت به گروه {TARGET_GROUP_ID} ارسال شد")
-            return f"✅ پیام با موفقیت ارسال شد!\n\n{message}"
-        else:
-            logger.warning("شناسه گروه مقصد تنظیم نشده است")
-            return f"⚠️ گروه مقصد تنظیم نشده، اما محاسبه انجام شد:\n\n{message}"
-        
-    except Exception as e:
-        error_msg = f"❌ خطا در فرآیند به‌روزرسانی: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        return error_msg
+    return describe_outcome(await read_source(application, force))
 
 
 async def scheduled_update(context: ContextTypes.DEFAULT_TYPE):
     """تابع برنامه‌ریزی شده برای اجرای خودکار"""
     logger.info("شروع به‌روزرسانی برنامه‌ریزی شده...")
     result = await fetch_and_calculate(context.application)
-    logger.info(f"نتیجه به‌روزرسانی: {result}")
+    logger.info("نتیجه به‌روزرسانی: %s", result)
+
+
+def _start_reminder(application: Application, settings: Settings):
+    global reminder_loop, reminder_task
+    reminder_loop = ReminderLoop(
+        application.bot, bot_instance, settings.target_group_id, skip_day=skip_closed_day,
+        refresh_rate=partial(refresh_yuan_rate, bot_instance),
+    )
+    reminder_task = asyncio.create_task(reminder_loop.run())
+    background_tasks.append(reminder_task)
+
+
+def _start_source_poll(application: Application):
+    """خواندن منبع با فاصله تطبیقی (adaptive_poll.py)"""
+    global source_poller, source_poll_task
+
+    async def poll() -> bool:
+        outcome = await read_source(application)
+        logger.info("نتیجه خواندن تطبیقی: %s", outcome.detail or outcome.status)
+        return outcome.status != FAILED
+
+    source_poller = AdaptivePoller(skip_day=skip_closed_day)
+    source_poll_task = asyncio.create_task(source_poller.run(poll, bot_instance.stats.ticks))
+    background_tasks.append(source_poll_task)
+
+
+def _stop_source_poll():
+    global source_poll_task
+    if source_poll_task is not None:
+        source_poll_task.cancel()
+        if source_poll_task in background_tasks:
+            background_tasks.remove(source_poll_task)
+    # آمار تصمیم‌ها (source_poller) تا رهبر شدن دوباره در /status می‌ماند
+    source_poll_task = None
+
+
+def _stop_reminder():
+    global reminder_loop, reminder_task
+    if reminder_task is not None:
+        reminder_task.cancel()
+        if reminder_task in background_tasks:
+            background_tasks.remove(reminder_task)
+    reminder_loop = reminder_task = None
+
+
+async def apply_settings(application: Application, old: Settings, new: Settings, changed: frozenset):
+    """
+    اعمال تنظیمات بارگذاری شده روی ربات در حال اجرا
+
+    مقصدهای خروجی در صورت نیاز دوباره ساخته و جایگزین می‌شوند؛ پیام‌های در صف
+    مقصدهای قبلی در outbox باقی می‌مانند و مقصدهای جدید آن‌ها را ارسال می‌کنند.
+    """
+    global sink_dispatcher
+
+    if 'bot_token' in changed:
+        logger.warning("تغییر BOT_TOKEN فقط پس از راه‌اندازی مجدد ربات اعمال می‌شود")
+
+    if not _leading():
+        # مقصدها و یادآوری نسخه follower هنگام رهبر شدن با تنظیمات جدید ساخته می‌شوند
+        publish_policy.configure(new)
+        bot_instance.bump_version()
+        return
+
+    if changed & SINK_SETTINGS:
+        sinks = build_sinks(application.bot, new.target_group_id, new)
+        previous, sink_dispatcher = sink_dispatcher, (
+            SinkDispatcher(sinks, outbox=publish_outbox) if sinks else None
+        )
+        if previous:
+            await previous.close()
+        if sink_dispatcher:
+            await sink_dispatcher.start()
+        logger.info("مقصدهای خروجی: %s", ', '.join(sink_dispatcher.names) if sink_dispatcher else 'هیچ')
+
+    enabled = new.reminder_enabled and new.target_group_id
+    if not enabled:
+        _stop_reminder()
+    elif reminder_loop is None:
+        _start_reminder(application, new)
+    elif any(name.startswith('reminder_') for name in changed) or changed & {'target_group_id', 'timezone'}:
+        reminder_loop.configure(new)
+
+    publish_policy.configure(new)
+    bot_instance.bump_version()
+
+
+def _leading() -> bool:
+    """آیا این نسخه رهبر است؟ (بدون LEADER_LEASE_FILE همیشه)"""
+    return elector is None or elector.is_leader
+
+
+async def _start_publishing(application: Application):
+    """مقصدهای خروجی و یادآوری (فقط در نسخه رهبر)"""
+    global sink_dispatcher
+    settings = config.current
+    sinks = build_sinks(application.bot, settings.target_group_id, settings)
+    if sinks:
+        sink_dispatcher = SinkDispatcher(sinks, outbox=publish_outbox)
+        await sink_dispatcher.start()
+    if settings.reminder_enabled and settings.target_group_id:
+        _start_reminder(application, settings)
+    if POLL_ADAPTIVE:
+        _start_source_poll(application)
+
+
+async def _stop_publishing():
+    global sink_dispatcher
+    _stop_source_poll()
+    _stop_reminder()
+    if sink_dispatcher:
+        await sink_dispatcher.close(timeout=SINK_TIMEOUT_SECONDS)
+        sink_dispatcher = None
+
+
+async def _on_elected(application: Application):
+    """رهبر شدن: وضعیت آخرین رهبر از data.json، سپس انتشار و دریافت پیام‌ها"""
+    bot_instance.reload_data()
+    bot_instance.read_only = False
+    await _start_publishing(application)
+    if application.updater and not application.updater.running:
+        await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+
+
+async def _on_demoted(application: Application):
+    bot_instance.read_only = True
+    if application.updater and application.updater.running:
+        await application.updater.stop()
+    await _stop_publishing()
+
+
+_standby_mtime: Optional[float] = None
+
+
+async def _on_follow():
+    """نسخه follower: وضعیت را با data.json رهبر همگام نگه می‌دارد"""
+    global _standby_mtime
+    try:
+        mtime = os.path.getmtime(bot_instance.data_file)
+    except (OSError, TypeError):
+        return
+    if mtime != _standby_mtime:
+        _standby_mtime = mtime
+        bot_instance.reload_data()
+
+
+async def post_init(application: Application):
+    """راه‌اندازی taskهای پس‌زمینه پس از آماده شدن ربات"""
+    global rate_api
+    
+    # با انتخاب رهبر، انتشار در _on_elected شروع می‌شود
+    if elector is None:
+        await _start_publishing(application)
+    await pricing_pipeline.start()
+    
+    if RATE_API_PORT:
+        rate_api = RateApi(bot_instance, PRICE_TIERS)
+        await rate_api.start()
+
+    # بارگذاری مجدد تنظیمات با SIGHUP یا تغییر فایل .env
+    config.subscribe(partial(apply_settings, application))
+    config.install_signal_handler()
+    background_tasks.append(asyncio.create_task(config.watch()))
+
+
+async def post_shutdown(application: Application):
+    """توقف taskهای پس‌زمینه"""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await pricing_pipeline.close()
+    if rate_api:
+        await rate_api.close()
+    await _stop_publishing()
+    await close_yuan_service()
+    await http_pool.close()
+
+
+async def run_standby(application: Application):
+    """
+    اجرای ربات با انتخاب رهبر (LEADER_LEASE_FILE)
+
+    همه نسخه‌ها اتصال‌ها، API محلی و وضعیت را گرم نگه می‌دارند؛ فقط رهبر
+    polling، یادآوری و انتشار را اجرا می‌کند و data.json را می‌نویسد.
+    """
+    global elector
+    bot_instance.read_only = True
+    elector = LeaderElector(
+        LeaseStore(LEADER_LEASE_FILE),
+        on_elected=partial(_on_elected, application),
+        on_demoted=partial(_on_demoted, application),
+        on_follow=_on_follow,
+    )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    await application.initialize()
+    await post_init(application)
+    await application.start()
+    heartbeat = asyncio.create_task(elector.run())
+    try:
+        await stop.wait()
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+        # رها کردن lease تا follower بلافاصله رهبر شود
+        await elector.resign()
+        await application.stop()
+        await application.shutdown()
+        await post_shutdown(application)
 
 
 def main():
     """تابع اصلی اجرای ربات"""
-    if not BOT_TOKEN:
+    settings = config.current
+    if not settings.bot_token:
         logger.error("BOT_TOKEN تنظیم نشده است!")
         print("❌ لطفاً فایل .env را با BOT_TOKEN مناسب ایجاد کنید.")
         return
@@ -425,8 +1164,13 @@ def main():
     # ایجاد اپلیکیشن بدون JobQueue (برای سازگاری با Python 3.13)
     application = (
         Application.builder()
-        .token(BOT_TOKEN)
+        .token(settings.bot_token)
+        # اتصال‌های Bot API از pool مشترک (http_pool.py)
+        .request(http_pool.bot_request())
+        .get_updates_request(http_pool.bot_request(1))
         .job_queue(None)  # غیرفعال کردن JobQueue
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .build()
     )
     
@@ -435,6 +1179,9 @@ def main():
     application.add_handler(CommandHandler("setrate", set_rate))
     application.add_handler(CommandHandler("getrate", get_rate))
     application.add_handler(CommandHandler("status", status))
+    application.add_handler(CommandHandler("stats", stats))
+    application.add_handler(CommandHandler("quote", quote))
+    application.add_handler(InlineQueryHandler(inline_quote))
     application.add_handler(CommandHandler("update", update_rate))
     
     logger.info("ربات شروع به کار کرد...")
@@ -444,9 +1191,15 @@ def main():
     print("  /setrate <نرخ> - تنظیم نرخ یوآن")
     print("  /getrate - نمایش نرخ فعلی")
     print("  /status - وضعیت ربات")
+    print("  /stats - آمار نوسان قیمت")
+    print("  /quote - قیمت کل برای مقدار یوآن (و حالت inline)")
     print("  /update - به‌روزرسانی دستی")
     
     # اجرای ربات
+    if LEADER_LEASE_FILE:
+        print(f"👥 حالت hot-standby: lease رهبری در {LEADER_LEASE_FILE}")
+        asyncio.run(run_standby(application))
+        return
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
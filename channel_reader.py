@@ -7,21 +7,19 @@
 
 from telethon.sync import TelegramClient
 from telethon.tl.functions.messages import GetHistoryRequest
-import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# باید از https://my.telegram.org دریافت کنید
-API_ID = os.getenv('TELEGRAM_API_ID')
-API_HASH = os.getenv('TELEGRAM_API_HASH')
-PHONE = os.getenv('TELEGRAM_PHONE')
+# session مشترک با auto_fetcher (API_ID و API_HASH از my.telegram.org)
+from telethon_session import create_client
+
 
 def read_channel_message(channel_username='tetherprice_toman'):
     """
     خواندن آخرین پیام از کانال عمومی
     """
-    with TelegramClient('session', API_ID, API_HASH) as client:
+    with create_client(TelegramClient) as client:
         # دریافت کانال
         channel = client.get_entity(channel_username)
         
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تنظیمات تایپ‌دار و قابل بارگذاری مجدد ربات
+
+همه تنظیمات اصلی (توکن، گروه مقصد، کانال منبع، منطقه زمانی، یادآوری و
+سیاست انتشار) یک بار در یک شیء Settings تغییرناپذیر خوانده و اعتبارسنجی می‌شوند.
+ماژول‌ها به جای os.getenv از config.current استفاده می‌کنند.
+
+بارگذاری مجدد بدون راه‌اندازی مجدد ربات:
+- ارسال SIGHUP به فرآیند (kill -HUP <pid>)
+- یا تغییر فایل .env (هر CONFIG_WATCH_SECONDS ثانیه بررسی می‌شود)
+
+در بارگذاری مجدد مقادیر فایل .env بر متغیرهای محیطی مقدم‌اند. Settings جدید با یک
+جایگزینی اتمی اعمال می‌شود و listenerها (sinks، یادآوری، سیاست انتشار) با
+تنظیمات قبلی و جدید فراخوانی می‌شوند. تنظیمات نامعتبر رد می‌شوند و تنظیمات
+فعلی بدون تغییر باقی می‌مانند.
+"""
+
+import os
+import re
+import signal
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, fields
+from datetime import time
+from typing import Callable, List, Mapping, Optional, Tuple
+
+import pytz
+from dotenv import dotenv_values
+
+from currencies import COMBINED, CurrencyPair, message_mode, parse_currencies
+
+logger = logging.getLogger(__name__)
+
+ENV_FILE = os.getenv('CONFIG_FILE', '.env')
+# فاصله بررسی تغییر فایل تنظیمات (ثانیه، 0 = غیرفعال)
+CONFIG_WATCH_SECONDS = float(os.getenv('CONFIG_WATCH_SECONDS', '30'))
+
+
+# منابع نرخ یوآن (yuan_rates.py)
+YUAN_PROVIDER_NAMES = frozenset({'manual', 'channel', 'http'})
+
+
+class ConfigError(ValueError):
+    """تنظیمات نامعتبر"""
+
+
+def parse_clock(value: str) -> time:
+    """تبدیل رشته HH:MM به time"""
+    hour, minute = value.split(':')
+    return time(int(hour), int(minute))
+
+
+def _flag(value: str) -> bool:
+    return value.strip().lower() not in ('0', 'false', 'no', 'off', '')
+
+
+def _chat(value: str) -> str:
+    value = value.strip()
+    if value and not (value.lstrip('-').isdigit() or value.startswith('@')):
+        raise ValueError("شناسه عددی یا @username لازم است")
+    return value
+
+
+def _chat_list(value: str) -> Tuple[str, ...]:
+    return tuple(_chat(item) for item in value.split(',') if item.strip())
+
+
+def _channel(value: str) -> str:
+    value = value.strip().lstrip('@')
+    if not value:
+        raise ValueError("نام کانال خالی است")
+    return value
+
+
+def _providers(value: str) -> Tuple[str, ...]:
+    names = tuple(item.strip().lower() for item in value.split(',') if item.strip())
+    unknown = set(names) - YUAN_PROVIDER_NAMES
+    if unknown:
+        raise ValueError(f"منبع ناشناخته: {', '.join(sorted(unknown))}")
+    return names
+
+
+def _pattern(value: str) -> str:
+    if re.compile(value).groups < 1:
+        raise ValueError("الگو باید یک گروه برای عدد داشته باشد")
+    return value
+
+
+def _timezone(value: str) -> str:
+    pytz.timezone(value.strip())
+    return value.strip()
+
+
+@dataclass(frozen=True)
+class Settings:
+    """تنظیمات اصلی ربات (تغییرناپذیر؛ هر بارگذاری یک نمونه جدید می‌سازد)"""
+
+    bot_token: str = ''
+    target_group_id: str = ''
+    # گروه‌های مقصد اضافه (حالت SHARD_WORKERS)
+    target_group_ids: Tuple[str, ...] = ()
+    source_channel: str = 'tetherprice_toman'
+    # کانال میانی برای خواندن
+    private_channel_id: str = ''
+    timezone: str = 'Asia/Tehran'
+
+    telegram_api_id: int = 0
+    telegram_api_hash: str = ''
+    telegram_phone: str = ''
+
+    webhook_url: str = ''
+    whatsapp_api_url: str = ''
+    whatsapp_group_id: str = ''
+
+    reminder_enabled: bool = True
+    reminder_start: time = time(10, 45)
+    reminder_end: time = time(19, 0)
+    reminder_interval_minutes: int = 15
+    reminder_escalate_after: int = 2
+    reminder_pin_after: int = 4
+
+    publish_min_delta: float = 0.0
+    publish_debounce_seconds: int = 300
+    publish_heartbeat_minutes: int = 180
+
+    # منابع نرخ یوآن به ترتیب اولویت (منابع تنظیم نشده نادیده گرفته می‌شوند)
+    yuan_providers: Tuple[str, ...] = ('manual', 'channel', 'http')
+    yuan_channel: str = ''
+    yuan_channel_pattern: str = r'یوآن\D{0,30}?(\d+(?:[.٫]\d+)?)'
+    yuan_http_url: str = ''
+    # مسیر نرخ در پاسخ JSON (مثلاً data.rate)
+    yuan_http_field: str = 'rate'
+
+    # جفت‌ارزهای اضافه بر یوآن (currencies.py) و حالت پیام آن‌ها
+    currencies: Tuple[CurrencyPair, ...] = ()
+    currency_messages: str = COMBINED
+
+    @property
+    def tz(self):
+        return pytz.timezone(self.timezone)
+
+
+# فیلد → (متغیر محیطی، تابع تبدیل)
+_SOURCES = {
+    'bot_token': ('BOT_TOKEN', str.strip),
+    'target_group_id': ('TARGET_GROUP_ID', _chat),
+    'target_group_ids': ('TARGET_GROUP_IDS', _chat_list),
+    'source_channel': ('SOURCE_CHANNEL', _channel),
+    'private_channel_id': ('PRIVATE_CHANNEL_ID', _chat),
+    'timezone': ('TIMEZONE', _timezone),
+    'telegram_api_id': ('TELEGRAM_API_ID', int),
+    'telegram_api_hash': ('TELEGRAM_API_HASH', str.strip),
+    'telegram_phone': ('TELEGRAM_PHONE', str.strip),
+    'webhook_url': ('WEBHOOK_URL', str.strip),
+    'whatsapp_api_url': ('WHATSAPP_API_URL', str.strip),
+    'whatsapp_group_id': ('WHATSAPP_GROUP_ID', str.strip),
+    'reminder_enabled': ('REMINDER_ENABLED', _flag),
+    'reminder_start': ('REMINDER_START', parse_clock),
+    'reminder_end': ('REMINDER_END', parse_clock),
+    'reminder_interval_minutes': ('REMINDER_INTERVAL_MINUTES', int),
+    'reminder_escalate_after': ('REMINDER_ESCALATE_AFTER', int),
+    'reminder_pin_after': ('REMINDER_PIN_AFTER', int),
+    'publish_min_delta': ('PUBLISH_MIN_DELTA', float),
+    'publish_debounce_seconds': ('PUBLISH_DEBOUNCE_SECONDS', int),
+    'publish_heartbeat_minutes': ('PUBLISH_HEARTBEAT_MINUTES', int),
+    'yuan_providers': ('YUAN_PROVIDERS', _providers),
+    'yuan_channel': ('YUAN_CHANNEL', _channel),
+    'yuan_channel_pattern': ('YUAN_CHANNEL_PATTERN', _pattern),
+    'yuan_http_url': ('YUAN_HTTP_URL', str.strip),
+    'yuan_http_field': ('YUAN_HTTP_FIELD', str.strip),
+    'currencies': ('CURRENCIES', parse_currencies),
+    'currency_messages': ('CURRENCY_MESSAGES', message_mode),
+}
+
+
+def settings_from_mapping(values: dict) -> Settings:
+    """ساخت Settings از دیکشنری متغیرهای محیطی با اعتبارسنجی"""
+    kwargs = {}
+    errors = []
+    for name, (env, convert) in _SOURCES.items():
+        raw = values.get(env)
+        if raw is None or (raw == '' and env != 'REMINDER_ENABLED'):
+            continue
+        try:
+            kwargs[name] = convert(raw)
+        except Exception as e:
+            errors.append(f"{env}={raw!r}: {e}")
+    settings = Settings(**kwargs)
+    if settings.reminder_interval_minutes <= 0:
+        errors.append("REMINDER_INTERVAL_MINUTES باید مثبت باشد")
+    if settings.reminder_start >= settings.reminder_end:
+        errors.append("REMINDER_START باید قبل از REMINDER_END باشد")
+    if errors:
+        raise ConfigError("تنظیمات نامعتبر: " + "؛ ".join(errors))
+    return settings
+
+
+def _file_values(env_file: Optional[str]) -> dict:
+    return {
+        key: value for key, value in (dotenv_values(env_file) if env_file else {}).items()
+        if value is not None
+    }
+
+
+def process_env(env_file: Optional[str] = ENV_FILE) -> dict:
+    """
+    متغیرهای محیطی واقعی فرآیند، بدون مقادیری که load_dotenv از فایل کپی کرده است
+
+    کلیدی که مقدارش با همان کلید فایل برابر است از فایل آمده در نظر گرفته می‌شود.
+    """
+    file_values = _file_values(env_file)
+    return {
+        key: value for key, value in os.environ.items()
+        if file_values.get(key) != value
+    }
+
+
+def load_settings(
+    env_file: Optional[str] = ENV_FILE,
+    file_first: bool = False,
+    env: Optional[Mapping[str, str]] = None,
+) -> Settings:
+    """
+    خواندن تنظیمات از محیط و فایل .env
+
+    file_first: مقادیر فایل بر متغیرهای محیطی مقدم باشند (برای بارگذاری مجدد)
+    env: متغیرهای محیطی (پیش‌فرض os.environ)؛ در بارگذاری مجدد محیط زمان شروع
+    بدون مقادیر فایل، تا کلید حذف شده از فایل از مقدار قدیمی load_dotenv خوانده نشود
+    """
+    file_values = _file_values(env_file)
+    env = os.environ if env is None else env
+    if file_first:
+        values = {**env, **file_values}
+    else:
+        values = {**file_values, **env}
+    return settings_from_mapping(values)
+
+
+def changed_fields(old: Settings, new: Settings) -> frozenset:
+    return frozenset(f.name for f in fields(Settings) if getattr(old, f.name) != getattr(new, f.name))
+
+
+# listener(old, new, changed) می‌تواند همگام یا async باشد
+Listener = Callable[[Settings, Settings, frozenset], object]
+
+
+class ConfigStore:
+    """نگهداری Settings فعلی و اعمال بارگذاری مجدد"""
+
+    def __init__(self, env_file: Optional[str] = ENV_FILE, settings: Optional[Settings] = None):
+        self.env_file = env_file
+        # محیط زمان شروع (قبل از load_dotenv) برای بارگذاری مجدد
+        self._startup_env = process_env(env_file)
+        self.current: Settings = settings or load_settings(env_file)
+        self._listeners: List[Listener] = []
+        self._mtime = self._file_mtime()
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.env_file) if self.env_file else None
+        except OSError:
+            return None
+
+    def subscribe(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    async def reload(self) -> frozenset:
+        """
+        بارگذاری مجدد و اعمال تغییرات؛ نام فیلدهای تغییر کرده برگردانده می‌شود
+        """
+        self._mtime = self._file_mtime()
+        try:
+            new = load_settings(self.env_file, file_first=True, env=self._startup_env)
+        except ConfigError as e:
+            logger.error("%s - تنظیمات فعلی حفظ شد", e)
+            return frozenset()
+
+        old = self.current
+        changed = changed_fields(old, new)
+        if not changed:
+            logger.info("بارگذاری مجدد تنظیمات: تغییری نبود")
+            return changed
+
+        self.current = new
+        logger.info("تنظیمات جدید اعمال شد: %s", ', '.join(sorted(changed)))
+        for listener in list(self._listeners):
+            try:
+                result = listener(old, new, changed)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error("خطا در اعمال تنظیمات جدید: %s", e, exc_info=True)
+        return changed
+
+    async def watch(self, interval: float = CONFIG_WATCH_SECONDS):
+        """بررسی دوره‌ای تغییر فایل تنظیمات"""
+        if not interval:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            if self._file_mtime() != self._mtime:
+                await self.reload()
+
+    def install_signal_handler(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> bool:
+        """بارگذاری مجدد با SIGHUP (در سیستم‌هایی که پشتیبانی می‌کنند)"""
+        loop = loop or asyncio.get_running_loop()
+        if not hasattr(signal, 'SIGHUP'):
+            return False
+        try:
+            loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(self.reload()))
+        except (NotImplementedError, RuntimeError):
+            return False
+        return True
+
+
+# تنظیمات مشترک فرآیند
+config = ConfigStore()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+جفت‌ارزهای قیمت‌گذاری شده با یک قیمت تتر
+
+یوآن (CNY) جفت اصلی است و همچنان با yuan_rate و last_calculated_rate ربات
+کار می‌کند. جفت‌های دیگر (مثلاً درهم، لیر و دلار) در CURRENCIES تعریف می‌شوند
+و هر کدام نرخ (چند واحد ارز به ازای هر تتر)، گام رند و سطوح قیمت خود را دارند:
+
+    CURRENCIES=AED=درهم|10|5000:300,20000:250,:200;USD=دلار|100|1000:900,:700
+
+هر ورودی: CODE=نام|گام رند|سطوح؛ هر سطح «سقف مقدار:افزایش» و سقف خالی
+یعنی سطح آخر. نرخ هر جفت با /setrate <کد> <نرخ> تنظیم می‌شود.
+
+هر قیمت تتر استخراج شده یک بار به تومان تبدیل و در یک محاسبه برای همه
+جفت‌ها قیمت‌گذاری می‌شود (price_pairs). پیام‌ها بسته به CURRENCY_MESSAGES
+یک پیام ترکیبی (combined) یا یک پیام برای هر ارز (separate) هستند.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+# حالت‌های ساخت پیام
+COMBINED = 'combined'
+SEPARATE = 'separate'
+MESSAGE_MODES = frozenset({COMBINED, SEPARATE})
+
+
+@dataclass(frozen=True)
+class CurrencyPair:
+    """یک جفت ارز: کد، نام فارسی، سطوح (عنوان، سقف، افزایش) و گام رند"""
+    code: str
+    name: str
+    tiers: Tuple[Tuple[str, Optional[int], float], ...]
+    step: int = 10
+
+    def base_rate(self, tether_price_toman: float, rate: float) -> float:
+        """نرخ مبنا: تومان هر تتر ÷ نرخ، رند به بالا به گام جفت"""
+        return float(math.ceil(tether_price_toman / rate / self.step) * self.step)
+
+    def tier_prices(self, base_rate: float) -> tuple:
+        """قیمت هر سطح (به همان دقتی که در پیام نمایش داده می‌شود)"""
+        return tuple(round(base_rate + markup) for _, _, markup in self.tiers)
+
+    def tier_lines(self, base_rate: float) -> str:
+        return '\n'.join(
+            f"{label} : {base_rate + markup:,.0f}" for label, _, markup in self.tiers
+        )
+
+
+def _amount(limit: int) -> str:
+    return f"{limit // 1000} هزار" if limit % 1000 == 0 else f"{limit:,}"
+
+
+def _tiers(value: str, name: str) -> tuple:
+    """تبدیل «5000:80,10000:70,:60» به سطوح با عنوان فارسی"""
+    tiers = []
+    previous = None
+    for index, item in enumerate((i for i in value.split(',') if i.strip()), 1):
+        if tiers and tiers[-1][1] is None:
+            raise ValueError("سطح بدون سقف باید آخرین سطح باشد")
+        limit, _, markup = item.partition(':')
+        limit = int(limit) if limit.strip() else None
+        if limit is None:
+            label = f"خرید بالای {_amount(previous)} {name}" if previous else f"خرید {name}"
+        elif previous is not None and limit <= previous:
+            raise ValueError("سقف سطوح باید صعودی باشد")
+        else:
+            label = f"خرید تا {_amount(limit)} {name}"
+            previous = limit
+        tiers.append((f"{index}️⃣ {label}", limit, float(markup)))
+    if not tiers:
+        raise ValueError("حداقل یک سطح لازم است")
+    return tuple(tiers)
+
+
+def parse_currencies(value: str) -> Tuple[CurrencyPair, ...]:
+    """تبدیل مقدار CURRENCIES به جفت‌ارزها (بدون جفت اصلی یوآن)"""
+    pairs = []
+    for entry in (e.strip() for e in value.split(';') if e.strip()):
+        code, _, spec = entry.partition('=')
+        code = code.strip().upper()
+        parts = [p.strip() for p in spec.split('|')]
+        if not code.isalpha() or len(parts) != 3 or not parts[0]:
+            raise ValueError(f"فرمت نادرست: {entry}")
+        if code == 'CNY' or code in (p.code for p in pairs):
+            raise ValueError(f"ارز تکراری: {code}")
+        step = int(parts[1] or 10)
+        if step <= 0:
+            raise ValueError(f"گام رند {code} باید مثبت باشد")
+        pairs.append(CurrencyPair(code, parts[0], _tiers(parts[2], parts[0]), step))
+    return tuple(pairs)
+
+
+def message_mode(value: str) -> str:
+    value = value.strip().lower()
+    if value not in MESSAGE_MODES:
+        raise ValueError(f"یکی از {', '.join(sorted(MESSAGE_MODES))}")
+    return value
+
+
+def price_pairs(
+    tether_price_rial: int, pairs: Iterable[CurrencyPair], rates: Dict[str, float],
+) -> Dict[str, float]:
+    """
+    قیمت‌گذاری یک قیمت تتر برای همه جفت‌ها در یک محاسبه
+
+    جفت‌هایی که نرخشان تنظیم نشده در نتیجه نیستند.
+    """
+    tether_price_toman = tether_price_rial / 10
+    return {
+        pair.code: pair.base_rate(tether_price_toman, rates[pair.code])
+        for pair in pairs if rates.get(pair.code)
+    }
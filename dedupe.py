@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+حذف پیام‌های تکراری منبع بر اساس شناسه و hash محتوا
+
+کانال‌های قیمت معمولاً همان پست را ویرایش می‌کنند و پیام جدید نمی‌فرستند. منابع
+(ChannelSource، BotApiSource) پیام‌های ویرایش شده را هم برمی‌گردانند و این
+کش تضمین می‌کند هر زوج (شناسه پیام، hash محتوا) فقط یک بار به
+extract_tether_price برسد: ویرایش واقعی (متن جدید) دوباره پردازش می‌شود و
+اجرای دوباره بدون تغییر هیچ کاری انجام نمی‌دهد.
+
+برای هر منبع حداکثر DEDUPE_CACHE_SIZE زوج اخیر (LRU) نگه داشته و در data.json
+ذخیره می‌شود.
+"""
+
+import os
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+DEDUPE_CACHE_SIZE = int(os.getenv('DEDUPE_CACHE_SIZE', '256'))
+
+
+def content_hash(text: Optional[str]) -> str:
+    """hash کوتاه متن پیام (فاصله‌های ابتدا و انتها نادیده گرفته می‌شوند)"""
+    return hashlib.sha1((text or '').strip().encode('utf-8')).hexdigest()[:16]
+
+
+class SeenCache:
+    """کش LRU زوج‌های (شناسه پیام، hash محتوا) برای هر منبع"""
+
+    def __init__(self, size: int = DEDUPE_CACHE_SIZE):
+        self.size = size
+        self._sources: Dict[str, OrderedDict] = {}
+        # زوج‌های در حال پردازش هر منبع (خوانده شده و هنوز mark نشده)
+        self._reserved: Dict[str, Set[str]] = {}
+        # تعداد پیام‌های تکراری کنار گذاشته شده
+        self.dropped = 0
+
+    @staticmethod
+    def _key(message) -> str:
+        return f"{message.id}:{content_hash(message.text)}"
+
+    def fresh(self, source: str, messages: Iterable) -> list:
+        """پیام‌هایی که این منبع قبلاً با همین محتوا پردازش نکرده (یا در حال پردازش ندارد)"""
+        seen = self._sources.get(source, {})
+        reserved = self._reserved.get(source, ())
+        result, keys = [], set()
+        for message in messages:
+            key = self._key(message)
+            if key in seen or key in keys or key in reserved:
+                self.dropped += 1
+                if key in seen:
+                    seen.move_to_end(key)
+                continue
+            keys.add(key)
+            result.append(message)
+        return result
+
+    def reserve(self, source: str, messages: Iterable):
+        """
+        رزرو پیام‌های خوانده شده تا mark یا release
+
+        خواندن همزمان همان منبع پیام‌های رزرو شده را دوباره برنمی‌گرداند.
+        """
+        self._reserved.setdefault(source, set()).update(self._key(m) for m in messages)
+
+    def release(self, source: str, messages: Iterable):
+        """آزاد کردن رزرو پیام‌هایی که پردازش آن‌ها بدون mark تمام شد"""
+        reserved = self._reserved.get(source)
+        if reserved:
+            reserved.difference_update(self._key(m) for m in messages)
+
+    def mark(self, source: str, messages: Iterable):
+        """ثبت پیام‌های پردازش شده (قدیمی‌ترین زوج‌ها بیرون می‌روند)"""
+        seen = self._sources.setdefault(source, OrderedDict())
+        reserved = self._reserved.get(source, set())
+        for message in messages:
+            key = self._key(message)
+            reserved.discard(key)
+            seen[key] = None
+            seen.move_to_end(key)
+        while len(seen) > self.size:
+            seen.popitem(last=False)
+
+    def export(self) -> Dict[str, List[str]]:
+        """زوج‌های هر منبع (قدیمی‌ترین اول) برای ذخیره در data.json"""
+        return {source: list(seen) for source, seen in self._sources.items()}
+
+    def restore(self, data: Optional[dict]):
+        """بازسازی کش از داده ذخیره شده"""
+        for source, keys in (data or {}).items():
+            seen = self._sources.setdefault(source, OrderedDict())
+            for key in keys[-self.size:]:
+                seen[key] = None
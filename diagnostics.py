@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+اجرای موازی بررسی‌های سلامت ربات (جایگزین اجرای ترتیبی test_all.py)
+
+بررسی‌های مستقل (اتصال ربات، session تلتون، دسترسی گروه، خواندن کانال و ...)
+همزمان و هر کدام با مهلت مخصوص خود اجرا می‌شوند؛ یک درخواست شبکه معلق فقط
+همان بررسی را ناموفق می‌کند و زمان اجرای هر بررسی در گزارش می‌آید.
+
+حالت آفلاین (--offline) به جای Bot API تلگرام یک سرور HTTP محلی و به جای
+Telethon یک کلاینت جایگزین با پیام نمونه کانال استفاده می‌کند؛ کل مجموعه
+بدون شبکه و در چند ثانیه اجرا می‌شود (مناسب CI).
+
+    python diagnostics.py              # بررسی واقعی (بدون ارسال به گروه)
+    python diagnostics.py --send       # همراه با ارسال یادآوری و پیام نرخ به گروه
+    python diagnostics.py --offline    # با جایگزین‌های محلی
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from dataclasses import dataclass, replace
+from datetime import datetime, time as clock_time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Awaitable, Callable, List, Optional
+from urllib.parse import parse_qs
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import config, Settings
+
+# مهلت پیش‌فرض هر بررسی (ثانیه)
+DIAG_TIMEOUT_SECONDS = float(os.getenv('DIAG_TIMEOUT_SECONDS', '20'))
+
+# پیام نمونه کانال منبع در حالت آفلاین
+OFFLINE_CHANNEL_TEXT = "💵 قیمت لحظه‌ای تتر\n🟢 خرید تتر : 1083140 ریال\n🔴 فروش تتر : 1083150 ریال"
+OFFLINE_YUAN_RATE = 7.12
+
+
+class DiagnosticError(Exception):
+    """نتیجه ناموفق یک بررسی (بدون traceback در گزارش)"""
+
+
+@dataclass
+class CheckResult:
+    name: str
+    title: str
+    ok: bool
+    seconds: float
+    detail: str = ''
+    skipped: bool = False
+
+
+class BotApiStandIn:
+    """
+    سرور HTTP محلی به جای api.telegram.org
+
+    فقط متدهایی که ربات و بررسی‌ها استفاده می‌کنند پیاده‌سازی شده‌اند؛
+    درخواست‌ها برای بررسی در تست‌ها در requests ثبت می‌شوند.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests: List[tuple] = []
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/bot"
+
+    def _result(self, method: str, params: dict):
+        user = {'id': 1000, 'is_bot': True, 'first_name': 'Offline Bot', 'username': 'offline_bot'}
+        chat_id = int(params.get('chat_id') or -1001)
+        chat = {'id': chat_id, 'type': 'supergroup', 'title': 'گروه آزمایشی'}
+        admin = {
+            'status': 'administrator', 'user': user, 'can_be_edited': False, 'is_anonymous': False,
+            'can_manage_chat': True, 'can_delete_messages': True, 'can_manage_video_chats': True,
+            'can_restrict_members': True, 'can_promote_members': False, 'can_change_info': True,
+            'can_invite_users': True, 'can_post_stories': False, 'can_edit_stories': False,
+            'can_delete_stories': False, 'can_pin_messages': True,
+        }
+        if method == 'getMe':
+            return user
+        if method == 'getChat':
+            return {**chat, 'accent_color_id': 0, 'max_reaction_count': 11}
+        if method == 'getChatMember':
+            return admin
+        if method == 'getChatAdministrators':
+            return [admin]
+        if method == 'sendMessage':
+            return {
+                'message_id': len(self.requests), 'date': int(time.time()),
+                'chat': chat, 'text': params.get('text', ''),
+            }
+        if method in ('pinChatMessage', 'unpinChatMessage'):
+            return True
+        return None
+
+    def __enter__(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive مثل api.telegram.org (پاسخ‌ها Content-Length دارند)
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                method = self.path.rsplit('/', 1)[-1]
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if 'json' in (self.headers.get('Content-Type') or ''):
+                    params = json.loads(body or b'{}')
+                else:
+                    params = {k: v[0] for k, v in parse_qs(body.decode('utf-8')).items()}
+                stand_in.requests.append((method, params))
+                if stand_in.delay:
+                    time.sleep(stand_in.delay)
+                result = stand_in._result(method, params)
+                if result is None:
+                    payload = {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+                else:
+                    payload = {'ok': True, 'result': result}
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def offline_client_factory(text: str = OFFLINE_CHANNEL_TEXT) -> Callable:
+    """کلاینت جایگزین Telethon با یک پیام نمونه در کانال منبع"""
+    from replay import FakeTelethonClient, RecordedPost, VirtualClock
+
+    posted = datetime.now(config.current.tz)
+    posts = [RecordedPost(date=posted, text=text, id=1)]
+
+    class OfflineTelethonClient(FakeTelethonClient):
+        async def connect(self):
+            pass
+
+        async def start(self, phone=None):
+            pass
+
+        async def disconnect(self):
+            pass
+
+        async def is_user_authorized(self):
+            return True
+
+        async def get_me(self):
+            return SimpleNamespace(id=2000, first_name='Offline', last_name='User', username='offline_user')
+
+    return lambda: OfflineTelethonClient(posts, VirtualClock(posted))
+
+
+class DiagnosticsContext:
+    """منابع مشترک بررسی‌ها (یک Bot و یک اتصال Telethon برای همه)"""
+
+    def __init__(
+        self,
+        settings: Settings,
+        offline: bool = False,
+        send: bool = False,
+        bot_base_url: Optional[str] = None,
+        client_factory: Optional[Callable] = None,
+    ):
+        self.settings = settings
+        self.offline = offline
+        self.send = send
+        self.bot_base_url = bot_base_url
+        self.client_factory = client_factory
+        self._bot = None
+        self._client = None
+        # قفل جدا: اتصال معلق Telethon بررسی‌های ربات را معطل نمی‌کند
+        self._bot_lock = asyncio.Lock()
+        self._client_lock = asyncio.Lock()
+
+    async def bot(self):
+        async with self._bot_lock:
+            if self._bot is None:
+                from http_pool import pool
+
+                if not self.settings.bot_token:
+                    raise DiagnosticError("BOT_TOKEN تنظیم نشده است")
+                options = {'base_url': self.bot_base_url} if self.bot_base_url else {}
+                bot = pool.create_bot(self.settings.bot_token, **options)
+                await bot.initialize()
+                self._bot = bot
+            return self._bot
+
+    async def client(self):
+        async with self._client_lock:
+            if self._client is None:
+                settings = self.settings
+                if not all([settings.telegram_api_id, settings.telegram_api_hash, settings.telegram_phone]):
+                    raise DiagnosticError("تنظیمات Telethon ناقص است")
+                if self.client_factory:
+                    client = self.client_factory()
+                else:
+                    from telethon_session import create_client
+                    client = create_client()
+                await client.connect()
+                self._client = client
+            return self._client
+
+    async def close(self):
+        if self._bot is not None:
+            await self._bot.shutdown()
+        if self._client is not None:
+            await self._client.disconnect()
+
+
+def _mask(value: str, head: int, tail: int) -> str:
+    return f"{value[:head]}...{value[-tail:]}" if len(value) > head + tail else value
+
+
+def _state(ctx: DiagnosticsContext):
+    """نمونه TetherBot بدون ذخیره‌سازی با نرخ یوآن فعلی (یا نمونه در حالت آفلاین)"""
+    from bot import TetherBot
+
+    state = TetherBot(data_file=None)
+    if ctx.offline:
+        state.yuan_rate = OFFLINE_YUAN_RATE
+    else:
+        from bot import bot_instance
+        state.yuan_rate = bot_instance.yuan_rate
+    return state
+
+
+async def check_env(ctx: DiagnosticsContext) -> str:
+    settings = ctx.settings
+    values = {
+        'BOT_TOKEN': _mask(settings.bot_token, 10, 10),
+        'TARGET_GROUP_ID': settings.target_group_id,
+        'TELEGRAM_API_ID': str(settings.telegram_api_id or ''),
+        'TELEGRAM_API_HASH': _mask(settings.telegram_api_hash, 8, 4),
+        'TELEGRAM_PHONE': _mask(settings.telegram_phone, 4, 4),
+    }
+    missing = [name for name, value in values.items() if not value]
+    if missing:
+        raise DiagnosticError(f"تنظیم نشده: {', '.join(missing)}")
+    return '\n'.join(f"{name}: {value}" for name, value in values.items())
+
+
+async def check_files(ctx: DiagnosticsContext) -> str:
+    required = ['bot.py', 'auto_fetcher.py', 'reminder.py', 'requirements.txt']
+    if not ctx.offline:
+        required.append('.env')
+    missing = [name for name in required if not os.path.exists(name)]
+    if not ctx.offline:
+        from telethon_session import load_session_string
+        if not load_session_string() and not os.path.exists('user_session.session'):
+            missing.append('TELETHON_SESSION_STRING / user_session.session')
+    if missing:
+        raise DiagnosticError(f"وجود ندارد: {', '.join(missing)}")
+    return ', '.join(required)
+
+
+async def check_bot_connection(ctx: DiagnosticsContext) -> str:
+    bot = await ctx.bot()
+    me = await bot.get_me()
+    return f"@{me.username} ({me.first_name}، شناسه {me.id})"
+
+
+async def check_telethon_session(ctx: DiagnosticsContext) -> str:
+    client = await ctx.client()
+    if not await client.is_user_authorized():
+        raise DiagnosticError("Session معتبر نیست - نیاز به ورود دوباره")
+    me = await client.get_me()
+    return f"{me.first_name} {me.last_name or ''} (@{me.username or 'ندارد'})".strip()
+
+
+async def check_group_access(ctx: DiagnosticsContext) -> str:
+    group_id = ctx.settings.target_group_id
+    if not group_id:
+        raise DiagnosticError("TARGET_GROUP_ID تنظیم نشده")
+    bot = await ctx.bot()
+    chat, member = await asyncio.gather(
+        bot.get_chat(chat_id=group_id),
+        bot.get_chat_member(chat_id=group_id, user_id=bot.id),
+    )
+    detail = f"{chat.title} ({chat.type}) - وضعیت ربات: {member.status}"
+    if member.status == 'member':
+        detail += "\n⚠️ ربات عضو عادی است (بهتر است ادمین باشد)"
+    return detail
+
+
+async def check_channel_read(ctx: DiagnosticsContext) -> str:
+    from auto_fetcher import fetch_new_messages
+
+    client = await ctx.client()
+    messages = await fetch_new_messages(client, ctx.settings.source_channel)
+    if not messages or not messages[0].text:
+        raise DiagnosticError(f"پیامی از @{ctx.settings.source_channel} خوانده نشد")
+    text = messages[0].text
+    price = _state(ctx).extract_tether_price(text)
+    detail = f"@{ctx.settings.source_channel}: {len(text)} کاراکتر"
+    if price:
+        return f"{detail}، قیمت فروش تتر {price:,} ریال"
+    return f"{detail}\n⚠️ قیمت فروش تتر در آخرین پیام یافت نشد"
+
+
+async def check_calculation(ctx: DiagnosticsContext) -> str:
+    state = _state(ctx)
+    if not state.yuan_rate:
+        return "⚠️ نرخ یوآن تنظیم نشده - از دستور /setrate استفاده کنید"
+    base_rate = state.calculate_base_rate(1_083_150)
+    if not base_rate:
+        raise DiagnosticError("محاسبه نرخ مبنا ناموفق بود")
+    state.format_message(base_rate)
+    return f"نرخ یوآن {state.yuan_rate} → نرخ مبنا {base_rate:,.0f} تومان"
+
+
+async def check_reminder(ctx: DiagnosticsContext) -> str:
+    from reminder import ReminderLoop
+
+    bot = await ctx.bot()
+    loop = ReminderLoop(
+        bot, _state(ctx), ctx.settings.target_group_id,
+        start=clock_time(0, 0), end=clock_time(23, 59), tz=ctx.settings.tz,
+    )
+    loop.state.yuan_rate = None
+    if not await loop.send_due_reminder(datetime.now(ctx.settings.tz)):
+        raise DiagnosticError("یادآوری ارسال نشد")
+    return f"یادآوری به {ctx.settings.target_group_id} ارسال شد"
+
+
+async def check_auto_update(ctx: DiagnosticsContext) -> str:
+    from auto_fetcher import fetch_new_messages
+
+    state = _state(ctx)
+    if not state.yuan_rate:
+        raise DiagnosticError("نرخ یوآن تنظیم نشده است")
+    client, bot = await asyncio.gather(ctx.client(), ctx.bot())
+    messages = await fetch_new_messages(client, ctx.settings.source_channel)
+    price = state.extract_tether_price(messages[0].text if messages else '')
+    if not price:
+        raise DiagnosticError("قیمت تتر در آخرین پیام کانال یافت نشد")
+    base_rate = state.calculate_base_rate(price)
+    message = state.format_message(base_rate)
+    await bot.send_message(chat_id=ctx.settings.target_group_id, text=message)
+    return f"پیام نرخ {base_rate:,.0f} تومان ارسال شد"
+
+
+@dataclass
+class Check:
+    name: str
+    title: str
+    run: Callable[[DiagnosticsContext], Awaitable[str]]
+    # ارسال پیام به گروه (فقط با --send یا در حالت آفلاین)
+    sends: bool = False
+    timeout: Optional[float] = None
+
+
+CHECKS = (
+    Check('env', 'متغیرهای محیطی', check_env),
+    Check('files', 'فایل‌های پروژه', check_files),
+    Check('bot', 'اتصال ربات', check_bot_connection),
+    Check('telethon', 'Telethon Session', check_telethon_session),
+    Check('group', 'دسترسی به گروه', check_group_access),
+    Check('channel', 'خواندن از کانال', check_channel_read),
+    Check('calculation', 'محاسبات', check_calculation),
+    Check('reminder', 'ارسال یادآوری', check_reminder, sends=True),
+    Check('auto_update', 'به‌روزرسانی خودکار', check_auto_update, sends=True),
+)
+
+
+async def _run_check(check: Check, ctx: DiagnosticsContext, timeout: float, report=None) -> CheckResult:
+    if check.sends and not (ctx.send or ctx.offline):
+        result = CheckResult(check.name, check.title, True, 0.0, "رد شد (برای ارسال به گروه --send)", skipped=True)
+    else:
+        started = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(check.run(ctx), check.timeout or timeout)
+            ok = True
+        except asyncio.TimeoutError:
+            ok, detail = False, f"پس از {check.timeout or timeout:g} ثانیه پاسخی نیامد"
+        except DiagnosticError as e:
+            ok, detail = False, str(e)
+        except Exception as e:
+            ok, detail = False, f"{type(e).__name__}: {e}"
+        result = CheckResult(check.name, check.title, ok, time.perf_counter() - started, detail)
+    if report:
+        report(result)
+    return result
+
+
+async def run_diagnostics(
+    checks=CHECKS,
+    settings: Optional[Settings] = None,
+    offline: bool = False,
+    send: bool = False,
+    timeout: float = DIAG_TIMEOUT_SECONDS,
+    report: Optional[Callable[[CheckResult], None]] = None,
+) -> List[CheckResult]:
+    """
+    اجرای همزمان بررسی‌ها؛ نتایج به ترتیب checks برگردانده می‌شوند
+
+    report: برای نمایش هر نتیجه به محض پایان بررسی
+    """
+    # import ماژول‌های ربات قبل از شروع زمان‌سنجی بررسی‌ها
+    import auto_fetcher, reminder  # noqa: F401
+
+    settings = settings or config.current
+    if not offline:
+        ctx = DiagnosticsContext(settings, send=send)
+        try:
+            return list(await asyncio.gather(*(_run_check(c, ctx, timeout, report) for c in checks)))
+        finally:
+            await ctx.close()
+
+    settings = replace(
+        settings,
+        bot_token='123456:offline', target_group_id='-1001',
+        telegram_api_id=1, telegram_api_hash='offline', telegram_phone='+10000000000',
+    )
+    with BotApiStandIn() as api:
+        ctx = DiagnosticsContext(
+            settings, offline=True, bot_base_url=api.base_url, client_factory=offline_client_factory()
+        )
+        try:
+            return list(await asyncio.gather(*(_run_check(c, ctx, timeout, report) for c in checks)))
+        finally:
+            await ctx.close()
+
+
+def _print_result(result: CheckResult):
+    status = "⏭️" if result.skipped else "✅" if result.ok else "❌"
+    print(f"{status} {result.title} ({result.seconds:.2f}s)")
+
+
+def print_summary(results: List[CheckResult], elapsed: float):
+    print("\n" + "=" * 60)
+    print("  📊 خلاصه نتایج")
+    print("=" * 60)
+    for result in results:
+        status = "⏭️" if result.skipped else "✅" if result.ok else "❌"
+        print(f"\n{status} {result.title:<22} {result.seconds:>7.2f}s")
+        for line in result.detail.splitlines():
+            print(f"   {line}")
+    passed = sum(1 for r in results if r.ok)
+    print(f"\n{'=' * 60}")
+    print(f"  موفق: {passed}/{len(results)}   زمان کل: {elapsed:.2f}s "
+          f"(مجموع بررسی‌ها: {sum(r.seconds for r in results):.2f}s)")
+    print(f"{'=' * 60}\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="بررسی سلامت ربات")
+    parser.add_argument('--offline', action='store_true',
+                        help="استفاده از جایگزین‌های محلی به جای تلگرام (بدون شبکه)")
+    parser.add_argument('--send', action='store_true',
+                        help="اجرای بررسی‌هایی که به گروه پیام می‌فرستند")
+    parser.add_argument('--timeout', type=float, default=DIAG_TIMEOUT_SECONDS,
+                        help="مهلت هر بررسی (ثانیه)")
+    parser.add_argument('--only', default='',
+                        help="فقط بررسی‌های نام برده (با کاما جدا شده): " + ', '.join(c.name for c in CHECKS))
+    args = parser.parse_args(argv)
+
+    checks = CHECKS
+    if args.only:
+        names = {name.strip() for name in args.only.split(',')}
+        checks = tuple(c for c in CHECKS if c.name in names)
+
+    print("🚀 بررسی سلامت ربات" + (" (آفلاین)" if args.offline else "") + "\n")
+    started = time.perf_counter()
+    results = asyncio.run(run_diagnostics(
+        checks, offline=args.offline, send=args.send, timeout=args.timeout, report=_print_result
+    ))
+    print_summary(results, time.perf_counter() - started)
+    return 0 if all(r.ok for r in results) else 1
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n\n⚠️  بررسی توسط کاربر لغو شد.")
+        sys.exit(1)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+کلاینت HTTP مشترک با pool اتصال و keep-alive
+
+همه درخواست‌های HTTP فرآیند (Bot API در bot.py، auto_fetcher.py، reminder.py و
+diagnostics.py، مقصدهای webhook/واتساپ و منبع HTTP نرخ یوآن) از این pool ساخته
+می‌شوند تا اتصال TCP/TLS بین ارسال‌ها دوباره استفاده شود و با close بسته شود.
+
+تنظیمات:
+- HTTP_POOL_SIZE: حداکثر اتصال همزمان (و اتصال keep-alive) هر کلاینت
+- HTTP_KEEPALIVE_SECONDS: مدت نگهداری اتصال بیکار
+- HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT / HTTP_WRITE_TIMEOUT / HTTP_POOL_TIMEOUT
+- HTTP2=1: استفاده از HTTP/2 (نیاز به بسته h2: pip install "httpx[http2]")
+
+تعداد درخواست‌ها و اتصال‌های جدید (و در نتیجه نسبت بازاستفاده) در PoolStats
+شمرده، هنگام close لاگ و در /status نمایش داده می‌شود.
+"""
+
+import os
+import asyncio
+import logging
+import importlib.util
+from typing import List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '16'))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv('HTTP_KEEPALIVE_SECONDS', '60'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+HTTP_WRITE_TIMEOUT = float(os.getenv('HTTP_WRITE_TIMEOUT', '10'))
+HTTP_POOL_TIMEOUT = float(os.getenv('HTTP_POOL_TIMEOUT', '5'))
+HTTP2 = os.getenv('HTTP2', '0').strip().lower() not in ('0', 'false', 'no', 'off', '')
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec('h2') is not None
+
+
+class PoolStats:
+    """شمارش درخواست‌ها و اتصال‌های جدید (از طریق trace در httpcore)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    async def on_request(self, request: httpx.Request):
+        self.requests += 1
+        request.extensions['trace'] = self._trace
+
+    async def _trace(self, event: str, info: dict):
+        if event == 'connection.connect_tcp.complete':
+            self.connections += 1
+        elif event == 'connection.start_tls.complete':
+            self.tls_handshakes += 1
+
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.connections, 0)
+
+    def summary(self) -> dict:
+        return {
+            'requests': self.requests,
+            'connections': self.connections,
+            'tls_handshakes': self.tls_handshakes,
+            'reused': self.reused,
+            'reuse_ratio': self.reused / self.requests if self.requests else 0.0,
+        }
+
+
+class HttpPool:
+    """
+    سازنده کلاینت‌های HTTP با تنظیمات مشترک
+
+    client(): کلاینت httpx مشترک (برای هر event loop یکی)
+    bot_request(): درخواست‌دهنده python-telegram-bot روی همان تنظیمات
+    create_bot(): ربات Bot API با pool اتصال (هر دو درخواست‌دهنده آن)
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        keepalive: float = HTTP_KEEPALIVE_SECONDS,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        write_timeout: float = HTTP_WRITE_TIMEOUT,
+        pool_timeout: float = HTTP_POOL_TIMEOUT,
+        http2: bool = HTTP2,
+    ):
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.pool_timeout = pool_timeout
+        if http2 and not http2_available():
+            logger.warning("HTTP2=1 اما بسته h2 نصب نیست؛ از HTTP/1.1 استفاده می‌شود")
+            http2 = False
+        self.http2 = http2
+        self.stats = PoolStats()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._requests: List = []
+
+    def limits(self, pool_size: Optional[int] = None) -> httpx.Limits:
+        size = pool_size or self.pool_size
+        return httpx.Limits(
+            max_connections=size, max_keepalive_connections=size, keepalive_expiry=self.keepalive,
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout, read=self.read_timeout,
+            write=self.write_timeout, pool=self.pool_timeout,
+        )
+
+    def client(self) -> httpx.AsyncClient:
+        """کلاینت مشترک؛ کلاینت event loop قبلی (مثلاً در تست‌ها) کنار گذاشته می‌شود"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                limits=self.limits(), timeout=self.timeout(), http2=self.http2,
+                event_hooks={'request': [self.stats.on_request]},
+            )
+            self._client_loop = loop
+        return self._client
+
+    def bot_request(self, pool_size: Optional[int] = None):
+        """درخواست‌دهنده HTTPXRequest با همین pool، مهلت‌ها و شمارنده‌ها"""
+        from telegram.request import HTTPXRequest
+
+        size = pool_size or self.pool_size
+        request = HTTPXRequest(
+            connection_pool_size=size,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            write_timeout=self.write_timeout,
+            pool_timeout=self.pool_timeout,
+            http_version='2' if self.http2 else '1.1',
+            httpx_kwargs={
+                'limits': self.limits(size),
+                'event_hooks': {'request': [self.stats.on_request]},
+            },
+        )
+        self._requests.append(request)
+        return request
+
+    def create_bot(self, token: str, **options):
+        """Bot با pool اتصال (getUpdates یک اتصال جداگانه دارد)"""
+        from telegram import Bot
+
+        return Bot(
+            token, request=self.bot_request(), get_updates_request=self.bot_request(1), **options,
+        )
+
+    async def close(self):
+        """بستن همه اتصال‌ها و لاگ آمار بازاستفاده"""
+        requests, self._requests = self._requests, []
+        for request in requests:
+            try:
+                await request.shutdown()
+            except Exception as e:
+                logger.debug("خطا در بستن درخواست‌دهنده Bot API: %s", e)
+        if self._client is not None and self._client_loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = self._client_loop = None
+        self.log_stats()
+
+    def log_stats(self):
+        summary = self.stats.summary()
+        if summary['requests']:
+            logger.info(
+                "🔌 HTTP: %d درخواست، %d اتصال جدید، %.0f%% بازاستفاده از اتصال",
+                summary['requests'], summary['connections'], summary['reuse_ratio'] * 100,
+            )
+
+
+# pool مشترک فرآیند
+pool = HttpPool()
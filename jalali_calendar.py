@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+جدول از پیش محاسبه شده تقویم شمسی، نام روزها و تعطیلات رسمی
+
+برای بازه‌ای از سال‌ها (CALENDAR_FIRST_YEAR تا CALENDAR_LAST_YEAR میلادی)
+معادل شمسی هر روز و پرچم تعطیلی آن یک بار در آرایه‌های فشرده محاسبه می‌شود؛
+ساخت سربرگ تاریخ پیام و بررسی روز تعطیل فقط یک جستجو در جدول است.
+
+تعطیلات:
+- تعطیلات ثابت شمسی (نوروز، ۱۲ و ۱۳ فروردین، ۱۴ و ۱۵ خرداد، ۲۲ بهمن، ۲۹ اسفند)
+- تعطیلات قمری با تقویم هجری جدولی محاسبه می‌شوند و ممکن است یک روز با
+  اعلام رسمی اختلاف داشته باشند؛ با HIJRI_OFFSET یا فایل HOLIDAYS_FILE
+  (JSON: {"add": ["1404/03/16"], "remove": ["1404/03/15"]}) قابل اصلاح‌اند.
+- روزهای هفته CALENDAR_CLOSED_WEEKDAYS (پیش‌فرض جمعه) بازار تعطیل است.
+"""
+
+import os
+import json
+import logging
+from array import array
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+import jdatetime  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_FIRST_YEAR = int(os.getenv('CALENDAR_FIRST_YEAR', '2020'))
+CALENDAR_LAST_YEAR = int(os.getenv('CALENDAR_LAST_YEAR', '2035'))
+# شماره روزهای تعطیل هفته (دوشنبه=0 ... جمعه=4)
+CALENDAR_CLOSED_WEEKDAYS = tuple(
+    int(d) for d in os.getenv('CALENDAR_CLOSED_WEEKDAYS', '4').split(',') if d.strip()
+)
+# جابه‌جایی تقویم قمری نسبت به محاسبه جدولی (روز)
+HIJRI_OFFSET = int(os.getenv('HIJRI_OFFSET', '0'))
+HOLIDAYS_FILE = os.getenv('HOLIDAYS_FILE', 'holidays.json')
+# رد شدن از انتشار و یادآوری در روزهای تعطیل
+CALENDAR_SKIP_CLOSED_DAYS = os.getenv('CALENDAR_SKIP_CLOSED_DAYS', 'true').lower() == 'true'
+
+# نام روزها به ترتیب date.weekday() (دوشنبه=0)
+PERSIAN_WEEKDAYS = ('دوشنبه', 'سه‌شنبه', 'چهارشنبه', 'پنج‌شنبه', 'جمعه', 'شنبه', 'یکشنبه')
+
+# (ماه، روز) شمسی → عنوان
+SOLAR_HOLIDAYS = {
+    (1, 1): 'نوروز', (1, 2): 'نوروز', (1, 3): 'نوروز', (1, 4): 'نوروز',
+    (1, 12): 'روز جمهوری اسلامی', (1, 13): 'روز طبیعت',
+    (3, 14): 'رحلت امام خمینی', (3, 15): 'قیام ۱۵ خرداد',
+    (11, 22): 'پیروزی انقلاب اسلامی', (12, 29): 'ملی شدن صنعت نفت',
+}
+
+# (ماه، روز) قمری → عنوان؛ روز 0 یعنی آخرین روز ماه
+LUNAR_HOLIDAYS = {
+    (1, 9): 'تاسوعا', (1, 10): 'عاشورا',
+    (2, 20): 'اربعین', (2, 28): 'رحلت پیامبر و شهادت امام حسن', (2, 0): 'شهادت امام رضا',
+    (3, 8): 'شهادت امام حسن عسکری', (3, 17): 'میلاد پیامبر',
+    (6, 3): 'شهادت حضرت فاطمه',
+    (7, 13): 'ولادت امام علی', (7, 27): 'مبعث',
+    (8, 15): 'ولادت امام زمان',
+    (9, 21): 'شهادت امام علی',
+    (10, 1): 'عید فطر', (10, 2): 'عید فطر', (10, 25): 'شهادت امام صادق',
+    (12, 10): 'عید قربان', (12, 18): 'عید غدیر',
+}
+
+_MANUAL_HOLIDAY = 'تعطیل رسمی'
+
+
+def hijri_from_date(day: date) -> Tuple[int, int, int]:
+    """تبدیل تاریخ میلادی به قمری (تقویم هجری جدولی)"""
+    l = day.toordinal() + 1721425 - 1948440 + 10632
+    n = (l - 1) // 10631
+    l = l - 10631 * n + 354
+    j = ((10985 - l) // 5316) * ((50 * l) // 17719) + (l // 5670) * ((43 * l) // 15238)
+    l = l - ((30 - j) // 15) * ((17719 * j) // 50) - (j // 16) * ((15238 * j) // 43) + 29
+    month = (24 * l) // 709
+    return 30 * n + j - 30, month, l - (709 * month) // 24
+
+
+def _parse_jalali(value: str) -> Tuple[int, int, int]:
+    year, month, day = (int(part) for part in value.replace('-', '/').split('/'))
+    return year, month, day
+
+
+class JalaliCalendar:
+    """جدول روزهای یک بازه سال میلادی"""
+
+    def __init__(
+        self,
+        first_year: int = CALENDAR_FIRST_YEAR,
+        last_year: int = CALENDAR_LAST_YEAR,
+        closed_weekdays: Iterable[int] = CALENDAR_CLOSED_WEEKDAYS,
+        hijri_offset: int = HIJRI_OFFSET,
+        add: Iterable[str] = (),
+        remove: Iterable[str] = (),
+    ):
+        self.first = date(first_year, 1, 1)
+        self.last = date(last_year, 12, 31)
+        self.closed_weekdays = frozenset(closed_weekdays)
+        size = (self.last - self.first).days + 1
+
+        self._jy = array('H', bytes(2 * size))
+        self._jm = bytearray(size)
+        self._jd = bytearray(size)
+        # اندیس عنوان تعطیلی در self._names (0 = روز عادی)
+        self._holiday = bytearray(size)
+        self._names = ['']
+
+        self._fill_jalali(size)
+        self._fill_holidays(size, hijri_offset)
+        for value in add:
+            self._set_manual(value, _MANUAL_HOLIDAY)
+        for value in remove:
+            self._set_manual(value, None)
+
+    def _fill_jalali(self, size: int):
+        start = jdatetime.date.fromgregorian(date=self.first)
+        year, month, day = start.year, start.month, start.day
+        leap = jdatetime.date(year, 1, 1).isleap()
+        for i in range(size):
+            self._jy[i], self._jm[i], self._jd[i] = year, month, day
+            length = 31 if month <= 6 else 30 if month <= 11 else 30 if leap else 29
+            day += 1
+            if day > length:
+                day = 1
+                month += 1
+                if month > 12:
+                    month = 1
+                    year += 1
+                    leap = jdatetime.date(year, 1, 1).isleap()
+
+    def _name_index(self, name: str) -> int:
+        if name not in self._names:
+            self._names.append(name)
+        return self._names.index(name)
+
+    def _fill_holidays(self, size: int, hijri_offset: int):
+        lunar = [
+            hijri_from_date(self.first + timedelta(days=i - hijri_offset))
+            for i in range(size + 1)
+        ]
+        for i in range(size):
+            name = SOLAR_HOLIDAYS.get((self._jm[i], self._jd[i]))
+            _, month, day = lunar[i]
+            last_of_month = lunar[i + 1][1] != month
+            name = name or LUNAR_HOLIDAYS.get((month, day)) or (
+                LUNAR_HOLIDAYS.get((month, 0)) if last_of_month else None
+            )
+            if name:
+                self._holiday[i] = self._name_index(name)
+
+    def _set_manual(self, value: str, name: Optional[str]):
+        try:
+            j = jdatetime.date(*_parse_jalali(value))
+        except (TypeError, ValueError):
+            logger.warning("تاریخ تعطیلی نامعتبر: %s", value)
+            return
+        index = self._index(j.togregorian())
+        if index is not None:
+            self._holiday[index] = self._name_index(name) if name else 0
+
+    def _index(self, day: date) -> Optional[int]:
+        if self.first <= day <= self.last:
+            return (day - self.first).days
+        return None
+
+    def jalali(self, day: date) -> Tuple[int, int, int]:
+        """(سال، ماه، روز) شمسی"""
+        index = self._index(day)
+        if index is None:
+            j = jdatetime.date.fromgregorian(date=day)
+            return j.year, j.month, j.day
+        return self._jy[index], self._jm[index], self._jd[index]
+
+    def jalali_str(self, day: date) -> str:
+        """تاریخ شمسی به صورت 1404/08/19"""
+        return '%04d/%02d/%02d' % self.jalali(day)
+
+    @staticmethod
+    def weekday_name(day: date) -> str:
+        return PERSIAN_WEEKDAYS[day.weekday()]
+
+    def holiday_name(self, day: date) -> Optional[str]:
+        """عنوان تعطیلی رسمی (None برای روز عادی یا خارج از بازه جدول)"""
+        index = self._index(day)
+        if index is None or not self._holiday[index]:
+            return None
+        return self._names[self._holiday[index]]
+
+    def is_closed(self, day: date) -> bool:
+        """آیا بازار در این روز تعطیل است؟ (تعطیل هفتگی یا رسمی)"""
+        return day.weekday() in self.closed_weekdays or self.holiday_name(day) is not None
+
+    def closed_reason(self, day: date) -> Optional[str]:
+        """دلیل تعطیلی برای لاگ و پاسخ به کاربر"""
+        name = self.holiday_name(day)
+        if name:
+            return name
+        if day.weekday() in self.closed_weekdays:
+            return f"تعطیلی {self.weekday_name(day)}"
+        return None
+
+    def next_open_day(self, day: date) -> date:
+        """اولین روز کاری از day به بعد"""
+        for _ in range(60):
+            if not self.is_closed(day):
+                return day
+            day += timedelta(days=1)
+        return day
+
+
+def _load_overrides(path: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error("خطا در خواندن %s: %s", path, e)
+        return {}
+
+
+@lru_cache(maxsize=1)
+def get_calendar() -> JalaliCalendar:
+    """جدول مشترک تقویم (یک بار در هر فرآیند ساخته می‌شود)"""
+    overrides = _load_overrides(HOLIDAYS_FILE)
+    return JalaliCalendar(add=overrides.get('add', ()), remove=overrides.get('remove', ()))
+
+
+def skip_closed_day(day: date) -> bool:
+    """برای ReminderLoop و سیاست انتشار: True اگر امروز باید رد شود"""
+    return CALENDAR_SKIP_CLOSED_DAYS and get_calendar().is_closed(day)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+انتخاب رهبر بین چند نسخه bot.py (hot-standby)
+
+با LEADER_LEASE_FILE چند نسخه ربات روی یک ماشین (یا دیسک مشترک) اجرا می‌شوند و
+فقط یکی رهبر است: دریافت پیام‌ها (polling)، یادآوری، انتشار و نوشتن data.json
+فقط در نسخه رهبر انجام می‌شود. نسخه‌های دیگر (follower) اتصال‌ها، API محلی
+نرخ و وضعیت خوانده شده از data.json را گرم نگه می‌دارند.
+
+رهبری یک lease در جدول SQLite است (نگهدارنده، زمان انقضا و term). رهبر هر
+LEADER_HEARTBEAT_SECONDS ثانیه lease را تمدید می‌کند؛ اگر رهبر از کار بیفتد،
+حداکثر LEADER_LEASE_SECONDS (به اضافه یک heartbeat) بعد یک follower رهبر
+می‌شود. رهبری که نتواند پیش از انقضای lease آن را تمدید کند خودش کنار می‌رود،
+پس دو رهبر همزمان وجود ندارد. term با هر تغییر رهبر افزایش می‌یابد.
+"""
+
+import os
+import time
+import socket
+import asyncio
+import logging
+import sqlite3
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# فایل SQLite مشترک (خالی = غیرفعال، یک نسخه همیشه رهبر است)
+LEADER_LEASE_FILE = os.getenv('LEADER_LEASE_FILE', '')
+LEADER_LEASE_SECONDS = float(os.getenv('LEADER_LEASE_SECONDS', '6'))
+LEADER_HEARTBEAT_SECONDS = float(os.getenv('LEADER_HEARTBEAT_SECONDS', '2'))
+LEADER_ID = os.getenv('LEADER_ID') or f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass(frozen=True)
+class Lease:
+    """lease فعلی رهبری"""
+    holder: str
+    term: int
+    expires: float
+
+
+class LeaseStore:
+    """lease رهبری در یک جدول SQLite (هر عملیات در یک تراکنش IMMEDIATE)"""
+
+    def __init__(self, path: str, name: str = 'bot', clock: Callable[[], float] = time.time):
+        self.path = path
+        self.name = name
+        self.clock = clock
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS lease "
+            "(name TEXT PRIMARY KEY, holder TEXT, expires REAL, term INTEGER)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=LEADER_HEARTBEAT_SECONDS, isolation_level=None)
+
+    def _execute(self, sql: str, params: tuple = ()):
+        db = self._connect()
+        try:
+            db.execute(sql, params)
+        finally:
+            db.close()
+
+    def _row(self, db) -> Optional[Lease]:
+        row = db.execute("SELECT holder, term, expires FROM lease WHERE name = ?", (self.name,)).fetchone()
+        return Lease(row[0], row[1], row[2]) if row else None
+
+    def try_acquire(self, holder: str, ttl: float) -> Optional[Lease]:
+        """گرفتن یا تمدید lease؛ None اگر نسخه دیگری lease معتبر دارد"""
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            now = self.clock()
+            current = self._row(db)
+            if current and current.holder != holder and current.expires > now:
+                db.execute("ROLLBACK")
+                return None
+            term = current.term if current and current.holder == holder else (current.term + 1 if current else 1)
+            lease = Lease(holder, term, now + ttl)
+            db.execute(
+                "INSERT OR REPLACE INTO lease (name, holder, expires, term) VALUES (?, ?, ?, ?)",
+                (self.name, holder, lease.expires, term),
+            )
+            db.execute("COMMIT")
+            return lease
+        finally:
+            db.close()
+
+    def release(self, holder: str):
+        """رها کردن lease (فقط توسط نگهدارنده فعلی)"""
+        self._execute("UPDATE lease SET expires = 0 WHERE name = ? AND holder = ?", (self.name, holder))
+
+    def current(self) -> Optional[Lease]:
+        db = self._connect()
+        try:
+            return self._row(db)
+        finally:
+            db.close()
+
+
+Callback = Optional[Callable[[], Awaitable]]
+
+
+class LeaderElector:
+    """
+    حلقه heartbeat: گرفتن/تمدید lease و فراخوانی callbackهای تغییر نقش
+
+    on_elected: این نسخه رهبر شد (قبل از آن data.json را دوباره بخوانید)
+    on_demoted: رهبری از دست رفت یا رها شد
+    on_follow:  هر heartbeat در نقش follower (گرم نگه داشتن وضعیت)
+    """
+
+    def __init__(
+        self,
+        store: LeaseStore,
+        holder: str = LEADER_ID,
+        lease: float = LEADER_LEASE_SECONDS,
+        heartbeat: float = LEADER_HEARTBEAT_SECONDS,
+        on_elected: Callback = None,
+        on_demoted: Callback = None,
+        on_follow: Callback = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        if heartbeat >= lease:
+            raise ValueError("LEADER_HEARTBEAT_SECONDS باید کمتر از LEADER_LEASE_SECONDS باشد")
+        self.store = store
+        self.holder = holder
+        self.lease_seconds = lease
+        self.heartbeat = heartbeat
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.on_follow = on_follow
+        self.clock = clock
+        self.lease: Optional[Lease] = None
+        # آمار تغییر نقش
+        self.elections = 0
+        self.demotions = 0
+        self.changed_at: Optional[float] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """رهبر با lease منقضی نشده (بدون انتظار برای heartbeat بعدی)"""
+        return self.lease is not None and self.clock() < self.lease.expires
+
+    async def tick(self):
+        """یک heartbeat"""
+        try:
+            lease = await asyncio.to_thread(self.store.try_acquire, self.holder, self.lease_seconds)
+        except sqlite3.Error as e:
+            logger.warning("خطا در تمدید lease رهبری: %s", e)
+            # رهبر تا انقضای lease فعلی رهبر می‌ماند
+            lease = self.lease if self.is_leader else None
+
+        if lease is not None:
+            elected = self.lease is None
+            self.lease = lease
+            if elected:
+                self.elections += 1
+                self.changed_at = self.clock()
+                logger.info("👑 %s رهبر شد (term %d)", self.holder, lease.term)
+                if self.on_elected:
+                    await self.on_elected()
+            return
+
+        if self.lease is not None:
+            await self._demote("lease به نسخه دیگری رسید یا تمدید نشد")
+        elif self.on_follow:
+            await self.on_follow()
+
+    async def _demote(self, reason: str):
+        self.lease = None
+        self.demotions += 1
+        self.changed_at = self.clock()
+        logger.warning("⬇️ %s دیگر رهبر نیست: %s", self.holder, reason)
+        if self.on_demoted:
+            await self.on_demoted()
+
+    async def run(self):
+        """heartbeat تا لغو task"""
+        while True:
+            await self.tick()
+            await asyncio.sleep(self.heartbeat)
+
+    async def resign(self):
+        """کنار رفتن (هنگام توقف) تا follower بدون انتظار برای انقضا رهبر شود"""
+        if self.lease is None:
+            return
+        await self._demote("توقف نسخه")
+        try:
+            await asyncio.to_thread(self.store.release, self.holder)
+        except sqlite3.Error as e:
+            logger.warning("خطا در رها کردن lease رهبری: %s", e)
+
+    def summary(self) -> dict:
+        return {
+            'holder': self.holder,
+            'leader': self.is_leader,
+            'term': self.lease.term if self.lease else None,
+            'elections': self.elections,
+            'demotions': self.demotions,
+        }
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تنظیمات مشترک لاگ برای همه اسکریپت‌ها
+
+- حالت متنی (پیش‌فرض) یا JSON ساخت‌یافته با LOG_FORMAT=json
+- قالب‌بندی آرگومان‌ها فقط هنگام نوشتن رکورد انجام می‌شود (lazy)
+- نوشتن روی خروجی در یک thread جداگانه با QueueHandler انجام می‌شود
+  تا event loop هرگز روی I/O لاگ منتظر نماند
+- نمونه‌برداری برای هر الگوی پیام (LOG_SAMPLE_EVERY) تا مسیرهای پرتکرار ساکت بمانند
+- هر اجرای فرآیند دریافت و محاسبه یک شناسه همبستگی (correlation id) دارد
+  که در هر دو قالب متنی و JSON نوشته می‌شود
+"""
+
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(correlation)s%(message)s'
+
+# آرگومان‌هایی که بعد از فراخوانی لاگ تغییر نمی‌کنند و قالب‌بندی آن‌ها در thread شنونده امن است
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+# شناسه اجرای جاری فرآیند دریافت و محاسبه
+_correlation_id: ContextVar[Optional[str]] = ContextVar('correlation_id', default=None)
+
+# فیلدهای استاندارد LogRecord که نباید به عنوان فیلد اضافی در JSON بیایند
+_RESERVED_ATTRS = frozenset(
+    vars(logging.LogRecord('', 0, '', 0, '', None, None)).keys()
+) | {'message', 'asctime', 'correlation_id', 'correlation', 'sampled'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+class fmt:
+    """
+    قالب‌بندی تنبل یک مقدار برای آرگومان‌های لاگ
+
+    مثال: logger.info("قیمت: %s ریال", fmt(price, ','))
+    قالب‌بندی فقط وقتی انجام می‌شود که رکورد واقعاً نوشته شود.
+    """
+
+    __slots__ = ('value', 'spec')
+
+    def __init__(self, value, spec: str = ''):
+        self.value = value
+        self.spec = spec
+
+    def __str__(self) -> str:
+        return format(self.value, self.spec)
+
+    __repr__ = __str__
+
+
+def get_correlation_id() -> Optional[str]:
+    """شناسه همبستگی اجرای جاری"""
+    return _correlation_id.get()
+
+
+@contextmanager
+def correlation_scope(correlation_id: Optional[str] = None):
+    """
+    اختصاص یک شناسه همبستگی به همه لاگ‌های داخل این بلوک
+
+    در کدهای async هر task کپی مستقل context را دارد، بنابراین
+    اجراهای همزمان شناسه‌های یکدیگر را بازنویسی نمی‌کنند.
+    """
+    token = _correlation_id.set(correlation_id or uuid.uuid4().hex[:12])
+    try:
+        yield _correlation_id.get()
+    finally:
+        _correlation_id.reset(token)
+
+
+class CorrelationFilter(logging.Filter):
+    """افزودن شناسه همبستگی به رکورد (در thread تولیدکننده اجرا می‌شود)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = _correlation_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    نمونه‌برداری برای هر الگوی پیام
+
+    از هر `every` رکورد با الگوی یکسان (msg قالب‌بندی نشده) فقط یکی عبور می‌کند.
+    رکوردهای WARNING و بالاتر همیشه عبور می‌کنند.
+    """
+
+    def __init__(self, every: int = 1, max_level: int = logging.INFO):
+        super().__init__()
+        self.every = max(1, every)
+        self.max_level = max_level
+        self._counts: dict = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno > self.max_level:
+            return True
+        key = (record.name, record.msg)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        record.sampled = self.every
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """قالب متنی؛ شناسه همبستگی (در صورت وجود) قبل از پیام می‌آید"""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        correlation_id = getattr(record, 'correlation_id', None)
+        record.correlation = f"[{correlation_id}] " if correlation_id else ''
+        return super().formatMessage(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """قالب‌بندی رکوردها به صورت یک خط JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        correlation_id = getattr(record, 'correlation_id', None)
+        if correlation_id:
+            entry['correlation_id'] = correlation_id
+        sampled = getattr(record, 'sampled', None)
+        if sampled:
+            entry['sampled'] = sampled
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler که پیام را در thread تولیدکننده قالب‌بندی نمی‌کند
+
+    QueueHandler استاندارد در prepare() کل رکورد را قالب‌بندی می‌کند؛
+    اینجا اگر همه آرگومان‌ها مقدار ساده تغییرناپذیر باشند فقط رکورد به صف
+    می‌رود و قالب‌بندی در thread شنونده انجام می‌شود. آرگومان‌های دیگر
+    (لیست، دیکشنری، اشیا) ممکن است تا زمان نوشتن تغییر کنند یا همزمان با
+    thread تولیدکننده خوانده شوند، پس پیام همین‌جا ثابت می‌شود.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args and not _immutable_args(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def _immutable_args(args) -> bool:
+    # آرگومان دیکشنری («%(name)s») خودش تغییرپذیر است
+    return isinstance(args, tuple) and all(
+        isinstance(value.value if isinstance(value, fmt) else value, _IMMUTABLE_ARGS)
+        for value in args
+    )
+
+
+def _build_formatter(log_format: str) -> logging.Formatter:
+    if log_format == 'json':
+        return JsonFormatter()
+    return TextFormatter()
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    sample_every: Optional[int] = None,
+    use_queue: Optional[bool] = None,
+    stream=None,
+    force: bool = False,
+) -> Optional[logging.handlers.QueueListener]:
+    """
+    پیکربندی root logger بر اساس متغیرهای محیطی
+
+    LOG_LEVEL: سطح لاگ (پیش‌فرض INFO)
+    LOG_FORMAT: text یا json (پیش‌فرض text)
+    LOG_SAMPLE_EVERY: از هر N پیام INFO با الگوی یکسان یکی نوشته شود (پیش‌فرض 1)
+    LOG_QUEUE: نوشتن در thread جداگانه (پیش‌فرض 1)
+
+    فراخوانی دوباره بدون force اثری ندارد.
+    """
+    global _listener
+
+    with _setup_lock:
+        root = logging.getLogger()
+        if getattr(root, '_tether_configured', False) and not force:
+            return _listener
+
+        level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+        log_format = (log_format or os.getenv('LOG_FORMAT', 'text')).lower()
+        if sample_every is None:
+            sample_every = int(os.getenv('LOG_SAMPLE_EVERY', '1'))
+        if use_queue is None:
+            use_queue = os.getenv('LOG_QUEUE', '1') != '0'
+
+        _stop_listener()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(_build_formatter(log_format))
+
+        if use_queue:
+            handler: logging.Handler = LazyQueueHandler(queue.SimpleQueue())
+            _listener = logging.handlers.QueueListener(
+                handler.queue, output, respect_handler_level=True
+            )
+            _listener.start()
+        else:
+            handler = output
+
+        handler.addFilter(CorrelationFilter())
+        if sample_every > 1:
+            handler.addFilter(SamplingFilter(sample_every))
+
+        root.addHandler(handler)
+        root.setLevel(level)
+        root._tether_configured = True
+        return _listener
+
+
+def _stop_listener():
+    """تخلیه صف و توقف thread نویسنده"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+صف پایدار پیام‌های منتشر شده (outbox)
+
+هر پیام قبل از ارسال برای هر مقصد به صورت یک رکورد در data.json ثبت می‌شود؛
+اگر ارسال ناموفق باشد یا فرآیند متوقف شود، رکورد در انتظار باقی می‌ماند و
+در اجرای بعدی (یا پس از backoff) دوباره ارسال می‌شود.
+
+کلید هر رکورد از شناسه tick و نام مقصد ساخته می‌شود؛ پیام تکراری با همان
+کلید دوباره ثبت نمی‌شود. با ثبت tick جدید، رکوردهای قدیمی‌تر همان مقصد که
+هنوز ارسال نشده‌اند کنار گذاشته می‌شوند تا نرخ کهنه بعد از نرخ جدید منتشر نشود.
+"""
+
+import os
+import time
+import logging
+from typing import Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# تأخیر پایه و سقف تأخیر بین تلاش‌های ارسال (ثانیه)
+OUTBOX_BACKOFF_SECONDS = float(os.getenv('OUTBOX_BACKOFF_SECONDS', '30'))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv('OUTBOX_MAX_BACKOFF_SECONDS', '1800'))
+# تعداد رکوردهای ارسال شده که برای جلوگیری از ارسال تکراری نگه داشته می‌شوند
+OUTBOX_KEEP_DELIVERED = int(os.getenv('OUTBOX_KEEP_DELIVERED', '50'))
+
+PENDING = 'pending'
+DELIVERED = 'delivered'
+SUPERSEDED = 'superseded'
+
+
+def idempotency_key(tick: str, destination: str) -> str:
+    """کلید یکتای ارسال یک tick به یک مقصد"""
+    return f"{tick}@{destination}"
+
+
+class Outbox:
+    """
+    رکوردهای ارسال پیام
+
+    entries: لیست قابل ذخیره (معمولاً TetherBot.outbox)
+    save: تابع ذخیره وضعیت پس از هر تغییر
+    """
+
+    def __init__(
+        self,
+        entries: Optional[list] = None,
+        save: Optional[Callable[[], None]] = None,
+        clock: Callable[[], float] = time.time,
+        backoff: float = OUTBOX_BACKOFF_SECONDS,
+        max_backoff: float = OUTBOX_MAX_BACKOFF_SECONDS,
+        keep_delivered: int = OUTBOX_KEEP_DELIVERED,
+    ):
+        self.entries = entries if entries is not None else []
+        self._save = save or (lambda: None)
+        self.clock = clock
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.keep_delivered = keep_delivered
+        # با هر تغییر رکوردها افزایش می‌یابد (کش پاسخ /status)
+        self.generation = 0
+
+    def _find(self, key: str) -> Optional[dict]:
+        for entry in self.entries:
+            if entry['key'] == key:
+                return entry
+        return None
+
+    def add(self, tick: str, text: str, destinations: Iterable[str]) -> List[dict]:
+        """
+        ثبت پیام یک tick برای مقصدها و ذخیره فوری
+
+        فقط رکوردهای جدید برگردانده می‌شوند (کلیدهای تکراری نادیده گرفته می‌شوند).
+        """
+        now = self.clock()
+        added = []
+        for destination in destinations:
+            key = idempotency_key(tick, destination)
+            if self._find(key):
+                logger.info("پیام %s قبلاً ثبت شده است", key)
+                continue
+            for entry in self.entries:
+                if entry['destination'] == destination and entry['status'] == PENDING:
+                    entry['status'] = SUPERSEDED
+            entry = {
+                'key': key,
+                'destination': destination,
+                'text': text,
+                'status': PENDING,
+                'created': now,
+                'attempts': 0,
+                'next_attempt': now,
+            }
+            self.entries.append(entry)
+            added.append(entry)
+        self.generation += 1
+        self._prune()
+        self._save()
+        return added
+
+    def is_pending(self, key: str) -> bool:
+        entry = self._find(key)
+        return bool(entry) and entry['status'] == PENDING
+
+    def due(self, destination: Optional[str] = None) -> List[dict]:
+        """رکوردهای در انتظاری که زمان تلاش بعدی آن‌ها رسیده است"""
+        now = self.clock()
+        return [
+            entry for entry in self.entries
+            if entry['status'] == PENDING and entry['next_attempt'] <= now
+            and (destination is None or entry['destination'] == destination)
+        ]
+
+    def mark_delivered(self, key: str):
+        entry = self._find(key)
+        if not entry:
+            return
+        now = self.clock()
+        entry['status'] = DELIVERED
+        entry['delivered'] = now
+        entry['attempts'] += 1
+        self.generation += 1
+        self._prune()
+        self._save()
+
+    def mark_failed(self, key: str, error: str = ''):
+        """ثبت تلاش ناموفق و زمان‌بندی تلاش بعدی با backoff نمایی"""
+        entry = self._find(key)
+        if not entry or entry['status'] != PENDING:
+            return
+        entry['attempts'] += 1
+        delay = min(self.backoff * 2 ** (entry['attempts'] - 1), self.max_backoff)
+        entry['next_attempt'] = self.clock() + delay
+        entry['error'] = str(error)[:200]
+        self.generation += 1
+        logger.warning(
+            "ارسال %s ناموفق بود (تلاش %d)، تلاش بعدی پس از %.0f ثانیه",
+            key, entry['attempts'], delay
+        )
+        self._save()
+
+    def _prune(self):
+        """حذف رکوردهای کنار گذاشته شده و ارسال شده‌های قدیمی"""
+        delivered = [e for e in self.entries if e['status'] == DELIVERED]
+        excess = len(delivered) - self.keep_delivered
+        stale = {id(e) for e in delivered[:excess]} if excess > 0 else set()
+        self.entries[:] = [
+            e for e in self.entries
+            if e['status'] != SUPERSEDED and id(e) not in stale
+        ]
+
+    @property
+    def depth(self) -> int:
+        """تعداد رکوردهای در انتظار ارسال"""
+        return sum(1 for e in self.entries if e['status'] == PENDING)
+
+    def oldest_pending_age(self) -> Optional[float]:
+        """سن قدیمی‌ترین رکورد در انتظار (ثانیه)"""
+        pending = [e['created'] for e in self.entries if e['status'] == PENDING]
+        if not pending:
+            return None
+        return self.clock() - min(pending)
+
+    def last_delivery_lag(self) -> Optional[float]:
+        """فاصله ثبت تا ارسال آخرین رکورد ارسال شده (ثانیه)"""
+        delivered = [e for e in self.entries if e['status'] == DELIVERED]
+        if not delivered:
+            return None
+        last = max(delivered, key=lambda e: e['delivered'])
+        return last['delivered'] - last['created']
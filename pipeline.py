@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+خط لوله مرحله‌ای محاسبه و انتشار نرخ
+
+هر tick (یک بار خواندن منبع برای یک مستأجر) از این مراحل عبور می‌کند:
+
+    source → parse → compute → policy → render → sink
+
+- source:  خواندن پیام‌های منبع (و همزمان به‌روزرسانی نرخ یوآن مستأجر)
+- parse:   استخراج قیمت تتر و رد قیمت‌های پرت
+- compute: نرخ مبنای یوآن و جفت‌ارزهای اضافه، ثبت در آمار و شرط کاهش نرخ
+- policy:  سیاست انتشار (force آن را نادیده می‌گیرد)
+- render:  ساخت پیام نهایی (یک پیام ترکیبی یا یک پیام برای هر ارز)
+- sink:    ثبت در outbox و صف مقصدهای خروجی
+
+مراحل با صف‌های محدود (PIPELINE_QUEUE_SIZE) به هم وصل‌اند؛ وقتی مرحله‌ای
+عقب بماند، مرحله قبلی (و در نهایت submit) منتظر می‌ماند. مرحله source
+PIPELINE_SOURCE_WORKERS worker دارد تا خواندن چند منبع همزمان انجام شود؛
+بقیه مراحل یک worker دارند تا تغییرات وضعیت ربات به ترتیب ورود اعمال شوند.
+
+هر tick مهلتی دارد (PIPELINE_DEADLINE_SECONDS)؛ tickی که مهلتش در صف یا
+در حین یک مرحله تمام شود کنار گذاشته می‌شود و نتیجه expired می‌گیرد.
+نتیجه هر tick یک Outcome است (نه رشته خطا) که فراخواننده آن را نمایش می‌دهد.
+
+با until='render' tick پس از ساخت پیام نگه داشته می‌شود (نتیجه held) و بعداً
+با resume به مرحله sink می‌رود؛ at زمان پیام را تعیین می‌کند (prefetch.py).
+
+تغییری که سیاست انتشار debounce کند در publish_state نگه داشته می‌شود و در
+پایان بازه (retry_at) دوباره از مرحله policy عبور می‌کند: در همین فرآیند با یک
+task زمان‌بندی شده، و در اجرای بعدی (مثلاً auto_fetcher) با اولین tick بدون پیام جدید.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config import config
+from logging_utils import correlation_scope, get_correlation_id, fmt
+
+logger = logging.getLogger(__name__)
+
+# ظرفیت صف بین هر دو مرحله
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '16'))
+# تعداد worker همزمان مرحله source
+PIPELINE_SOURCE_WORKERS = int(os.getenv('PIPELINE_SOURCE_WORKERS', '4'))
+# مهلت پیش‌فرض هر tick از ورود تا ثبت در مقصدها (ثانیه)
+PIPELINE_DEADLINE_SECONDS = float(os.getenv('PIPELINE_DEADLINE_SECONDS', '90'))
+
+STAGES = ('source', 'parse', 'compute', 'policy', 'render', 'sink')
+
+# وضعیت نتیجه tick
+PUBLISHED = 'published'
+SUPPRESSED = 'suppressed'
+NO_SINKS = 'no_sinks'
+EMPTY = 'empty'
+FAILED = 'failed'
+EXPIRED = 'expired'
+HELD = 'held'
+
+
+class SourceError(Exception):
+    """خطای خواندن منبع با پیام قابل نمایش به کاربر"""
+
+
+@dataclass(frozen=True)
+class SourceMessage:
+    """یک پیام منبع"""
+    text: Optional[str]
+    # زمان انتشار یا آخرین ویرایش (یونیکس) برای موتور آمار
+    at: Optional[float] = None
+    id: Optional[int] = None
+    # پیام قبلاً دیده شده و متن آن ویرایش شده است
+    edited: bool = False
+
+
+class Source:
+    """
+    پایه منابع قیمت
+
+    زیرکلاس‌ها read را پیاده‌سازی می‌کنند (خطای قابل نمایش با SourceError).
+    commit پس از پردازش پیام‌ها (قبل از ذخیره وضعیت) فراخوانی می‌شود.
+    با seen (dedupe.SeenCache) پیام‌هایی که با همین محتوا قبلاً پردازش شده‌اند
+    کنار گذاشته می‌شوند (مگر با force).
+    """
+
+    name = 'source'
+    empty_text = "⏸️ پیام جدیدی در منبع نیست"
+    seen = None
+
+    async def read(self) -> List[SourceMessage]:
+        raise NotImplementedError
+
+    def commit(self, tick: 'Tick'):
+        pass
+
+    def tick_key(self, tick: 'Tick') -> str:
+        """شناسه tick در outbox (همان شناسه دوباره ارسال نمی‌شود)"""
+        return f"{tick.now:%Y%m%d%H%M}:{tick.base_rate:.0f}"
+
+
+@dataclass
+class Tenant:
+    """وضعیت، سیاست انتشار و مقصدهای یک مصرف‌کننده خط لوله"""
+    name: str
+    state: object
+    policy: object
+    # مقصدهای فعلی (تابع، چون با بارگذاری مجدد تنظیمات جایگزین می‌شوند)
+    dispatcher: Callable[[], Optional[object]]
+    refresh_rate: Optional[Callable[[], Awaitable]] = None
+
+
+@dataclass
+class Outcome:
+    """نتیجه یک tick"""
+    status: str
+    detail: str = ''
+    base_rate: Optional[float] = None
+    message: Optional[str] = None
+    destinations: List[str] = field(default_factory=list)
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    # tick نگه داشته شده (فقط برای held، جهت resume)
+    tick: Optional['Tick'] = field(default=None, repr=False)
+
+    @property
+    def published(self) -> bool:
+        return self.status == PUBLISHED
+
+
+@dataclass
+class Tick:
+    source: Source
+    tenant: Tenant
+    deadline: float
+    result: asyncio.Future
+    force: bool = False
+    correlation_id: Optional[str] = None
+    # زمان پیام (پیش‌فرض: زمان ورود به مرحله policy)
+    at: Optional[datetime] = None
+    # آخرین مرحله قبل از نگه داشتن tick
+    until: Optional[str] = None
+    messages: List[SourceMessage] = field(default_factory=list)
+    # قیمت‌های پذیرفته شده: (قیمت تتر، زمان)
+    prices: list = field(default_factory=list)
+    rejected: Optional[int] = None
+    base_rate: Optional[float] = None
+    # نرخ مبنای جفت‌ارزهای اضافه (کد ارز ← نرخ)
+    rates: Dict[str, float] = field(default_factory=dict)
+    tiers: tuple = ()
+    now: Optional[datetime] = None
+    message: Optional[str] = None
+    # پیام‌های ساخته شده: [(کد ارز، متن)]
+    renders: list = field(default_factory=list)
+    # شناسه outbox از پیش تعیین شده و tick ساخته شده از تغییر debounce شده
+    key: Optional[str] = None
+    deferred: bool = False
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+
+    def restore_pending(self, pending: dict):
+        """tick از تغییر در انتظار (publish_state['pending']) بدون خواندن پیام"""
+        self.base_rate = pending['rate']
+        self.rates = dict(pending.get('rates') or {})
+        self.key = pending['key']
+        self.deferred = True
+
+    def finish(self, outcome: Outcome):
+        if self.source.seen is not None and self.messages:
+            # پیام‌های tick ناتمام (خطا، مهلت) در خواندن بعدی دوباره پردازش می‌شوند
+            self.source.seen.release(self.source.name, self.messages)
+        outcome.stage_seconds = dict(self.stage_seconds)
+        if not self.result.done():
+            self.result.set_result(outcome)
+
+
+class Pipeline:
+    """
+    خط لوله مرحله‌ای با صف‌های محدود
+
+    run(source, tenant) یک tick را وارد خط لوله می‌کند و منتظر Outcome آن می‌ماند.
+    workerها با اولین submit (یا start) شروع و با close متوقف می‌شوند.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = PIPELINE_QUEUE_SIZE,
+        source_workers: int = PIPELINE_SOURCE_WORKERS,
+        deadline: float = PIPELINE_DEADLINE_SECONDS,
+        clock: Optional[Callable[[], datetime]] = None,
+    ):
+        self.queue_size = max(queue_size, 1)
+        self.source_workers = max(source_workers, 1)
+        self.deadline = deadline
+        self._clock = clock or (lambda: datetime.now(config.current.tz))
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+        # انتشارهای زمان‌بندی شده پایان بازه debounce
+        self._trailing: set = set()
+
+    async def __aenter__(self) -> 'Pipeline':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        if self._workers:
+            return
+        handlers = {
+            'source': self._source,
+            'parse': self._parse,
+            'compute': self._compute,
+            'policy': self._policy,
+            'render': self._render,
+            'sink': self._sink,
+        }
+        self._queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in STAGES}
+        for index, stage in enumerate(STAGES):
+            following = self._queues[STAGES[index + 1]] if index + 1 < len(STAGES) else None
+            count = self.source_workers if stage == 'source' else 1
+            for _ in range(count):
+                self._workers.append(asyncio.create_task(
+                    self._worker(stage, handlers[stage], self._queues[stage], following)
+                ))
+
+    async def close(self):
+        """توقف workerها؛ tickهای باقیمانده در صف‌ها نتیجه expired می‌گیرند"""
+        # تغییرهای در انتظار در publish_state می‌مانند و اجرای بعدی آن‌ها را منتشر می‌کند
+        for task in self._trailing:
+            task.cancel()
+        await asyncio.gather(*self._trailing, return_exceptions=True)
+        self._trailing.clear()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        for stage, queue in self._queues.items():
+            while not queue.empty():
+                queue.get_nowait().finish(Outcome(EXPIRED, f"⌛ خط لوله پیش از مرحله {stage} متوقف شد"))
+        self._queues.clear()
+
+    async def submit(
+        self,
+        source: Source,
+        tenant: Tenant,
+        force: bool = False,
+        deadline: Optional[float] = None,
+        at: Optional[datetime] = None,
+        until: Optional[str] = None,
+    ) -> Tick:
+        """ورود یک tick (اگر صف source پر باشد منتظر می‌ماند)"""
+        if until is not None and until not in STAGES:
+            raise ValueError(f"مرحله نامعتبر: {until}")
+        await self.start()
+        loop = asyncio.get_running_loop()
+        tick = Tick(
+            source=source,
+            tenant=tenant,
+            deadline=loop.time() + (self.deadline if deadline is None else deadline),
+            result=loop.create_future(),
+            force=force,
+            correlation_id=get_correlation_id(),
+            at=at,
+            until=until,
+        )
+        await self._queues['source'].put(tick)
+        return tick
+
+    async def run(
+        self,
+        source: Source,
+        tenant: Tenant,
+        force: bool = False,
+        deadline: Optional[float] = None,
+        at: Optional[datetime] = None,
+        until: Optional[str] = None,
+    ) -> Outcome:
+        tick = await self.submit(source, tenant, force, deadline, at, until)
+        return await tick.result
+
+    async def resume(self, tick: Tick, deadline: Optional[float] = None) -> Outcome:
+        """ادامه tick نگه داشته شده از مرحله بعد از until با مهلت تازه"""
+        await self.start()
+        loop = asyncio.get_running_loop()
+        stage = STAGES[STAGES.index(tick.until) + 1]
+        tick.until = None
+        tick.result = loop.create_future()
+        tick.deadline = loop.time() + (self.deadline if deadline is None else deadline)
+        await self._queues[stage].put(tick)
+        return await tick.result
+
+    async def publish_pending(self, source: Source, tenant: Tenant) -> Optional[Outcome]:
+        """انتشار تغییر debounce شده‌ای که بازه آن تمام شده (None: چیزی در انتظار نیست)"""
+        pending = tenant.policy.pending_due(self._clock())
+        if not pending:
+            return None
+        await self.start()
+        loop = asyncio.get_running_loop()
+        tick = Tick(
+            source=source, tenant=tenant, deadline=loop.time() + self.deadline,
+            result=loop.create_future(), correlation_id=get_correlation_id(),
+        )
+        tick.restore_pending(pending)
+        await self._queues['policy'].put(tick)
+        return await tick.result
+
+    def _schedule_pending(self, tick: Tick, retry_at: datetime):
+        async def trailing():
+            delay = (retry_at - self._clock()).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pending = tick.tenant.policy.state.get('pending') or {}
+            # تغییر جدیدتر task خودش را دارد؛ انتشار دیگر تغییر را هم کنار گذاشته است
+            if pending.get('key') != tick.key:
+                return
+            with correlation_scope(tick.correlation_id):
+                outcome = await self.publish_pending(tick.source, tick.tenant)
+                if outcome is not None:
+                    logger.info("انتشار پایان بازه debounce: %s", outcome.status)
+
+        task = asyncio.create_task(trailing())
+        self._trailing.add(task)
+        task.add_done_callback(self._trailing.discard)
+
+    async def _worker(self, stage: str, handler, queue: asyncio.Queue, following: Optional[asyncio.Queue]):
+        loop = asyncio.get_running_loop()
+        while True:
+            tick = await queue.get()
+            try:
+                if tick.result.done():
+                    continue
+                with correlation_scope(tick.correlation_id):
+                    outcome = await self._step(stage, handler, tick, loop)
+                    if outcome is not None:
+                        tick.finish(outcome)
+                    elif tick.until == stage and following is not None:
+                        tick.finish(Outcome(
+                            HELD, base_rate=tick.base_rate, message=tick.message, tick=tick,
+                        ))
+                    elif following is not None:
+                        await following.put(tick)
+            except asyncio.CancelledError:
+                tick.finish(Outcome(EXPIRED, f"⌛ خط لوله در مرحله {stage} متوقف شد"))
+                raise
+            finally:
+                queue.task_done()
+
+    async def _step(self, stage: str, handler, tick: Tick, loop) -> Optional[Outcome]:
+        remaining = tick.deadline - loop.time()
+        if remaining <= 0:
+            logger.warning("مهلت tick %s قبل از مرحله %s تمام شد", tick.source.name, stage)
+            return Outcome(EXPIRED, f"⌛ مهلت پردازش پیش از مرحله {stage} به پایان رسید")
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(handler(tick), remaining)
+        except asyncio.TimeoutError:
+            logger.warning("مهلت tick %s در مرحله %s تمام شد", tick.source.name, stage)
+            return Outcome(EXPIRED, f"⌛ مهلت پردازش در مرحله {stage} به پایان رسید")
+        except SourceError as e:
+            logger.error("خطا در خواندن منبع %s: %s", tick.source.name, e)
+            return Outcome(FAILED, str(e))
+        except Exception as e:
+            logger.error("خطا در مرحله %s: %s", stage, e, exc_info=True)
+            return Outcome(FAILED, f"❌ خطا در فرآیند به‌روزرسانی: {e}")
+        finally:
+            tick.stage_seconds[stage] = time.perf_counter() - started
+
+    # مراحل: None یعنی ادامه به مرحله بعد، Outcome یعنی پایان tick
+
+    async def _source(self, tick: Tick) -> Optional[Outcome]:
+        if tick.tenant.refresh_rate:
+            # خطای منابع نرخ یوآن tick را متوقف نمی‌کند (نرخ ذخیره شده استفاده می‌شود)
+            messages, refreshed = await asyncio.gather(
+                tick.source.read(), tick.tenant.refresh_rate(), return_exceptions=True,
+            )
+            if isinstance(refreshed, Exception):
+                logger.warning("خطا در به‌روزرسانی نرخ یوآن: %s", refreshed)
+            if isinstance(messages, BaseException):
+                raise messages
+        else:
+            messages = await tick.source.read()
+        if messages and tick.source.seen is not None and not tick.force:
+            messages = tick.source.seen.fresh(tick.source.name, messages)
+            # رزرو تا mark در compute: worker دیگری که همزمان همین منبع را
+            # می‌خواند این پیام‌ها را دوباره پردازش نمی‌کند
+            tick.source.seen.reserve(tick.source.name, messages)
+        if not messages:
+            pending = None if tick.force else tick.tenant.policy.pending_due(self._clock())
+            if pending:
+                # پیام جدیدی نیامده اما تغییر debounce شده اجرای قبلی منتظر انتشار است
+                logger.info("انتشار تغییر در انتظار از پایان بازه debounce")
+                tick.restore_pending(pending)
+                return None
+            logger.info("%s", tick.source.empty_text)
+            return Outcome(EMPTY, tick.source.empty_text)
+        tick.messages = list(messages)
+        return None
+
+    async def _parse(self, tick: Tick) -> Optional[Outcome]:
+        if tick.deferred:
+            return None
+        state = tick.tenant.state
+        if not state.yuan_rate:
+            detail = "❌ نرخ یوآن تنظیم نشده است! لطفاً با دستور /setrate نرخ را تنظیم کنید."
+            logger.error(detail)
+            return Outcome(FAILED, detail)
+        for message in tick.messages:
+            tether_price = state.extract_tether_price(message.text) if message.text else None
+            if not tether_price:
+                continue
+            # رد قیمت‌های پرت
+            if not state.accept_price(tether_price, message.at):
+                tick.rejected = tether_price
+                continue
+            tick.prices.append((tether_price, message.at))
+        return None
+
+    async def _compute(self, tick: Tick) -> Optional[Outcome]:
+        if tick.deferred:
+            return None
+        state = tick.tenant.state
+        base_rate = None
+        for tether_price, at in tick.prices:
+            # همه جفت‌ارزها با یک قیمت تتر در یک محاسبه
+            priced = state.price_all(tether_price)
+            tick_rate = priced.pop('CNY', None)
+            if not tick_rate:
+                logger.error("❌ خطا در محاسبه نرخ")
+                continue
+            state.record_tick(tether_price, tick_rate, at)
+            # شرط کاهش نرخ (ذخیره یک بار پس از پردازش همه پیام‌ها)
+            base_rate = state.apply_ratchet(tick_rate, save=False)
+            tick.rates = state.apply_pair_ratchets(priced)
+        tick.source.commit(tick)
+        if tick.source.seen is not None:
+            tick.source.seen.mark(tick.source.name, tick.messages)
+        state.save_data()
+
+        if base_rate:
+            tick.base_rate = base_rate
+            logger.info("✅ نرخ مبنا: %s تومان", fmt(base_rate, ',.0f'))
+            return None
+        if tick.prices:
+            detail = "❌ خطا در محاسبه نرخ مبنا!"
+        elif tick.rejected:
+            detail = f"❌ قیمت تتر ({tick.rejected:,} ریال) غیرعادی است و رد شد!"
+        else:
+            detail = f"❌ قیمت تتر در {len(tick.messages)} پیام کانال یافت نشد!"
+        logger.error(detail)
+        return Outcome(FAILED, detail)
+
+    async def _policy(self, tick: Tick) -> Optional[Outcome]:
+        tick.now = tick.at or self._clock()
+        tick.tiers = tick.tenant.state.tier_prices(tick.base_rate, tick.rates)
+        decision = tick.tenant.policy.decide(tick.base_rate, tick.tiers, tick.now)
+        if not decision and not tick.force:
+            logger.info("ارسال لازم نیست: %s", decision.reason)
+            if decision.retry_at is not None:
+                tick.key = tick.key or tick.source.tick_key(tick)
+                tick.tenant.policy.defer(tick.base_rate, tick.rates, decision.retry_at, tick.key)
+                tick.tenant.state.save_data()
+                self._schedule_pending(tick, decision.retry_at)
+            return Outcome(SUPPRESSED, f"⏸️ پیامی ارسال نشد: {decision.label}", base_rate=tick.base_rate)
+        return None
+
+    async def _render(self, tick: Tick) -> Optional[Outcome]:
+        tick.renders = tick.tenant.state.render_messages(tick.base_rate, tick.rates, now=tick.now)
+        tick.message = '\n\n'.join(text for _, text in tick.renders)
+        return None
+
+    async def _sink(self, tick: Tick) -> Optional[Outcome]:
+        dispatcher = tick.tenant.dispatcher()
+        if not dispatcher:
+            logger.warning("هیچ مقصد خروجی تنظیم نشده است")
+            return Outcome(
+                NO_SINKS, "⚠️ گروه مقصد تنظیم نشده، اما محاسبه انجام شد",
+                base_rate=tick.base_rate, message=tick.message,
+            )
+        # ثبت در outbox و صف هر مقصد (بدون انتظار برای ارسال)
+        tick.tenant.policy.record(tick.base_rate, tick.tiers, tick.now)
+        key = tick.key or tick.source.tick_key(tick)
+        for code, text in tick.renders:
+            # کلید جدا برای پیام هر ارز (پیام یوآن همان کلید قبلی را دارد)
+            dispatcher.publish(text, tick=key if code == 'CNY' else f"{key}:{code}")
+        tick.tenant.state.save_data()
+        logger.info("پیام در صف ارسال قرار گرفت: %s", ', '.join(dispatcher.names))
+        return Outcome(
+            PUBLISHED, base_rate=tick.base_rate, message=tick.message, destinations=list(dispatcher.names),
+        )
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ارسال پیام ساعتی دقیقاً سر ساعت (prefetch)
+
+cron گیت‌هاب معمولاً با تأخیر اجرا می‌شود و auto_fetcher پس از بیدار شدن
+تازه وارد حساب می‌شود، کانال را می‌خواند و پیام را می‌سازد؛ در نتیجه پیام
+«ساعت 11» چند دقیقه دیر می‌رسد. در حالت prefetch (auto_fetcher.py --prefetch):
+
+1. slot بعدی (سر ساعت بین SLOT_FIRST_HOUR و SLOT_LAST_HOUR) انتخاب می‌شود
+2. PREFETCH_LEAD_SECONDS ثانیه قبل از slot اتصال‌ها گرم و منبع خوانده و پیام
+   با زمان slot ساخته می‌شود (tick در خط لوله نگه داشته می‌شود)
+3. PREFETCH_REVALIDATE_SECONDS ثانیه قبل از slot پیام‌های جدید منبع دوباره
+   خوانده می‌شوند؛ اگر قیمت تازه‌ای آمده باشد پیام جدید جایگزین می‌شود
+4. سر ساعت پیام به مقصدها سپرده می‌شود
+
+تأخیر ثبت در صف و تأخیر تحویل به همه مقصدها نسبت به slot در data.json
+(slot_lateness) ذخیره و در /status خلاصه می‌شود.
+
+اگر اجرا بعد از slot (حداکثر PREFETCH_GRACE_MINUTES دقیقه) برسد، همان slot
+بدون انتظار ارسال و تأخیرش ثبت می‌شود.
+"""
+
+import os
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from config import config
+from pipeline import EMPTY, EXPIRED, FAILED, HELD, Outcome, Pipeline, Source, Tenant
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_LEAD_SECONDS = float(os.getenv('PREFETCH_LEAD_SECONDS', '120'))
+PREFETCH_REVALIDATE_SECONDS = float(os.getenv('PREFETCH_REVALIDATE_SECONDS', '10'))
+# حداکثر انتظار برای slot بعدی؛ دورتر از این یعنی اجرای عادی (دقیقه)
+PREFETCH_MAX_WAIT_MINUTES = float(os.getenv('PREFETCH_MAX_WAIT_MINUTES', '45'))
+# اجرای دیرتر از slot تا این مدت هنوز متعلق به همان slot است (دقیقه)
+PREFETCH_GRACE_MINUTES = float(os.getenv('PREFETCH_GRACE_MINUTES', '30'))
+SLOT_FIRST_HOUR = int(os.getenv('SLOT_FIRST_HOUR', '11'))
+SLOT_LAST_HOUR = int(os.getenv('SLOT_LAST_HOUR', '19'))
+# تعداد رکوردهای تأخیر نگه داشته شده
+SLOT_METRICS_KEEP = int(os.getenv('SLOT_METRICS_KEEP', '200'))
+
+
+def plan_slot(
+    now: datetime,
+    max_wait: float = PREFETCH_MAX_WAIT_MINUTES * 60,
+    grace: float = PREFETCH_GRACE_MINUTES * 60,
+    first_hour: int = SLOT_FIRST_HOUR,
+    last_hour: int = SLOT_LAST_HOUR,
+) -> Optional[datetime]:
+    """
+    slot این اجرا: slot گذشته در فاصله grace یا slot آینده در فاصله max_wait
+
+    None یعنی اجرا به هیچ slotی تعلق ندارد (اجرای عادی).
+    """
+    top = now.replace(minute=0, second=0, microsecond=0)
+    # slot از دست رفته مقدم است؛ slot بعدی را cron بعدی ارسال می‌کند
+    candidates = [top, top + timedelta(hours=1)]
+    for slot in candidates:
+        if not first_hour <= slot.hour <= last_hour:
+            continue
+        # slot با همان منطقه زمانی now ساخته می‌شود (pytz: normalize برای تغییر ساعت)
+        if hasattr(now.tzinfo, 'normalize'):
+            slot = now.tzinfo.normalize(slot)
+        delta = (slot - now).total_seconds()
+        if 0 <= delta <= max_wait or -grace <= delta < 0:
+            return slot
+    return None
+
+
+@dataclass
+class SlotResult:
+    """نتیجه یک slot"""
+    slot: datetime
+    outcome: Outcome
+    # تأخیر ثبت پیام در صف مقصدها نسبت به slot (ثانیه)
+    queued_lateness: Optional[float] = None
+    revalidated: bool = False
+
+
+async def _sleep_until(moment: datetime, clock: Callable[[], datetime]):
+    delay = (moment - clock()).total_seconds()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def run_slot(
+    pipeline: Pipeline,
+    make_source: Callable[[], Source],
+    tenant: Tenant,
+    slot: datetime,
+    force: bool = False,
+    lead: float = PREFETCH_LEAD_SECONDS,
+    revalidate: float = PREFETCH_REVALIDATE_SECONDS,
+    clock: Optional[Callable[[], datetime]] = None,
+    warm: Optional[Callable[[], Awaitable]] = None,
+) -> SlotResult:
+    """
+    خواندن و ساخت پیام lead ثانیه قبل از slot، بررسی دوباره و ارسال سر slot
+
+    make_source برای هر خواندن یک منبع تازه می‌سازد (منبع مکان‌نما دار فقط
+    پیام‌های بعد از خواندن قبلی را برمی‌گرداند). warm در زمان lead و قبل از
+    اولین خواندن اجرا می‌شود (اتصال و ورود به حساب).
+    """
+    clock = clock or (lambda: datetime.now(config.current.tz))
+    await _sleep_until(slot - timedelta(seconds=lead), clock)
+    if warm:
+        await warm()
+    logger.info("⏩ آماده‌سازی پیام slot %s", f"{slot:%H:%M}")
+    # زمان پیام همان slot است، مگر اجرا بعد از slot رسیده باشد (زمان واقعی)
+    at = slot if clock() <= slot else None
+    held = await pipeline.run(make_source(), tenant, force=force, at=at, until='render')
+
+    revalidated = False
+    check_at = slot - timedelta(seconds=revalidate)
+    if revalidate and clock() < check_at:
+        await _sleep_until(check_at, clock)
+        fresh = await pipeline.run(make_source(), tenant, force=force, at=at, until='render')
+        # پیام‌های جدید معتبر جایگزین پیام آماده شده می‌شوند؛ نبود پیام جدید یا
+        # خطای خواندن، پیام آماده شده را باطل نمی‌کند
+        if fresh.status not in (EMPTY, FAILED, EXPIRED):
+            revalidated = fresh.base_rate != held.base_rate or fresh.status != held.status
+            held = fresh
+        if revalidated:
+            logger.info("🔁 قیمت تا پیش از slot تغییر کرد: %s", fresh.detail or fresh.base_rate)
+
+    if held.status != HELD:
+        return SlotResult(slot, held, revalidated=revalidated)
+
+    await _sleep_until(slot, clock)
+    outcome = await pipeline.resume(held.tick)
+    lateness = (clock() - slot).total_seconds()
+    logger.info("⏱️ پیام slot %s با %.2f ثانیه تأخیر در صف قرار گرفت", f"{slot:%H:%M}", lateness)
+    return SlotResult(slot, outcome, lateness, revalidated)
+
+
+def record_lateness(state, slot: datetime, queued: Optional[float], delivered: Optional[float]):
+    """ثبت تأخیر یک slot در state.slot_lateness (ذخیره با save_data فراخواننده)"""
+    state.slot_lateness.append({
+        'slot': slot.isoformat(),
+        'queued': None if queued is None else round(queued, 3),
+        'delivered': None if delivered is None else round(delivered, 3),
+    })
+    del state.slot_lateness[:-SLOT_METRICS_KEEP]
+
+
+def lateness_summary(entries: list) -> Optional[dict]:
+    """میانگین، بیشینه و آخرین تأخیر تحویل (ثانیه)"""
+    values = [e['delivered'] for e in entries if e.get('delivered') is not None]
+    if not values:
+        return None
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'max': max(values),
+        'last': values[-1],
+    }
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+پروفایل اختیاری هر اجرا (auto_fetcher.main، fetch_and_calculate و دستورات ربات)
+
+با PROFILE=1 (یا auto_fetcher.py --profile) هر فراخوانی تابع‌های علامت‌گذاری
+شده با cProfile اجرا می‌شود؛ خروجی هر اجرا در PROFILE_DIR ذخیره می‌شود
+(فقط PROFILE_KEEP فایل آخر نگه داشته می‌شود) و پرهزینه‌ترین توابع در لاگ
+خلاصه می‌شوند. فایل‌ها با python -m pstats یا snakeviz قابل بررسی‌اند.
+
+وقتی پروفایل خاموش است دکوراتور همان تابع اصلی را برمی‌گرداند و هزینه‌ای ندارد.
+
+نکته: cProfile همه کدهای همان thread را ثبت می‌کند؛ در ربات، taskهای دیگری
+که در حین await اجرا شوند هم در پروفایل همان دستور دیده می‌شوند.
+"""
+
+import os
+import io
+import time
+import pstats
+import cProfile
+import logging
+import functools
+from datetime import datetime
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENABLED = os.getenv('PROFILE', '0').lower() in ('1', 'true', 'yes', 'on')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+# تعداد فایل پروفایل نگه داشته شده
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '20'))
+# تعداد توابع پرهزینه در خلاصه لاگ
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', '15'))
+
+# فقط یک پروفایل همزمان (فراخوانی‌های تو در تو جزو پروفایل بیرونی‌اند)
+_active = False
+
+
+def _rotate(directory: str, keep: int):
+    files = sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.prof')),
+        key=os.path.getmtime,
+    )
+    for path in files[:max(len(files) - keep, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def summarize(profile: cProfile.Profile, top: int = PROFILE_TOP) -> str:
+    """جدول پرهزینه‌ترین توابع (بر اساس زمان داخلی)"""
+    stream = io.StringIO()
+    stats = pstats.Stats(profile, stream=stream)
+    stats.strip_dirs().sort_stats('tottime').print_stats(top)
+    lines = stream.getvalue().splitlines()
+    # حذف سربرگ pstats تا ابتدای جدول
+    for index, line in enumerate(lines):
+        if line.lstrip().startswith('ncalls'):
+            return '\n'.join(lines[index:]).rstrip()
+    return '\n'.join(lines).rstrip()
+
+
+def save(profile: cProfile.Profile, name: str, directory: Optional[str] = None, keep: Optional[int] = None) -> str:
+    """ذخیره پروفایل یک اجرا و حذف فایل‌های قدیمی (پیش‌فرض PROFILE_DIR و PROFILE_KEEP)"""
+    directory = directory or PROFILE_DIR
+    keep = PROFILE_KEEP if keep is None else keep
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}-{os.getpid()}.prof")
+    profile.dump_stats(path)
+    _rotate(directory, keep)
+    return path
+
+
+def profiled(name: Optional[str] = None, enabled: Optional[bool] = None) -> Callable:
+    """
+    دکوراتور پروفایل برای تابع‌های async
+
+    enabled: None یعنی بر اساس PROFILE؛ در حالت خاموش تابع بدون تغییر برگردانده می‌شود
+    """
+    enabled = PROFILE_ENABLED if enabled is None else enabled
+
+    def decorate(func):
+        if not enabled:
+            return func
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            global _active
+            if _active:
+                return await func(*args, **kwargs)
+
+            _active = True
+            profile = cProfile.Profile()
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                profile.disable()
+                _active = False
+                elapsed = time.perf_counter() - started
+                try:
+                    path = save(profile, label)
+                    logger.info("پروفایل %s (%.2f ثانیه): %s\n%s", label, elapsed, path, summarize(profile))
+                except Exception as e:
+                    logger.warning("ذخیره پروفایل %s ممکن نشد: %s", label, e)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+سیاست انتشار پیام نرخ
+
+قبل از ارسال هر پیام تصمیم می‌گیرد که آیا ارسال لازم است:
+- اگر قیمت سطوح (همان اعدادی که در پیام دیده می‌شوند) تغییری نکرده باشد، ارسال نمی‌شود
+- تغییر کمتر از حداقل اختلاف (PUBLISH_MIN_DELTA تومان) ارسال نمی‌شود
+- چند تغییر پشت سر هم در بازه debounce فقط یک پیام می‌شوند؛ آخرین مقدار
+  (pending در وضعیت) در پایان بازه منتشر می‌شود، حتی اگر پیام جدیدی در منبع نیاید
+- اولین پیام هر روز و پیام heartbeat (پس از PUBLISH_HEARTBEAT_MINUTES بدون ارسال)
+  حتی بدون تغییر ارسال می‌شوند
+- در روزهای تعطیل بازار (skip_day، معمولاً از jalali_calendar) چیزی ارسال نمی‌شود
+
+وضعیت آخرین انتشار در data.json ذخیره می‌شود تا اجراهای جداگانه
+auto_fetcher هم از آن استفاده کنند.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from config import config, Settings
+
+# توضیح فارسی دلیل تصمیم‌ها برای پاسخ به کاربر
+REASON_LABELS = {
+    'first': 'اولین انتشار',
+    'new_day': 'اولین پیام روز',
+    'heartbeat': 'پیام دوره‌ای',
+    'changed': 'تغییر نرخ',
+    'unchanged': 'قیمت سطوح تغییری نکرده است',
+    'below_delta': 'تغییر نرخ کمتر از حداقل اختلاف است',
+    'debounced': 'پیام قبلی به تازگی ارسال شده است',
+    'closed': 'بازار امروز تعطیل است',
+}
+
+
+@dataclass
+class PublishDecision:
+    """نتیجه تصمیم‌گیری سیاست انتشار"""
+    publish: bool
+    reason: str
+    # برای تصمیم‌های debounce: زودترین زمانی که انتشار مجاز است
+    retry_at: Optional[datetime] = None
+
+    def __bool__(self) -> bool:
+        return self.publish
+
+    @property
+    def label(self) -> str:
+        return REASON_LABELS.get(self.reason, self.reason)
+
+
+class PublishPolicy:
+    """
+    تصمیم‌گیری درباره ارسال پیام بر اساس آخرین انتشار
+
+    state: دیکشنری قابل ذخیره (معمولاً TetherBot.publish_state)
+    پارامترهای داده نشده از config.current (PUBLISH_*) خوانده می‌شوند.
+    """
+
+    def __init__(
+        self,
+        state: Optional[dict] = None,
+        min_delta: Optional[float] = None,
+        debounce_seconds: Optional[int] = None,
+        heartbeat_minutes: Optional[int] = None,
+        skip_day: Optional[Callable] = None,
+    ):
+        settings = config.current
+        self.state = state if state is not None else {}
+        self._set(
+            settings.publish_min_delta if min_delta is None else min_delta,
+            settings.publish_debounce_seconds if debounce_seconds is None else debounce_seconds,
+            settings.publish_heartbeat_minutes if heartbeat_minutes is None else heartbeat_minutes,
+        )
+        # تابعی که برای روزهای تعطیل True برمی‌گرداند
+        self._skip_day = skip_day
+
+    def _set(self, min_delta: float, debounce_seconds: int, heartbeat_minutes: int):
+        self.min_delta = min_delta
+        self.debounce = timedelta(seconds=debounce_seconds)
+        self.heartbeat = timedelta(minutes=heartbeat_minutes) if heartbeat_minutes else None
+
+    def configure(self, settings: Settings):
+        """اعمال تنظیمات جدید (بارگذاری مجدد config)"""
+        self._set(
+            settings.publish_min_delta,
+            settings.publish_debounce_seconds,
+            settings.publish_heartbeat_minutes,
+        )
+
+    def decide(self, base_rate: float, tiers: tuple, now: datetime) -> PublishDecision:
+        """آیا پیام این tick باید منتشر شود؟"""
+        decision = self._decide(base_rate, tiers, now)
+        if decision.reason != 'debounced':
+            # قیمت جدید جایگزین تغییر در انتظار شده (منتشر، بی‌تغییر یا تعطیل)
+            self.state.pop('pending', None)
+        return decision
+
+    def _decide(self, base_rate: float, tiers: tuple, now: datetime) -> PublishDecision:
+        if self._skip_day and self._skip_day(now.date()):
+            return PublishDecision(False, 'closed')
+
+        last_at = self.state.get('at')
+        if not last_at:
+            return PublishDecision(True, 'first')
+
+        last_at = datetime.fromisoformat(last_at)
+        if last_at.date() != now.date():
+            return PublishDecision(True, 'new_day')
+
+        elapsed = now - last_at
+        if self.heartbeat and elapsed >= self.heartbeat:
+            return PublishDecision(True, 'heartbeat')
+
+        if tuple(self.state.get('tiers') or ()) == tuple(tiers):
+            return PublishDecision(False, 'unchanged')
+
+        last_rate = self.state.get('rate')
+        if last_rate is not None and abs(base_rate - last_rate) < self.min_delta:
+            return PublishDecision(False, 'below_delta')
+
+        if elapsed < self.debounce:
+            return PublishDecision(False, 'debounced', retry_at=last_at + self.debounce)
+
+        return PublishDecision(True, 'changed')
+
+    def defer(self, base_rate: float, rates: dict, retry_at: datetime, key: str):
+        """
+        نگه داشتن تغییر debounce شده تا retry_at (در data.json، برای اجراهای بعدی)
+
+        rates: نرخ جفت‌ارزهای اضافه برای ساخت دوباره پیام؛ key: شناسه tick در outbox
+        """
+        self.state['pending'] = {
+            'rate': base_rate,
+            'rates': dict(rates),
+            'retry_at': retry_at.isoformat(),
+            'key': key,
+        }
+
+    def pending_due(self, now: datetime) -> Optional[dict]:
+        """تغییر در انتظاری که بازه debounce آن تمام شده است (فقط همان روز)"""
+        pending = self.state.get('pending')
+        if not pending:
+            return None
+        retry_at = datetime.fromisoformat(pending['retry_at'])
+        if retry_at.date() != now.date():
+            self.state.pop('pending', None)
+            return None
+        return pending if now >= retry_at else None
+
+    def record(self, base_rate: float, tiers: tuple, now: datetime):
+        """ثبت انتشار موفق"""
+        self.state.pop('pending', None)
+        self.state['rate'] = base_rate
+        self.state['tiers'] = list(tiers)
+        self.state['at'] = now.isoformat()
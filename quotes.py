@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+محاسبه قیمت کل برای مقدار مشخصی یوآن (/quote و inline query)
+
+جدول قیمت برای هر نسخه نرخ (state_version) یک بار ساخته می‌شود: مرز سطوح،
+قیمت واحد هر سطح و پاسخ آماده مقادیر رایج (مضرب‌های QUOTE_STEP تا QUOTE_MAX)؛
+پاسخ به inline query فقط یک جستجو در این جدول است.
+"""
+
+import os
+import re
+import bisect
+from typing import Dict, List, Optional, Sequence, Tuple
+
+QUOTE_STEP = int(os.getenv('QUOTE_STEP', '100'))
+QUOTE_MAX = int(os.getenv('QUOTE_MAX', '50000'))
+# حداکثر تعداد مقدار در یک پیام
+QUOTE_MAX_AMOUNTS = int(os.getenv('QUOTE_MAX_AMOUNTS', '10'))
+
+_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+_AMOUNT_PATTERN = re.compile(r'\d[\d,٬]*(?:\.\d+)?')
+
+
+def parse_amounts(text: str) -> List[float]:
+    """
+    استخراج مقادیر یوآن از متن (ارقام فارسی و جداکننده هزارگان مجاز است)
+
+    چند مقدار با فاصله یا خط جدید از هم جدا می‌شوند؛ مقدار تکراری یک بار
+    (به ترتیب اولین ظهور) برگردانده می‌شود.
+    """
+    text = (text or '').translate(_DIGITS)
+    amounts = []
+    for match in _AMOUNT_PATTERN.findall(text):
+        value = float(match.replace(',', '').replace('٬', '').rstrip('.'))
+        if value > 0:
+            amounts.append(int(value) if value.is_integer() else value)
+    return list(dict.fromkeys(amounts))[:QUOTE_MAX_AMOUNTS]
+
+
+class QuoteTable:
+    """
+    جدول قیمت یک نرخ مبنا
+
+    tiers: همان PRICE_TIERS ربات: (عنوان، سقف مقدار یوآن، افزایش نسبت به نرخ مبنا)
+    """
+
+    def __init__(self, base_rate: float, tiers: Sequence[tuple], step: int = QUOTE_STEP, maximum: int = QUOTE_MAX):
+        self.base_rate = base_rate
+        self.labels = [label for label, _, _ in tiers]
+        self.unit_prices = [round(base_rate + markup) for _, _, markup in tiers]
+        # سقف هر سطح (آخرین سطح بدون سقف)
+        self.limits = [limit for _, limit, _ in tiers if limit is not None]
+        self.step = step
+        self._lines: Dict[int, str] = {}
+        if step > 0:
+            for amount in range(step, maximum + 1, step):
+                self._lines[amount] = self._render(amount)
+
+    def tier_index(self, amount: float) -> int:
+        return bisect.bisect_left(self.limits, amount)
+
+    def quote(self, amount: float) -> Tuple[str, int, float]:
+        """(عنوان سطح، قیمت واحد، جمع به تومان)"""
+        index = self.tier_index(amount)
+        unit = self.unit_prices[index]
+        return self.labels[index], unit, amount * unit
+
+    def _render(self, amount: float) -> str:
+        label, unit, total = self.quote(amount)
+        return f"💰 {amount:,} یوآن → {total:,.0f} تومان\n   {label} (هر یوآن {unit:,} تومان)"
+
+    def line(self, amount: float) -> str:
+        """متن پاسخ یک مقدار (از جدول، در صورت وجود)"""
+        line = self._lines.get(amount)
+        return line if line is not None else self._render(amount)
+
+    def render(self, amounts: Sequence[float]) -> str:
+        """پاسخ کامل برای یک یا چند مقدار"""
+        text = '\n\n'.join(self.line(amount) for amount in amounts)
+        if len(amounts) > 1:
+            total = sum(self.quote(amount)[2] for amount in amounts)
+            text += f"\n\n🧾 جمع کل {sum(amounts):,} یوآن: {total:,.0f} تومان"
+        return text
+
+
+class QuoteBook:
+    """نگهداری جدول قیمت نسخه فعلی نرخ"""
+
+    def __init__(self, tiers: Sequence[tuple]):
+        self.tiers = tiers
+        self._version: Optional[int] = None
+        self._table: Optional[QuoteTable] = None
+
+    def table(self, version: int, base_rate: Optional[float]) -> Optional[QuoteTable]:
+        """جدول نرخ فعلی؛ فقط با تغییر نسخه دوباره ساخته می‌شود"""
+        if not base_rate:
+            return None
+        if self._table is None or self._version != version:
+            self._table = QuoteTable(base_rate, self.tiers)
+            self._version = version
+        return self._table
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API محلی فقط‌خواندنی نرخ (برای تابلوهای قیمت و سامانه‌های داخلی)
+
+مسیرها:
+    GET /v1/rate        نرخ مبنای فعلی، قیمت سطوح و متن پیام (JSON)
+    GET /v1/rate.txt    متن پیام نرخ (همان format_message)
+    GET /v1/base-rate   آخرین نتیجه calculate_base_rate (قبل از شرط کاهش نرخ)
+    GET /v1/history     tickهای اخیر (حداکثر پنجره ۲۴ ساعته موتور آمار)
+                        ?from=&to= (یونیکس یا ISO 8601) و ?format=csv
+                        (یا /v1/history.csv)
+
+هر پاسخ یک بار برای هر نسخه وضعیت (state_version، نسخه آمار و زمان آخرین
+انتشار) ساخته و همراه با ETag و Last-Modified به صورت bytes نگه داشته
+می‌شود؛ درخواست‌های بعدی فقط یک جستجوی dict هستند و با If-None-Match یا
+If-Modified-Since پاسخ 304 بدون بدنه می‌گیرند.
+
+سرور روی همان event loop ربات اجرا می‌شود (بدون وابستگی جدید) و فقط GET و
+HEAD را می‌پذیرد. با RATE_API_PORT=0 (پیش‌فرض) غیرفعال است.
+"""
+
+import os
+import csv
+import io
+import json
+import time
+import hashlib
+import asyncio
+import logging
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+RATE_API_HOST = os.getenv('RATE_API_HOST', '127.0.0.1')
+RATE_API_PORT = int(os.getenv('RATE_API_PORT', '0'))
+# حداکثر تعداد پاسخ‌های آماده نگه داشته شده (مسیر و query متفاوت)
+RATE_API_CACHE_SIZE = int(os.getenv('RATE_API_CACHE_SIZE', '256'))
+# بستن اتصال keep-alive بدون درخواست پس از این مدت (ثانیه)
+RATE_API_IDLE_SECONDS = float(os.getenv('RATE_API_IDLE_SECONDS', '15'))
+
+_REASONS = {
+    200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 431: 'Request Header Fields Too Large',
+}
+_MAX_HEADERS = 64
+
+
+class Representation:
+    """پاسخ آماده: بدنه و سربرگ‌های از پیش ساخته شده"""
+
+    __slots__ = ('status', 'body', 'etag', 'last_modified', 'modified_at', 'head', 'not_modified')
+
+    def __init__(self, status: int, body: bytes, content_type: str, modified_at: float):
+        self.status = status
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        # دقت Last-Modified یک ثانیه است
+        self.modified_at = int(modified_at)
+        self.last_modified = formatdate(self.modified_at, usegmt=True)
+        common = (
+            f"ETag: {self.etag}\r\n"
+            f"Last-Modified: {self.last_modified}\r\n"
+            f"Cache-Control: no-cache\r\n"
+        )
+        self.head = (
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n{common}"
+        ).encode('latin-1')
+        self.not_modified = common.encode('latin-1')
+
+    def matches(self, headers: Dict[str, str]) -> bool:
+        """آیا درخواست شرطی با این نسخه مطابقت دارد؟ (پاسخ 304)"""
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or self.etag in tags or f"W/{self.etag}" in tags
+        if_modified_since = headers.get('if-modified-since')
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return self.modified_at <= since
+        return False
+
+
+def _json(status: int, payload, modified_at: float) -> Representation:
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return Representation(status, body, 'application/json; charset=utf-8', modified_at)
+
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"زمان نامعتبر: {value}") from None
+    if moment.tzinfo is None:
+        moment = config.current.tz.localize(moment)
+    return moment.timestamp()
+
+
+class RateApi:
+    """
+    پاسخ‌دهنده و سرور HTTP API نرخ
+
+    state: نمونه TetherBot؛ price_tiers: همان PRICE_TIERS ربات (عنوان، سقف، افزایش)
+    """
+
+    def __init__(
+        self,
+        state,
+        price_tiers: tuple,
+        cache_size: int = RATE_API_CACHE_SIZE,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.state = state
+        self.price_tiers = price_tiers
+        self.cache_size = max(cache_size, 1)
+        self._clock = clock
+        self._cache: Dict[str, Representation] = {}
+        self._cache_version = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: set = set()
+        self.builds = 0
+        self.requests = 0
+        self.not_modified = 0
+        self._routes = {
+            '/v1/rate': self._rate,
+            '/v1/rate.txt': self._message,
+            '/v1/base-rate': self._base_rate,
+            '/v1/history': self._history,
+            '/v1/history.csv': self._history_csv,
+        }
+
+    # نسخه و زمان‌ها
+
+    def version(self) -> tuple:
+        return (
+            self.state.state_version,
+            self.state.stats.version,
+            self.state.publish_state.get('at'),
+        )
+
+    def _last_tick(self) -> Optional[tuple]:
+        ticks = self.state.stats.ticks()
+        return ticks[-1] if ticks else None
+
+    def _published_at(self) -> Optional[datetime]:
+        at = self.state.publish_state.get('at')
+        return datetime.fromisoformat(at) if at else None
+
+    def _modified_at(self) -> float:
+        published = self._published_at()
+        tick = self._last_tick()
+        candidates = [published.timestamp() if published else 0, tick[0] if tick else 0]
+        return max(candidates) or self._clock()
+
+    # سازنده‌های پاسخ
+
+    def _rate(self, query: dict) -> Representation:
+        base_rate = self.state.last_calculated_rate
+        if not base_rate:
+            return _json(404, {'error': 'نرخی محاسبه نشده است'}, self._modified_at())
+        published = self._published_at()
+        now = published or datetime.fromtimestamp(self._modified_at(), config.current.tz)
+        prices = self.state.tier_prices(base_rate)
+        payload = {
+            'base_rate': base_rate,
+            'yuan_rate': self.state.yuan_rate,
+            'yuan_rate_source': self.state.yuan_rate_source,
+            'tiers': [
+                {'label': label, 'max_amount': limit, 'price': price}
+                for (label, limit, _), price in zip(self.price_tiers, prices)
+            ],
+            'published_at': published.isoformat() if published else None,
+            'message': self.state.format_message(base_rate, now=now),
+        }
+        return _json(200, payload, self._modified_at())
+
+    def _message(self, query: dict) -> Representation:
+        base_rate = self.state.last_calculated_rate
+        if not base_rate:
+            return Representation(404, 'نرخی محاسبه نشده است'.encode('utf-8'),
+                                  'text/plain; charset=utf-8', self._modified_at())
+        now = self._published_at() or datetime.fromtimestamp(self._modified_at(), config.current.tz)
+        body = self.state.format_message(base_rate, now=now).encode('utf-8')
+        return Representation(200, body, 'text/plain; charset=utf-8', self._modified_at())
+
+    def _base_rate(self, query: dict) -> Representation:
+        tick = next((t for t in reversed(self.state.stats.ticks()) if t[2] is not None), None)
+        if tick is None:
+            return _json(404, {'error': 'نرخی محاسبه نشده است'}, self._modified_at())
+        ts, tether_price, base_rate = tick
+        payload = {
+            'base_rate': base_rate,
+            'tether_price': tether_price,
+            'yuan_rate': self.state.yuan_rate,
+            'at': datetime.fromtimestamp(ts, config.current.tz).isoformat(),
+        }
+        return _json(200, payload, ts)
+
+    def _ticks(self, query: dict) -> list:
+        start = _parse_time((query.get('from') or [None])[0])
+        end = _parse_time((query.get('to') or [None])[0])
+        return self.state.stats.ticks(start, end)
+
+    def _history(self, query: dict) -> Representation:
+        if (query.get('format') or ['json'])[0] == 'csv':
+            return self._history_csv(query)
+        ticks = self._ticks(query)
+        tz = config.current.tz
+        payload = [
+            {
+                'ts': ts,
+                'at': datetime.fromtimestamp(ts, tz).isoformat(),
+                'tether_price': tether_price,
+                'base_rate': base_rate,
+            }
+            for ts, tether_price, base_rate in ticks
+        ]
+        return _json(200, payload, ticks[-1][0] if ticks else self._modified_at())
+
+    def _history_csv(self, query: dict) -> Representation:
+        ticks = self._ticks(query)
+        tz = config.current.tz
+        stream = io.StringIO()
+        writer = csv.writer(stream, lineterminator='\n')
+        writer.writerow(('ts', 'at', 'tether_price', 'base_rate'))
+        for ts, tether_price, base_rate in ticks:
+            writer.writerow((ts, datetime.fromtimestamp(ts, tz).isoformat(), tether_price,
+                             '' if base_rate is None else base_rate))
+        return Representation(200, stream.getvalue().encode('utf-8'), 'text/csv; charset=utf-8',
+                              ticks[-1][0] if ticks else self._modified_at())
+
+    # پاسخ‌دهی
+
+    def lookup(self, target: str) -> Representation:
+        """
+        پاسخ آماده یک مسیر (ساخت دوباره فقط پس از تغییر نسخه)
+
+        KeyError برای مسیر ناشناخته و ValueError برای query نامعتبر
+        """
+        version = self.version()
+        if version != self._cache_version:
+            self._cache.clear()
+            self._cache_version = version
+        representation = self._cache.get(target)
+        if representation is not None:
+            return representation
+
+        parts = urlsplit(target)
+        route = self._routes[parts.path.rstrip('/') or '/']
+        representation = route(parse_qs(parts.query))
+        self.builds += 1
+        if len(self._cache) >= self.cache_size:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[target] = representation
+        return representation
+
+    def respond(self, method: str, target: str, headers: Dict[str, str]) -> Tuple[int, bytes, bytes]:
+        """(وضعیت، سربرگ‌ها، بدنه) برای یک درخواست"""
+        self.requests += 1
+        if method not in ('GET', 'HEAD'):
+            return 405, b"Allow: GET, HEAD\r\nContent-Length: 0\r\n", b''
+        try:
+            representation = self.lookup(target)
+        except KeyError:
+            return 404, b"Content-Length: 0\r\n", b''
+        except ValueError as e:
+            body = str(e).encode('utf-8')
+            return 400, b"Content-Type: text/plain; charset=utf-8\r\nContent-Length: %d\r\n" % len(body), body
+        if representation.status == 200 and representation.matches(headers):
+            self.not_modified += 1
+            return 304, representation.not_modified, b''
+        body = b'' if method == 'HEAD' else representation.body
+        return representation.status, representation.head, body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), RATE_API_IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                try:
+                    method, target, protocol = line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers: Dict[str, str] = {}
+                too_large = False
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    if len(headers) >= _MAX_HEADERS:
+                        too_large = True
+                        continue
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = (
+                    protocol == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                    and not too_large
+                )
+                if too_large:
+                    status, head, body = 431, b"Content-Length: 0\r\n", b''
+                else:
+                    status, head, body = self.respond(method, target, headers)
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n".encode('latin-1') + head
+                    + (b"Connection: keep-alive\r\n\r\n" if keep_alive else b"Connection: close\r\n\r\n")
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            # قطع اتصال یا خط بیش از حد طولانی
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def start(self, host: str = RATE_API_HOST, port: int = RATE_API_PORT):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        logger.info("API نرخ روی http://%s:%d/v1/rate", host, self.port)
+
+    @property
+    def port(self) -> Optional[int]:
+        if not self._server or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            # اتصال‌های keep-alive باز منتظر درخواست بعدی نمی‌مانند
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -1,52 +1,62 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-اسکریپت یادآوری برای درخواست نرخ یوآن
-این اسکریپت از ساعت 10:45 صبح شروع به ارسال یادآوری می‌کند
+یادآوری برای درخواست نرخ یوآن
+
+از ساعت 10:45 صبح (قابل تنظیم) هر چند دقیقه یک بار یادآوری ارسال می‌شود
+تا زمانی که نرخ یوآن همان روز با /setrate ثبت شود. یادآوری‌های بعدی
+تشدید می‌شوند (منشن ادمین‌ها و سنجاق کردن پیام). قبل از هر یادآوری منابع
+خودکار نرخ (yuan_rates.py) بررسی می‌شوند و در صورت یافتن نرخ، یادآوری لازم نیست.
+
+- در ربات اصلی (bot.py) به صورت task داخل همان فرآیند اجرا می‌شود
+- اجرای مستقیم این فایل فقط یک یادآوری (در صورت نیاز) ارسال می‌کند
+
+وضعیت یادآوری در همان data.json ربات نگهداری و قبل از هر یادآوری دوباره
+خوانده می‌شود، بنابراین ربات و اجرای مستقیم این اسکریپت روی همان سرور
+یادآوری تکراری ارسال نمی‌کنند.
 """
 
-import os
 import asyncio
 import logging
-from datetime import datetime
+from functools import partial
+from datetime import datetime, time, timedelta
+from typing import Awaitable, Callable, List, Optional
 
-import pytz
 from dotenv import load_dotenv
 from telegram import Bot
+from telegram.helpers import escape_markdown
 
 # بارگذاری متغیرهای محیطی
 load_dotenv()
 
+from logging_utils import setup_logging
+from config import config, Settings
+from http_pool import pool
+
 # تنظیمات لاگ
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-# تنظیمات Bot
-BOT_TOKEN = os.getenv('BOT_TOKEN')
-TARGET_GROUP_ID = os.getenv('TARGET_GROUP_ID')
-TIMEZONE = pytz.timezone(os.getenv('TIMEZONE', 'Asia/Tehran'))
 
-
-async def send_reminder():
+def build_reminder_message(
+    now: datetime,
+    count: int = 0,
+    admin_mentions: Optional[List[str]] = None,
+) -> str:
     """
-    ارسال پیام یادآوری برای دریافت نرخ یوآن
+    ساخت متن یادآوری (Markdown)
+
+    count: تعداد یادآوری‌های قبلی همین روز
+    admin_mentions: منشن ادمین‌ها در یادآوری‌های تشدید شده
     """
-    try:
-        if not all([BOT_TOKEN, TARGET_GROUP_ID]):
-            logger.error("❌ تنظیمات ناقص است!")
-            return
-        
-        # زمان فعلی
-        current_time = datetime.now(TIMEZONE).strftime("%H:%M")
-        
-        # ایجاد پیام یادآوری
-        message = f"""
-🔔 **یادآوری: ارسال نرخ یوآن**
+    title = "🔔 **یادآوری: ارسال نرخ یوآن**"
+    if count:
+        title = f"🔔 **یادآوری ({count + 1}): ارسال نرخ یوآن**"
 
-⏰ زمان: {current_time}
+    message = f"""
+{title}
+
+⏰ زمان: {now.strftime("%H:%M")}
 
 لطفاً نرخ تبدیل تتر به یوآن را از طریق دستور /setrate ارسال کنید.
 
@@ -55,24 +65,244 @@ async def send_reminder():
 
 ⚠️ این یادآوری تا دریافت نرخ جدید ادامه خواهد داشت.
 """
-        
-        # ارسال به گروه
-        bot = Bot(BOT_TOKEN)
-        await bot.send_message(
-            chat_id=TARGET_GROUP_ID, 
+    if admin_mentions:
+        message += f"\n👥 {' '.join(admin_mentions)}\n"
+    return message
+
+
+class ReminderLoop:
+    """
+    حلقه یادآوری داخل ربات
+
+    state: نمونه TetherBot (منبع مشترک وضعیت و ذخیره‌سازی)
+    با notify_rate_set() حلقه فوراً بیدار شده و یادآوری‌های روز متوقف می‌شود.
+    پارامترهای داده نشده از config.current (REMINDER_*) خوانده می‌شوند.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        state,
+        chat_id,
+        start: Optional[time] = None,
+        end: Optional[time] = None,
+        interval_minutes: Optional[int] = None,
+        escalate_after: Optional[int] = None,
+        pin_after: Optional[int] = None,
+        tz=None,
+        clock: Optional[Callable[[], datetime]] = None,
+        skip_day: Optional[Callable] = None,
+        refresh_rate: Optional[Callable[[], Awaitable]] = None,
+        save: Optional[Callable[[], None]] = None,
+    ):
+        settings = config.current
+        self.bot = bot
+        self.state = state
+        self.chat_id = chat_id
+        self.start = start or settings.reminder_start
+        self.end = end or settings.reminder_end
+        self.interval = timedelta(minutes=interval_minutes or settings.reminder_interval_minutes)
+        self.escalate_after = settings.reminder_escalate_after if escalate_after is None else escalate_after
+        self.pin_after = settings.reminder_pin_after if pin_after is None else pin_after
+        self.tz = tz or settings.tz
+        self._clock = clock or (lambda: datetime.now(self.tz))
+        # تابعی که برای روزهای تعطیل True برمی‌گرداند
+        self._skip_day = skip_day
+        # خواندن نرخ از منابع خودکار قبل از ارسال یادآوری (yuan_rates)
+        self._refresh_rate = refresh_rate
+        # ذخیره وضعیت یادآوری (پیش‌فرض: ذخیره کامل state)
+        self._save = save or state.save_data
+        self._wakeup = asyncio.Event()
+
+    def notify_rate_set(self):
+        """اعلام ثبت نرخ یوآن جدید (از /setrate)"""
+        self._wakeup.set()
+
+    def configure(self, settings: Settings):
+        """اعمال تنظیمات جدید (بارگذاری مجدد config) و محاسبه دوباره زمان یادآوری بعدی"""
+        self.chat_id = settings.target_group_id
+        self.start = settings.reminder_start
+        self.end = settings.reminder_end
+        self.interval = timedelta(minutes=settings.reminder_interval_minutes)
+        self.escalate_after = settings.reminder_escalate_after
+        self.pin_after = settings.reminder_pin_after
+        self.tz = settings.tz
+        self._wakeup.set()
+
+    def _day_bounds(self, now: datetime):
+        start = self.tz.localize(datetime.combine(now.date(), self.start))
+        end = self.tz.localize(datetime.combine(now.date(), self.end))
+        return start, end
+
+    def _today_state(self, now: datetime) -> dict:
+        """وضعیت یادآوری امروز (در صورت تغییر روز، بازنشانی می‌شود)"""
+        today = now.date().isoformat()
+        if self.state.reminder.get('date') != today:
+            self.state.reminder = {'date': today, 'count': 0}
+        return self.state.reminder
+
+    def next_due(self, now: datetime) -> Optional[datetime]:
+        """
+        زمان یادآوری بعدی؛ None یعنی امروز یادآوری دیگری لازم نیست
+        """
+        if self.state.has_fresh_yuan_rate(now.date()):
+            return None
+        if self._skip_day and self._skip_day(now.date()):
+            return None
+        start, end = self._day_bounds(now)
+        reminder = self._today_state(now)
+        due = start
+        if reminder.get('last_sent'):
+            due = max(due, datetime.fromisoformat(reminder['last_sent']) + self.interval)
+        if due > end:
+            return None
+        return due
+
+    def _next_day_start(self, now: datetime) -> datetime:
+        start, _ = self._day_bounds(now + timedelta(days=1))
+        return start
+
+    async def _admin_mentions(self) -> List[str]:
+        try:
+            admins = await self.bot.get_chat_administrators(self.chat_id)
+        except Exception as e:
+            logger.warning("دریافت ادمین‌های گروه ممکن نشد: %s", e)
+            return []
+        mentions = []
+        for member in admins:
+            user = member.user
+            if user.is_bot:
+                continue
+            if user.username:
+                mentions.append(escape_markdown(f"@{user.username}"))
+            else:
+                name = escape_markdown(user.first_name or 'ادمین')
+                mentions.append(f"[{name}](tg://user?id={user.id})")
+        return mentions
+
+    async def send_due_reminder(self, now: datetime) -> bool:
+        """
+        ارسال یادآوری اگر زمان آن رسیده باشد
+
+        وضعیت یادآوری قبل از تصمیم از data.json خوانده (یادآوری فرآیند دیگر)
+        و پیش از ارسال ذخیره می‌شود تا حتی پس از crash یادآوری تکراری ارسال نشود.
+        """
+        self.state.reload_reminder()
+        due = self.next_due(now)
+        if due is None or due > now:
+            return False
+        if self._refresh_rate:
+            try:
+                await self._refresh_rate()
+            except Exception as e:
+                logger.warning("خواندن نرخ یوآن از منابع خودکار ممکن نشد: %s", e)
+            if self.state.has_fresh_yuan_rate(now.date()):
+                logger.info("نرخ یوآن از منبع خودکار دریافت شد - یادآوری لازم نیست")
+                return False
+
+        reminder = self._today_state(now)
+        count = reminder.get('count', 0)
+        reminder['count'] = count + 1
+        reminder['last_sent'] = now.isoformat()
+        self._save()
+
+        mentions = await self._admin_mentions() if count >= self.escalate_after else None
+        message = build_reminder_message(now, count, mentions)
+        sent = await self.bot.send_message(
+            chat_id=self.chat_id,
             text=message,
             parse_mode='Markdown'
         )
-        
-        logger.info("✅ یادآوری ارسال شد!")
+        logger.info("✅ یادآوری %d ارسال شد", count + 1)
+
+        if count >= self.pin_after and not reminder.get('pinned_message_id'):
+            try:
+                await self.bot.pin_chat_message(self.chat_id, sent.message_id)
+                reminder['pinned_message_id'] = sent.message_id
+                self._save()
+            except Exception as e:
+                logger.warning("سنجاق کردن یادآوری ممکن نشد: %s", e)
+        return True
+
+    async def _unpin(self):
+        message_id = self.state.reminder.pop('pinned_message_id', None)
+        if message_id is None:
+            return
+        self._save()
+        try:
+            await self.bot.unpin_chat_message(self.chat_id, message_id)
+        except Exception as e:
+            logger.warning("برداشتن سنجاق یادآوری ممکن نشد: %s", e)
+
+    async def run(self):
+        """اجرای دائمی حلقه یادآوری"""
+        logger.info("حلقه یادآوری شروع شد")
+        while True:
+            now = self._clock()
+            try:
+                if self.state.has_fresh_yuan_rate(now.date()):
+                    await self._unpin()
+                await self.send_due_reminder(now)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("❌ خطا در ارسال یادآوری: %s", e, exc_info=True)
+
+            now = self._clock()
+            due = self.next_due(now)
+            wake_at = due if due is not None else self._next_day_start(now)
+            timeout = max((wake_at - now).total_seconds(), 1.0)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+                if self.state.has_fresh_yuan_rate(self._clock().date()):
+                    logger.info("نرخ یوآن ثبت شد - یادآوری‌های امروز متوقف شد")
+            except asyncio.TimeoutError:
+                pass
+
+
+async def send_reminder():
+    """
+    ارسال یک یادآوری (اجرای مستقیم / GitHub Actions)
+
+    اگر نرخ امروز ثبت شده یا یادآوری قبلی هنوز در بازه باشد، ارسال نمی‌شود.
+    """
+    try:
+        settings = config.current
+        if not all([settings.bot_token, settings.target_group_id]):
+            logger.error("❌ تنظیمات ناقص است!")
+            return
+
+        from bot import bot_instance
+        from jalali_calendar import skip_closed_day
+        from yuan_rates import close_service, refresh_yuan_rate
+
+        bot = pool.create_bot(settings.bot_token)
+        loop = ReminderLoop(
+            bot, bot_instance, settings.target_group_id, skip_day=skip_closed_day,
+            refresh_rate=partial(refresh_yuan_rate, bot_instance),
+            # فقط کلید reminder در data.json نوشته می‌شود (ربات ممکن است همزمان در حال اجرا باشد)
+            save=bot_instance.save_reminder,
+        )
+        now = datetime.now(settings.tz)
+        # در اجرای دستی، محدوده ساعت شروع نادیده گرفته می‌شود
+        loop.start = min(loop.start, now.time())
+
+        try:
+            sent = await loop.send_due_reminder(now)
+        finally:
+            await close_service()
+            await pool.close()
+        if not sent:
+            logger.info("یادآوری لازم نیست (نرخ ثبت شده یا یادآوری اخیراً ارسال شده)")
+            return
+
         print("\n" + "="*50)
         print("✅ یادآوری ارسال شد!")
         print("="*50)
-        print(message)
-        print("="*50)
-        
+
     except Exception as e:
-        logger.error(f"❌ خطا در ارسال یادآوری: {e}", exc_info=True)
+        logger.error("❌ خطا در ارسال یادآوری: %s", e, exc_info=True)
 
 
 if __name__ == '__main__':
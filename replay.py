@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+بازپخش سریع پیام‌های ضبط شده کانال منبع از مسیر واقعی محاسبه
+
+هر tick از همان خط لوله ربات (pipeline.Pipeline) عبور می‌کند:
+    source → parse → compute → policy → render → sink
+منبع، پیام‌های ضبط شده را از آخرین شناسه پردازش شده می‌خواند و مقصد،
+TelegramSink با Bot جعلی است.
+
+ساعت مجازی و Bot/Telethon جعلی باعث می‌شوند ماه‌ها داده در چند ثانیه
+و بدون اتصال به اینترنت بازپخش شود. خروجی شامل توان عملیاتی (tick در ثانیه)،
+زمان هر مرحله و دنباله دقیق پیام‌هایی است که منتشر می‌شدند.
+
+فرمت ورودی:
+- JSON Lines: هر خط {"date": "...", "text": "..."}؛ خطوط
+  {"date": "...", "yuan_rate": 7.12} معادل /setrate در آن لحظه هستند
+- خروجی JSON تلگرام دسکتاپ (result.json با کلید messages)
+
+اجرا:
+    python replay.py recorded.jsonl --yuan-rate 7.12
+    python replay.py result.json --mode posts --out published.txt
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bot import TetherBot
+from config import config
+from pipeline import PUBLISHED, STAGES, SUPPRESSED, Pipeline, Source, SourceMessage, Tenant
+from publish_policy import PublishPolicy
+from sinks import SinkDispatcher, TelegramSink
+from auto_fetcher import fetch_new_messages
+
+TIMEZONE = config.current.tz
+
+
+@dataclass
+class RecordedPost:
+    """یک رویداد ضبط شده: پیام کانال یا تنظیم نرخ یوآن"""
+    date: datetime
+    text: Optional[str] = None
+    yuan_rate: Optional[float] = None
+    id: int = 0
+
+
+@dataclass
+class PublishedMessage:
+    """پیامی که در بازپخش منتشر شد"""
+    at: datetime
+    chat_id: object
+    text: str
+
+
+@dataclass
+class ReplayReport:
+    """نتیجه بازپخش"""
+    ticks: int = 0
+    messages: int = 0
+    published: List[PublishedMessage] = field(default_factory=list)
+    stage_seconds: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(STAGES, 0.0))
+    skipped: int = 0
+    suppressed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def ticks_per_second(self) -> float:
+        return self.ticks / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        lines = [
+            f"📊 tick: {self.ticks:,} | پیام: {self.messages:,} | منتشر شده: {len(self.published):,} | "
+            f"رد شده: {self.skipped:,} | حذف با سیاست انتشار: {self.suppressed:,}",
+            f"⏱️ زمان کل: {self.elapsed:.3f} ثانیه ({self.ticks_per_second:,.0f} tick/s)",
+        ]
+        for stage in STAGES:
+            total = self.stage_seconds[stage]
+            per_tick = total / self.ticks * 1e6 if self.ticks else 0.0
+            lines.append(f"   {stage:<10} {total * 1000:10.2f} ms  ({per_tick:8.2f} µs/tick)")
+        return '\n'.join(lines)
+
+
+class VirtualClock:
+    """ساعت مجازی که فقط با advance جلو می‌رود"""
+
+    def __init__(self, start: datetime):
+        self._now = start
+
+    def now(self) -> datetime:
+        return self._now
+
+    def advance(self, to: datetime):
+        if to > self._now:
+            self._now = to
+
+
+class FakeBot:
+    """جایگزین telegram.Bot که پیام‌ها را به جای ارسال ثبت می‌کند"""
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self.sent: List[PublishedMessage] = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(PublishedMessage(self.clock.now(), chat_id, text))
+
+
+class _FakeMessage:
+    def __init__(self, post: RecordedPost):
+        self.id = post.id
+        self.date = post.date
+        self.text = post.text
+
+
+class FakeTelethonClient:
+    """
+    جایگزین TelegramClient که پیام‌های ضبط شده را تا زمان ساعت مجازی برمی‌گرداند
+    """
+
+    def __init__(self, posts: List[RecordedPost], clock: VirtualClock):
+        self._posts = [p for p in posts if p.text is not None]
+        self._dates = [p.date for p in self._posts]
+        self._ids = [p.id for p in self._posts]
+        self.clock = clock
+
+    async def get_messages(self, channel, limit=1, min_id=0, reverse=False):
+        # مثل Telethon: پیش‌فرض جدیدترین پیام‌ها اول؛ reverse یعنی قدیمی‌ترین اول
+        end = bisect_right(self._dates, self.clock.now())
+        if reverse:
+            start = bisect_right(self._ids, min_id, 0, end)
+            return [_FakeMessage(p) for p in self._posts[start:min(end, start + limit)]]
+        visible = self._posts[max(0, end - limit):end]
+        return [_FakeMessage(p) for p in reversed(visible) if p.id > min_id]
+
+
+def _parse_date(value: str) -> datetime:
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = TIMEZONE.localize(moment)
+    return moment.astimezone(TIMEZONE)
+
+
+def _export_text(text) -> str:
+    """متن پیام در خروجی تلگرام دسکتاپ می‌تواند لیستی از entityها باشد"""
+    if isinstance(text, list):
+        return ''.join(part if isinstance(part, str) else part.get('text', '') for part in text)
+    return text or ''
+
+
+def load_recording(path: str) -> List[RecordedPost]:
+    """بارگذاری پیام‌های ضبط شده (JSON Lines یا خروجی تلگرام دسکتاپ)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    posts: List[RecordedPost] = []
+    stripped = content.lstrip()
+    if stripped.startswith('{') and '"messages"' in stripped[:2000]:
+        export = json.loads(content)
+        for item in export.get('messages', []):
+            if item.get('type', 'message') != 'message':
+                continue
+            posts.append(RecordedPost(
+                date=_parse_date(item['date']),
+                text=_export_text(item.get('text')),
+                id=int(item.get('id', 0)),
+            ))
+    else:
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            posts.append(RecordedPost(
+                date=_parse_date(item['date']),
+                text=item.get('text'),
+                yuan_rate=item.get('yuan_rate'),
+                id=int(item.get('id', 0)),
+            ))
+
+    return _number_posts(posts)
+
+
+def _number_posts(posts: List[RecordedPost]) -> List[RecordedPost]:
+    """مرتب‌سازی زمانی و اختصاص شناسه به پیام‌های بدون شناسه"""
+    posts.sort(key=lambda p: p.date)
+    for index, post in enumerate(posts, start=1):
+        if not post.id:
+            post.id = index
+    return posts
+
+
+def hourly_slots(start: datetime, end: datetime, first_hour: int = 11, last_hour: int = 19):
+    """زمان‌های اجرای برنامه‌ریزی شده (هر ساعت از 11 تا 19) بین دو تاریخ"""
+    day = start.date()
+    while day <= end.date():
+        for hour in range(first_hour, last_hour + 1):
+            slot = TIMEZONE.localize(datetime(day.year, day.month, day.day, hour))
+            if start <= slot <= end:
+                yield slot
+        day += timedelta(days=1)
+
+
+class ReplaySource(Source):
+    """پیام‌های ضبط شده از آخرین شناسه پردازش شده (مثل ChannelSource در auto_fetcher)"""
+
+    name = 'replay'
+
+    def __init__(self, client: FakeTelethonClient):
+        self.client = client
+        # شناسه آخرین پیام پردازش شده
+        self.cursor = 0
+        self.read_count = 0
+
+    async def read(self) -> List[SourceMessage]:
+        messages = await fetch_new_messages(self.client, self.name, self.cursor)
+        self.read_count += len(messages)
+        return [SourceMessage(m.text, m.date.timestamp(), m.id) for m in messages]
+
+    def commit(self, tick):
+        self.cursor = max(self.cursor, max(m.id for m in tick.messages))
+
+
+class ReplayEngine:
+    """
+    موتور بازپخش
+
+    mode='schedule': در هر ساعت برنامه‌ریزی شده آخرین پیام کانال خوانده می‌شود
+                     (رفتار auto_fetcher در GitHub Actions)
+    mode='posts':    هر پیام کانال یک tick است
+    policy: سیاست انتشار (None یعنی انتشار همه tickها، مثل force)
+    """
+
+    def __init__(
+        self,
+        posts: List[RecordedPost],
+        yuan_rate: Optional[float] = None,
+        mode: str = 'schedule',
+        chat_id: object = 'replay',
+        policy: Optional[PublishPolicy] = None,
+    ):
+        if mode not in ('schedule', 'posts'):
+            raise ValueError(f"حالت نامعتبر: {mode}")
+        self.posts = _number_posts(list(posts))
+        self.mode = mode
+        self.chat_id = chat_id
+        start = self.posts[0].date if self.posts else datetime.now(TIMEZONE)
+        self.clock = VirtualClock(start)
+        self.bot = FakeBot(self.clock)
+        self.client = FakeTelethonClient(self.posts, self.clock)
+        self.source = ReplaySource(self.client)
+        self.state = TetherBot(data_file=None)
+        self.state.yuan_rate = yuan_rate
+        self.force = policy is None
+        self.policy = policy if policy is not None else PublishPolicy(self.state.publish_state)
+
+    def _tick_times(self) -> List[datetime]:
+        if not self.posts:
+            return []
+        if self.mode == 'posts':
+            return [p.date for p in self.posts if p.text is not None]
+        return list(hourly_slots(self.posts[0].date, self.posts[-1].date))
+
+    async def run(self) -> ReplayReport:
+        """اجرای بازپخش کامل از مسیر واقعی خط لوله (pipeline.py)"""
+        report = ReplayReport()
+        rate_events = [p for p in self.posts if p.yuan_rate is not None]
+        rate_index = 0
+        dispatcher = SinkDispatcher([TelegramSink(self.bot, self.chat_id, retries=0)])
+        tenant = Tenant('replay', self.state, self.policy, dispatcher=lambda: dispatcher)
+        timings = report.stage_seconds
+
+        started = time.perf_counter()
+        await dispatcher.start()
+        try:
+            async with Pipeline(clock=self.clock.now) as pipeline:
+                for moment in self._tick_times():
+                    self.clock.advance(moment)
+                    while rate_index < len(rate_events) and rate_events[rate_index].date <= moment:
+                        self.state.set_yuan_rate(rate_events[rate_index].yuan_rate, now=moment)
+                        rate_index += 1
+                    report.ticks += 1
+                    outcome = await pipeline.run(self.source, tenant, force=self.force)
+                    for stage, seconds in outcome.stage_seconds.items():
+                        timings[stage] += seconds
+                    if outcome.status == PUBLISHED:
+                        # ارسال با ساعت مجازی همین tick
+                        t0 = time.perf_counter()
+                        await dispatcher.flush()
+                        timings['sink'] += time.perf_counter() - t0
+                    elif outcome.status == SUPPRESSED:
+                        report.suppressed += 1
+                    else:
+                        report.skipped += 1
+        finally:
+            await dispatcher.close()
+        report.elapsed = time.perf_counter() - started
+        report.messages = self.source.read_count
+        report.published = self.bot.sent
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="بازپخش پیام‌های ضبط شده کانال منبع")
+    parser.add_argument('recording', help="فایل JSON Lines یا result.json تلگرام دسکتاپ")
+    parser.add_argument('--yuan-rate', type=float, help="نرخ یوآن اولیه")
+    parser.add_argument('--mode', choices=('schedule', 'posts'), default='schedule')
+    parser.add_argument('--out', help="ذخیره پیام‌های منتشر شده در فایل")
+    parser.add_argument('--policy', action='store_true',
+                        help="اعمال سیاست انتشار (تنظیمات PUBLISH_* از config)")
+    parser.add_argument('--quiet', action='store_true', help="غیرفعال کردن لاگ مراحل")
+    args = parser.parse_args(argv)
+
+    if args.quiet:
+        import logging
+        logging.disable(logging.WARNING)
+
+    posts = load_recording(args.recording)
+    policy = PublishPolicy() if args.policy else None
+    engine = ReplayEngine(posts, yuan_rate=args.yuan_rate, mode=args.mode, policy=policy)
+    report = asyncio.run(engine.run())
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            for item in report.published:
+                f.write(f"--- {item.at.isoformat()} ---\n{item.text}\n")
+
+    print(report.summary())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+کش پاسخ‌های از پیش ساخته شده برای دستورات فقط‌خواندنی ربات
+
+هر پاسخ با نسخه وضعیت ربات (state_version) کلید می‌خورد و فقط وقتی
+دوباره ساخته می‌شود که نسخه تغییر کند یا (برای پاسخ‌های دارای ساعت)
+دقیقه عوض شود. نسخه می‌تواند tuple چند شمارنده هم باشد (بخش پویای
+/status). در حالت hit هیچ کار قالب‌بندی انجام نمی‌شود.
+"""
+
+import time
+from typing import Callable, Dict, Hashable, Tuple
+
+
+class ReplyCache:
+    """کش پاسخ دستورات بر اساس نسخه وضعیت"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._entries: Dict[str, Tuple[Hashable, int, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self,
+        key: str,
+        version: Hashable,
+        render: Callable[[], str],
+        per_minute: bool = False,
+    ) -> str:
+        """
+        پاسخ کش شده یا ساخت دوباره آن با render()
+
+        per_minute: پاسخ شامل ساعت است و باید هر دقیقه تازه شود
+        """
+        stamp = int(self._clock() // 60) if per_minute else 0
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version and entry[1] == stamp:
+            self.hits += 1
+            return entry[2]
+
+        self.misses += 1
+        text = render()
+        self._entries[key] = (version, stamp, text)
+        return text
+
+    def clear(self):
+        """حذف همه پاسخ‌های کش شده"""
+        self._entries.clear()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+موتور آمار لحظه‌ای پنجره‌های زمانی (۱ ساعت / ۲۴ ساعت)
+
+برای هر سری (قیمت تتر و نرخ مبنا) و هر پنجره:
+- میانگین و واریانس با الگوریتم Welford قابل حذف: به‌روزرسانی O(1)
+- کمینه و بیشینه با صف‌های یکنوا: O(1) سرشکن
+- میانه با دو heap و حذف تنبل: O(log n)
+
+هیچ مقداری در هنگام پرس‌وجو از ابتدا محاسبه نمی‌شود. همین موتور برای رد کردن
+قیمت‌های پرت (اختلاف زیاد با میانه کوتاه‌ترین پنجره) قبل از calculate_base_rate
+استفاده می‌شود. قیمت‌های رد شده در یک بافر نامزد نگه داشته می‌شوند؛ اگر
+STATS_CONFIRM_SAMPLES قیمت پرت پشت سر هم با هم (در STATS_CONFIRM_PCT درصد) همخوان
+باشند، سطح جدید واقعی است و پذیرفته می‌شود.
+"""
+
+import os
+import math
+import heapq
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+STATS_MAX_DEVIATION_PCT = float(os.getenv('STATS_MAX_DEVIATION_PCT', '5'))
+STATS_MIN_SAMPLES = int(os.getenv('STATS_MIN_SAMPLES', '3'))
+# تعداد قیمت پرت همخوان پشت سر هم برای پذیرش سطح جدید (0 = غیرفعال)
+STATS_CONFIRM_SAMPLES = int(os.getenv('STATS_CONFIRM_SAMPLES', '3'))
+# حداکثر اختلاف قیمت‌های نامزد با میانه بافر نامزد (درصد)
+STATS_CONFIRM_PCT = float(os.getenv('STATS_CONFIRM_PCT', '1'))
+
+# پنجره‌ها: نام ← طول (ثانیه)
+WINDOWS = {'1h': 3600, '24h': 86400}
+SERIES = ('tether', 'base_rate')
+
+
+class _RollingMedian:
+    """میانه پنجره لغزان با دو heap و حذف تنبل"""
+
+    def __init__(self):
+        self._low: list = []    # max-heap: (-value, seq)
+        self._high: list = []   # min-heap: (value, seq)
+        self._low_n = 0
+        self._high_n = 0
+        self._side: Dict[int, bool] = {}   # seq → True اگر در low باشد
+        self._dead: set = set()
+
+    def _prune(self, heap: list):
+        while heap and heap[0][1] in self._dead:
+            self._dead.discard(heapq.heappop(heap)[1])
+
+    def _rebalance(self):
+        self._prune(self._low)
+        self._prune(self._high)
+        if self._low_n > self._high_n + 1:
+            value, seq = heapq.heappop(self._low)
+            heapq.heappush(self._high, (-value, seq))
+            self._side[seq] = False
+            self._low_n -= 1
+            self._high_n += 1
+        elif self._high_n > self._low_n:
+            value, seq = heapq.heappop(self._high)
+            heapq.heappush(self._low, (-value, seq))
+            self._side[seq] = True
+            self._high_n -= 1
+            self._low_n += 1
+        self._prune(self._low)
+        self._prune(self._high)
+
+    def add(self, value: float, seq: int):
+        if not self._low_n or value <= -self._low[0][0]:
+            heapq.heappush(self._low, (-value, seq))
+            self._side[seq] = True
+            self._low_n += 1
+        else:
+            heapq.heappush(self._high, (value, seq))
+            self._side[seq] = False
+            self._high_n += 1
+        self._rebalance()
+
+    def remove(self, seq: int):
+        in_low = self._side.pop(seq)
+        self._dead.add(seq)
+        if in_low:
+            self._low_n -= 1
+        else:
+            self._high_n -= 1
+        self._rebalance()
+
+    def median(self) -> Optional[float]:
+        if not self._low_n:
+            return None
+        if self._low_n > self._high_n:
+            return -self._low[0][0]
+        return (-self._low[0][0] + self._high[0][0]) / 2
+
+
+class RollingWindow:
+    """آمار یک سری در یک پنجره زمانی لغزان"""
+
+    def __init__(self, span_seconds: float):
+        self.span = span_seconds
+        self._items: deque = deque()   # (ts, seq, value)
+        self._min: deque = deque()     # صف یکنوای صعودی
+        self._max: deque = deque()     # صف یکنوای نزولی
+        self._median = _RollingMedian()
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, ts: float, value: float, seq: int):
+        self._items.append((ts, seq, value))
+
+        n = len(self._items)
+        delta = value - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (value - self._mean)
+
+        while self._min and self._min[-1][2] >= value:
+            self._min.pop()
+        self._min.append((ts, seq, value))
+        while self._max and self._max[-1][2] <= value:
+            self._max.pop()
+        self._max.append((ts, seq, value))
+
+        self._median.add(value, seq)
+        self.evict(ts)
+
+    def evict(self, now: float):
+        """حذف مقادیر قدیمی‌تر از طول پنجره"""
+        cutoff = now - self.span
+        items = self._items
+        while items and items[0][0] <= cutoff:
+            _, seq, value = items.popleft()
+            n = len(items)
+            if n:
+                delta = value - self._mean
+                self._mean -= delta / n
+                self._m2 -= delta * (value - self._mean)
+            else:
+                self._mean = self._m2 = 0.0
+            if self._min and self._min[0][1] == seq:
+                self._min.popleft()
+            if self._max and self._max[0][1] == seq:
+                self._max.popleft()
+            self._median.remove(seq)
+
+    def snapshot(self) -> Optional[dict]:
+        """آمار فعلی پنجره (None اگر خالی باشد)"""
+        if not self._items:
+            return None
+        n = len(self._items)
+        first = self._items[0][2]
+        last = self._items[-1][2]
+        variance = max(self._m2, 0.0) / (n - 1) if n > 1 else 0.0
+        return {
+            'count': n,
+            'mean': self._mean,
+            'median': self._median.median(),
+            'min': self._min[0][2],
+            'max': self._max[0][2],
+            'stdev': math.sqrt(variance),
+            'change_pct': (last - first) / first * 100 if first else 0.0,
+            'last': last,
+        }
+
+
+class StatsEngine:
+    """آمار لحظه‌ای قیمت تتر و نرخ مبنا در پنجره‌های ۱ و ۲۴ ساعته"""
+
+    def __init__(self, windows: Dict[str, float] = WINDOWS):
+        self.windows = dict(windows)
+        self._horizon = max(self.windows.values())
+        self._series = {
+            name: {label: RollingWindow(span) for label, span in self.windows.items()}
+            for name in SERIES
+        }
+        self._ticks: deque = deque()
+        # قیمت‌های پرت اخیر (نامزد سطح جدید قیمت)
+        self._candidates: List[float] = []
+        self._seq = 0
+        # با هر tick جدید افزایش می‌یابد (برای کش پاسخ /stats)
+        self.version = 0
+
+    def record(self, ts: float, tether_price: float, base_rate: Optional[float] = None):
+        """ثبت یک tick (ts: زمان یونیکس)"""
+        self._seq += 1
+        self.version += 1
+        for window in self._series['tether'].values():
+            window.add(ts, tether_price, self._seq)
+        if base_rate is not None:
+            for window in self._series['base_rate'].values():
+                window.add(ts, base_rate, self._seq)
+        self._ticks.append((ts, tether_price, base_rate))
+        cutoff = ts - self._horizon
+        while self._ticks and self._ticks[0][0] <= cutoff:
+            self._ticks.popleft()
+
+    def snapshot(self, series: str, window: str, now: Optional[float] = None) -> Optional[dict]:
+        """آمار یک سری در یک پنجره"""
+        rolling = self._series[series][window]
+        if now is not None:
+            rolling.evict(now)
+        return rolling.snapshot()
+
+    def is_outlier(
+        self,
+        tether_price: float,
+        now: Optional[float] = None,
+        max_deviation_pct: float = STATS_MAX_DEVIATION_PCT,
+        min_samples: int = STATS_MIN_SAMPLES,
+    ) -> bool:
+        """
+        آیا قیمت با میانه کوتاه‌ترین پنجره بیش از max_deviation_pct درصد اختلاف دارد؟
+
+        تا وقتی نمونه کافی در آن پنجره نباشد هیچ قیمتی رد نمی‌شود. پنجره‌های
+        بلندتر استفاده نمی‌شوند تا میانه قدیمی جلوی سطح جدید قیمت را نگیرد.
+        """
+        if not max_deviation_pct:
+            return False
+        label = min(self.windows, key=self.windows.get)
+        rolling = self._series['tether'][label]
+        if now is not None:
+            rolling.evict(now)
+        if len(rolling) < min_samples:
+            return False
+        median = rolling.snapshot()['median']
+        return abs(tether_price - median) / median * 100 > max_deviation_pct
+
+    def accept(
+        self,
+        tether_price: float,
+        now: Optional[float] = None,
+        confirm: int = STATS_CONFIRM_SAMPLES,
+        tolerance_pct: float = STATS_CONFIRM_PCT,
+    ) -> bool:
+        """
+        پذیرش قیمت: قیمت عادی، یا قیمت پرتی که confirm قیمت پرت همخوان پشت سر هم دارد
+
+        قیمت عادی بافر نامزد را خالی می‌کند (نامزدها باید پشت سر هم باشند).
+        """
+        if not self.is_outlier(tether_price, now):
+            self._candidates.clear()
+            return True
+        if not confirm:
+            return False
+        if self._candidates:
+            level = sorted(self._candidates)[len(self._candidates) // 2]
+            if abs(tether_price - level) / level * 100 > tolerance_pct:
+                self._candidates.clear()
+        self._candidates.append(tether_price)
+        if len(self._candidates) >= confirm:
+            self._candidates.clear()
+            return True
+        return False
+
+    def ticks(self, start: Optional[float] = None, end: Optional[float] = None) -> List[tuple]:
+        """tickهای (زمان، قیمت تتر، نرخ مبنا) در بازه [start, end]"""
+        return [
+            tick for tick in self._ticks
+            if (start is None or tick[0] >= start) and (end is None or tick[0] <= end)
+        ]
+
+    def export(self) -> List[list]:
+        """tickهای پنجره بزرگ‌تر برای ذخیره در data.json"""
+        return [list(tick) for tick in self._ticks]
+
+    def restore(self, ticks: Optional[Iterable]):
+        """بازسازی موتور از tickهای ذخیره شده"""
+        for ts, tether_price, base_rate in ticks or ():
+            self.record(ts, tether_price, base_rate)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تقسیم ارسال پیام بین چند فرآیند worker (برای تعداد زیاد گروه مقصد)
+
+فرآیند اصلی (coordinator) تنها خواننده کانال منبع است و هر tick را از طریق
+صف‌های multiprocessing به workerها می‌دهد. هر worker حلقه asyncio و Bot
+مخصوص خود را دارد و فقط به گروه‌هایی ارسال می‌کند که با consistent hashing
+به آن تعلق دارند؛ بنابراین با اضافه شدن یک worker فقط حدود 1/N گروه‌ها جابه‌جا می‌شوند.
+
+هر worker گروه‌هایی را که یک tick به آن‌ها ارسال شده به خاطر می‌سپارد، پس
+ارسال مجدد همان tick (مثلاً از outbox) به گروه‌های قبلی تکرار نمی‌شود.
+
+پاسخ workerها را یک thread جمع‌آوری و با (tick، دور ارسال) نگه می‌دارد؛ انتظار
+برای یک tick پاسخ tick دیگری را مصرف نمی‌کند و انتظار منقضی شده چیزی را از صف
+برنمی‌دارد. worker هر ارسال موفق را همان لحظه به coordinator اعلام می‌کند؛ workerی
+که از کار بیفتد در حین انتظار با همان نام و سهم گروه‌ها دوباره ساخته می‌شود و
+tickهای بی‌پاسخ همراه با گروه‌هایی که قبلاً دریافت کرده‌اند دوباره به آن داده می‌شوند.
+
+توجه: محدودیت نرخ ارسال Bot API تلگرام برای هر توکن مستقل از تعداد worker است.
+"""
+
+import os
+import time
+import asyncio
+import bisect
+import hashlib
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# تعداد فرآیندهای worker (0 = غیرفعال، ارسال در همان فرآیند ربات)
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '0'))
+# حداکثر ارسال همزمان در هر worker
+SHARD_CONCURRENCY = int(os.getenv('SHARD_CONCURRENCY', '20'))
+# تعداد نقاط مجازی هر worker روی حلقه hash
+SHARD_REPLICAS = int(os.getenv('SHARD_REPLICAS', '100'))
+# تعداد tickهای اخیری که worker برای جلوگیری از ارسال تکراری نگه می‌دارد
+_REMEMBERED_TICKS = 8
+# فاصله بررسی زنده بودن workerها در حین انتظار (ثانیه)
+SHARD_LIVENESS_SECONDS = float(os.getenv('SHARD_LIVENESS_SECONDS', '1'))
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """حلقه consistent hashing با نقاط مجازی"""
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = SHARD_REPLICAS):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        for i in range(self.replicas):
+            point = _hash(f'{node}#{i}')
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+                self._owners[point] = node
+
+    def remove(self, node: str):
+        self._points = [p for p in self._points if self._owners[p] != node]
+        self._owners = {p: n for p, n in self._owners.items() if n != node}
+
+    def owner(self, key) -> str:
+        """worker مسئول یک گروه"""
+        if not self._points:
+            raise LookupError("هیچ workerی روی حلقه نیست")
+        index = bisect.bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._owners[self._points[index]]
+
+    def assign(self, keys: Iterable) -> Dict[str, list]:
+        """تقسیم گروه‌ها بین workerها"""
+        shards: Dict[str, list] = {node: [] for node in set(self._owners.values())}
+        for key in keys:
+            shards[self.owner(key)].append(key)
+        return shards
+
+
+async def _init_bot(bot):
+    initialize = getattr(bot, 'initialize', None)
+    if initialize:
+        await initialize()
+
+
+async def _worker_loop(name: str, inbox, results, bot_factory: Callable, concurrency: int):
+    bot = bot_factory()
+    await _init_bot(bot)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    chats: list = []
+    delivered: OrderedDict = OrderedDict()   # tick → گروه‌های دریافت کننده
+
+    async def send(chat_id, tick: str, tick_chats: set, text: str) -> bool:
+        async with semaphore:
+            try:
+                await bot.send_message(chat_id=chat_id, text=text)
+                tick_chats.add(chat_id)
+                # ثبت فوری تا worker جایگزین دوباره ارسال نکند
+                results.put(('chat', tick, chat_id))
+                return True
+            except Exception as e:
+                logger.warning("%s: ارسال به %s ناموفق بود: %s", name, chat_id, e)
+                return False
+
+    while True:
+        message = await loop.run_in_executor(None, inbox.get)
+        kind = message[0]
+        if kind == 'stop':
+            break
+        if kind == 'assign':
+            chats = message[1]
+            continue
+
+        _, tick, text, round_, skip = message
+        tick_chats = delivered.setdefault(tick, set())
+        tick_chats.update(skip)
+        delivered.move_to_end(tick)
+        while len(delivered) > _REMEMBERED_TICKS:
+            delivered.popitem(last=False)
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(send(chat_id, tick, tick_chats, text) for chat_id in chats if chat_id not in tick_chats)
+        )
+        sent = sum(outcomes)
+        results.put(('done', tick, round_, name, sent, len(outcomes) - sent, time.perf_counter() - started))
+
+    shutdown = getattr(bot, 'shutdown', None)
+    if shutdown:
+        await shutdown()
+
+
+def _worker_main(name: str, inbox, results, bot_factory: Callable, concurrency: int):
+    """نقطه شروع فرآیند worker"""
+    asyncio.run(_worker_loop(name, inbox, results, bot_factory, concurrency))
+
+
+class ShardCoordinator:
+    """
+    مدیریت فرآیندهای worker و تقسیم گروه‌ها بین آن‌ها
+
+    bot_factory باید قابل pickle باشد (مثلاً functools.partial(telegram.Bot, token)).
+    """
+
+    def __init__(
+        self,
+        chat_ids: Iterable,
+        workers: int,
+        bot_factory: Callable,
+        concurrency: int = SHARD_CONCURRENCY,
+        replicas: int = SHARD_REPLICAS,
+    ):
+        self.chat_ids = list(dict.fromkeys(chat_ids))
+        self.initial_workers = workers
+        self.bot_factory = bot_factory
+        self.concurrency = concurrency
+        self.ring = HashRing(replicas=replicas)
+        self._context = multiprocessing.get_context('spawn')
+        self._results = self._context.Queue()
+        self._workers: Dict[str, tuple] = {}   # نام → (فرآیند، صف ورودی)
+        # پاسخ‌ها: (tick، دور) → [(worker، ارسال، ناموفق، ثانیه)]
+        self._acks: Dict[tuple, list] = {}
+        # آخرین دور ارسال هر tick: tick → (دور، متن)
+        self._rounds: OrderedDict = OrderedDict()
+        # گروه‌های دریافت کننده هر tick (اعلام شده توسط workerها)
+        self._delivered: Dict[str, set] = {}
+        self._round = 0
+        self._cond = threading.Condition()
+        # بررسی و جایگزینی workerها در یک thread در هر لحظه
+        self._respawn_lock = threading.Lock()
+        self._collector: Optional[threading.Thread] = None
+        self._next_index = 0
+        self.respawned = 0
+
+    @property
+    def workers(self) -> List[str]:
+        return list(self._workers)
+
+    def start(self):
+        """شروع workerهای اولیه و thread جمع‌آوری پاسخ‌ها"""
+        if self._collector is None:
+            self._collector = threading.Thread(target=self._collect, name='shard-acks', daemon=True)
+            self._collector.start()
+        for _ in range(self.initial_workers - len(self._workers)):
+            self.add_worker()
+
+    def _collect(self):
+        while True:
+            ack = self._results.get()
+            if ack is None:
+                break
+            if ack[0] == 'chat':
+                with self._cond:
+                    if ack[1] in self._rounds:
+                        self._delivered.setdefault(ack[1], set()).add(ack[2])
+                continue
+            _, tick, round_, name, *counts = ack
+            with self._cond:
+                # پاسخ دورهای قدیمی (و tickهای فراموش شده) کنار گذاشته می‌شود
+                if self._rounds.get(tick, (None,))[0] == round_:
+                    self._acks.setdefault((tick, round_), []).append((name, *counts))
+                    self._cond.notify_all()
+
+    def _spawn(self, name: str):
+        inbox = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(name, inbox, self._results, self.bot_factory, self.concurrency),
+            name=name,
+            daemon=True,
+        )
+        process.start()
+        self._workers[name] = (process, inbox)
+
+    def add_worker(self) -> str:
+        """اضافه کردن یک worker و جابه‌جایی سهم گروه‌های آن"""
+        name = f'worker-{self._next_index}'
+        self._next_index += 1
+        self._spawn(name)
+        self.ring.add(name)
+        self._rebalance()
+        logger.info("%s اضافه شد (%d worker)", name, len(self._workers))
+        return name
+
+    def remove_worker(self, name: str):
+        process, inbox = self._workers.pop(name)
+        self.ring.remove(name)
+        inbox.put(('stop',))
+        process.join(timeout=10)
+        self._rebalance()
+
+    def assignments(self) -> Dict[str, list]:
+        return self.ring.assign(self.chat_ids) if self._workers else {}
+
+    def _rebalance(self):
+        for name, chats in self.assignments().items():
+            self._workers[name][1].put(('assign', chats))
+
+    def broadcast(self, tick: str, text: str):
+        """ارسال یک tick به همه workerها (بدون انتظار)؛ هر بار یک دور جدید"""
+        with self._cond:
+            self._round += 1
+            previous = self._rounds.pop(tick, None)
+            if previous:
+                self._acks.pop((tick, previous[0]), None)
+            self._rounds[tick] = (self._round, text)
+            while len(self._rounds) > _REMEMBERED_TICKS:
+                old, (old_round, _) = self._rounds.popitem(last=False)
+                self._acks.pop((old, old_round), None)
+                self._delivered.pop(old, None)
+            round_ = self._round
+        for _, inbox in self._workers.values():
+            inbox.put(('tick', tick, text, round_, frozenset()))
+
+    def _responders(self, tick: str, round_: int) -> set:
+        return {ack[0] for ack in self._acks.get((tick, round_), ())}
+
+    def check_workers(self) -> List[str]:
+        """جایگزینی workerهای از کار افتاده با همان نام، سهم گروه‌ها و tickهای بی‌پاسخ"""
+        with self._respawn_lock:
+            dead = [name for name, (process, _) in list(self._workers.items()) if not process.is_alive()]
+            for name in dead:
+                process, _ = self._workers[name]
+                logger.error("%s از کار افتاد (کد خروج %s)؛ دوباره ساخته می‌شود", name, process.exitcode)
+                self._spawn(name)
+                self.respawned += 1
+                inbox = self._workers[name][1]
+                chats = self.assignments().get(name, [])
+                inbox.put(('assign', chats))
+                with self._cond:
+                    pending = [
+                        (tick, round_, text, frozenset(self._delivered.get(tick, ())).intersection(chats))
+                        for tick, (round_, text) in self._rounds.items()
+                        if name not in self._responders(tick, round_)
+                    ]
+                for tick, round_, text, skip in pending:
+                    inbox.put(('tick', tick, text, round_, skip))
+            return dead
+
+    def wait(self, tick: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        انتظار برای پاسخ همه workerها به آخرین دور ارسال یک tick
+
+        خلاصه ارسال برگردانده می‌شود؛ None اگر تا پایان مهلت همه پاسخ نداده باشند.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            round_ = self._rounds.get(tick, (None,))[0]
+        if round_ is None:
+            return None
+        while True:
+            with self._cond:
+                if self._rounds.get(tick, (None,))[0] != round_:
+                    # دور جدیدتر یا tick فراموش شده (بیش از _REMEMBERED_TICKS tick بعدی)
+                    return None
+                if set(self._workers) <= self._responders(tick, round_):
+                    acks = self._acks.pop((tick, round_), None)
+                    if acks is None:
+                        return None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(min(SHARD_LIVENESS_SECONDS, remaining or SHARD_LIVENESS_SECONDS))
+            self.check_workers()
+
+        return {
+            'sent': sum(a[1] for a in acks),
+            'failed': sum(a[2] for a in acks),
+            'seconds': max(a[3] for a in acks),
+            'workers': len(acks),
+        }
+
+    def stop(self):
+        """توقف همه workerها و thread جمع‌آوری پاسخ‌ها"""
+        for process, inbox in self._workers.values():
+            inbox.put(('stop',))
+        for process, _ in self._workers.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._workers.clear()
+        if self._collector is not None:
+            self._results.put(None)
+            self._collector.join(timeout=10)
+            self._collector = None
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+مقصدهای خروجی پیام نرخ (Telegram، webhook عمومی HTTP و پل واتساپ)
+
+هر مقصد صف محدود، worker، timeout و سیاست تلاش مجدد مخصوص خود را دارد؛
+بنابراین یک مقصد کند (مثلاً پل Node.js واتساپ) ارسال به مقصدهای دیگر را
+به تأخیر نمی‌اندازد. اگر صف یک مقصد پر شود قدیمی‌ترین پیام کنار گذاشته
+می‌شود، چون فقط آخرین نرخ اهمیت دارد.
+
+مقصدها (گروه تلگرام، WEBHOOK_URL، WHATSAPP_*) از config.current و
+تنظیمات هر مقصد از محیط خوانده می‌شود:
+    SINK_TIMEOUT_SECONDS / SINK_RETRIES / SINK_QUEUE_SIZE  (پیش‌فرض همه)
+    SINK_<NAME>_TIMEOUT_SECONDS / SINK_<NAME>_RETRIES / SINK_<NAME>_QUEUE_SIZE
+که NAME یکی از TELEGRAM، WEBHOOK یا WHATSAPP است.
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+from functools import partial
+from typing import Dict, List, Optional
+
+import httpx
+
+from config import config, Settings
+from http_pool import pool
+from outbox import Outbox
+from sharding import ShardCoordinator, SHARD_WORKERS
+
+logger = logging.getLogger(__name__)
+
+SINK_TIMEOUT_SECONDS = float(os.getenv('SINK_TIMEOUT_SECONDS', '10'))
+SINK_RETRIES = int(os.getenv('SINK_RETRIES', '2'))
+SINK_QUEUE_SIZE = int(os.getenv('SINK_QUEUE_SIZE', '10'))
+# تأخیر پایه بین تلاش‌ها (ثانیه، در هر تلاش دو برابر می‌شود)
+SINK_BACKOFF_SECONDS = float(os.getenv('SINK_BACKOFF_SECONDS', '1'))
+
+# فاصله بررسی رکوردهای outbox برای تلاش مجدد (ثانیه)
+OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', '15'))
+
+
+def _option(name: str, key: str, default, cast):
+    value = os.getenv(f'SINK_{name.upper()}_{key}')
+    return cast(value) if value else default
+
+
+class Sink:
+    """
+    پایه مقصدهای خروجی
+
+    زیرکلاس‌ها فقط deliver را پیاده‌سازی می‌کنند؛ خطا یعنی تلاش مجدد.
+    """
+
+    name = 'sink'
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        backoff: float = SINK_BACKOFF_SECONDS,
+    ):
+        self.timeout = timeout if timeout is not None else _option(
+            self.name, 'TIMEOUT_SECONDS', SINK_TIMEOUT_SECONDS, float)
+        self.retries = retries if retries is not None else _option(
+            self.name, 'RETRIES', SINK_RETRIES, int)
+        self.queue_size = queue_size if queue_size is not None else _option(
+            self.name, 'QUEUE_SIZE', SINK_QUEUE_SIZE, int)
+        self.backoff = backoff
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    async def open(self):
+        """آماده‌سازی منابع (قبل از شروع worker)"""
+
+    async def close(self):
+        """آزادسازی منابع"""
+
+    async def deliver(self, text: str):
+        raise NotImplementedError
+
+    async def send(self, text: str) -> bool:
+        """ارسال با timeout و تلاش مجدد؛ True در صورت موفقیت"""
+        for attempt in range(self.retries + 1):
+            try:
+                await asyncio.wait_for(self.deliver(text), self.timeout)
+                self.sent += 1
+                return True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                reason = 'timeout' if isinstance(e, asyncio.TimeoutError) else e
+                if attempt < self.retries:
+                    delay = self.backoff * 2 ** attempt
+                    logger.warning(
+                        "ارسال به %s ناموفق بود (%s)، تلاش مجدد پس از %.1f ثانیه",
+                        self.name, reason, delay
+                    )
+                    await asyncio.sleep(delay)
+                else:
+                    logger.error(
+                        "ارسال به %s پس از %d تلاش ناموفق بود: %s",
+                        self.name, attempt + 1, reason
+                    )
+        self.failed += 1
+        return False
+
+
+class TelegramSink(Sink):
+    """ارسال به گروه تلگرام با Bot API"""
+
+    name = 'telegram'
+
+    def __init__(self, bot, chat_id, **kwargs):
+        super().__init__(**kwargs)
+        self.bot = bot
+        self.chat_id = chat_id
+
+    async def deliver(self, text: str):
+        await self.bot.send_message(chat_id=self.chat_id, text=text)
+
+
+class ShardedTelegramSink(Sink):
+    """ارسال به تعداد زیادی گروه تلگرام با چند فرآیند worker (sharding.py)"""
+
+    name = 'telegram'
+
+    def __init__(self, coordinator: ShardCoordinator, **kwargs):
+        super().__init__(**kwargs)
+        self.coordinator = coordinator
+
+    async def open(self):
+        self.coordinator.start()
+
+    async def close(self):
+        # join فرآیندها حلقه رویداد را معطل نمی‌کند
+        await asyncio.to_thread(self.coordinator.stop)
+
+    async def deliver(self, text: str):
+        # شناسه tick از متن پیام؛ ارسال مجدد همان متن به گروه‌های قبلی تکرار نمی‌شود
+        tick = hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+        self.coordinator.broadcast(tick, text)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self.coordinator.wait, tick, self.timeout)
+        if result is None:
+            raise asyncio.TimeoutError()
+        if result['failed']:
+            # تلاش مجدد (و outbox) فقط گروه‌های ناموفق را دوباره ارسال می‌کند
+            raise RuntimeError(
+                f"ارسال به {result['failed']} از {result['sent'] + result['failed']} گروه ناموفق بود"
+            )
+
+
+class WebhookSink(Sink):
+    """ارسال JSON به یک آدرس HTTP دلخواه"""
+
+    name = 'webhook'
+
+    def __init__(self, url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def payload(self, text: str) -> dict:
+        return {'text': text}
+
+    async def open(self):
+        # کلاینت مشترک http_pool (بستن آن با pool.close صاحب فرآیند است)
+        self._client = pool.client()
+
+    async def close(self):
+        self._client = None
+
+    async def deliver(self, text: str):
+        if self._client is None:
+            await self.open()
+        response = await self._client.post(self.url, json=self.payload(text))
+        response.raise_for_status()
+
+
+class WhatsAppSink(WebhookSink):
+    """ارسال به گروه واتساپ از طریق پل whatsapp-web.js (WHATSAPP_INTEGRATION.md)"""
+
+    name = 'whatsapp'
+
+    def __init__(self, api_url: str, group_id: str, **kwargs):
+        super().__init__(f"{api_url.rstrip('/')}/send-group", **kwargs)
+        self.group_id = group_id
+
+    def payload(self, text: str) -> dict:
+        return {'groupId': self.group_id, 'message': text}
+
+
+class SinkDispatcher:
+    """
+    پخش هر پیام به همه مقصدها، هر کدام با صف و worker جداگانه
+
+    اگر outbox داده شود، هر پیام ابتدا به صورت پایدار ثبت می‌شود و ارسال‌های
+    ناموفق (یا باقیمانده از اجرای قبلی) هر poll_seconds ثانیه دوباره در صف قرار می‌گیرند.
+    """
+
+    def __init__(
+        self,
+        sinks: List[Sink],
+        outbox: Optional[Outbox] = None,
+        poll_seconds: float = OUTBOX_POLL_SECONDS,
+    ):
+        self.sinks = list(sinks)
+        self.outbox = outbox
+        self.poll_seconds = poll_seconds
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+        # کلیدهای outbox که در صف یا در حال ارسال هستند
+        self._inflight: set = set()
+
+    def __len__(self) -> int:
+        return len(self.sinks)
+
+    @property
+    def names(self) -> List[str]:
+        return [sink.name for sink in self.sinks]
+
+    async def start(self):
+        """ساخت صف‌ها، شروع workerها و ارسال رکوردهای باقیمانده outbox"""
+        for sink in self.sinks:
+            await sink.open()
+            queue = asyncio.Queue(maxsize=max(sink.queue_size, 1))
+            self._queues[sink.name] = queue
+            self._workers.append(asyncio.create_task(self._worker(sink, queue)))
+        if self.outbox is not None:
+            self.requeue()
+            self._workers.append(asyncio.create_task(self._redeliver()))
+
+    async def _worker(self, sink: Sink, queue: asyncio.Queue):
+        while True:
+            key, text = await queue.get()
+            try:
+                if key is None:
+                    await sink.send(text)
+                elif self.outbox.is_pending(key):
+                    if await sink.send(text):
+                        self.outbox.mark_delivered(key)
+                    else:
+                        self.outbox.mark_failed(key, 'ارسال ناموفق')
+            finally:
+                self._inflight.discard(key)
+                queue.task_done()
+
+    async def _redeliver(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            self.requeue()
+
+    def _put(self, sink: Sink, key: Optional[str], text: str):
+        queue = self._queues.get(sink.name)
+        if queue is None:
+            # هنوز start نشده: رکورد outbox در start ارسال می‌شود
+            return
+        if queue.full():
+            dropped, _ = queue.get_nowait()
+            queue.task_done()
+            self._inflight.discard(dropped)
+            sink.dropped += 1
+            logger.warning("صف %s پر است؛ قدیمی‌ترین پیام کنار گذاشته شد", sink.name)
+        if key is not None:
+            self._inflight.add(key)
+        queue.put_nowait((key, text))
+
+    def requeue(self) -> int:
+        """قرار دادن رکوردهای outbox که زمان تلاش مجددشان رسیده در صف"""
+        sinks = {sink.name: sink for sink in self.sinks}
+        count = 0
+        for entry in self.outbox.due():
+            sink = sinks.get(entry['destination'])
+            if sink and entry['key'] not in self._inflight:
+                self._put(sink, entry['key'], entry['text'])
+                count += 1
+        return count
+
+    def publish(self, text: str, tick: Optional[str] = None) -> int:
+        """
+        قرار دادن پیام در صف همه مقصدها (بدون انتظار برای ارسال)
+
+        tick: شناسه tick برای ثبت در outbox؛ همان tick دوباره ارسال نمی‌شود.
+        تعداد مقصدهایی که پیام را دریافت کردند برگردانده می‌شود.
+        """
+        if self.outbox is None or tick is None:
+            for sink in self.sinks:
+                self._put(sink, None, text)
+            return len(self.sinks)
+
+        sinks = {sink.name: sink for sink in self.sinks}
+        entries = self.outbox.add(tick, text, sinks)
+        for entry in entries:
+            self._put(sinks[entry['destination']], entry['key'], text)
+        return len(entries)
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """انتظار برای خالی شدن همه صف‌ها؛ False اگر timeout برسد"""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(q.join() for q in self._queues.values())), timeout
+            )
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self, timeout: Optional[float] = None):
+        """
+        توقف workerها؛ اگر timeout داده شود ابتدا تا آن زمان برای ارسال
+        پیام‌های باقیمانده صبر می‌شود (رکوردهای outbox در هر صورت باقی می‌مانند)
+        """
+        if timeout and not await self.flush(timeout):
+            logger.warning("ارسال همه پیام‌ها تا پایان مهلت انجام نشد")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
+        self._inflight.clear()
+        for sink in self.sinks:
+            await sink.close()
+
+
+# تنظیماتی که با تغییرشان مقصدها دوباره ساخته می‌شوند
+SINK_SETTINGS = frozenset({
+    'target_group_id', 'target_group_ids', 'webhook_url', 'whatsapp_api_url', 'whatsapp_group_id',
+})
+
+
+def build_sinks(bot=None, chat_id=None, settings: Optional[Settings] = None) -> List[Sink]:
+    """ساخت مقصدهای پیکربندی شده (پیش‌فرض از config.current)"""
+    settings = settings or config.current
+    sinks: List[Sink] = []
+    if bot is not None and SHARD_WORKERS:
+        chat_ids = ([chat_id] if chat_id else []) + list(settings.target_group_ids)
+        coordinator = ShardCoordinator(chat_ids, SHARD_WORKERS, partial(type(bot), bot.token))
+        sinks.append(ShardedTelegramSink(coordinator))
+    elif bot is not None and chat_id:
+        sinks.append(TelegramSink(bot, chat_id))
+    if settings.webhook_url:
+        sinks.append(WebhookSink(settings.webhook_url))
+    if settings.whatsapp_api_url and settings.whatsapp_group_id:
+        sinks.append(WhatsAppSink(settings.whatsapp_api_url, settings.whatsapp_group_id))
+    return sinks
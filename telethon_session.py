@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تأمین session مشترک Telethon برای همه مسیرهای خواندن کانال
+
+session به ترتیب از این منابع خوانده می‌شود و در حافظه نگهداری می‌شود
+(بدون فایل SQLite و بدون فایل موقت):
+
+1. TELETHON_SESSION_STRING: رشته StringSession
+2. TELETHON_SESSION_FILE: مسیر فایل secrets حاوی رشته StringSession
+3. TELETHON_SESSION: فایل user_session.session به صورت base64 (روش قدیمی
+   GitHub Actions)؛ مستقیماً در حافظه به StringSession تبدیل می‌شود
+4. فایل محلی user_session.session (فقط برای اجرای محلی و ورود اولیه)
+
+shared_client یک اتصال وارد شده برای همه خواننده‌های یک فرآیند است (منبع قیمت
+در auto_fetcher و کانال نرخ یوآن در yuan_rates)؛ هر خواندن دوباره وارد حساب نمی‌شود.
+
+تبدیل فایل session قدیمی به رشته:
+    python telethon_session.py export
+"""
+
+import os
+import sys
+import asyncio
+import base64
+import sqlite3
+import logging
+from functools import lru_cache
+from typing import Callable, Optional, Union
+
+from dotenv import load_dotenv
+from telethon import TelegramClient  # type: ignore
+from telethon.crypto import AuthKey  # type: ignore
+from telethon.sessions import StringSession  # type: ignore
+
+load_dotenv()
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# نام فایل session محلی (Telethon پسوند .session را اضافه می‌کند)
+SESSION_NAME = 'user_session'
+
+
+def string_from_sqlite_bytes(data: bytes) -> str:
+    """
+    تبدیل محتوای فایل session از نوع SQLite به رشته StringSession در حافظه
+    """
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.deserialize(data)
+        row = conn.execute(
+            'SELECT dc_id, server_address, port, auth_key FROM sessions'
+        ).fetchone()
+    finally:
+        conn.close()
+
+    if not row:
+        raise ValueError("فایل session خالی است")
+
+    dc_id, server_address, port, auth_key = row
+    session = StringSession()
+    session.set_dc(dc_id, server_address, port)
+    session.auth_key = AuthKey(data=auth_key)
+    return session.save()
+
+
+@lru_cache(maxsize=1)
+def load_session_string() -> Optional[str]:
+    """رشته session از محیط یا فایل secrets (یک بار در هر فرآیند)"""
+    value = os.getenv('TELETHON_SESSION_STRING', '').strip()
+    if value:
+        return value
+
+    secrets_file = os.getenv('TELETHON_SESSION_FILE')
+    if secrets_file and os.path.exists(secrets_file):
+        with open(secrets_file, 'r', encoding='utf-8') as f:
+            value = f.read().strip()
+        if value:
+            return value
+
+    legacy = os.getenv('TELETHON_SESSION', '').strip()
+    if legacy:
+        try:
+            return string_from_sqlite_bytes(base64.b64decode(legacy))
+        except Exception as e:
+            logger.error("تبدیل TELETHON_SESSION به StringSession ناموفق بود: %s", e)
+
+    return None
+
+
+def get_session() -> Union[StringSession, str]:
+    """
+    session برای ساخت TelegramClient
+
+    اگر رشته session موجود باشد StringSession (در حافظه) و در غیر این صورت
+    نام فایل session محلی برگردانده می‌شود.
+    """
+    value = load_session_string()
+    if value:
+        return StringSession(value)
+    return SESSION_NAME
+
+
+def create_client(client_class=TelegramClient, **kwargs):
+    """
+    ساخت کلاینت Telethon با session مشترک
+
+    client_class: برای نسخه همگام (telethon.sync) هم قابل استفاده است
+    """
+    settings = config.current
+    return client_class(get_session(), settings.telegram_api_id, settings.telegram_api_hash, **kwargs)
+
+
+class SharedClient:
+    """
+    یک اتصال Telethon مشترک در فرآیند
+
+    get() در اولین فراخوانی (یا پس از قطع اتصال) وارد حساب می‌شود و بقیه
+    فراخوانی‌ها، حتی همزمان، همان اتصال را می‌گیرند. close در پایان اجرا.
+    """
+
+    def __init__(self, factory: Optional[Callable] = None):
+        self._factory = factory or create_client
+        self._client = None
+        self._loop = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def get(self):
+        """کلاینت متصل و وارد شده"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # اتصال حلقه قبلی (asyncio.run دیگر) قابل استفاده نیست
+            self._client, self._loop, self._lock = None, loop, asyncio.Lock()
+        async with self._lock:
+            if self._client is None or not self._client.is_connected():
+                client = self._client or self._factory()
+                await client.start(phone=config.current.telegram_phone)
+                self._client = client
+            return self._client
+
+    async def close(self):
+        client, self._client = self._client, None
+        if client is not None and self._loop is asyncio.get_running_loop():
+            try:
+                await client.disconnect()
+            except Exception as e:
+                logger.warning("قطع اتصال Telethon ناموفق بود: %s", e)
+
+
+# اتصال مشترک فرآیند
+shared_client = SharedClient()
+
+
+def export_session_string(session_file: str = f'{SESSION_NAME}.session') -> str:
+    """تبدیل فایل session محلی به رشته برای TELETHON_SESSION_STRING"""
+    with open(session_file, 'rb') as f:
+        return string_from_sqlite_bytes(f.read())
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'export':
+        path = sys.argv[2] if len(sys.argv) > 2 else f'{SESSION_NAME}.session'
+        print(export_session_string(path))
+    else:
+        print("استفاده: python telethon_session.py export [user_session.session]")
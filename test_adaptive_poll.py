@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست زمان‌بندی تطبیقی خواندن منبع (نوسان، عقب‌نشینی، سهمیه ساعتی و ساعات کاری)
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import pytz
+
+from adaptive_poll import ERROR, FLAT, VOLATILE, AdaptivePoller
+
+TZ = pytz.timezone('Asia/Tehran')
+# دوشنبه
+MORNING = TZ.localize(datetime(2025, 11, 10, 11, 0))
+
+
+class Clock:
+    def __init__(self, now: datetime = MORNING):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+
+def _poller(clock, **options) -> AdaptivePoller:
+    params = dict(min_seconds=60, max_seconds=600, threshold_pct=0.2, backoff=2,
+                  hourly_budget=0, first_hour=11, last_hour=19)
+    params.update(options)
+    return AdaptivePoller(tz=TZ, clock=clock, **params)
+
+
+class Market:
+    """tickهای (زمان، قیمت تتر، نرخ مبنا) مثل StatsEngine.ticks()"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.ticks = []
+
+    def tick(self, price):
+        self.ticks.append((self.clock().timestamp(), price, None))
+
+
+def test_volatility_and_backoff():
+    """تغییر بزرگ فاصله را به حداقل می‌رساند؛ بازار آرام آن را تا حداکثر دو برابر می‌کند"""
+    clock = Clock()
+    market = Market(clock)
+    poller = _poller(clock)
+    intervals = []
+
+    def step(*prices):
+        for price in prices:
+            market.tick(price)
+        decision = poller.decide(market.ticks)
+        intervals.append(decision.interval)
+        clock.now = decision.next_at
+        return decision
+
+    assert step(1084000).reason == FLAT
+    step()
+    # تغییر کمتر از آستانه (0.1%)
+    assert step(1085084).reason == FLAT
+    step()
+    assert intervals == [120, 240, 480, 600]
+    decision = step(1085500, 1090000)
+    assert decision.reason == VOLATILE and round(decision.change_pct, 2) == 0.41
+    # tickهای قبلی دوباره شمرده نمی‌شوند
+    assert step().reason == FLAT
+    assert intervals[-2:] == [60, 120]
+    # اولین tick جدید با آخرین tick قبلی مقایسه می‌شود
+    assert step(1084000).reason == VOLATILE
+    assert poller.decisions == {VOLATILE: 2, FLAT: 5, ERROR: 0}
+    print("✅ نوسان و عقب‌نشینی")
+
+
+def test_hourly_budget():
+    """بیش از سهمیه ساعتی خواندن انجام نمی‌شود"""
+    clock = Clock()
+    market = Market(clock)
+    poller = _poller(clock, hourly_budget=5)
+    polls = []
+    for i in range(12):
+        polls.append(clock.now)
+        market.tick(1084000 + (i % 2) * 10000)
+        clock.now = poller.decide(market.ticks).next_at
+    assert poller.decisions[VOLATILE] == 11
+    for i in range(len(polls)):
+        window = [p for p in polls if polls[i] <= p < polls[i] + timedelta(hours=1)]
+        assert len(window) <= 5
+    assert poller.throttled == 4
+    summary = poller.summary()
+    assert summary['polls'] == 12 and summary['hourly_budget'] == 5
+    assert summary['polls_last_hour'] <= 5
+    print("✅ سهمیه ساعتی")
+
+
+def test_market_hours():
+    """بعد از پایان ساعات کاری، خواندن بعدی ابتدای روز کاری بعد با حداقل فاصله است"""
+    # جمعه تعطیل
+    clock = Clock(TZ.localize(datetime(2025, 11, 13, 18, 55)))
+    poller = _poller(clock, skip_day=lambda day: day.weekday() == 4)
+    poller.interval = 480
+    decision = poller.decide()
+    assert decision.next_at == TZ.localize(datetime(2025, 11, 15, 11, 0))
+    assert decision.interval == poller.interval == 60
+    assert poller.next_open(TZ.localize(datetime(2025, 11, 15, 9, 30))) == TZ.localize(datetime(2025, 11, 15, 11))
+    noon = TZ.localize(datetime(2025, 11, 15, 12, 0))
+    assert poller.next_open(noon) == noon
+    assert poller.window_end(noon) == TZ.localize(datetime(2025, 11, 15, 19, 0))
+    print("✅ ساعات کاری")
+
+
+def test_run_until_window_end():
+    """حلقه تا پایان ساعات کاری؛ خطای خواندن هم فاصله را زیاد می‌کند"""
+    clock = Clock(TZ.localize(datetime(2025, 11, 10, 17, 50)))
+    market = Market(clock)
+    poller = _poller(clock)
+    calls = []
+
+    async def poll():
+        calls.append(clock.now)
+        if len(calls) == 2:
+            raise ConnectionError("شبکه قطع شد")
+        if len(calls) == 4:
+            market.tick(1084000)
+            market.tick(1094000)
+        return True
+
+    logging.disable(logging.CRITICAL)
+    try:
+        asyncio.run(poller.run(poll, lambda: market.ticks, until=poller.window_end(clock.now), sleep=clock.sleep))
+    finally:
+        logging.disable(logging.NOTSET)
+    assert [f"{c:%H:%M}" for c in calls] == ['17:50', '17:52', '17:56', '18:04', '18:05', '18:07', '18:11', '18:19', '18:29', '18:39', '18:49', '18:59']
+    assert poller.decisions == {VOLATILE: 1, FLAT: 10, ERROR: 1}
+    assert poller.summary()['reason'] == FLAT
+    print("✅ حلقه خواندن")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های خواندن تطبیقی...\n")
+    test_volatility_and_backoff()
+    test_hourly_budget()
+    test_market_hours()
+    test_run_until_window_end()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
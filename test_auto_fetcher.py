@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست خواندن پیام‌های جدید کانال بر اساس شناسه آخرین پیام
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import auto_fetcher
+from auto_fetcher import fetch_new_messages
+
+
+class FakeClient:
+    """جایگزین TelegramClient با تعدادی پیام و شمارش درخواست‌ها"""
+
+    def __init__(self, count):
+        self.messages = [SimpleNamespace(id=i, text=f"پیام {i}") for i in range(1, count + 1)]
+        self.calls = 0
+
+    async def get_messages(self, channel, limit=1, min_id=0, reverse=False):
+        self.calls += 1
+        newer = [m for m in self.messages if m.id > min_id]
+        if reverse:
+            return newer[:limit]
+        return list(reversed(newer))[:limit]
+
+
+def test_first_run_reads_latest_only():
+    """بدون شناسه ذخیره شده فقط آخرین پیام خوانده می‌شود"""
+    client = FakeClient(30)
+    messages = asyncio.run(fetch_new_messages(client, 'source', 0))
+    assert [m.id for m in messages] == [30]
+    print("✅ اجرای اول")
+
+
+def test_batches_in_order():
+    """همه پیام‌های جدید در دسته‌ها و به ترتیب زمانی خوانده می‌شوند"""
+    client = FakeClient(30)
+    original = auto_fetcher.FETCH_BATCH_SIZE
+    auto_fetcher.FETCH_BATCH_SIZE = 8
+    try:
+        messages = asyncio.run(fetch_new_messages(client, 'source', 5))
+    finally:
+        auto_fetcher.FETCH_BATCH_SIZE = original
+    assert [m.id for m in messages] == list(range(6, 31))
+    assert client.calls == 4
+    print("✅ خواندن دسته‌ای")
+
+
+def test_nothing_new_single_round_trip():
+    """اگر پیام جدیدی نباشد فقط یک درخواست ارسال می‌شود"""
+    client = FakeClient(30)
+    assert asyncio.run(fetch_new_messages(client, 'source', 30)) == []
+    assert client.calls == 1
+    print("✅ بدون پیام جدید")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های خواندن کانال...\n")
+    test_first_run_reads_latest_only()
+    test_batches_in_order()
+    test_nothing_new_single_round_trip()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
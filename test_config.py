@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست تنظیمات تایپ‌دار و بارگذاری مجدد آن
+"""
+
+import os
+import asyncio
+import logging
+import tempfile
+from datetime import time
+
+from config import ConfigError, ConfigStore, Settings, settings_from_mapping
+from publish_policy import PublishPolicy
+
+
+def _store(text):
+    fd, path = tempfile.mkstemp(suffix='.env')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return ConfigStore(env_file=path), path
+
+
+def _write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_parse_and_validate():
+    """مقادیر رشته‌ای به نوع درست تبدیل و مقادیر نامعتبر رد می‌شوند"""
+    settings = settings_from_mapping({
+        'SOURCE_CHANNEL': '@tetherprice_toman',
+        'REMINDER_START': '09:30',
+        'REMINDER_ENABLED': '0',
+        'TARGET_GROUP_IDS': '-1001, -1002,',
+        'PUBLISH_MIN_DELTA': '25',
+    })
+    assert settings.source_channel == 'tetherprice_toman'
+    assert settings.reminder_start == time(9, 30)
+    assert settings.reminder_enabled is False
+    assert settings.target_group_ids == ('-1001', '-1002')
+    assert settings.publish_min_delta == 25.0
+    assert settings.tz.zone == 'Asia/Tehran'
+
+    for bad in (
+        {'TIMEZONE': 'Mars/Olympus'},
+        {'REMINDER_INTERVAL_MINUTES': 'ten'},
+        {'REMINDER_START': '20:00', 'REMINDER_END': '19:00'},
+        {'TARGET_GROUP_ID': 'my group'},
+    ):
+        try:
+            settings_from_mapping(bad)
+        except ConfigError:
+            continue
+        raise AssertionError(f"تنظیمات نامعتبر پذیرفته شد: {bad}")
+    print("✅ تبدیل نوع و اعتبارسنجی")
+
+
+def test_reload_notifies_listeners():
+    """بارگذاری مجدد فقط فیلدهای تغییر کرده را به listenerها اعلام می‌کند"""
+    store, path = _store('TARGET_GROUP_ID=-100\nPUBLISH_MIN_DELTA=0\n')
+    policy = PublishPolicy({})
+    calls = []
+
+    async def listener(old, new, changed):
+        calls.append((old.target_group_id, new.target_group_id, changed))
+        policy.configure(new)
+
+    store.subscribe(listener)
+    try:
+        before = store.current
+        _write(path, 'TARGET_GROUP_ID=-200\nPUBLISH_MIN_DELTA=30\n')
+        changed = asyncio.run(store.reload())
+        assert changed == {'target_group_id', 'publish_min_delta'}
+        assert calls == [('-100', '-200', changed)]
+        assert store.current.target_group_id == '-200'
+        assert before.target_group_id == '-100'   # نسخه قبلی تغییر نمی‌کند
+        assert policy.min_delta == 30
+
+        assert asyncio.run(store.reload()) == frozenset()
+        assert len(calls) == 1
+    finally:
+        os.remove(path)
+    print("✅ اعلام تغییرات به listenerها")
+
+
+def test_reload_drops_deleted_keys():
+    """کلید حذف شده از فایل با مقدار کپی شده load_dotenv باقی نمی‌ماند"""
+    fd, path = tempfile.mkstemp(suffix='.env')
+    os.close(fd)
+    _write(path, 'PUBLISH_MIN_DELTA=30\n')
+    # load_dotenv قبل از ساخت ConfigStore مقادیر فایل را در محیط کپی می‌کند
+    os.environ['PUBLISH_MIN_DELTA'] = '30'
+    try:
+        store = ConfigStore(env_file=path)
+        assert store.current.publish_min_delta == 30
+        _write(path, '')
+        assert asyncio.run(store.reload()) == {'publish_min_delta'}
+        assert store.current.publish_min_delta == 0
+    finally:
+        os.environ.pop('PUBLISH_MIN_DELTA', None)
+        os.remove(path)
+    print("✅ حذف کلید از فایل در بارگذاری مجدد")
+
+
+def test_invalid_reload_keeps_current():
+    """تنظیمات نامعتبر رد می‌شوند و تنظیمات فعلی باقی می‌ماند"""
+    logging.disable(logging.CRITICAL)
+    store, path = _store('REMINDER_INTERVAL_MINUTES=15\n')
+    try:
+        current = store.current
+        _write(path, 'REMINDER_INTERVAL_MINUTES=0\n')
+        assert asyncio.run(store.reload()) == frozenset()
+        assert store.current is current
+    finally:
+        os.remove(path)
+        logging.disable(logging.NOTSET)
+    print("✅ رد تنظیمات نامعتبر")
+
+
+def test_watch_detects_file_change():
+    """تغییر فایل .env بدون سیگنال هم اعمال می‌شود"""
+    store, path = _store('SOURCE_CHANNEL=first\n')
+
+    async def scenario():
+        watcher = asyncio.create_task(store.watch(interval=0.01))
+        await asyncio.sleep(0.05)
+        _write(path, 'SOURCE_CHANNEL=second\n')
+        os.utime(path, (0, 0))
+        for _ in range(100):
+            if store.current.source_channel == 'second':
+                break
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+
+    try:
+        asyncio.run(scenario())
+        assert store.current.source_channel == 'second'
+    finally:
+        os.remove(path)
+    print("✅ بررسی تغییر فایل")
+
+
+def test_explicit_settings():
+    """ConfigStore با Settings آماده (بدون فایل) برای تست‌ها"""
+    store = ConfigStore(env_file=None, settings=Settings(target_group_id='-1'))
+    assert store.current.target_group_id == '-1'
+    print("✅ Settings آماده")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های تنظیمات...\n")
+    test_parse_and_validate()
+    test_reload_notifies_listeners()
+    test_reload_drops_deleted_keys()
+    test_invalid_reload_keeps_current()
+    test_watch_detects_file_change()
+    test_explicit_settings()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست قیمت‌گذاری چند ارزی با یک قیمت تتر (currencies.py)
+"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytz
+
+from bot import TetherBot
+from config import ConfigError, config, settings_from_mapping
+from currencies import parse_currencies
+from pipeline import PUBLISHED, Pipeline, Source, SourceMessage, Tenant
+from publish_policy import PublishPolicy
+
+TEHRAN = pytz.timezone('Asia/Tehran')
+SPEC = 'AED=درهم|10|5000:300,20000:250,:200;USD=دلار|100|1000:900,:700'
+
+
+@contextmanager
+def _settings(**values):
+    previous = config.current
+    config.current = settings_from_mapping({'CURRENCIES': SPEC, **values})
+    try:
+        yield config.current
+    finally:
+        config.current = previous
+
+
+def _state():
+    state = TetherBot(data_file=None)
+    state.yuan_rate = 7.12
+    state.set_currency_rate('AED', 3.67)
+    state.set_currency_rate('USD', 1.0)
+    return state
+
+
+class Dispatcher:
+    names = ['telegram']
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, text, tick=None):
+        self.published.append((tick, text))
+        return 1
+
+
+class OnePost(Source):
+    name = 'one'
+
+    def __init__(self, price):
+        self.price = price
+
+    async def read(self):
+        return [SourceMessage(f"🔴 فروش تتر : {self.price} ریال", id=1)]
+
+
+def _publish(state, dispatcher, price):
+    policy = PublishPolicy(state.publish_state, min_delta=0, debounce_seconds=0, heartbeat_minutes=0)
+    tenant = Tenant('t', state, policy, dispatcher=lambda: dispatcher)
+    at = TEHRAN.localize(datetime(2025, 11, 10, 11, 0))
+
+    async def run():
+        async with Pipeline() as pipeline:
+            return await pipeline.run(OnePost(price), tenant, at=at)
+
+    logging.disable(logging.CRITICAL)
+    try:
+        return asyncio.run(run())
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_parse_currencies():
+    """تعریف جفت‌ها، عنوان سطوح و رد تعریف نادرست"""
+    aed, usd = parse_currencies(SPEC)
+    assert (aed.code, aed.name, aed.step, usd.step) == ('AED', 'درهم', 10, 100)
+    assert [label for label, _, _ in aed.tiers] == [
+        '1️⃣ خرید تا 5 هزار درهم', '2️⃣ خرید تا 20 هزار درهم', '3️⃣ خرید بالای 20 هزار درهم',
+    ]
+    for bad in ('AED=درهم|10|', 'AED=درهم|10|:5,100:3', 'AED=درهم|10|500:5,100:3',
+                'CNY=یوآن|10|:60', 'AED=درهم', 'AED=درهم|0|:5'):
+        try:
+            parse_currencies(bad)
+        except ValueError:
+            continue
+        raise AssertionError(bad)
+    try:
+        settings_from_mapping({'CURRENCY_MESSAGES': 'both'})
+        raise AssertionError('CURRENCY_MESSAGES')
+    except ConfigError:
+        pass
+    print("✅ تعریف جفت‌ارزها")
+
+
+def test_price_all_pairs():
+    """یک قیمت تتر برای همه جفت‌ها؛ ارز بدون نرخ حذف و یوآن مثل calculate_base_rate"""
+    with _settings():
+        state = _state()
+        priced = state.price_all(1084980)
+        assert priced == {
+            'CNY': state.calculate_base_rate(1084980),
+            'AED': 29570.0,  # 108498 / 3.67 = 29563.5 → 29570
+            'USD': 108500.0,
+        }
+        del state.currency_rates['USD']
+        assert set(state.price_all(1084980)) == {'CNY', 'AED'}
+    print("✅ قیمت‌گذاری همه جفت‌ها")
+
+
+def test_combined_message():
+    """پیام ترکیبی: سطوح یوآن و بخش هر ارز؛ سطوح سیاست انتشار شامل همه ارزها"""
+    with _settings():
+        state = _state()
+        dispatcher = Dispatcher()
+        outcome = _publish(state, dispatcher, 1084980)
+        assert outcome.status == PUBLISHED and len(dispatcher.published) == 1
+        _, text = dispatcher.published[0]
+        assert text.startswith('⏳ به‌روزرسانی نرخ یوآن')
+        assert '💱 نرخ درهم\n1️⃣ خرید تا 5 هزار درهم : 29,870' in text
+        assert '2️⃣ خرید بالای 1 هزار دلار : 109,200' in text
+        assert len(state.publish_state['tiers']) == 3 + 3 + 2
+
+        # شرط کاهش نرخ جداگانه برای هر ارز
+        state.set_currency_rate('AED', 3.7)
+        _publish(state, dispatcher, 1084980)
+        assert state.currency_last_rates['AED'] == 29570.0
+    print("✅ پیام ترکیبی")
+
+
+def test_separate_messages():
+    """حالت separate: یک پیام برای هر ارز با کلید tick جدا"""
+    with _settings(CURRENCY_MESSAGES='separate'):
+        state = _state()
+        dispatcher = Dispatcher()
+        outcome = _publish(state, dispatcher, 1084980)
+        keys = [key for key, _ in dispatcher.published]
+        assert outcome.status == PUBLISHED and len(keys) == 3 == len(set(keys))
+        assert keys[1] == f"{keys[0]}:AED" and keys[2] == f"{keys[0]}:USD"
+        titles = [text.splitlines()[0] for _, text in dispatcher.published]
+        assert titles == ['⏳ به‌روزرسانی نرخ یوآن', '⏳ به‌روزرسانی نرخ درهم', '⏳ به‌روزرسانی نرخ دلار']
+        assert 'درهم' not in dispatcher.published[0][1]
+    print("✅ پیام جدا برای هر ارز")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های چند ارزی...\n")
+    test_parse_currencies()
+    test_price_all_pairs()
+    test_combined_message()
+    test_separate_messages()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
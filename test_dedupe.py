@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست پیام‌های ویرایش شده و حذف پیام تکراری با hash محتوا
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import auto_fetcher
+from auto_fetcher import ChannelSource, fetch_updates
+from bot import BotApiSource, TetherBot
+from config import Settings
+from dedupe import SeenCache
+from pipeline import EMPTY, PUBLISHED, SUPPRESSED, Pipeline, SourceMessage, Tenant
+from publish_policy import PublishPolicy
+
+T0 = datetime(2025, 11, 10, 7, 30, tzinfo=timezone.utc)
+
+
+def _post(text):
+    return f"💵 قیمت لحظه‌ای تتر\n🔴 فروش تتر : {text} ریال"
+
+
+class EditableChannel:
+    """کانال با پست‌های قابل ویرایش (جایگزین TelegramClient)"""
+
+    def __init__(self, *prices):
+        self.messages = []
+        for price in prices:
+            self.post(price)
+
+    def post(self, price):
+        self.messages.append(SimpleNamespace(
+            id=len(self.messages) + 1, text=_post(price),
+            date=T0 + timedelta(minutes=len(self.messages)), edit_date=None,
+        ))
+
+    def edit(self, message_id, price, minutes=30):
+        message = self.messages[message_id - 1]
+        message.text = _post(price)
+        message.edit_date = T0 + timedelta(minutes=minutes)
+
+    async def get_messages(self, channel, limit=1, min_id=0, max_id=0, reverse=False):
+        found = [m for m in self.messages if m.id > min_id and (not max_id or m.id < max_id)]
+        if reverse:
+            return found[:limit]
+        return list(reversed(found))[:limit]
+
+
+class Dispatcher:
+    names = ['telegram']
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, text, tick=None):
+        self.published.append(tick)
+        return 1
+
+
+def _tenant():
+    state = TetherBot(data_file=None)
+    state.yuan_rate = 7.12
+    policy = PublishPolicy(state.publish_state, min_delta=0, debounce_seconds=0, heartbeat_minutes=0)
+    dispatcher = Dispatcher()
+    return Tenant('t', state, policy, dispatcher=lambda: dispatcher), dispatcher
+
+
+def _run(coro):
+    logging.disable(logging.CRITICAL)
+    try:
+        return asyncio.run(coro)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_seen_cache_lru():
+    """هر زوج (شناسه، hash) یک بار؛ متن جدید همان شناسه دوباره؛ قدیمی‌ترین‌ها بیرون می‌روند"""
+    cache = SeenCache(size=2)
+    first = [SourceMessage('a', id=1), SourceMessage('a', id=1), SourceMessage('b', id=2)]
+    assert [m.text for m in cache.fresh('s', first)] == ['a', 'b'] and cache.dropped == 1
+    cache.mark('s', first)
+    assert cache.fresh('s', [SourceMessage('a ', id=1)]) == []
+    assert cache.fresh('other', [SourceMessage('a', id=1)])
+    cache.mark('s', [SourceMessage('c', id=1)])
+    assert len(cache.export()['s']) == 2
+    restored = SeenCache(size=2)
+    restored.restore(cache.export())
+    # 'a' با خواندن دوباره تازه شده و 'b' قدیمی‌ترین بود
+    assert restored.fresh('s', [SourceMessage('b', id=2)])
+    assert not restored.fresh('s', [SourceMessage('a', id=1), SourceMessage('c', id=1)])
+    # پیام رزرو شده تا release یا mark دوباره برنمی‌گردد و رزرو در export نمی‌آید
+    pending = [SourceMessage('d', id=3)]
+    restored.reserve('s', pending)
+    assert restored.fresh('s', pending) == []
+    assert not any(key.startswith('3:') for key in restored.export()['s'])
+    restored.release('s', pending)
+    assert restored.fresh('s', pending) == pending
+    print("✅ کش LRU")
+
+
+def test_channel_edit_published_once():
+    """ویرایش پست قبلی یک بار پردازش و منتشر می‌شود و اجرای دوباره هیچ کاری نمی‌کند"""
+    channel = EditableChannel(1084000)
+    tenant, dispatcher = _tenant()
+    state = tenant.state
+    calls = []
+    extract = state.extract_tether_price
+    state.extract_tether_price = lambda text: calls.append(text) or extract(text)
+
+    async def scenario():
+        results = []
+        async with Pipeline() as pipeline:
+            async def run():
+                source = ChannelSource('prices', state, client=channel)
+                results.append(await pipeline.run(source, tenant))
+            await run()
+            await run()
+            channel.edit(1, 1090000)
+            await run()
+            await run()
+            channel.post(1090000)
+            await run()
+        return results
+
+    results = _run(scenario())
+    # پست جدید با همان قیمت پست ویرایش شده: پردازش می‌شود اما ارسال لازم نیست
+    assert [r.status for r in results] == [PUBLISHED, EMPTY, PUBLISHED, EMPTY, SUPPRESSED]
+    assert results[2].base_rate == state.calculate_base_rate(1090000)
+    assert len(calls) == 3 and state.cursors['prices'] == 2
+    first, edited = dispatcher.published
+    assert first == 'prices:1' and edited.startswith('prices:1:') and edited != first
+    print("✅ ویرایش پست کانال")
+
+
+def test_fetch_updates_orders_edits():
+    """پیام‌های ویرایش شده فقط تا شناسه ذخیره شده و در محدوده FETCH_EDIT_WINDOW"""
+    channel = EditableChannel(1, 2, 3, 4, 5)
+    channel.edit(1, 9)
+    channel.edit(4, 8)
+    original = auto_fetcher.FETCH_EDIT_WINDOW
+    auto_fetcher.FETCH_EDIT_WINDOW = 3
+    try:
+        messages = asyncio.run(fetch_updates(channel, 'prices', 4))
+    finally:
+        auto_fetcher.FETCH_EDIT_WINDOW = original
+    assert [m.id for m in messages] == [4, 5]
+    print("✅ خواندن پیام‌های ویرایش شده")
+
+
+def test_bot_api_edited_post():
+    """Bot API: پست ویرایش شده جدیدترین پیام است و تکرار همان متن کنار گذاشته می‌شود"""
+    chat = SimpleNamespace(id=-100, username='prices')
+    updates = [SimpleNamespace(
+        channel_post=SimpleNamespace(chat=chat, text=_post(1084000), message_id=7, date=T0, edit_date=None),
+        edited_channel_post=None,
+    )]
+
+    class FakeBot:
+        async def get_chat(self, chat_id):
+            return chat
+
+        async def get_updates(self, limit=100):
+            return list(updates)
+
+    tenant, dispatcher = _tenant()
+    source = lambda: BotApiSource(FakeBot(), Settings(private_channel_id='-100'), seen=tenant.state.seen)
+
+    async def scenario():
+        results = []
+        async with Pipeline() as pipeline:
+            results.append(await pipeline.run(source(), tenant))
+            results.append(await pipeline.run(source(), tenant))
+            updates.append(SimpleNamespace(channel_post=None, edited_channel_post=SimpleNamespace(
+                chat=chat, text=_post(1090000), message_id=7, date=T0, edit_date=T0 + timedelta(minutes=5),
+            )))
+            results.append(await pipeline.run(source(), tenant))
+            results.append(await pipeline.run(source(), tenant, force=True))
+        return results
+
+    results = _run(scenario())
+    assert [r.status for r in results] == [PUBLISHED, EMPTY, PUBLISHED, PUBLISHED]
+    assert results[2].base_rate == tenant.state.calculate_base_rate(1090000)
+    print("✅ پست ویرایش شده Bot API")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های پیام ویرایش شده...\n")
+    test_seen_cache_lru()
+    test_channel_edit_published_once()
+    test_fetch_updates_orders_edits()
+    test_bot_api_edited_post()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
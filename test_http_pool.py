@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست pool مشترک اتصال HTTP (بازاستفاده از اتصال، شمارنده‌ها و بستن)
+"""
+
+import asyncio
+import logging
+
+import http_pool
+from diagnostics import BotApiStandIn
+from http_pool import HttpPool
+
+
+def _run(coro):
+    logging.disable(logging.CRITICAL)
+    try:
+        return asyncio.run(coro)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_bot_reuses_connection():
+    """ارسال‌های پشت سر هم یک Bot روی یک اتصال keep-alive انجام می‌شوند"""
+    pool = HttpPool(pool_size=4)
+
+    async def scenario(api):
+        bot = pool.create_bot('1:test', base_url=api.base_url)
+        for i in range(10):
+            await bot.send_message(-1001, f"پیام {i}")
+        await pool.close()
+        return bot
+
+    with BotApiStandIn() as api:
+        bot = _run(scenario(api))
+        assert len(api.requests) == 10
+    summary = pool.stats.summary()
+    assert summary['requests'] == 10 and summary['connections'] == 1
+    assert summary['reused'] == 9
+    assert bot.request._client.is_closed
+    print("✅ بازاستفاده از اتصال Bot API")
+
+
+def test_shared_client_per_loop():
+    """کلاینت مشترک در هر event loop یکی است و با close بسته می‌شود"""
+    pool = HttpPool()
+
+    async def scenario(api):
+        client = pool.client()
+        assert pool.client() is client
+        for _ in range(3):
+            response = await client.post(f"{api.base_url}/getMe", json={})
+            assert response.json()['ok']
+        await pool.close()
+        return client
+
+    with BotApiStandIn() as api:
+        first = _run(scenario(api))
+        second = _run(scenario(api))
+    assert first is not second and first.is_closed and second.is_closed
+    assert pool.stats.requests == 6 and pool.stats.connections == 2
+    print("✅ کلاینت مشترک")
+
+
+def test_settings_and_http2_fallback():
+    """محدودیت‌ها و مهلت‌ها از تنظیمات؛ HTTP/2 بدون h2 به HTTP/1.1 برمی‌گردد"""
+    pool = HttpPool(pool_size=8, keepalive=30, read_timeout=7, http2=True)
+    assert pool.http2 == http_pool.http2_available()
+    limits = pool.limits()
+    assert (limits.max_connections, limits.max_keepalive_connections, limits.keepalive_expiry) == (8, 8, 30)
+    assert pool.timeout().read == 7
+    request = pool.bot_request(1)
+    assert request.http_version == ('2' if pool.http2 else '1.1')
+    assert request.read_timeout == 7
+    print("✅ تنظیمات pool")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های pool اتصال HTTP...\n")
+    test_bot_reuses_connection()
+    test_shared_client_per_loop()
+    test_settings_and_http2_fallback()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست جدول تقویم شمسی و تعطیلات
+"""
+
+from datetime import date, timedelta
+
+import jdatetime
+
+from jalali_calendar import JalaliCalendar
+
+CALENDAR = JalaliCalendar(2024, 2026)
+
+
+def test_matches_jdatetime():
+    """جدول با تبدیل jdatetime برای همه روزها یکسان است"""
+    day = CALENDAR.first
+    while day <= CALENDAR.last:
+        j = jdatetime.date.fromgregorian(date=day)
+        assert CALENDAR.jalali(day) == (j.year, j.month, j.day), day
+        day += timedelta(days=1)
+    assert CALENDAR.jalali_str(date(2025, 11, 10)) == '1404/08/19'
+    assert CALENDAR.weekday_name(date(2025, 11, 10)) == 'دوشنبه'
+    print("✅ تبدیل تاریخ")
+
+
+def test_holidays():
+    """تعطیلات ثابت، قمری و جمعه‌ها"""
+    assert CALENDAR.holiday_name(date(2025, 3, 21)) == 'نوروز'
+    assert CALENDAR.holiday_name(date(2025, 3, 31)) == 'عید فطر'
+    assert CALENDAR.holiday_name(date(2025, 7, 6)) == 'عاشورا'
+    assert CALENDAR.is_closed(date(2025, 11, 14))          # جمعه
+    assert not CALENDAR.is_closed(date(2025, 11, 10))
+    assert CALENDAR.next_open_day(date(2025, 3, 21)) == date(2025, 3, 25)
+    print("✅ تعطیلات")
+
+
+def test_manual_overrides():
+    """تعطیلی اعلام شده رسمی اضافه و روز اشتباه حذف می‌شود"""
+    calendar = JalaliCalendar(2025, 2025, add=['1404/08/19'], remove=['1404/04/15'])
+    assert calendar.is_closed(date(2025, 11, 10))
+    assert calendar.holiday_name(date(2025, 7, 6)) is None
+    print("✅ اصلاح دستی تعطیلات")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های تقویم...\n")
+    test_matches_jdatetime()
+    test_holidays()
+    test_manual_overrides()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
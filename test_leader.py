@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست انتخاب رهبر (lease در SQLite، جابجایی رهبر و وضعیت نسخه follower)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import tempfile
+
+from bot import TetherBot
+from leader import LeaderElector, LeaseStore
+
+LEASE = 0.4
+HEARTBEAT = 0.1
+
+
+def _run(coro):
+    logging.disable(logging.CRITICAL)
+    try:
+        return asyncio.run(coro)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def _lease_file():
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    return path
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lease_terms():
+    """lease معتبر نسخه دیگر گرفته نمی‌شود؛ تمدید term را حفظ و جابجایی آن را زیاد می‌کند"""
+    clock = Clock()
+    path = _lease_file()
+    try:
+        store = LeaseStore(path, clock=clock)
+        assert store.current() is None
+        first = store.try_acquire('a', 5)
+        assert (first.holder, first.term, first.expires) == ('a', 1, 1005)
+        assert store.try_acquire('b', 5) is None
+        clock.now += 3
+        assert store.try_acquire('a', 5).term == 1
+        clock.now += 5.5
+        assert store.try_acquire('b', 5).term == 2
+        store.release('a')
+        assert store.current().expires > clock.now
+        store.release('b')
+        assert store.try_acquire('a', 5).term == 3
+    finally:
+        os.remove(path)
+    print("✅ lease و term")
+
+
+async def _race(path, stop, graceful):
+    """دو نسخه؛ رهبر متوقف می‌شود و زمان رسیدن رهبری به نسخه دیگر اندازه‌گیری می‌شود"""
+    events = []
+    electors = [
+        LeaderElector(LeaseStore(path), holder=name, lease=LEASE, heartbeat=HEARTBEAT)
+        for name in ('a', 'b')
+    ]
+    for elector in electors:
+        elector.on_elected = _async(lambda e=elector: events.append(('elected', e.holder)))
+    tasks = {e.holder: asyncio.create_task(e.run()) for e in electors}
+    overlap = 0
+
+    async def watch(until):
+        nonlocal overlap
+        while time.monotonic() < until:
+            if all(e.is_leader for e in electors):
+                overlap += 1
+            await asyncio.sleep(0.005)
+
+    await watch(time.monotonic() + 2 * HEARTBEAT)
+    leader = next(e for e in electors if e.is_leader)
+    follower = next(e for e in electors if e is not leader)
+    assert follower.elections == 0
+
+    tasks[leader.holder].cancel()
+    await asyncio.gather(tasks[leader.holder], return_exceptions=True)
+    if graceful:
+        await leader.resign()
+    stopped = time.monotonic()
+    while not follower.is_leader:
+        await asyncio.sleep(0.005)
+        assert time.monotonic() - stopped < stop
+    failover = time.monotonic() - stopped
+    await watch(time.monotonic() + LEASE)
+
+    tasks[follower.holder].cancel()
+    await asyncio.gather(tasks[follower.holder], return_exceptions=True)
+    return failover, overlap, leader, follower, events
+
+
+def _async(callback):
+    async def call():
+        callback()
+    return call
+
+
+def test_failover_after_crash():
+    """رهبری که بدون رها کردن lease متوقف شود، حداکثر lease + دو heartbeat بعد جایگزین می‌شود"""
+    path = _lease_file()
+    try:
+        failover, overlap, leader, follower, events = _run(_race(path, LEASE + 2 * HEARTBEAT, False))
+    finally:
+        os.remove(path)
+    assert overlap == 0
+    assert failover > LEASE / 2
+    assert follower.lease.term == leader.lease.term + 1
+    # نسخه متوقف شده lease قبلی را دارد اما دیگر رهبر محسوب نمی‌شود
+    assert not leader.is_leader
+    assert [holder for _, holder in events] == [leader.holder, follower.holder]
+    print(f"✅ جابجایی رهبر پس از توقف ناگهانی ({failover * 1000:.0f}ms)")
+
+
+def test_failover_after_resign():
+    """توقف عادی lease را آزاد می‌کند و follower در heartbeat بعدی رهبر می‌شود"""
+    path = _lease_file()
+    try:
+        failover, overlap, leader, follower, _ = _run(_race(path, 2 * HEARTBEAT, True))
+    finally:
+        os.remove(path)
+    assert overlap == 0 and failover < LEASE
+    assert leader.demotions == 1 and leader.lease is None
+    print(f"✅ جابجایی رهبر پس از توقف عادی ({failover * 1000:.0f}ms)")
+
+
+def test_demote_on_takeover():
+    """رهبری که lease را از دست بدهد کنار می‌رود؛ خطای SQLite تا انقضای lease رهبری را حفظ می‌کند"""
+    clock = Clock()
+    path = _lease_file()
+    roles = []
+    try:
+        store = LeaseStore(path, clock=clock)
+        elector = LeaderElector(
+            store, holder='a', lease=5, heartbeat=1, clock=clock,
+            on_elected=_async(lambda: roles.append('elected')),
+            on_demoted=_async(lambda: roles.append('demoted')),
+            on_follow=_async(lambda: roles.append('follow')),
+        )
+        _run(elector.tick())
+        assert elector.is_leader
+
+        def broken(holder, ttl):
+            raise sqlite3.OperationalError('database is locked')
+
+        elector.store.try_acquire, original = broken, store.try_acquire
+        clock.now += 2
+        _run(elector.tick())
+        assert elector.is_leader
+        clock.now += 4
+        assert not elector.is_leader
+        _run(elector.tick())
+        elector.store.try_acquire = original
+        assert store.try_acquire('b', 5).term == 2
+        _run(elector.tick())
+        assert roles == ['elected', 'demoted', 'follow']
+        assert elector.summary()['term'] is None and elector.demotions == 1
+    finally:
+        os.remove(path)
+    print("✅ کنار رفتن رهبر")
+
+
+def test_follower_state():
+    """نسخه follower در data.json نمی‌نویسد و reload_data همان لیست outbox را به‌روز می‌کند"""
+    path = os.path.join(tempfile.mkdtemp(), 'data.json')
+    try:
+        leader = TetherBot(data_file=path)
+        leader.yuan_rate = 7.2
+        leader.outbox.append({'key': 'k', 'text': 'x'})
+        leader.save_data()
+
+        follower = TetherBot(data_file=path)
+        follower.read_only = True
+        outbox = follower.outbox
+        leader.yuan_rate = 7.3
+        leader.outbox.append({'key': 'k2', 'text': 'y'})
+        leader.save_data()
+        version = follower.state_version
+        follower.reload_data()
+        assert follower.yuan_rate == 7.3 and follower.outbox is outbox and len(outbox) == 2
+        assert follower.state_version > version
+
+        follower.yuan_rate = 9.9
+        follower.save_data()
+        with open(path, encoding='utf-8') as f:
+            assert json.load(f)['yuan_rate'] == 7.3
+    finally:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+    print("✅ وضعیت نسخه follower")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های انتخاب رهبر...\n")
+    test_lease_terms()
+    test_failover_after_crash()
+    test_failover_after_resign()
+    test_demote_on_takeover()
+    test_follower_state()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
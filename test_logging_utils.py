@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست تنظیمات لاگ ساخت‌یافته
+"""
+
+import io
+import json
+import logging
+
+from logging_utils import (
+    fmt,
+    setup_logging,
+    correlation_scope,
+    get_correlation_id,
+    SamplingFilter,
+)
+
+
+class _Counted:
+    """شیئی که تعداد قالب‌بندی‌هایش را می‌شمارد"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __format__(self, spec):
+        self.calls += 1
+        return 'x'
+
+
+def _json_lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines() if line]
+
+
+def test_lazy_formatting():
+    """آرگومان‌ها فقط هنگام نوشتن قالب‌بندی می‌شوند"""
+    stream = io.StringIO()
+    setup_logging(level='WARNING', log_format='json', stream=stream, force=True)
+    try:
+        value = _Counted()
+        logging.getLogger('test').info("مقدار: %s", fmt(value))
+        assert value.calls == 0, "پیام حذف‌شده نباید قالب‌بندی شود"
+        logging.getLogger('test').warning("مقدار: %s", fmt(value))
+    finally:
+        setup_logging(force=True)
+    assert value.calls == 1
+    print("✅ قالب‌بندی تنبل")
+
+
+def test_json_correlation_id():
+    """هر اجرا شناسه همبستگی خودش را در JSON دارد"""
+    stream = io.StringIO()
+    setup_logging(log_format='json', stream=stream, force=True)
+    try:
+        log = logging.getLogger('test')
+        with correlation_scope('run-1'):
+            assert get_correlation_id() == 'run-1'
+            log.info("قیمت: %s ریال", fmt(1084980, ','), extra={'source': 'ch'})
+        log.info("بیرون از اجرا")
+    finally:
+        setup_logging(force=True)
+
+    first, second = _json_lines(stream)
+    assert first['msg'] == "قیمت: 1,084,980 ریال"
+    assert first['correlation_id'] == 'run-1'
+    assert first['source'] == 'ch'
+    assert 'correlation_id' not in second
+    assert get_correlation_id() is None
+    print("✅ شناسه همبستگی")
+
+
+def test_text_correlation_id():
+    """شناسه همبستگی در قالب متنی هم نوشته می‌شود"""
+    stream = io.StringIO()
+    setup_logging(log_format='text', stream=stream, force=True)
+    try:
+        log = logging.getLogger('test')
+        with correlation_scope('run-2'):
+            log.info("داخل اجرا")
+        log.info("بیرون از اجرا")
+    finally:
+        setup_logging(force=True)
+
+    first, second = stream.getvalue().splitlines()
+    assert first.endswith('INFO - [run-2] داخل اجرا')
+    assert second.endswith('INFO - بیرون از اجرا')
+    print("✅ شناسه همبستگی در قالب متنی")
+
+
+def test_mutable_args_frozen():
+    """آرگومان تغییرپذیر با مقدار زمان فراخوانی لاگ نوشته می‌شود"""
+    stream = io.StringIO()
+    setup_logging(log_format='json', stream=stream, force=True)
+    try:
+        rates = {'CNY': 1}
+        logging.getLogger('test').info("نرخ‌ها: %s (%d)", rates, len(rates))
+        rates['CNY'] = 2
+    finally:
+        setup_logging(force=True)
+
+    (line,) = _json_lines(stream)
+    assert line['msg'] == "نرخ‌ها: {'CNY': 1} (1)"
+    print("✅ ثابت شدن آرگومان‌های تغییرپذیر")
+
+
+def test_sampling():
+    """از هر N پیام INFO با الگوی یکسان فقط یکی عبور می‌کند"""
+    stream = io.StringIO()
+    setup_logging(log_format='json', stream=stream, sample_every=10, force=True)
+    try:
+        log = logging.getLogger('test')
+        for i in range(25):
+            log.info("tick %d", i)
+        log.warning("هشدار %d", 1)
+        log.warning("هشدار %d", 2)
+    finally:
+        setup_logging(force=True)
+
+    lines = _json_lines(stream)
+    assert [line['msg'] for line in lines] == [
+        'tick 0', 'tick 10', 'tick 20', 'هشدار 1', 'هشدار 2'
+    ]
+    assert lines[0]['sampled'] == 10
+    print("✅ نمونه‌برداری")
+
+
+def test_sampling_filter_passes_errors():
+    """خطاها هرگز نمونه‌برداری نمی‌شوند"""
+    sampler = SamplingFilter(every=100)
+    record = logging.LogRecord('t', logging.ERROR, '', 0, 'err', None, None)
+    assert all(sampler.filter(record) for _ in range(5))
+    print("✅ عبور خطاها از نمونه‌برداری")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های لاگ...\n")
+    test_lazy_formatting()
+    test_json_correlation_id()
+    test_text_correlation_id()
+    test_mutable_args_frozen()
+    test_sampling()
+    test_sampling_filter_passes_errors()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست outbox پایدار و ارسال idempotent
+"""
+
+import asyncio
+import logging
+
+from outbox import Outbox
+from sinks import Sink, SinkDispatcher
+
+
+class FlakySink(Sink):
+    """مقصدی که تعداد مشخصی ارسال اول را رد می‌کند"""
+
+    name = 'telegram'
+
+    def __init__(self, fail_first=0):
+        super().__init__(timeout=1, retries=0, queue_size=10, backoff=0)
+        self.fail_first = fail_first
+        self.delivered = []
+
+    async def deliver(self, text):
+        if self.fail_first:
+            self.fail_first -= 1
+            raise ConnectionError('down')
+        self.delivered.append(text)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _run(coro):
+    logging.disable(logging.CRITICAL)
+    try:
+        return asyncio.run(coro)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+async def _deliver(outbox, sink, tick=None, text='نرخ'):
+    dispatcher = SinkDispatcher([sink], outbox=outbox, poll_seconds=3600)
+    await dispatcher.start()
+    if tick:
+        dispatcher.publish(text, tick=tick)
+    await dispatcher.close(timeout=5)
+
+
+def test_failed_delivery_survives_restart():
+    """پیام ناموفق ذخیره می‌شود و پس از راه‌اندازی مجدد ارسال می‌شود"""
+    clock = Clock()
+    saved = []
+    entries = []
+    outbox = Outbox(entries, save=lambda: saved.append(len(entries)), clock=clock, backoff=60)
+
+    _run(_deliver(outbox, FlakySink(fail_first=1), tick='source:10'))
+    assert outbox.depth == 1 and saved
+    assert entries[0]['attempts'] == 1
+
+    # اجرای جدید با همان رکوردهای ذخیره شده، قبل از پایان backoff
+    restarted = Outbox(entries, clock=clock, backoff=60)
+    sink = FlakySink()
+    _run(_deliver(restarted, sink))
+    assert sink.delivered == []
+
+    clock.now += 61
+    _run(_deliver(restarted, sink))
+    assert sink.delivered == ['نرخ']
+    assert restarted.depth == 0
+    assert restarted.last_delivery_lag() == 61
+    print("✅ ارسال پس از راه‌اندازی مجدد")
+
+
+def test_same_tick_not_sent_twice():
+    """tick تکراری دوباره ارسال نمی‌شود"""
+    outbox = Outbox()
+    sink = FlakySink()
+    _run(_deliver(outbox, sink, tick='source:10'))
+    _run(_deliver(outbox, sink, tick='source:10'))
+    assert sink.delivered == ['نرخ']
+    print("✅ جلوگیری از ارسال تکراری")
+
+
+def test_newer_tick_supersedes_pending():
+    """نرخ قدیمی ارسال نشده پس از ثبت نرخ جدید ارسال نمی‌شود"""
+    clock = Clock()
+    outbox = Outbox(clock=clock, backoff=0)
+    _run(_deliver(outbox, FlakySink(fail_first=1), tick='source:10', text='قدیمی'))
+    sink = FlakySink()
+    _run(_deliver(outbox, sink, tick='source:11', text='جدید'))
+    assert sink.delivered == ['جدید']
+    assert outbox.depth == 0
+    print("✅ جایگزینی نرخ قدیمی")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های outbox...\n")
+    test_failed_delivery_survives_restart()
+    test_same_tick_not_sent_twice()
+    test_newer_tick_supersedes_pending()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست خط لوله مرحله‌ای (منبع، محاسبه، سیاست انتشار، مقصد، مهلت و فشار برگشتی)
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+
+import pytz
+
+from bot import TetherBot
+from dedupe import SeenCache
+from pipeline import (
+    EMPTY, EXPIRED, FAILED, PUBLISHED, SUPPRESSED,
+    Pipeline, Source, SourceError, SourceMessage, Tenant,
+)
+from publish_policy import PublishPolicy
+
+TEHRAN = pytz.timezone('Asia/Tehran')
+NOW = TEHRAN.localize(datetime(2025, 11, 10, 11, 0))
+
+
+class ListSource(Source):
+    """منبع با پیام‌های ثابت، تأخیر اختیاری و ثبت commit"""
+
+    def __init__(self, name, prices, delay=0.0, error=None):
+        self.name = name
+        self.prices = prices
+        self.delay = delay
+        self.error = error
+        self.committed = None
+
+    async def read(self):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise SourceError(self.error)
+        return [SourceMessage(f"🔴 فروش تتر : {price} ریال", id=i) for i, price in enumerate(self.prices, 1)]
+
+    def commit(self, tick):
+        self.committed = tick.messages[-1].id
+
+
+class RecordingDispatcher:
+    names = ['telegram']
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, text, tick=None):
+        self.published.append((tick, text))
+        return 1
+
+
+def _tenant(name='t1'):
+    state = TetherBot(data_file=None)
+    state.yuan_rate = 7.12
+    dispatcher = RecordingDispatcher()
+    policy = PublishPolicy({}, min_delta=10, debounce_seconds=3600, heartbeat_minutes=0)
+    return Tenant(name, state, policy, dispatcher=lambda: dispatcher), dispatcher
+
+
+def _run(coro):
+    logging.disable(logging.CRITICAL)
+    try:
+        return asyncio.run(coro)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_publish_and_suppress():
+    """همه پیام‌ها پردازش، آخرین نرخ منتشر و tick تکراری با سیاست انتشار رد می‌شود"""
+    tenant, dispatcher = _tenant()
+    source = ListSource('src', [1084000, 1084980])
+
+    async def scenario():
+        async with Pipeline(clock=lambda: NOW) as pipeline:
+            first = await pipeline.run(source, tenant)
+            second = await pipeline.run(ListSource('src', [1084980]), tenant)
+            forced = await pipeline.run(ListSource('src', [1084980]), tenant, force=True)
+        return first, second, forced
+
+    first, second, forced = _run(scenario())
+    assert first.status == PUBLISHED and first.destinations == ['telegram']
+    assert first.base_rate == tenant.state.calculate_base_rate(1084980)
+    assert source.committed == 2
+    assert set(first.stage_seconds) == {'source', 'parse', 'compute', 'policy', 'render', 'sink'}
+    assert second.status == SUPPRESSED
+    assert forced.status == PUBLISHED
+    assert len(dispatcher.published) == 2
+    assert dispatcher.published[0] == (f"{NOW:%Y%m%d%H%M}:{first.base_rate:.0f}", first.message)
+    print("✅ انتشار و سیاست انتشار")
+
+
+def test_failures_are_outcomes():
+    """خطاهای منبع و داده به صورت Outcome برمی‌گردند و worker متوقف نمی‌شود"""
+    tenant, dispatcher = _tenant()
+
+    async def scenario():
+        async with Pipeline(clock=lambda: NOW) as pipeline:
+            return [
+                await pipeline.run(ListSource('src', [], error="❌ منبع در دسترس نیست"), tenant),
+                await pipeline.run(ListSource('src', []), tenant),
+                await pipeline.run(ListSource('src', [None]), tenant),
+                await pipeline.run(ListSource('src', [1084980]), tenant),
+            ]
+
+    failed, empty, no_price, published = _run(scenario())
+    assert (failed.status, failed.detail) == (FAILED, "❌ منبع در دسترس نیست")
+    assert empty.status == EMPTY
+    assert no_price.status == FAILED and 'یافت نشد' in no_price.detail
+    assert published.status == PUBLISHED
+    assert len(dispatcher.published) == 1
+    print("✅ نتیجه خطاها")
+
+
+def test_deadline_and_concurrent_sources():
+    """منبع کند پس از مهلت کنار گذاشته می‌شود و منابع دیگر معطل نمی‌مانند"""
+    slow_tenant, slow_dispatcher = _tenant('slow')
+    fast_tenant, fast_dispatcher = _tenant('fast')
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        async with Pipeline(clock=lambda: NOW, source_workers=2) as pipeline:
+            started = loop.time()
+            slow = await pipeline.submit(ListSource('slow', [1084980], delay=5), slow_tenant, deadline=0.2)
+            fast = await pipeline.submit(ListSource('fast', [1084980]), fast_tenant)
+            fast_outcome = await fast.result
+            fast_elapsed = loop.time() - started
+            slow_outcome = await slow.result
+            return slow_outcome, fast_outcome, fast_elapsed, loop.time() - started
+
+    slow, fast, fast_elapsed, elapsed = _run(scenario())
+    assert slow.status == EXPIRED
+    assert fast.status == PUBLISHED and fast_elapsed < 0.2
+    assert elapsed < 1
+    assert not slow_dispatcher.published and len(fast_dispatcher.published) == 1
+    print("✅ مهلت و منابع همزمان")
+
+
+def test_backpressure():
+    """وقتی مراحل پر باشند submit منتظر می‌ماند"""
+    tenant, _ = _tenant()
+
+    async def scenario():
+        async with Pipeline(clock=lambda: NOW, queue_size=1, source_workers=1) as pipeline:
+            # یک tick در حال خواندن و یک tick در صف source
+            await pipeline.submit(ListSource('a', [1084980], delay=0.3), tenant)
+            await pipeline.submit(ListSource('b', [1084980]), tenant)
+            try:
+                await asyncio.wait_for(pipeline.submit(ListSource('c', [1084980]), tenant), 0.05)
+            except asyncio.TimeoutError:
+                return True
+            return False
+
+    assert _run(scenario())
+    print("✅ فشار برگشتی")
+
+
+def test_debounced_change_published_after_window():
+    """تغییر داخل بازه debounce در پایان بازه منتشر می‌شود، بدون پیام جدید در منبع"""
+    tenant, dispatcher = _tenant()
+    tenant.policy = PublishPolicy({}, min_delta=0, debounce_seconds=0.3, heartbeat_minutes=0)
+    clock = lambda: datetime.now(TEHRAN)
+
+    async def scenario():
+        async with Pipeline(clock=clock) as pipeline:
+            first = await pipeline.run(ListSource('src', [1084000]), tenant)
+            debounced = await pipeline.run(ListSource('src', [1090000]), tenant)
+            pending = dict(tenant.policy.state['pending'])
+            await asyncio.sleep(0.4)
+        # اجرای جداگانه (auto_fetcher): تغییر در انتظار با اولین tick بدون پیام جدید
+        async with Pipeline(clock=clock) as pipeline:
+            again = await pipeline.run(ListSource('src', [1095000]), tenant)
+        await asyncio.sleep(0.35)
+        async with Pipeline(clock=clock) as pipeline:
+            empty = await pipeline.run(ListSource('src', []), tenant)
+        return first, debounced, pending, again, empty
+
+    first, debounced, pending, again, empty = _run(scenario())
+    assert first.status == PUBLISHED
+    assert debounced.status == SUPPRESSED and pending['rate'] == debounced.base_rate
+    assert again.status == SUPPRESSED
+    assert empty.status == PUBLISHED and empty.base_rate == again.base_rate
+    keys = [key for key, _ in dispatcher.published]
+    assert len(keys) == 3 and keys[1] == pending['key']
+    assert 'pending' not in tenant.policy.state
+    assert tenant.policy.state['rate'] == again.base_rate
+    print("✅ انتشار پایان بازه debounce")
+
+
+def test_concurrent_reads_processed_once():
+    """پیام‌هایی که دو worker همزمان از یک منبع می‌خوانند یک بار پردازش می‌شوند"""
+    tenant, dispatcher = _tenant()
+    seen = SeenCache()
+    calls = []
+    extract = tenant.state.extract_tether_price
+    tenant.state.extract_tether_price = lambda text: calls.append(text) or extract(text)
+
+    def source(delay=0.0):
+        source = ListSource('src', [1084000, 1084980], delay=delay)
+        source.seen = seen
+        return source
+
+    async def scenario():
+        async with Pipeline(clock=lambda: NOW, source_workers=2) as pipeline:
+            ticks = [await pipeline.submit(source(delay=0.05), tenant) for _ in range(2)]
+            concurrent = [await tick.result for tick in ticks]
+            extracted = len(calls)
+            # tick ناموفق رزرو را آزاد می‌کند و همان پیام‌ها در اجرای بعدی پردازش می‌شوند
+            seen.__init__()
+            tenant.state.yuan_rate = None
+            failed = await pipeline.run(source(), tenant)
+            tenant.state.yuan_rate = 7.12
+            retried = await pipeline.run(source(), tenant)
+        return concurrent, extracted, failed, retried
+
+    concurrent, extracted, failed, retried = _run(scenario())
+    assert sorted(o.status for o in concurrent) == [EMPTY, PUBLISHED]
+    assert extracted == 2 and len(dispatcher.published) == 1
+    assert failed.status == FAILED
+    assert retried.status == SUPPRESSED and len(calls) == 4
+    print("✅ خواندن همزمان یک منبع")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های خط لوله...\n")
+    test_publish_and_suppress()
+    test_failures_are_outcomes()
+    test_deadline_and_concurrent_sources()
+    test_backpressure()
+    test_debounced_change_published_after_window()
+    test_concurrent_reads_processed_once()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست prefetch: انتخاب slot، آماده‌سازی قبل از slot، بررسی دوباره و ارسال سر slot
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import pytz
+
+import prefetch
+from bot import TetherBot
+from pipeline import PUBLISHED, SUPPRESSED, Pipeline, Source, SourceMessage, Tenant
+from prefetch import lateness_summary, plan_slot, record_lateness, run_slot
+from publish_policy import PublishPolicy
+
+TEHRAN = pytz.timezone('Asia/Tehran')
+
+
+def _at(hour, minute):
+    return TEHRAN.localize(datetime(2025, 11, 10, hour, minute))
+
+
+class Feed:
+    """کانال با مکان‌نما: هر منبع فقط پیام‌های بعد از خواندن قبلی را می‌بیند"""
+
+    def __init__(self, prices):
+        self.posts = list(prices)
+        self.cursor = 0
+        self.reads = 0
+
+    def source(self):
+        feed = self
+
+        class FeedSource(Source):
+            name = 'feed'
+
+            async def read(self):
+                feed.reads += 1
+                return [
+                    SourceMessage(f"🔴 فروش تتر : {price} ریال", id=i)
+                    for i, price in enumerate(feed.posts[feed.cursor:], feed.cursor + 1)
+                ]
+
+            def commit(self, tick):
+                feed.cursor = tick.messages[-1].id
+
+        return FeedSource()
+
+
+class TimedDispatcher:
+    names = ['telegram']
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, text, tick=None):
+        self.published.append((datetime.now(TEHRAN), text))
+        return 1
+
+
+def _tenant(state=None):
+    state = state or TetherBot(data_file=None)
+    state.yuan_rate = 7.12
+    dispatcher = TimedDispatcher()
+    policy = PublishPolicy({}, min_delta=10, debounce_seconds=0, heartbeat_minutes=0)
+    return Tenant('t', state, policy, dispatcher=lambda: dispatcher), dispatcher
+
+
+def _run(coro):
+    logging.disable(logging.CRITICAL)
+    try:
+        return asyncio.run(coro)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_plan_slot():
+    """slot آینده در فاصله انتظار، slot گذشته در فاصله مهلت، و خارج از ساعات کاری هیچ"""
+    assert plan_slot(_at(10, 40)) == _at(11, 0)
+    assert plan_slot(_at(18, 50)) == _at(19, 0)
+    assert plan_slot(_at(11, 20)) == _at(11, 0)
+    assert plan_slot(_at(10, 5)) is None
+    assert plan_slot(_at(19, 40)) is None
+    assert plan_slot(_at(8, 30)) is None
+    print("✅ انتخاب slot")
+
+
+def test_revalidated_price_sent_on_slot():
+    """قیمت جدید قبل از slot جایگزین پیام آماده شده و پیام دقیقاً سر slot ارسال می‌شود"""
+    feed = Feed([1084000])
+    tenant, dispatcher = _tenant()
+
+    async def scenario():
+        slot = datetime.now(TEHRAN) + timedelta(seconds=0.4)
+
+        async def change_price():
+            await asyncio.sleep(0.25)
+            feed.posts.append(1090000)
+
+        async with Pipeline() as pipeline:
+            changer = asyncio.create_task(change_price())
+            result = await run_slot(pipeline, feed.source, tenant, slot, lead=0.3, revalidate=0.1)
+            await changer
+        return slot, result
+
+    slot, result = _run(scenario())
+    assert result.outcome.status == PUBLISHED and result.revalidated
+    assert result.outcome.base_rate == tenant.state.calculate_base_rate(1090000)
+    assert feed.reads == 2
+    sent_at, text = dispatcher.published[0]
+    assert len(dispatcher.published) == 1
+    assert sent_at >= slot and 0 <= result.queued_lateness < 0.1
+    assert f"{slot:%H:%M}" in text
+    print("✅ بررسی دوباره و ارسال سر slot")
+
+
+def test_prefetched_message_kept_and_unchanged_suppressed():
+    """بدون پیام جدید پیام آماده شده ارسال می‌شود؛ نرخ تکراری اصلاً ارسال نمی‌شود"""
+    feed = Feed([1084000])
+    tenant, dispatcher = _tenant()
+
+    async def scenario():
+        async with Pipeline() as pipeline:
+            slot = datetime.now(TEHRAN) + timedelta(seconds=0.2)
+            first = await run_slot(pipeline, feed.source, tenant, slot, lead=0.15, revalidate=0.05)
+            feed.posts.append(1084000)
+            slot = datetime.now(TEHRAN) + timedelta(seconds=0.2)
+            second = await run_slot(pipeline, feed.source, tenant, slot, lead=0.15, revalidate=0.05)
+        return first, second
+
+    first, second = _run(scenario())
+    assert first.outcome.status == PUBLISHED and not first.revalidated
+    assert second.outcome.status == SUPPRESSED and second.queued_lateness is None
+    assert len(dispatcher.published) == 1
+    print("✅ پیام آماده شده و نرخ تکراری")
+
+
+def test_missed_slot_sent_immediately():
+    """اجرای دیرتر از slot بدون انتظار و بدون بررسی دوباره ارسال می‌شود"""
+    feed = Feed([1084000])
+    tenant, dispatcher = _tenant()
+
+    async def scenario():
+        slot = datetime.now(TEHRAN) - timedelta(seconds=5)
+        async with Pipeline() as pipeline:
+            return await run_slot(pipeline, feed.source, tenant, slot, lead=60, revalidate=10)
+
+    result = _run(scenario())
+    assert result.outcome.status == PUBLISHED and feed.reads == 1
+    assert 5 <= result.queued_lateness < 6
+    print("✅ slot از دست رفته")
+
+
+def test_lateness_metrics():
+    """رکوردهای تأخیر محدود نگه داشته و خلاصه می‌شوند"""
+    state = TetherBot(data_file=None)
+    original = prefetch.SLOT_METRICS_KEEP
+    prefetch.SLOT_METRICS_KEEP = 3
+    try:
+        for i, delivered in enumerate((4.0, 1.0, 2.0, 3.0)):
+            record_lateness(state, _at(11 + i, 0), 0.01, delivered)
+    finally:
+        prefetch.SLOT_METRICS_KEEP = original
+    assert [e['slot'][11:16] for e in state.slot_lateness] == ['12:00', '13:00', '14:00']
+    assert lateness_summary(state.slot_lateness) == {'count': 3, 'mean': 2.0, 'max': 3.0, 'last': 3.0}
+    assert lateness_summary([]) is None
+    print("✅ ثبت تأخیر")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های prefetch...\n")
+    test_plan_slot()
+    test_revalidated_price_sent_on_slot()
+    test_prefetched_message_kept_and_unchanged_suppressed()
+    test_missed_slot_sent_immediately()
+    test_lateness_metrics()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
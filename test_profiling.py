@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست پروفایل اختیاری اجراها
+"""
+
+import os
+import asyncio
+import logging
+import tempfile
+
+import profiling
+from profiling import profiled
+
+
+async def _work(n=2000):
+    await asyncio.sleep(0)
+    return sum(i * i for i in range(n))
+
+
+def test_disabled_is_free():
+    """در حالت خاموش همان تابع اصلی برگردانده می‌شود"""
+    assert profiled(enabled=False)(_work) is _work
+    print("✅ بدون هزینه در حالت خاموش")
+
+
+def test_profile_saved_and_rotated():
+    """هر اجرا یک فایل می‌سازد و فقط PROFILE_KEEP فایل آخر می‌ماند"""
+    logging.disable(logging.CRITICAL)
+    directory = tempfile.mkdtemp()
+    original = profiling.PROFILE_DIR, profiling.PROFILE_KEEP
+    profiling.PROFILE_DIR, profiling.PROFILE_KEEP = directory, 3
+    try:
+        run = profiled('work', enabled=True)(_work)
+        for _ in range(5):
+            assert asyncio.run(run()) == asyncio.run(_work())
+        files = [name for name in os.listdir(directory) if name.endswith('.prof')]
+        assert len(files) == 3
+        assert all('-work-' in name for name in files)
+    finally:
+        profiling.PROFILE_DIR, profiling.PROFILE_KEEP = original
+        logging.disable(logging.NOTSET)
+    print("✅ ذخیره و چرخش فایل‌ها")
+
+
+def test_save_uses_directory_argument():
+    """save و summarize مستقل از دکوراتور قابل استفاده‌اند"""
+    import cProfile
+
+    directory = tempfile.mkdtemp()
+    profile = cProfile.Profile()
+    profile.enable()
+    sum(range(1000))
+    profile.disable()
+    path = profiling.save(profile, 'manual', directory=directory, keep=5)
+    assert os.path.dirname(path) == directory and os.path.exists(path)
+    assert profiling.summarize(profile).lstrip().startswith('ncalls')
+    print("✅ save و summarize")
+
+
+def test_nested_calls_share_profile():
+    """فراخوانی تو در تو پروفایل دوم نمی‌سازد"""
+    logging.disable(logging.CRITICAL)
+    directory = tempfile.mkdtemp()
+    original = profiling.PROFILE_DIR
+    profiling.PROFILE_DIR = directory
+    try:
+        inner = profiled('inner', enabled=True)(_work)
+
+        @profiled('outer', enabled=True)
+        async def outer():
+            return await inner()
+
+        asyncio.run(outer())
+        files = os.listdir(directory)
+        assert len(files) == 1 and '-outer-' in files[0]
+    finally:
+        profiling.PROFILE_DIR = original
+        logging.disable(logging.NOTSET)
+    print("✅ پروفایل تو در تو")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های پروفایل...\n")
+    test_disabled_is_free()
+    test_profile_saved_and_rotated()
+    test_save_uses_directory_argument()
+    test_nested_calls_share_profile()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
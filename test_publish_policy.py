@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست سیاست انتشار پیام نرخ
+"""
+
+from datetime import datetime, timedelta
+
+import pytz
+
+from bot import TetherBot
+from publish_policy import PublishPolicy
+
+TEHRAN = pytz.timezone('Asia/Tehran')
+START = TEHRAN.localize(datetime(2025, 11, 10, 11, 0))
+
+
+def _policy(**kwargs):
+    options = dict(min_delta=0, debounce_seconds=300, heartbeat_minutes=180)
+    options.update(kwargs)
+    return PublishPolicy({}, **options)
+
+
+def _publish(policy, rate, now):
+    bot = TetherBot(data_file=None)
+    tiers = bot.tier_prices(rate)
+    decision = policy.decide(rate, tiers, now)
+    if decision:
+        policy.record(rate, tiers, now)
+    return decision
+
+
+def test_unchanged_tiers_suppressed():
+    """نرخ تکراری (مثلاً شاخه شرط کاهش نرخ) ارسال نمی‌شود"""
+    policy = _policy()
+    assert _publish(policy, 15240, START).reason == 'first'
+    decision = _publish(policy, 15240, START + timedelta(hours=1))
+    assert not decision and decision.reason == 'unchanged'
+    print("✅ حذف پیام تکراری")
+
+
+def test_min_delta():
+    """تغییر کمتر از حداقل اختلاف ارسال نمی‌شود"""
+    policy = _policy(min_delta=30)
+    _publish(policy, 15240, START)
+    assert _publish(policy, 15260, START + timedelta(hours=1)).reason == 'below_delta'
+    assert _publish(policy, 15280, START + timedelta(hours=2)).reason == 'changed'
+    print("✅ حداقل اختلاف")
+
+
+def test_debounce_and_heartbeat():
+    """تغییرات پشت سر هم یک پیام می‌شوند و heartbeat پیام تکراری می‌فرستد"""
+    policy = _policy()
+    _publish(policy, 15240, START)
+    decision = _publish(policy, 15250, START + timedelta(minutes=1))
+    assert decision.reason == 'debounced'
+    assert decision.retry_at == START + timedelta(minutes=5)
+    assert not _publish(policy, 15260, START + timedelta(minutes=2))
+    assert _publish(policy, 15270, START + timedelta(minutes=6)).reason == 'changed'
+
+    assert _publish(policy, 15270, START + timedelta(hours=4)).reason == 'heartbeat'
+    print("✅ debounce و heartbeat")
+
+
+def test_new_day():
+    """اولین پیام هر روز همیشه ارسال می‌شود"""
+    policy = _policy(heartbeat_minutes=0)
+    _publish(policy, 15240, START)
+    assert _publish(policy, 15240, START + timedelta(days=1)).reason == 'new_day'
+    print("✅ اولین پیام روز")
+
+
+def test_closed_day():
+    """در روز تعطیل (جمعه) چیزی منتشر نمی‌شود"""
+    from jalali_calendar import JalaliCalendar
+    policy = _policy(skip_day=JalaliCalendar(2025, 2025).is_closed)
+    friday = START + timedelta(days=4)
+    assert _publish(policy, 15240, friday).reason == 'closed'
+    assert _publish(policy, 15240, friday + timedelta(days=1)).reason == 'first'
+    print("✅ روز تعطیل")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های سیاست انتشار...\n")
+    test_unchanged_tiers_suppressed()
+    test_min_delta()
+    test_debounce_and_heartbeat()
+    test_new_day()
+    test_closed_day()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست جدول قیمت /quote
+"""
+
+from bot import PRICE_TIERS
+from quotes import QuoteBook, QuoteTable, parse_amounts
+
+
+def test_parse_amounts():
+    """ارقام فارسی، جداکننده هزارگان و چند مقدار"""
+    assert parse_amounts('7500') == [7500]
+    assert parse_amounts('۷۵۰۰ 12,000\n3٬000') == [7500, 12000, 3000]
+    assert parse_amounts('سلام') == []
+    # مقادیر تکراری (شناسه نتایج inline یکتا می‌ماند)
+    assert parse_amounts('7500 7,500 100 ۱۰۰ 100.0') == [7500, 100]
+    print("✅ خواندن مقادیر")
+
+
+def test_tier_selection():
+    """سطح درست برای هر مقدار (مرزها شامل سقف سطح هستند)"""
+    table = QuoteTable(15240, PRICE_TIERS)
+    assert table.quote(5000) == (PRICE_TIERS[0][0], 15320, 5000 * 15320)
+    assert table.quote(7500) == (PRICE_TIERS[1][0], 15310, 7500 * 15310)
+    assert table.quote(10000)[1] == 15310
+    assert table.quote(10001)[1] == 15300
+    assert table.line(7500) == table._render(7500)
+    assert '114,825,000' in table.line(7500)
+    print("✅ انتخاب سطح")
+
+
+def test_batch_total():
+    """جمع کل برای چند مقدار"""
+    text = QuoteTable(15240, PRICE_TIERS).render([3000, 12000])
+    assert '3,000 یوآن' in text and '12,000 یوآن' in text
+    assert f"{3000 * 15320 + 12000 * 15300:,}" in text
+    print("✅ چند مقدار")
+
+
+def test_table_rebuilt_per_version():
+    """جدول فقط با تغییر نسخه نرخ دوباره ساخته می‌شود"""
+    book = QuoteBook(PRICE_TIERS)
+    first = book.table(1, 15240)
+    assert book.table(1, 15240) is first
+    assert book.table(2, 15300) is not first
+    assert book.table(3, None) is None
+    print("✅ جدول هر نسخه")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های quote...\n")
+    test_parse_amounts()
+    test_tier_selection()
+    test_batch_total()
+    test_table_rebuilt_per_version()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست API محلی نرخ (ETag، Last-Modified، تاریخچه و keep-alive)
+"""
+
+import json
+import asyncio
+import logging
+from datetime import datetime
+
+import pytz
+
+from bot import PRICE_TIERS, TetherBot
+from rate_api import RateApi
+
+TEHRAN = pytz.timezone('Asia/Tehran')
+T0 = TEHRAN.localize(datetime(2025, 11, 10, 11, 0)).timestamp()
+
+
+def _state():
+    state = TetherBot(data_file=None)
+    state.yuan_rate = 7.12
+    for i, price in enumerate((1084000, 1084500, 1084980)):
+        base_rate = state.calculate_base_rate(price)
+        state.record_tick(price, base_rate, T0 + i * 600)
+        state.apply_ratchet(base_rate, save=False)
+    return state
+
+
+async def _request(reader, writer, target, headers=None, method='GET'):
+    lines = [f"{method} {target} HTTP/1.1", "Host: localhost"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    received = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1')
+        if line == '\r\n':
+            break
+        name, _, value = line.partition(':')
+        received[name.strip().lower()] = value.strip()
+    length = int(received.get('content-length', 0))
+    body = await reader.readexactly(length) if length and method != 'HEAD' else b''
+    return status, received, body
+
+
+def _serve(state, scenario):
+    async def run():
+        api = RateApi(state, PRICE_TIERS)
+        await api.start('127.0.0.1', 0)
+        reader, writer = await asyncio.open_connection('127.0.0.1', api.port)
+        try:
+            return await scenario(api, reader, writer)
+        finally:
+            writer.close()
+            await api.close()
+
+    logging.disable(logging.CRITICAL)
+    try:
+        return asyncio.run(run())
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_rate_and_conditional_requests():
+    """پاسخ نرخ با ETag؛ درخواست شرطی 304 و تغییر نرخ ETag جدید می‌دهد"""
+    state = _state()
+
+    async def scenario(api, reader, writer):
+        status, headers, body = await _request(reader, writer, '/v1/rate')
+        assert status == 200
+        payload = json.loads(body)
+        assert payload['base_rate'] == state.last_calculated_rate
+        assert [t['price'] for t in payload['tiers']] == list(state.tier_prices(payload['base_rate']))
+        assert payload['message'].startswith('⏳')
+
+        etag, modified = headers['etag'], headers['last-modified']
+        status, cached, body = await _request(reader, writer, '/v1/rate', {'If-None-Match': etag})
+        assert (status, body) == (304, b'') and cached['etag'] == etag
+        status, _, _ = await _request(reader, writer, '/v1/rate', {'If-Modified-Since': modified})
+        assert status == 304
+
+        state.yuan_rate = 7.0
+        state.apply_ratchet(state.calculate_base_rate(1090000), save=False)
+        status, changed, _ = await _request(reader, writer, '/v1/rate', {'If-None-Match': etag})
+        assert status == 200 and changed['etag'] != etag
+        return api
+
+    api = _serve(state, scenario)
+    assert api.not_modified == 2
+    print("✅ نرخ فعلی و درخواست شرطی")
+
+
+def test_prebuilt_per_version():
+    """تا تغییر نسخه وضعیت، پاسخ فقط یک بار ساخته می‌شود"""
+    state = _state()
+    api = RateApi(state, PRICE_TIERS)
+    first = [api.respond('GET', '/v1/rate.txt', {}) for _ in range(1000)]
+    assert api.builds == 1 and all(r is first[0] or r == first[0] for r in first)
+    assert first[0][2].decode('utf-8') == state.format_message(
+        state.last_calculated_rate, datetime.fromtimestamp(T0 + 1200, TEHRAN))
+    state.record_tick(1085000, state.calculate_base_rate(1085000), T0 + 1800)
+    api.respond('GET', '/v1/rate.txt', {})
+    assert api.builds == 2
+    print("✅ ساخت پاسخ یک بار برای هر نسخه")
+
+
+def test_history_and_base_rate():
+    """تاریخچه JSON/CSV با بازه زمانی و آخرین نتیجه calculate_base_rate"""
+    state = _state()
+
+    async def scenario(api, reader, writer):
+        _, _, body = await _request(reader, writer, f'/v1/history?from={T0 + 1}')
+        history = json.loads(body)
+        _, headers, csv_body = await _request(reader, writer, f'/v1/history.csv?to={T0 + 600}')
+        _, _, base = await _request(reader, writer, '/v1/base-rate')
+        status, _, _ = await _request(reader, writer, '/v1/history?from=yesterday')
+        missing, _, _ = await _request(reader, writer, '/v2/rate')
+        post, _, _ = await _request(reader, writer, '/v1/rate', method='POST')
+        return history, headers, csv_body, json.loads(base), status, missing, post
+
+    history, headers, csv_body, base, bad, missing, post = _serve(state, scenario)
+    assert [h['tether_price'] for h in history] == [1084500, 1084980]
+    assert headers['content-type'].startswith('text/csv')
+    rows = csv_body.decode('utf-8').splitlines()
+    assert rows[0] == 'ts,at,tether_price,base_rate' and len(rows) == 3
+    assert base['tether_price'] == 1084980
+    assert base['base_rate'] == state.calculate_base_rate(1084980)
+    assert (bad, missing, post) == (400, 404, 405)
+    print("✅ تاریخچه و نرخ مبنا")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های API نرخ...\n")
+    test_rate_and_conditional_requests()
+    test_prebuilt_per_version()
+    test_history_and_base_rate()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست حلقه یادآوری بدون نیاز به تلگرام
+"""
+
+import os
+import asyncio
+import tempfile
+from datetime import datetime, time
+from types import SimpleNamespace
+
+import pytz
+
+from bot import TetherBot
+from reminder import ReminderLoop
+
+TEHRAN = pytz.timezone('Asia/Tehran')
+
+
+def _at(hour, minute):
+    return TEHRAN.localize(datetime(2025, 11, 10, hour, minute))
+
+
+class FakeBot:
+    """جایگزین Bot تلگرام که پیام‌ها را ثبت می‌کند"""
+
+    def __init__(self):
+        self.sent = []
+        self.pinned = []
+        self.unpinned = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append(text)
+        return SimpleNamespace(message_id=len(self.sent))
+
+    async def get_chat_administrators(self, chat_id):
+        admin = SimpleNamespace(username='rate_admin', is_bot=False, id=1, first_name='A')
+        return [SimpleNamespace(user=admin)]
+
+    async def pin_chat_message(self, chat_id, message_id):
+        self.pinned.append(message_id)
+
+    async def unpin_chat_message(self, chat_id, message_id):
+        self.unpinned.append(message_id)
+
+
+def _loop(state, bot, **kwargs):
+    options = dict(start=time(10, 45), end=time(19, 0), interval_minutes=15,
+                   escalate_after=2, pin_after=3, tz=TEHRAN)
+    options.update(kwargs)
+    return ReminderLoop(bot, state, -100, **options)
+
+
+def test_cadence_and_escalation():
+    """ارسال در بازه‌های منظم، تشدید و سنجاق"""
+    state = TetherBot(data_file=None)
+    bot = FakeBot()
+    loop = _loop(state, bot)
+
+    async def scenario():
+        assert not await loop.send_due_reminder(_at(10, 30))
+        assert await loop.send_due_reminder(_at(10, 45))
+        assert not await loop.send_due_reminder(_at(10, 50)), "یادآوری تکراری!"
+        for minute in (0, 15, 30):
+            assert await loop.send_due_reminder(_at(11, minute))
+
+    asyncio.run(scenario())
+    assert len(bot.sent) == 4
+    assert '@rate\\_admin' not in bot.sent[1]
+    assert '@rate\\_admin' in bot.sent[2], "یادآوری سوم باید ادمین‌ها را منشن کند"
+    assert bot.pinned == [4]
+    assert state.reminder['count'] == 4
+    print("✅ زمان‌بندی و تشدید یادآوری")
+
+
+def test_stops_when_rate_set():
+    """پس از ثبت نرخ امروز یادآوری ارسال نمی‌شود"""
+    state = TetherBot(data_file=None)
+    loop = _loop(state, FakeBot())
+    assert loop.next_due(_at(11, 0)) is not None
+    state.set_yuan_rate(7.12, now=_at(11, 5))
+    assert loop.next_due(_at(11, 10)) is None
+    print("✅ توقف پس از ثبت نرخ")
+
+
+def test_run_cancelled_by_setrate():
+    """حلقه با notify_rate_set فوراً بیدار شده و سنجاق را برمی‌دارد"""
+    state = TetherBot(data_file=None)
+    bot = FakeBot()
+    clock = SimpleNamespace(now=_at(11, 0))
+    loop = _loop(state, bot, pin_after=0, clock=lambda: clock.now)
+
+    async def scenario():
+        task = asyncio.create_task(loop.run())
+        await asyncio.sleep(0.05)
+        assert len(bot.sent) == 1 and bot.pinned == [1]
+
+        state.set_yuan_rate(7.12, now=clock.now)
+        loop.notify_rate_set()
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert len(bot.sent) == 1
+    assert bot.unpinned == [1]
+    print("✅ لغو حلقه با /setrate")
+
+
+def test_automatic_rate_skips_reminder():
+    """اگر منبع خودکار نرخ امروز را بدهد یادآوری ارسال نمی‌شود"""
+    state = TetherBot(data_file=None)
+    bot = FakeBot()
+
+    async def refresh():
+        state.set_yuan_rate(7.2, now=_at(10, 45), source='http')
+
+    loop = _loop(state, bot, refresh_rate=refresh)
+    assert not asyncio.run(loop.send_due_reminder(_at(10, 45)))
+    assert bot.sent == [] and state.yuan_rate_source == 'http'
+    print("✅ نرخ خودکار به جای یادآوری")
+
+
+def test_no_duplicate_across_processes():
+    """یادآوری ارسال شده از فرآیند دیگر (اجرای مستقیم reminder.py) تکرار نمی‌شود"""
+    path = os.path.join(tempfile.mkdtemp(), 'data.json')
+    try:
+        bot_state = TetherBot(data_file=path)
+        bot = FakeBot()
+        bot_loop = _loop(bot_state, bot)
+        job_state = TetherBot(data_file=path)
+        job_loop = _loop(job_state, bot, save=job_state.save_reminder)
+
+        async def scenario():
+            assert await job_loop.send_due_reminder(_at(10, 45))
+            assert not await bot_loop.send_due_reminder(_at(10, 46)), "یادآوری تکراری!"
+            assert await bot_loop.send_due_reminder(_at(11, 0))
+            assert not await job_loop.send_due_reminder(_at(11, 1)), "یادآوری تکراری!"
+
+        asyncio.run(scenario())
+        assert len(bot.sent) == 2 and bot_state.reminder['count'] == 2
+    finally:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+    print("✅ بدون یادآوری تکراری بین ربات و اجرای مستقیم")
+
+
+def test_standalone_keeps_bot_data():
+    """اجرای مستقیم reminder.py فقط وضعیت یادآوری را در data.json می‌نویسد"""
+    path = os.path.join(tempfile.mkdtemp(), 'data.json')
+    try:
+        job_state = TetherBot(data_file=path)
+        bot_state = TetherBot(data_file=path)
+        # ربات بعد از شروع اجرای مستقیم داده‌های تازه ذخیره می‌کند
+        bot_state.last_calculated_rate = 9500
+        bot_state.outbox.append({'key': 'tick@telegram', 'status': 'pending'})
+        bot_state.save_data()
+
+        job_loop = _loop(job_state, FakeBot(), save=job_state.save_reminder)
+        assert asyncio.run(job_loop.send_due_reminder(_at(10, 45)))
+
+        stored = TetherBot(data_file=path)
+        assert stored.last_calculated_rate == 9500
+        assert stored.outbox == [{'key': 'tick@telegram', 'status': 'pending'}]
+        assert stored.reminder['count'] == 1
+    finally:
+        for name in os.listdir(os.path.dirname(path)):
+            os.remove(os.path.join(os.path.dirname(path), name))
+        os.rmdir(os.path.dirname(path))
+    print("✅ حفظ داده‌های ربات در اجرای مستقیم")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های یادآوری...\n")
+    test_cadence_and_escalation()
+    test_stops_when_rate_set()
+    test_run_cancelled_by_setrate()
+    test_automatic_rate_skips_reminder()
+    test_no_duplicate_across_processes()
+    test_standalone_keeps_bot_data()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست موتور بازپخش پیام‌های ضبط شده
+"""
+
+import os
+import json
+import asyncio
+import logging
+import tempfile
+
+from publish_policy import PublishPolicy
+from replay import ReplayEngine, load_recording
+
+
+def _post(date, price):
+    return {'date': date, 'text': f"🔴 فروش تتر : {price} ریال"}
+
+
+RECORDING = [
+    {'date': '2025-11-10T10:50:00', 'yuan_rate': 7.12},
+    _post('2025-11-10T10:55:00', 1084980),   # → 15,240
+    _post('2025-11-10T11:40:00', 1000000),   # کاهش → شرط کاهش نرخ
+    _post('2025-11-10T12:30:00', 1090000),   # → 15,310
+    {'date': '2025-11-10T13:00:00', 'text': 'پیام بدون قیمت'},
+]
+
+
+def _write_recording(items):
+    fd, path = tempfile.mkstemp(suffix='.jsonl')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+    return path
+
+
+def _replay(mode, policy=None):
+    path = _write_recording(RECORDING)
+    try:
+        posts = load_recording(path)
+    finally:
+        os.remove(path)
+    logging.disable(logging.WARNING)
+    try:
+        return asyncio.run(ReplayEngine(posts, mode=mode, policy=policy).run())
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_schedule_replay():
+    """در هر ساعت 11 تا 13 همه پیام‌های جدید از اجرای قبلی پردازش می‌شوند"""
+    report = _replay('schedule')
+    assert report.ticks == 3
+    assert report.messages == 4
+    assert [m.at.strftime('%H:%M') for m in report.published] == ['11:00', '12:00', '13:00']
+    assert '🕐 ساعت: 11:00' in report.published[0].text
+    assert '15,320' in report.published[0].text
+    # ساعت 12: قیمت کمتر بود، نرخ قبلی حفظ می‌شود
+    assert '15,320' in report.published[1].text
+    # ساعت 13: پیام ساعت 12:30 دیده می‌شود، با وجود پیام بدون قیمت بعد از آن
+    assert '15,390' in report.published[2].text
+    assert report.skipped == 0
+    print("✅ بازپخش زمان‌بندی شده")
+
+
+def test_posts_replay():
+    """هر پیام یک tick است و ترتیب پیام‌ها حفظ می‌شود"""
+    report = _replay('posts')
+    assert report.ticks == 4
+    rates = [m.text.splitlines()[-1].split(':')[-1].strip() for m in report.published]
+    assert rates == ['15,300', '15,300', '15,370']
+    assert report.ticks_per_second > 0
+    assert all(report.stage_seconds[s] >= 0 for s in report.stage_seconds)
+    print("✅ بازپخش پیام به پیام")
+
+
+def test_policy_replay():
+    """با سیاست انتشار، tick بدون تغییر سطوح منتشر نمی‌شود"""
+    policy = PublishPolicy(min_delta=0, debounce_seconds=0, heartbeat_minutes=0)
+    report = _replay('posts', policy)
+    assert [m.at.strftime('%H:%M') for m in report.published] == ['10:55', '12:30']
+    assert report.suppressed == 1 and report.skipped == 1
+    assert set(report.stage_seconds) == {'source', 'parse', 'compute', 'policy', 'render', 'sink'}
+    print("✅ بازپخش با سیاست انتشار")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های بازپخش...\n")
+    test_schedule_replay()
+    test_posts_replay()
+    test_policy_replay()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
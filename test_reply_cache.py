@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست کش پاسخ دستورات فقط‌خواندنی
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import bot as bot_module
+from bot import TetherBot
+from outbox import Outbox
+from reply_cache import ReplyCache
+
+
+class _Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_hit_skips_render():
+    """در حالت hit تابع ساخت پاسخ فراخوانی نمی‌شود"""
+    cache = ReplyCache()
+    calls = []
+
+    def render():
+        calls.append(1)
+        return "پاسخ"
+
+    assert cache.get('getrate', 1, render) == "پاسخ"
+    assert cache.get('getrate', 1, render) == "پاسخ"
+    assert len(calls) == 1 and cache.hits == 1
+
+    cache.get('getrate', 2, render)
+    assert len(calls) == 2, "تغییر نسخه باید پاسخ را دوباره بسازد"
+    print("✅ کش بر اساس نسخه")
+
+
+def test_per_minute_refresh():
+    """پاسخ‌های دارای ساعت هر دقیقه تازه می‌شوند"""
+    clock = _Clock(600.0)
+    cache = ReplyCache(clock=clock)
+    counter = iter(range(100))
+
+    def render():
+        return str(next(counter))
+
+    first = cache.get('status', 1, render, per_minute=True)
+    clock.now = 659.0
+    assert cache.get('status', 1, render, per_minute=True) == first
+    clock.now = 660.0
+    assert cache.get('status', 1, render, per_minute=True) != first
+    print("✅ تازه‌سازی دقیقه‌ای")
+
+
+def test_state_version_tracks_rates():
+    """نسخه وضعیت فقط با تغییر واقعی نرخ‌ها افزایش می‌یابد"""
+    bot = TetherBot(data_file=None)
+    version = bot.state_version
+
+    bot.yuan_rate = 7.12
+    assert bot.state_version == version + 1
+    bot.yuan_rate = 7.12
+    assert bot.state_version == version + 1, "مقدار یکسان نباید نسخه را تغییر دهد"
+    bot.last_calculated_rate = 15240.0
+    bot.bump_version()
+    assert bot.state_version == version + 3
+    print("✅ نسخه وضعیت")
+
+
+def test_status_live_fields():
+    """صف ارسال در /status بدون تغییر نسخه وضعیت تازه و بدون تغییر از کش خوانده می‌شود"""
+    replies = []
+
+    async def reply_text(text):
+        replies.append(text)
+
+    update = SimpleNamespace(message=SimpleNamespace(reply_text=reply_text))
+    state = bot_module.bot_instance
+    version = state.state_version
+    # outbox و کش جدا (بدون وابستگی به data.json محلی)
+    outbox, cache = Outbox(), ReplyCache()
+    originals = bot_module.publish_outbox, bot_module.reply_cache
+    bot_module.publish_outbox, bot_module.reply_cache = outbox, cache
+    try:
+        asyncio.run(bot_module.status(update, None))
+        outbox.add('status-test', 'متن', ['telegram'])
+        asyncio.run(bot_module.status(update, None))
+        hits = cache.hits
+        asyncio.run(bot_module.status(update, None))
+    finally:
+        bot_module.publish_outbox, bot_module.reply_cache = originals
+    assert state.state_version == version
+    assert '📬 صف ارسال: خالی' in replies[0]
+    assert '📬 صف ارسال: 1 پیام در انتظار' in replies[1]
+    assert replies[2] == replies[1] and cache.hits == hits + 2
+    print("✅ بخش پویای /status")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های کش پاسخ...\n")
+    test_cache_hit_skips_render()
+    test_per_minute_refresh()
+    test_state_version_tracks_rates()
+    test_status_live_fields()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
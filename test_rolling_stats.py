@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست موتور آمار لحظه‌ای پنجره‌های زمانی
+"""
+
+import random
+import statistics
+
+from rolling_stats import StatsEngine
+
+
+def _naive(values):
+    return {
+        'count': len(values),
+        'mean': statistics.fmean(values),
+        'median': statistics.median(values),
+        'min': min(values),
+        'max': max(values),
+        'stdev': statistics.stdev(values) if len(values) > 1 else 0.0,
+        'change_pct': (values[-1] - values[0]) / values[0] * 100,
+    }
+
+
+def test_matches_full_recompute():
+    """آمار افزایشی با محاسبه کامل پنجره در هر مرحله برابر است"""
+    rng = random.Random(7)
+    engine = StatsEngine({'short': 600, 'long': 3600})
+    history = []
+    ts = 0.0
+    for _ in range(2000):
+        ts += rng.uniform(5, 90)
+        price = rng.randint(1_050_000, 1_120_000)
+        engine.record(ts, price)
+        history.append((ts, price))
+        for window, span in (('short', 600), ('long', 3600)):
+            values = [p for t, p in history if t > ts - span]
+            expected = _naive(values)
+            actual = engine.snapshot('tether', window)
+            for key, value in expected.items():
+                assert abs(actual[key] - value) < 1e-6 * max(1, abs(value)), (window, key)
+    print("✅ برابری با محاسبه کامل")
+
+
+def test_window_expires():
+    """پنجره با گذشت زمان خالی می‌شود"""
+    engine = StatsEngine({'1h': 3600})
+    engine.record(0, 1_000_000, 15_000)
+    assert engine.snapshot('base_rate', '1h', now=100)['count'] == 1
+    assert engine.snapshot('base_rate', '1h', now=3600) is None
+    print("✅ انقضای پنجره")
+
+
+def test_outlier_rejection():
+    """قیمت دور از میانه اخیر پرت شناخته می‌شود"""
+    engine = StatsEngine()
+    assert not engine.is_outlier(2_000_000, now=0)    # نمونه کافی نیست
+    for i, price in enumerate((1_080_000, 1_085_000, 1_090_000)):
+        engine.record(i * 60, price)
+    assert not engine.is_outlier(1_100_000, now=200)
+    assert engine.is_outlier(1_400_000, now=200)
+    assert engine.is_outlier(108_500, now=200)        # یک رقم کم
+    print("✅ رد قیمت پرت")
+
+
+def test_sustained_level_shift():
+    """جهش پایدار قیمت پس از چند قیمت همخوان پذیرفته می‌شود؛ قیمت پرت تکی نه"""
+    engine = StatsEngine()
+    ts = 0
+    for _ in range(144):                              # ۲۴ ساعت، هر ۱۰ دقیقه
+        engine.record(ts, 1_080_000)
+        ts += 600
+
+    # یک قیمت پرت تکی و سپس قیمت عادی: بافر نامزد خالی می‌شود
+    assert not engine.accept(1_400_000, now=ts)
+    assert engine.accept(1_081_000, now=ts)
+    assert not engine.accept(1_400_000, now=ts)
+    assert not engine.accept(1_155_000, now=ts)       # ناهمخوان با نامزد قبلی
+
+    accepted = []
+    for i in range(18):                               # جهش ۷٪ به مدت ۳ ساعت
+        ts += 600
+        price = 1_155_600 + (i % 2) * 1000
+        if engine.accept(price, now=ts):
+            engine.record(ts, price)
+            accepted.append(i)
+    assert accepted[0] <= 2
+    # پس از خروج قیمت‌های قدیمی از پنجره ۱ ساعته همه قیمت‌ها پذیرفته می‌شوند
+    assert accepted[-12:] == list(range(6, 18))
+    print("✅ جهش پایدار قیمت")
+
+
+def test_export_restore():
+    """tickهای ذخیره شده آمار را بازسازی می‌کنند"""
+    engine = StatsEngine()
+    for i in range(10):
+        engine.record(i * 600, 1_080_000 + i * 1000, 15_000 + i)
+    restored = StatsEngine()
+    restored.restore(engine.export())
+    assert restored.snapshot('tether', '24h') == engine.snapshot('tether', '24h')
+    assert restored.snapshot('base_rate', '1h') == engine.snapshot('base_rate', '1h')
+    print("✅ ذخیره و بازیابی")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های آمار...\n")
+    test_matches_full_recompute()
+    test_window_expires()
+    test_outlier_rejection()
+    test_sustained_level_shift()
+    test_export_restore()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
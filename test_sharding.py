@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست تقسیم گروه‌ها بین workerها با consistent hashing
+"""
+
+import time
+import asyncio
+import hashlib
+import logging
+
+from sharding import HashRing, ShardCoordinator
+from sinks import ShardedTelegramSink
+from benchmarks import FakeBotApi
+
+CHATS = [-1000000000000 - i for i in range(2000)]
+
+
+class FlakyBot(FakeBotApi):
+    """اولین ارسال به هر گروه هفتم ناموفق است"""
+
+    def __init__(self):
+        super().__init__(cost_rounds=1)
+        self.attempts = {}
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.attempts[chat_id] = self.attempts.get(chat_id, 0) + 1
+        if chat_id % 7 == 0 and self.attempts[chat_id] == 1:
+            raise ConnectionError("قطع شبکه")
+        await super().send_message(chat_id, text, **kwargs)
+
+
+def test_ring_balanced():
+    """گروه‌ها تقریباً به طور مساوی تقسیم می‌شوند"""
+    shards = HashRing([f'worker-{i}' for i in range(4)]).assign(CHATS)
+    assert sum(len(chats) for chats in shards.values()) == len(CHATS)
+    assert all(300 < len(chats) < 700 for chats in shards.values())
+    print("✅ تقسیم متوازن")
+
+
+def test_adding_worker_moves_fraction():
+    """با اضافه شدن worker فقط گروه‌های worker جدید جابه‌جا می‌شوند"""
+    before = HashRing([f'worker-{i}' for i in range(4)])
+    after = HashRing([f'worker-{i}' for i in range(5)])
+    moved = [c for c in CHATS if before.owner(c) != after.owner(c)]
+    assert all(after.owner(c) == 'worker-4' for c in moved)
+    assert len(moved) < len(CHATS) * 0.35
+    print("✅ جابه‌جایی حداقلی")
+
+
+def test_coordinator_delivers_once():
+    """هر گروه یک بار پیام را دریافت می‌کند، حتی با ارسال مجدد همان tick"""
+    coordinator = ShardCoordinator(CHATS[:300], 2, FakeBotApi)
+    coordinator.start()
+    try:
+        coordinator.broadcast('tick-1', 'نرخ')
+        first = coordinator.wait('tick-1', timeout=60)
+        coordinator.broadcast('tick-1', 'نرخ')
+        again = coordinator.wait('tick-1', timeout=60)
+        coordinator.add_worker()
+        coordinator.broadcast('tick-2', 'نرخ')
+        third = coordinator.wait('tick-2', timeout=60)
+    finally:
+        coordinator.stop()
+    assert first == {**first, 'sent': 300, 'failed': 0, 'workers': 2}
+    assert again['sent'] == 0
+    assert third['sent'] == 300 and third['workers'] == 3
+    print("✅ ارسال با چند فرآیند")
+
+
+def test_failed_chats_retried_once():
+    """مقصد با گروه ناموفق خطا می‌دهد و تلاش مجدد فقط همان گروه‌ها را ارسال می‌کند"""
+    chats = CHATS[:100]
+    coordinator = ShardCoordinator(chats, 2, FlakyBot)
+    sink = ShardedTelegramSink(coordinator, timeout=60, retries=2, backoff=0)
+    tick = hashlib.sha1('نرخ'.encode('utf-8')).hexdigest()[:16]
+
+    async def run():
+        await sink.open()
+        try:
+            ok = await sink.send('نرخ')
+            coordinator.broadcast(tick, 'نرخ')
+            return ok, coordinator.wait(tick, timeout=60)
+        finally:
+            await sink.close()
+
+    logging.disable(logging.CRITICAL)
+    try:
+        ok, again = asyncio.run(run())
+    finally:
+        logging.disable(logging.NOTSET)
+    assert ok and sink.sent == 1 and sink.failed == 0
+    assert again == {**again, 'sent': 0, 'failed': 0}
+    print("✅ تلاش مجدد گروه‌های ناموفق")
+
+
+def test_wait_timeout_keeps_acks():
+    """انتظار منقضی شده پاسخ workerها را مصرف نمی‌کند"""
+    coordinator = ShardCoordinator(CHATS[:100], 2, FakeBotApi)
+    coordinator.start()
+    try:
+        coordinator.broadcast('tick-1', 'نرخ')
+        expired = coordinator.wait('tick-1', timeout=0.001)
+        result = coordinator.wait('tick-1', timeout=60)
+    finally:
+        coordinator.stop()
+    assert expired is None
+    assert result == {**result, 'sent': 100, 'failed': 0, 'workers': 2}
+    print("✅ انتظار منقضی شده")
+
+
+def test_dead_worker_respawned():
+    """worker از کار افتاده با همان سهم گروه‌ها دوباره ساخته می‌شود"""
+    coordinator = ShardCoordinator(CHATS[:300], 2, FakeBotApi)
+    coordinator.start()
+    logging.disable(logging.CRITICAL)
+    try:
+        process, _ = coordinator._workers['worker-0']
+        process.kill()
+        process.join()
+        coordinator.broadcast('tick-1', 'نرخ')
+        result = coordinator.wait('tick-1', timeout=60)
+        alive = all(p.is_alive() for p, _ in coordinator._workers.values())
+    finally:
+        logging.disable(logging.NOTSET)
+        coordinator.stop()
+    assert result == {**result, 'sent': 300, 'failed': 0, 'workers': 2}
+    assert coordinator.respawned == 1 and alive
+    print("✅ جایگزینی worker از کار افتاده")
+
+
+class SlowBot(FakeBotApi):
+    """ارسال با تأخیر (برای از کار انداختن worker در میانه یک tick)"""
+
+    def __init__(self):
+        super().__init__(cost_rounds=1)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0.02)
+        await super().send_message(chat_id, text, **kwargs)
+
+
+def test_respawn_skips_delivered_chats():
+    """worker جایگزین به گروه‌هایی که worker قبلی ارسال کرده دوباره ارسال نمی‌کند"""
+    coordinator = ShardCoordinator(CHATS[:60], 1, SlowBot, concurrency=1)
+    coordinator.start()
+    logging.disable(logging.CRITICAL)
+    try:
+        coordinator.broadcast('tick-1', 'نرخ')
+        deadline = time.monotonic() + 30
+        while len(coordinator._delivered.get('tick-1', ())) < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        process, _ = coordinator._workers['worker-0']
+        process.kill()
+        process.join()
+        time.sleep(0.2)
+        already = len(coordinator._delivered['tick-1'])
+        result = coordinator.wait('tick-1', timeout=60)
+    finally:
+        logging.disable(logging.NOTSET)
+        coordinator.stop()
+    assert 5 <= already < 60
+    assert result['sent'] + already == 60 and result['failed'] == 0
+    print("✅ بدون ارسال تکراری پس از جایگزینی worker")
+
+
+def test_wait_forgotten_tick():
+    """انتظار برای tickی که از حافظه coordinator خارج شده None برمی‌گرداند"""
+    coordinator = ShardCoordinator(CHATS[:10], 1, FakeBotApi)
+    assert coordinator.wait('unknown', timeout=0.1) is None
+    print("✅ tick فراموش شده")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های sharding...\n")
+    test_ring_balanced()
+    test_adding_worker_moves_fraction()
+    test_coordinator_delivers_once()
+    test_failed_chats_retried_once()
+    test_wait_timeout_keeps_acks()
+    test_dead_worker_respawned()
+    test_respawn_skips_delivered_chats()
+    test_wait_forgotten_tick()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
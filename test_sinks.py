@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست مقصدهای خروجی با سرورهای HTTP محلی به جای webhook و پل واتساپ
+"""
+
+import json
+import time
+import asyncio
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sinks import SinkDispatcher, TelegramSink, WebhookSink, WhatsAppSink
+
+
+class StandInServer:
+    """سرور HTTP محلی که درخواست‌ها را ثبت می‌کند"""
+
+    def __init__(self, delay=0.0, fail_first=0):
+        self.requests = []
+        self.delay = delay
+        self.fail_first = fail_first
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                owner.requests.append((self.path, json.loads(body)))
+                time.sleep(owner.delay)
+                status = 500 if len(owner.requests) <= owner.fail_first else 200
+                self.send_response(status)
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        # قطع اتصال کلاینت پس از timeout خطای تست نیست
+        self.server.handle_error = lambda request, address: None
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RecordingBot:
+    """جایگزین Bot تلگرام که زمان دریافت پیام را ثبت می‌کند"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text, time.perf_counter()))
+
+
+def _run(coro):
+    logging.disable(logging.CRITICAL)
+    try:
+        return asyncio.run(coro)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_slow_sink_does_not_block_others():
+    """مقصد کند ارسال به تلگرام را معطل نمی‌کند و با timeout کنار گذاشته می‌شود"""
+    bot = RecordingBot()
+
+    async def scenario(url):
+        dispatcher = SinkDispatcher([
+            WebhookSink(url, timeout=0.3, retries=0),
+            TelegramSink(bot, '-100', timeout=1, retries=0),
+        ])
+        await dispatcher.start()
+        started = time.perf_counter()
+        dispatcher.publish('نرخ')
+        await dispatcher.flush(5)
+        await dispatcher.close()
+        return started, dispatcher.sinks
+
+    with StandInServer(delay=1.0) as slow:
+        started, (webhook, telegram) = _run(scenario(slow.url))
+
+    assert bot.sent and bot.sent[0][2] - started < 0.2
+    assert telegram.sent == 1
+    assert webhook.failed == 1 and webhook.sent == 0
+    print("✅ جداسازی مقصد کند")
+
+
+def test_retry_then_success():
+    """پس از خطای سرور دوباره تلاش می‌شود"""
+    async def scenario(url):
+        sink = WebhookSink(url, timeout=2, retries=2, backoff=0.01)
+        dispatcher = SinkDispatcher([sink])
+        await dispatcher.start()
+        dispatcher.publish('نرخ')
+        await dispatcher.close(timeout=5)
+        return sink
+
+    with StandInServer(fail_first=2) as server:
+        sink = _run(scenario(server.url))
+        assert len(server.requests) == 3
+    assert sink.sent == 1 and sink.failed == 0
+    print("✅ تلاش مجدد")
+
+
+def test_whatsapp_payload():
+    """پل واتساپ درخواست /send-group با شناسه گروه دریافت می‌کند"""
+    async def scenario(url):
+        dispatcher = SinkDispatcher([WhatsAppSink(url, '123@g.us', timeout=2, retries=0)])
+        await dispatcher.start()
+        dispatcher.publish('📊 نرخ')
+        await dispatcher.close(timeout=5)
+
+    with StandInServer() as bridge:
+        _run(scenario(bridge.url))
+        assert bridge.requests == [('/send-group', {'groupId': '123@g.us', 'message': '📊 نرخ'})]
+    print("✅ پل واتساپ")
+
+
+def test_full_queue_keeps_latest():
+    """در صف پر، قدیمی‌ترین پیام کنار گذاشته می‌شود"""
+    bot = RecordingBot()
+
+    async def scenario():
+        sink = TelegramSink(bot, '-100', queue_size=1)
+        dispatcher = SinkDispatcher([sink])
+        await dispatcher.start()
+        for text in ('1', '2', '3'):
+            dispatcher.publish(text)
+        await dispatcher.close(timeout=5)
+        return sink
+
+    sink = _run(scenario())
+    assert [text for _, text, _ in bot.sent] == ['3']
+    assert sink.dropped == 2
+    print("✅ صف محدود")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های مقصدهای خروجی...\n")
+    test_slow_sink_does_not_block_others()
+    test_retry_then_success()
+    test_whatsapp_payload()
+    test_full_queue_keeps_latest()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
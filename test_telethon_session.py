@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست تأمین session تلتون در حافظه
+"""
+
+import os
+import base64
+import shutil
+import tempfile
+
+from telethon.sessions import StringSession
+
+import telethon_session
+from benchmarks import _fake_sqlite_session
+
+
+def _with_env(**values):
+    """تنظیم موقت متغیرهای محیطی و پاک کردن کش session"""
+    previous = {key: os.environ.get(key) for key in values}
+
+    def restore():
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        telethon_session.load_session_string.cache_clear()
+
+    for key, value in values.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    telethon_session.load_session_string.cache_clear()
+    return restore
+
+
+def test_legacy_session_converted_in_memory():
+    """TELETHON_SESSION (base64 فایل SQLite) بدون فایل موقت تبدیل می‌شود"""
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, 'legacy')
+        _fake_sqlite_session(path)
+        with open(f'{path}.session', 'rb') as f:
+            raw = f.read()
+    finally:
+        shutil.rmtree(workdir)
+
+    restore = _with_env(
+        TELETHON_SESSION_STRING=None,
+        TELETHON_SESSION_FILE=None,
+        TELETHON_SESSION=base64.b64encode(raw).decode(),
+    )
+    try:
+        session = telethon_session.get_session()
+    finally:
+        restore()
+
+    assert isinstance(session, StringSession)
+    assert session.dc_id == 4 and session.port == 443
+    assert session.auth_key is not None
+    print("✅ تبدیل session قدیمی در حافظه")
+
+
+def test_string_takes_priority():
+    """TELETHON_SESSION_STRING بر روش‌های دیگر مقدم است"""
+    value = StringSession.save(_string_session())
+    restore = _with_env(TELETHON_SESSION_STRING=value, TELETHON_SESSION='invalid')
+    try:
+        assert telethon_session.load_session_string() == value
+    finally:
+        restore()
+    print("✅ اولویت رشته session")
+
+
+def test_falls_back_to_local_file():
+    """بدون هیچ متغیری نام فایل session محلی برگردانده می‌شود"""
+    restore = _with_env(
+        TELETHON_SESSION_STRING=None, TELETHON_SESSION_FILE=None, TELETHON_SESSION=None
+    )
+    try:
+        assert telethon_session.get_session() == telethon_session.SESSION_NAME
+    finally:
+        restore()
+    print("✅ فایل session محلی")
+
+
+def _string_session():
+    from telethon.crypto import AuthKey
+    session = StringSession()
+    session.set_dc(2, '149.154.167.51', 443)
+    session.auth_key = AuthKey(data=os.urandom(256))
+    return session
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های session...\n")
+    test_legacy_session_converted_in_memory()
+    test_string_takes_priority()
+    test_falls_back_to_local_file()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
@@ -30,13 +30,23 @@ for var in required_vars:
 
 # بررسی فایل‌ها
 print("\n📁 بررسی فایل‌ها:")
-files = ['bot.py', 'auto_fetcher.py', 'reminder.py', 'user_session.session']
+files = ['bot.py', 'auto_fetcher.py', 'reminder.py']
 for file in files:
     if os.path.exists(file):
         print(f"  ✅ {file}")
     else:
         print(f"  ❌ {file} وجود ندارد")
 
+# بررسی session تلگرام
+print("\n🔑 بررسی session تلگرام:")
+from telethon_session import load_session_string
+if load_session_string():
+    print("  ✅ session از متغیر محیطی (در حافظه)")
+elif os.path.exists('user_session.session'):
+    print("  ✅ user_session.session")
+else:
+    print("  ❌ session تلگرام وجود ندارد")
+
 print("\n" + "="*60)
 print("✅ تست workflow موفق بود!")
 print("="*60)
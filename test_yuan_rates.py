@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+تست منابع نرخ یوآن با جایگزین‌های محلی (سرور HTTP و کلاینت Telethon)
+"""
+
+import json
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytz
+
+from bot import TetherBot
+from replay import FakeTelethonClient, RecordedPost, VirtualClock
+from telethon_session import SharedClient
+from yuan_rates import (
+    ChannelProvider, HttpJsonProvider, ManualProvider, RateProvider, RateQuote,
+    YuanRateService, refresh_yuan_rate,
+)
+
+TEHRAN = pytz.timezone('Asia/Tehran')
+
+
+class JsonServer:
+    """سرور HTTP محلی با پاسخ JSON ثابت"""
+
+    def __init__(self, payload, delay=0.0):
+        self.hits = 0
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                owner.hits += 1
+                time.sleep(delay)
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.server.handle_error = lambda request, address: None
+        self.url = f'http://127.0.0.1:{self.server.server_port}/rate'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ChannelClient(FakeTelethonClient):
+    starts = 0
+
+    async def start(self, phone=None):
+        ChannelClient.starts += 1
+
+    def is_connected(self):
+        return True
+
+    async def disconnect(self):
+        pass
+
+
+class FixedProvider(RateProvider):
+    def __init__(self, name, rate, delay=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.rate = rate
+        self.delay = delay
+
+    async def fetch(self, state):
+        await asyncio.sleep(self.delay)
+        return RateQuote(self.rate, self.name, time.time())
+
+
+def _run(coro):
+    logging.disable(logging.CRITICAL)
+    try:
+        return asyncio.run(coro)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def _channel(posts, **kwargs):
+    now = max(p.date for p in posts)
+    connection = SharedClient(lambda: ChannelClient(posts, VirtualClock(now)))
+    return ChannelProvider('yuan_rates', r'یوآن\D{0,30}?(\d+(?:[.٫]\d+)?)', connection=connection, **kwargs)
+
+
+def test_http_provider_and_cache():
+    """فیلد تو در تو خوانده و پاسخ در مدت ttl دوباره درخواست نمی‌شود"""
+    with JsonServer({'data': {'rates': [{'cny': '7.14'}]}}) as server:
+        provider = HttpJsonProvider(server.url, 'data.rates.0.cny', ttl=60)
+        first = _run(provider.get(None))
+        second = _run(provider.get(None))
+    assert first.rate == 7.14 and first.source == 'http'
+    assert second is first
+    assert server.hits == 1
+    print("✅ منبع HTTP و cache")
+
+
+def test_channel_provider_parses_latest():
+    """آخرین پیام حاوی نرخ (با ارقام فارسی) انتخاب می‌شود"""
+    now = TEHRAN.localize(datetime(2025, 11, 10, 11, 0))
+    posts = [
+        RecordedPost(date=now - timedelta(hours=2), text="نرخ یوآن: 7.05", id=1),
+        RecordedPost(date=now - timedelta(hours=1), text="نرخ تتر به یوآن ۷٫۱۳", id=2),
+        RecordedPost(date=now, text="اطلاعیه بدون نرخ", id=3),
+    ]
+    quote = _run(_channel(posts, clock=lambda: now.timestamp()).get(None))
+    assert quote.rate == 7.13
+    assert quote.observed_at == (now - timedelta(hours=1)).timestamp()
+    print("✅ منبع کانال")
+
+
+def test_channel_shares_connection():
+    """منبع کانال و خواننده منبع قیمت همزمان فقط یک بار وارد حساب می‌شوند"""
+    now = TEHRAN.localize(datetime(2025, 11, 10, 11, 0))
+    posts = [RecordedPost(date=now, text="یوآن 7.12", id=1)]
+    connection = SharedClient(lambda: ChannelClient(posts, VirtualClock(now)))
+    provider = ChannelProvider('yuan_rates', r'یوآن\D{0,30}?(\d+(?:[.٫]\d+)?)',
+                               connection=connection, clock=lambda: now.timestamp())
+    ChannelClient.starts = 0
+
+    async def tick():
+        reader, quote = await asyncio.gather(connection.get(), provider.get(None))
+        return reader, quote, await connection.get()
+
+    reader, quote, again = _run(tick())
+    assert quote.rate == 7.12
+    assert reader is again and ChannelClient.starts == 1
+    print("✅ اتصال مشترک Telethon")
+
+
+def test_stale_rate_rejected():
+    """نرخ قدیمی‌تر از max_age پذیرفته نمی‌شود و اعداد خارج از بازه رد می‌شوند"""
+    now = TEHRAN.localize(datetime(2025, 11, 10, 11, 0))
+    posts = [RecordedPost(date=now - timedelta(days=2), text="یوآن 7.10", id=1)]
+    provider = _channel(posts, max_age=86400, clock=lambda: now.timestamp())
+    assert _run(provider.get(None)) is None
+
+    posts = [RecordedPost(date=now, text="یوآن 7100", id=1)]
+    assert _run(_channel(posts, clock=lambda: now.timestamp()).get(None)) is None
+    print("✅ رد نرخ قدیمی و نامعتبر")
+
+
+def test_priority_and_timeout():
+    """منبع با اولویت بالاتر انتخاب می‌شود و منبع کند بقیه را معطل نمی‌کند"""
+    service = YuanRateService([
+        FixedProvider('slow', 7.00, delay=5),
+        FixedProvider('channel', 7.12),
+        FixedProvider('http', 7.20),
+    ], timeout=0.2)
+    started = time.perf_counter()
+    quote = _run(service.resolve(None))
+    assert quote.source == 'channel' and quote.rate == 7.12
+    assert time.perf_counter() - started < 1
+    print("✅ اولویت و مهلت منابع")
+
+
+def test_refresh_respects_fresh_manual_rate():
+    """نرخ دستی امروز بر منابع خودکار مقدم است؛ نرخ دستی قدیمی جایگزین می‌شود"""
+    state = TetherBot(data_file=None)
+    service = YuanRateService([ManualProvider(), FixedProvider('http', 7.20)])
+
+    state.set_yuan_rate(7.10)
+    quote = _run(refresh_yuan_rate(state, service))
+    assert quote.source == 'manual'
+    assert (state.yuan_rate, state.yuan_rate_source) == (7.10, 'manual')
+
+    state.set_yuan_rate(7.10, now=datetime.now(TEHRAN) - timedelta(days=1))
+    version = state.state_version
+    quote = _run(refresh_yuan_rate(state, service))
+    assert quote.source == 'http'
+    assert (state.yuan_rate, state.yuan_rate_source) == (7.20, 'http')
+    assert state.has_fresh_yuan_rate(datetime.now(TEHRAN).date())
+    assert state.state_version > version
+    print("✅ اولویت نرخ دستی امروز")
+
+
+def main():
+    """اجرای تست‌ها"""
+    print("🧪 شروع تست‌های منابع نرخ یوآن...\n")
+    test_http_provider_and_cache()
+    test_channel_provider_parses_latest()
+    test_channel_shares_connection()
+    test_stale_rate_rejected()
+    test_priority_and_timeout()
+    test_refresh_respects_fresh_manual_rate()
+    print("\n✅ همه تست‌ها با موفقیت انجام شد!")
+
+
+if __name__ == '__main__':
+    main()
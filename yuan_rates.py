@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+منابع خودکار نرخ یوآن (تتر به یوآن)
+
+به جای توقف کامل تا ارسال /setrate، نرخ از چند منبع خوانده می‌شود:
+- manual: همان نرخ /setrate (فقط برای همان روز معتبر است)
+- channel: آخرین پیام‌های کانال YUAN_CHANNEL با الگوی YUAN_CHANNEL_PATTERN (اتصال مشترک Telethon)
+- http: پاسخ JSON آدرس YUAN_HTTP_URL (فیلد YUAN_HTTP_FIELD، مثلاً data.rate)
+
+همه منابع همزمان و هر کدام با مهلت جداگانه پرسیده می‌شوند و از بین پاسخ‌های
+معتبر، منبع با اولویت بالاتر (ترتیب YUAN_PROVIDERS) انتخاب می‌شود. پاسخ هر
+منبع YUAN_CACHE_SECONDS ثانیه cache می‌شود و نرخ قدیمی‌تر از
+YUAN_MAX_AGE_MINUTES دقیقه پذیرفته نمی‌شود.
+
+اگر هیچ منبعی نرخ تازه نداشته باشد، آخرین نرخ ذخیره شده استفاده می‌شود
+(رفتار قبلی)؛ یادآوری فقط در این حالت ارسال می‌شود.
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from config import config, Settings
+from http_pool import pool
+
+logger = logging.getLogger(__name__)
+
+# مدت cache پاسخ هر منبع (ثانیه)
+YUAN_CACHE_SECONDS = float(os.getenv('YUAN_CACHE_SECONDS', '300'))
+# حداکثر عمر نرخ منابع خودکار (دقیقه)
+YUAN_MAX_AGE_MINUTES = float(os.getenv('YUAN_MAX_AGE_MINUTES', '1440'))
+# مهلت پاسخ هر منبع (ثانیه)
+YUAN_TIMEOUT_SECONDS = float(os.getenv('YUAN_TIMEOUT_SECONDS', '10'))
+# تعداد پیام‌های اخیر کانال که برای یافتن نرخ بررسی می‌شوند
+YUAN_CHANNEL_SCAN = int(os.getenv('YUAN_CHANNEL_SCAN', '20'))
+# بازه قابل قبول نرخ (برای رد اعداد اشتباه استخراج شده)
+YUAN_RATE_MIN = float(os.getenv('YUAN_RATE_MIN', '1'))
+YUAN_RATE_MAX = float(os.getenv('YUAN_RATE_MAX', '50'))
+
+_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٫', '0123456789.')
+
+# عنوان فارسی منابع برای پاسخ‌ها
+SOURCE_LABELS = {
+    'manual': 'دستی (/setrate)',
+    'channel': 'کانال',
+    'http': 'سرویس HTTP',
+}
+
+
+@dataclass(frozen=True)
+class RateQuote:
+    """نرخ گزارش شده یک منبع"""
+    rate: float
+    source: str
+    # زمان انتشار نرخ در منبع (یونیکس)
+    observed_at: float
+
+
+def parse_rate(value) -> Optional[float]:
+    """تبدیل مقدار (عدد یا رشته با ارقام فارسی) به نرخ معتبر"""
+    try:
+        rate = float(str(value).translate(_DIGITS).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+    if not YUAN_RATE_MIN <= rate <= YUAN_RATE_MAX:
+        return None
+    return rate
+
+
+class RateProvider:
+    """
+    پایه منابع نرخ
+
+    زیرکلاس‌ها fetch را پیاده‌سازی می‌کنند؛ پاسخ (حتی None) به مدت ttl cache می‌شود.
+    """
+
+    name = 'provider'
+
+    def __init__(
+        self,
+        ttl: float = YUAN_CACHE_SECONDS,
+        max_age: float = YUAN_MAX_AGE_MINUTES * 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl = ttl
+        self.max_age = max_age
+        self._clock = clock
+        self._cached: Optional[RateQuote] = None
+        self._cached_at: Optional[float] = None
+
+    async def fetch(self, state) -> Optional[RateQuote]:
+        raise NotImplementedError
+
+    async def close(self):
+        """آزادسازی اتصال‌ها (پایان فرآیند)"""
+
+    def is_fresh(self, quote: RateQuote, state, now: float) -> bool:
+        return now - quote.observed_at <= self.max_age
+
+    async def get(self, state) -> Optional[RateQuote]:
+        """نرخ تازه این منبع (از cache در صورت امکان)"""
+        now = self._clock()
+        if self._cached_at is None or now - self._cached_at >= self.ttl:
+            self._cached = await self.fetch(state)
+            self._cached_at = now
+        quote = self._cached
+        if quote is None or not self.is_fresh(quote, state, now):
+            return None
+        return quote
+
+
+class ManualProvider(RateProvider):
+    """نرخ /setrate؛ فقط در همان روز ثبت معتبر است"""
+
+    name = 'manual'
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('ttl', 0)
+        super().__init__(**kwargs)
+
+    async def fetch(self, state) -> Optional[RateQuote]:
+        if not state.yuan_rate or state.yuan_rate_source != self.name or not state.yuan_rate_date:
+            return None
+        return RateQuote(state.yuan_rate, self.name, self._clock())
+
+    def is_fresh(self, quote: RateQuote, state, now: float) -> bool:
+        return state.has_fresh_yuan_rate(datetime.fromtimestamp(now, config.current.tz).date())
+
+
+class ChannelProvider(RateProvider):
+    """
+    آخرین نرخ منتشر شده در یک کانال تلگرام
+
+    از همان اتصال Telethon خواننده منبع قیمت (telethon_session.shared_client)
+    استفاده می‌کند؛ خود منبع هیچ کلاینتی نمی‌سازد یا قطع نمی‌کند.
+    """
+
+    name = 'channel'
+
+    def __init__(
+        self,
+        channel: str,
+        pattern: str,
+        connection=None,
+        scan: int = YUAN_CHANNEL_SCAN,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.channel = channel
+        self.pattern = re.compile(pattern)
+        self.scan = scan
+        self._connection = connection
+
+    def _shared(self):
+        if self._connection is None:
+            from telethon_session import shared_client
+            self._connection = shared_client
+        return self._connection
+
+    def extract(self, text: Optional[str]) -> Optional[float]:
+        match = self.pattern.search((text or '').translate(_DIGITS))
+        return parse_rate(match.group(1)) if match else None
+
+    async def fetch(self, state) -> Optional[RateQuote]:
+        client = await self._shared().get()
+        # جدیدترین پیام اول
+        messages = await client.get_messages(self.channel, limit=self.scan)
+        for message in messages or ():
+            rate = self.extract(message.text)
+            if rate:
+                return RateQuote(rate, self.name, message.date.timestamp())
+        logger.warning("نرخ یوآن در %d پیام اخیر @%s یافت نشد", len(messages or ()), self.channel)
+        return None
+
+    async def close(self):
+        if self._connection is not None:
+            await self._connection.close()
+
+
+class HttpJsonProvider(RateProvider):
+    """نرخ از یک API با پاسخ JSON"""
+
+    name = 'http'
+
+    def __init__(self, url: str, field: str = 'rate', timeout: float = YUAN_TIMEOUT_SECONDS, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.path = [part for part in field.split('.') if part]
+        self.timeout = timeout
+
+    def extract(self, payload) -> Optional[float]:
+        value = payload
+        for part in self.path:
+            if isinstance(value, list) and part.isdigit():
+                value = value[int(part)] if int(part) < len(value) else None
+            elif isinstance(value, dict):
+                value = value.get(part)
+            else:
+                return None
+        return parse_rate(value)
+
+    async def fetch(self, state) -> Optional[RateQuote]:
+        response = await pool.client().get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        payload = response.json()
+        rate = self.extract(payload)
+        if rate is None:
+            logger.warning("نرخ یوآن در فیلد %s پاسخ %s یافت نشد", '.'.join(self.path), self.url)
+            return None
+        return RateQuote(rate, self.name, self._clock())
+
+
+def build_providers(settings: Optional[Settings] = None) -> List[RateProvider]:
+    """منابع تنظیم شده به ترتیب اولویت"""
+    settings = settings or config.current
+    providers: List[RateProvider] = []
+    for name in settings.yuan_providers:
+        if name == 'manual':
+            providers.append(ManualProvider())
+        elif name == 'channel' and settings.yuan_channel:
+            providers.append(ChannelProvider(settings.yuan_channel, settings.yuan_channel_pattern))
+        elif name == 'http' and settings.yuan_http_url:
+            providers.append(HttpJsonProvider(settings.yuan_http_url, settings.yuan_http_field))
+    return providers
+
+
+class YuanRateService:
+    """پرسیدن همزمان منابع و انتخاب نرخ معتبر با بالاترین اولویت"""
+
+    def __init__(self, providers: List[RateProvider], timeout: float = YUAN_TIMEOUT_SECONDS):
+        self.providers = providers
+        self.timeout = timeout
+
+    async def _query(self, provider: RateProvider, state) -> Optional[RateQuote]:
+        try:
+            return await asyncio.wait_for(provider.get(state), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning("منبع نرخ یوآن %s پاسخ نداد", provider.name)
+        except Exception as e:
+            logger.warning("خطا در منبع نرخ یوآن %s: %s", provider.name, e)
+        return None
+
+    async def resolve(self, state) -> Optional[RateQuote]:
+        quotes = await asyncio.gather(*(self._query(p, state) for p in self.providers))
+        return next((quote for quote in quotes if quote), None)
+
+    async def close(self):
+        await asyncio.gather(*(p.close() for p in self.providers), return_exceptions=True)
+
+
+_service: Optional[YuanRateService] = None
+_service_settings: Optional[Settings] = None
+
+
+def get_service() -> YuanRateService:
+    """سرویس مشترک؛ با تغییر config (بارگذاری مجدد) دوباره ساخته می‌شود"""
+    global _service, _service_settings
+    settings = config.current
+    if _service is None or _service_settings is not settings:
+        _service, _service_settings = YuanRateService(build_providers(settings)), settings
+    return _service
+
+
+async def close_service():
+    """بستن اتصال‌های سرویس مشترک (پایان ربات یا اسکریپت)"""
+    if _service is not None:
+        await _service.close()
+
+
+async def refresh_yuan_rate(state, service: Optional[YuanRateService] = None) -> Optional[RateQuote]:
+    """
+    به‌روزرسانی نرخ یوآن state از منابع
+
+    نرخ دستی تازه تغییر نمی‌کند؛ نرخ منابع خودکار فقط وقتی ذخیره می‌شود که
+    با نرخ فعلی تفاوت داشته باشد یا نرخ فعلی مربوط به امروز نباشد.
+    """
+    service = service or get_service()
+    quote = await service.resolve(state)
+    if quote is None or quote.source == 'manual':
+        return quote
+    today = datetime.now(config.current.tz).date()
+    if (quote.rate, quote.source) != (state.yuan_rate, state.yuan_rate_source) or not state.has_fresh_yuan_rate(today):
+        state.set_yuan_rate(quote.rate, source=quote.source)
+        state.save_data()
+        logger.info("نرخ یوآن از منبع %s: %s", quote.source, quote.rate)
+    return quote